@@ -0,0 +1,257 @@
+"""
+Agendador de Barras - Disparo de tarefas no fechamento de barra e em horários exatos
+As threads do SistemaIntegrado acordavam em intervalos fixos (30 s, 10 s, 1 s) só para comparar
+o relógio com o próximo horário de trabalho: acordadas à toa e até um ciclo inteiro de atraso no
+fechamento da barra ou nos horários de 15:10/15:20/16:01. Aqui uma única thread despachante
+guarda as próximas execuções numa fila de prioridade (heapq) e dorme numa Condition até a
+primeira delas vencer; agendar ou cancelar uma tarefa acorda o despachante na hora.
+
+Gatilhos:
+  - barra: fechamento de cada barra do timeframe (M1, M5, M15, H1, D1...), alinhado ao relógio local
+  - horario: hora:minuto exatos, uma vez por dia (opcionalmente só em dias úteis), com tolerância
+    para recuperar o disparo perdido quando o sistema sobe depois do horário
+  - intervalo: a cada N segundos, alinhado a múltiplos de N
+
+As tarefas rodam num pool de threads; a mesma tarefa não se sobrepõe (a execução vencida é
+pulada enquanto a anterior ainda roda) e a janela opcional (hora_inicio, hora_fim) restringe os
+disparos ao pregão.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+SEGUNDOS_TIMEFRAME = {'M1': 60, 'M5': 300, 'M15': 900, 'M30': 1800, 'H1': 3600, 'H4': 14400, 'D1': 86400}
+# Constantes TIMEFRAME_* do MetaTrader5 (valores fixos da API)
+SEGUNDOS_TIMEFRAME_MT5 = {1: 60, 5: 300, 15: 900, 30: 1800, 16385: 3600, 16388: 14400, 16408: 86400}
+
+
+def segundos_timeframe(timeframe):
+    """Duração da barra em segundos a partir de 'M15', uma constante mt5.TIMEFRAME_* ou segundos."""
+    if isinstance(timeframe, str):
+        return SEGUNDOS_TIMEFRAME[timeframe.upper()]
+    if timeframe in SEGUNDOS_TIMEFRAME_MT5:
+        return SEGUNDOS_TIMEFRAME_MT5[timeframe]
+    return int(timeframe)
+
+
+def proximo_multiplo(agora, segundos):
+    """Próximo instante (datetime) múltiplo de `segundos`, contado da meia-noite local, depois de `agora`."""
+    meia_noite = agora.replace(hour=0, minute=0, second=0, microsecond=0)
+    decorrido = (agora - meia_noite).total_seconds()
+    return meia_noite + timedelta(seconds=(int(decorrido // segundos) + 1) * segundos)
+
+
+def proximo_fechamento_barra(agora, timeframe):
+    """Próximo fechamento de barra do timeframe depois de `agora`."""
+    return proximo_multiplo(agora, segundos_timeframe(timeframe))
+
+
+def proximo_horario(agora, hora, minuto, dias_uteis=True, tolerancia_segundos=0):
+    """
+    Próxima ocorrência de hora:minuto depois de `agora`. Se o horário de hoje passou há menos de
+    `tolerancia_segundos`, devolve o de hoje (disparo imediato do horário perdido).
+    """
+    alvo = agora.replace(hour=int(hora), minute=int(minuto), second=0, microsecond=0)
+    atraso = (agora - alvo).total_seconds()
+    if atraso >= 0 and not (0 < tolerancia_segundos and atraso <= tolerancia_segundos):
+        alvo += timedelta(days=1)
+    while dias_uteis and alvo.weekday() >= 5:
+        alvo += timedelta(days=1)
+    return alvo
+
+
+def segundos_ate_fechamento(timeframe, agora=None):
+    """Segundos até o próximo fechamento de barra (usado no lugar das esperas em laço de 1 s)."""
+    agora = agora or datetime.now()
+    return (proximo_fechamento_barra(agora, timeframe) - agora).total_seconds()
+
+
+class Tarefa:
+    """Tarefa registrada: função, gatilho e estado das execuções."""
+
+    def __init__(self, nome, funcao, proxima, janela=None):
+        self.nome = nome
+        self.funcao = funcao
+        self.proxima = proxima      # callable(datetime agora) -> datetime do próximo disparo
+        self.janela = janela        # (hora_inicio, hora_fim) ou None
+        self.cancelada = False
+        self.executando = False
+        self.execucoes = 0
+        self.puladas = 0
+        self.erros = 0
+        self.ultimo_disparo = None
+        self.atraso_ultimo = None   # segundos entre o horário previsto e o início da execução
+
+    def na_janela(self, instante):
+        return self.janela is None or self.janela[0] <= instante.hour < self.janela[1]
+
+
+class AgendadorBarras:
+    """
+    Fila de prioridade de disparos com uma thread despachante e uma Condition.
+
+    Uso:
+        agendador = AgendadorBarras()
+        agendador.a_cada_barra('analise', funcao, 'M15', janela=(10, 17))
+        agendador.horario('fechamento_total', funcao, 16, 1)
+        agendador.iniciar()
+        ...
+        agendador.cancelar('analise'); agendador.parar()
+    """
+
+    def __init__(self, max_workers=4, log=print, relogio=datetime.now):
+        self._heap = []
+        self._tarefas = {}
+        self._sequencia = itertools.count()
+        self._condicao = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="Agendador")
+        self._rodando = False
+        self.thread = None
+        self.log = log
+        self.relogio = relogio
+
+    # ------------------------------------------------------------------ registro
+    def agendar(self, nome, funcao, proxima, janela=None):
+        """Registra (ou substitui) a tarefa `nome` com o gatilho `proxima(agora) -> datetime`."""
+        with self._condicao:
+            anterior = self._tarefas.get(nome)
+            if anterior is not None:
+                anterior.cancelada = True
+            tarefa = Tarefa(nome, funcao, proxima, janela)
+            self._tarefas[nome] = tarefa
+            self._enfileirar(tarefa, self.relogio())
+            self._condicao.notify()
+        return tarefa
+
+    def a_cada_barra(self, nome, funcao, timeframe, janela=None, atraso_segundos=0.0):
+        """Dispara no fechamento de cada barra do timeframe (+ atraso_segundos para a barra chegar na corretora)."""
+        return self.intervalo(nome, funcao, segundos_timeframe(timeframe), janela, atraso_segundos)
+
+    def horario(self, nome, funcao, hora, minuto, dias_uteis=True, tolerancia_segundos=0):
+        """Dispara uma vez por dia às hora:minuto; ao registrar, recupera o horário perdido dentro da tolerância."""
+        primeira = [True]
+
+        def proxima(agora):
+            tolerancia = tolerancia_segundos if primeira[0] else 0
+            primeira[0] = False
+            return proximo_horario(agora, hora, minuto, dias_uteis, tolerancia)
+        return self.agendar(nome, funcao, proxima)
+
+    def intervalo(self, nome, funcao, segundos, janela=None, atraso_segundos=0.0):
+        """Dispara a cada `segundos`, alinhado a múltiplos do intervalo (+ atraso_segundos)."""
+        atraso = timedelta(seconds=atraso_segundos)
+        return self.agendar(nome, funcao, lambda agora: proximo_multiplo(agora - atraso, segundos) + atraso, janela)
+
+    def cancelar(self, nome):
+        """Remove a tarefa; a entrada na fila é descartada quando chegar a vez dela."""
+        with self._condicao:
+            tarefa = self._tarefas.pop(nome, None)
+            if tarefa is None:
+                return False
+            tarefa.cancelada = True
+            self._condicao.notify()
+            return True
+
+    def executar_agora(self, nome):
+        """Dispara a tarefa uma vez já, sem mexer no próximo disparo agendado."""
+        with self._condicao:
+            tarefa = self._tarefas.get(nome)
+            if tarefa is None:
+                return False
+            heapq.heappush(self._heap, (self.relogio(), next(self._sequencia), tarefa, False))
+            self._condicao.notify()
+            return True
+
+    def _enfileirar(self, tarefa, agora):
+        instante = tarefa.proxima(agora)
+        heapq.heappush(self._heap, (instante, next(self._sequencia), tarefa, True))
+
+    # ------------------------------------------------------------------ execução
+    def iniciar(self):
+        with self._condicao:
+            if self._rodando:
+                return
+            self._rodando = True
+        self.thread = threading.Thread(target=self._despachar, name="AgendadorBarras", daemon=True)
+        self.thread.start()
+
+    def parar(self, aguardar=False):
+        with self._condicao:
+            self._rodando = False
+            self._condicao.notify_all()
+        if aguardar and self.thread is not None:
+            self.thread.join()
+        self._executor.shutdown(wait=aguardar)
+
+    @property
+    def rodando(self):
+        return self._rodando
+
+    def _despachar(self):
+        with self._condicao:
+            while self._rodando:
+                # Descarta canceladas do topo da fila
+                while self._heap and self._heap[0][2].cancelada:
+                    heapq.heappop(self._heap)
+                if not self._heap:
+                    self._condicao.wait()
+                    continue
+                instante, _, tarefa, recorrente = self._heap[0]
+                espera = (instante - self.relogio()).total_seconds()
+                if espera > 0:
+                    self._condicao.wait(timeout=espera)
+                    continue
+                heapq.heappop(self._heap)
+                if recorrente:
+                    self._enfileirar(tarefa, max(self.relogio(), instante))
+                if not tarefa.na_janela(instante):
+                    continue
+                if tarefa.executando:
+                    tarefa.puladas += 1
+                    continue
+                tarefa.executando = True
+                tarefa.ultimo_disparo = instante
+                tarefa.atraso_ultimo = (self.relogio() - instante).total_seconds()
+                try:
+                    self._executor.submit(self._executar, tarefa)
+                except RuntimeError:
+                    tarefa.executando = False      # executor encerrado durante a parada
+
+    def _executar(self, tarefa):
+        try:
+            tarefa.funcao()
+            tarefa.execucoes += 1
+        except Exception as e:
+            tarefa.erros += 1
+            self.log(f"[AGENDADOR] Erro na tarefa '{tarefa.nome}': {e}")
+        finally:
+            tarefa.executando = False
+
+    # ------------------------------------------------------------------ consulta
+    def proximos_disparos(self):
+        """{nome: próximo datetime} das tarefas ativas (para o dashboard/logs)."""
+        with self._condicao:
+            proximos = {}
+            for instante, _, tarefa, recorrente in sorted(self._heap, key=lambda item: item[:2]):
+                if recorrente and not tarefa.cancelada:
+                    proximos[tarefa.nome] = instante
+            return proximos
+
+    def estatisticas(self):
+        with self._condicao:
+            return {nome: {'execucoes': t.execucoes, 'puladas': t.puladas, 'erros': t.erros,
+                           'ultimo_disparo': t.ultimo_disparo, 'atraso_ultimo': t.atraso_ultimo}
+                    for nome, t in self._tarefas.items()}
+
+
+def aguardar_fechamento(timeframe, evento_parada=None):
+    """Espera o próximo fechamento de barra numa única espera (interrompível por um threading.Event)."""
+    segundos = segundos_ate_fechamento(timeframe)
+    if evento_parada is not None:
+        return not evento_parada.wait(segundos)
+    time.sleep(segundos)
+    return True
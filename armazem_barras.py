@@ -0,0 +1,187 @@
+"""
+Armazém de Barras - Histórico OHLC persistente por (ativo, timeframe)
+Guarda as barras retornadas pelo MT5 em arquivos .npy (mapeáveis em memória) e,
+depois da carga inicial, busca apenas as barras a partir da última já armazenada.
+A primeira e a segunda seleção de calculo_entradas_v55 passam a ler a mesma cópia
+em memória, sem repetir copy_rates_range de 360 dias nem reconstruir DataFrames.
+"""
+
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone as tz_utc
+
+import numpy as np
+import pandas as pd
+
+
+class ArmazemBarras:
+    """
+    Cache de barras com atualização incremental.
+
+    Parâmetros:
+      - diretorio: pasta dos arquivos <ativo>_<timeframe>.npy / .json
+      - buscar_barras: função no formato de mt5.copy_rates_range(ativo, timeframe, inicio, fim),
+        retornando o array estruturado do MT5 (campo 'time' em segundos)
+      - validade_segundos: intervalo em que uma chave recém-atualizada é servida sem consultar o MT5
+    """
+
+    def __init__(self, diretorio, buscar_barras, validade_segundos=0):
+        self.diretorio = diretorio
+        self.buscar_barras = buscar_barras
+        self.validade_segundos = validade_segundos
+        self._barras = {}        # (ativo, timeframe) -> array estruturado do MT5
+        self._inicio = {}        # (ativo, timeframe) -> início (s) coberto pela carga completa
+        self._frames = {}        # (ativo, timeframe) -> DataFrame indexado por 'time'
+        self._verificado = {}    # (ativo, timeframe) -> time.monotonic() da última consulta ao MT5
+        self._lock = threading.RLock()
+        self.estatisticas = {'cargas_completas': 0, 'buscas_incrementais': 0, 'barras_recebidas': 0}
+        os.makedirs(diretorio, exist_ok=True)
+
+    # ------------------------------------------------------------------ arquivos
+    def _caminho(self, ativo, timeframe, extensao):
+        nome = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{ativo}_{timeframe}")
+        return os.path.join(self.diretorio, f"{nome}.{extensao}")
+
+    def _carregar_disco(self, chave):
+        caminho = self._caminho(*chave, 'npy')
+        caminho_meta = self._caminho(*chave, 'json')
+        if not (os.path.exists(caminho) and os.path.exists(caminho_meta)):
+            return False
+        try:
+            with open(caminho_meta, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            barras = np.load(caminho, mmap_mode='r')
+            self._barras[chave] = np.array(barras)  # cópia em memória; o mmap só evita ler o arquivo duas vezes
+            self._inicio[chave] = int(meta['inicio'])
+            return True
+        except Exception as e:
+            print(f"[ARMAZEM] Falha ao ler {caminho}: {e}. Recarregando do MT5.")
+            return False
+
+    def _salvar_disco(self, chave):
+        caminho = self._caminho(*chave, 'npy')
+        caminho_meta = self._caminho(*chave, 'json')
+        try:
+            temporario = caminho + '.tmp'
+            with open(temporario, 'wb') as f:
+                np.save(f, self._barras[chave])
+            os.replace(temporario, caminho)
+            with open(caminho_meta + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump({'inicio': self._inicio[chave], 'barras': int(len(self._barras[chave]))}, f)
+            os.replace(caminho_meta + '.tmp', caminho_meta)
+        except Exception as e:
+            print(f"[ARMAZEM] Falha ao salvar {caminho}: {e}")
+
+    # ------------------------------------------------------------------ atualização
+    @staticmethod
+    def _segundos(data):
+        if isinstance(data, datetime):
+            if data.tzinfo is None:
+                data = data.replace(tzinfo=tz_utc.utc)
+            return int(data.timestamp())
+        return int(pd.Timestamp(data).timestamp())
+
+    def _atualizar(self, chave, data_inicio, data_fim):
+        """Carga completa na primeira vez (ou se o início pedido é anterior ao coberto); senão, só o delta."""
+        ativo, timeframe = chave
+        inicio_pedido = self._segundos(data_inicio)
+        barras = self._barras.get(chave)
+
+        if barras is None or len(barras) == 0 or inicio_pedido < self._inicio.get(chave, inicio_pedido):
+            novas = self.buscar_barras(ativo, timeframe, data_inicio, data_fim)
+            if novas is None or len(novas) == 0:
+                return False
+            self._barras[chave] = np.array(novas)
+            self._inicio[chave] = inicio_pedido
+            self.estatisticas['cargas_completas'] += 1
+            self.estatisticas['barras_recebidas'] += len(novas)
+        else:
+            # A última barra armazenada é buscada de novo: ela pode ter sido gravada ainda em formação
+            ultima = int(barras['time'][-1])
+            novas = self.buscar_barras(ativo, timeframe, datetime.fromtimestamp(ultima, tz=tz_utc.utc), data_fim)
+            self.estatisticas['buscas_incrementais'] += 1
+            if novas is None or len(novas) == 0:
+                return False
+            novas = np.array(novas)
+            self.estatisticas['barras_recebidas'] += len(novas)
+            if (len(novas) == 1 and novas['time'][0] == ultima
+                    and novas.dtype == barras.dtype and novas[0] == barras[-1]):
+                return False
+            manter = barras['time'] < novas['time'][0]
+            if inicio_pedido > self._inicio[chave]:
+                # Janela deslizante: descarta o que ficou antes do início pedido
+                manter &= barras['time'] >= inicio_pedido
+                self._inicio[chave] = inicio_pedido
+            self._barras[chave] = np.concatenate([barras[manter], novas.astype(barras.dtype)])
+
+        self._frames.pop(chave, None)
+        self._salvar_disco(chave)
+        return True
+
+    def obter(self, ativo, timeframe, data_inicio, data_fim, validade_segundos=None):
+        """
+        Retorna o DataFrame de barras (índice 'time', colunas do MT5) entre data_inicio e data_fim,
+        no mesmo formato de pd.DataFrame(copy_rates_range(...)).set_index('time'); None se não houver dados.
+
+        O DataFrame devolvido é compartilhado entre as chamadas: trate-o como somente leitura.
+        """
+        chave = (ativo, timeframe)
+        validade = self.validade_segundos if validade_segundos is None else validade_segundos
+        with self._lock:
+            if chave not in self._barras:
+                self._carregar_disco(chave)
+
+            agora = time.monotonic()
+            recente = agora - self._verificado.get(chave, -np.inf) < validade
+            if not recente or chave not in self._barras:
+                try:
+                    self._atualizar(chave, data_inicio, data_fim)
+                except Exception as e:
+                    print(f"[ARMAZEM] Erro ao atualizar {ativo} ({timeframe}): {e}")
+                self._verificado[chave] = agora
+
+            barras = self._barras.get(chave)
+            if barras is None or len(barras) == 0:
+                return None
+
+            # Janela efetiva: um data_fim além da última barra não invalida o DataFrame já montado
+            inicio = self._segundos(data_inicio)
+            janela = (inicio, min(self._segundos(data_fim), int(barras['time'][-1])))
+            df = self._frames.get(chave)
+            if df is None or df.attrs.get('janela') != janela:
+                selecao = barras[(barras['time'] >= inicio) & (barras['time'] <= janela[1])]
+                if len(selecao) == 0:
+                    return None
+                df = pd.DataFrame(selecao)
+                df['time'] = pd.to_datetime(df['time'], unit='s')
+                df = df.set_index('time')
+                df.attrs['janela'] = janela
+                self._frames[chave] = df
+            return df
+
+    def ultima_atualizacao(self, ativo, timeframe):
+        """Horário (pd.Timestamp) da última barra armazenada, ou None."""
+        barras = self._barras.get((ativo, timeframe))
+        if barras is None or len(barras) == 0:
+            return None
+        return pd.to_datetime(int(barras['time'][-1]), unit='s')
+
+
+def carregar_historico(armazem, ativos, timeframe, data_inicio, data_fim, dados_historicos, ultima_atualizacao,
+                       validade_segundos=None):
+    """
+    Preenche dados_historicos[ativo] e ultima_atualizacao[ativo] a partir do armazém,
+    como faziam os blocos de copy_rates_range de main(). Retorna a lista de ativos sem dados.
+    """
+    sem_dados = []
+    for ativo in dict.fromkeys(ativos):
+        df = armazem.obter(ativo, timeframe, data_inicio, data_fim, validade_segundos=validade_segundos)
+        if df is None:
+            sem_dados.append(ativo)
+            continue
+        dados_historicos[ativo] = df
+        ultima_atualizacao[ativo] = df.index.max()
+    return sem_dados
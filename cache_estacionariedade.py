@@ -0,0 +1,80 @@
+"""
+Cache de Estacionariedade - Memoização do teste ADF do preprocessamento
+Guarda o resultado de tornar_estacionaria (série estacionária e ndiffs) por uma
+impressão digital barata da série: ativo, timeframe, primeiro/último horário,
+tamanho e hash das últimas barras. Séries que não mudaram entre ciclos (ou entre
+os pares da segunda seleção, que repetem IBOV, WIN$ e os mesmos ativos) não
+rodam o adfuller de novo. Despejo LRU limita a memória.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+N_BARRAS_CAUDA = 32
+
+
+def impressao_digital(ativo, timeframe, serie, n_cauda=N_BARRAS_CAUDA):
+    """Chave barata da série: (ativo, timeframe, tamanho, primeiro e último horário, hash da cauda)."""
+    n = len(serie)
+    if n == 0:
+        return (ativo, timeframe, 0, None, None, None)
+    cauda = serie.iloc[-n_cauda:]
+    resumo = hashlib.blake2b(np.ascontiguousarray(cauda.to_numpy(dtype=float)).tobytes(), digest_size=16)
+    indice = cauda.index
+    if isinstance(indice, pd.DatetimeIndex):
+        resumo.update(indice.asi8.tobytes())
+    else:
+        resumo.update(np.asarray(indice).astype(str).astype(bytes).tobytes())
+    return (ativo, timeframe, n, serie.index[0], serie.index[-1], resumo.hexdigest())
+
+
+class CacheEstacionariedade:
+    """Cache LRU de (série estacionária, ndiffs) por impressão digital da série."""
+
+    def __init__(self, capacidade=512):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obter(self, chave):
+        with self._lock:
+            if chave not in self._entradas:
+                self.falhas += 1
+                return None
+            self._entradas.move_to_end(chave)
+            self.acertos += 1
+            return self._entradas[chave]
+
+    def guardar(self, chave, valor):
+        with self._lock:
+            self._entradas[chave] = valor
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def tornar_estacionaria(self, ativo, timeframe, serie, funcao, max_diffs=1, verbose=False):
+        """
+        Retorna funcao(serie, max_diffs=..., verbose=...) — ou seja, (serie_estacionaria, ndiffs) —
+        reaproveitando o resultado de uma série com a mesma impressão digital.
+
+        A série estacionária devolvida é compartilhada entre os acertos: trate-a como somente leitura.
+        """
+        chave = impressao_digital(ativo, timeframe, serie) + (max_diffs,)
+        resultado = self.obter(chave)
+        if resultado is None:
+            resultado = funcao(serie, max_diffs=max_diffs, verbose=verbose)
+            self.guardar(chave, resultado)
+        return resultado
@@ -0,0 +1,186 @@
+"""
+Cache de Painéis - Memoização do render do dashboard por versão dos dados e filtros do usuário
+A cada autorefresh o main() do dashboard relia tabela_linha_operacao(01) do disco e reexecutava por
+inteiro render_status_cards, render_positions_table, render_signals_table, render_segunda_selecao,
+render_trade_history e render_profit_distribution: DataFrames refeitos, colunas reformatadas e
+buscar_id_par* (str.contains sobre as tabelas) repetidos por posição — em toda sessão aberta do navegador.
+
+O Streamlit remove da página os elementos que não forem emitidos no rerun, então o painel não pode
+simplesmente "não rodar". O que se evita é o trabalho caro: cada painel monta um modelo (valores
+formatados, DataFrame de exibição, índice de IDs dos pares) que fica guardado por
+
+    nome   = (painel, sessão, filtros do usuário)
+    versão = versões dos dados de entrada (Snapshot.versao_de, CacheDeals.versao, mtime do arquivo)
+
+e o rerun só emite os elementos a partir do modelo pronto. O cache é do processo (LRU com descarte),
+compartilhado pelas sessões; cada nome guarda só a versão mais recente.
+"""
+
+import os
+
+from dados_graficos import CacheFiguras
+from publicacao_snapshots import congelar
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+try:
+    import pyarrow as pa
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+_cache_paineis = CacheFiguras(capacidade=64)
+
+
+def obter_cache_paineis():
+    """Cache de modelos de painéis compartilhado pelo processo (sobrevive aos reruns e às sessões)."""
+    return _cache_paineis
+
+
+def chave_painel(painel, sessao=None, **filtros):
+    """Nome da entrada: painel + sessão + filtros, em ordem estável (valores precisam ser hasheáveis)."""
+    return (painel, sessao) + tuple(sorted(filtros.items()))
+
+
+def memorizar(painel, versao, construir, sessao=None, **filtros):
+    """
+    Modelo do painel para (painel, sessão, filtros) na `versao` dos dados, ou construir().
+    Versão None desliga o cache (dado sem versão conhecida é sempre reconstruído).
+    """
+    return _cache_paineis.obter(chave_painel(painel, sessao, **filtros), versao, construir)
+
+
+def tabela_exibicao(df):
+    """
+    DataFrame convertido uma vez para pyarrow.Table (o st.dataframe recebe a tabela pronta em vez de
+    converter o DataFrame a cada rerun). Sem pyarrow ou com colunas de tipos mistos, devolve o próprio df.
+    """
+    if not HAS_PYARROW or df is None:
+        return df
+    try:
+        return pa.Table.from_pandas(df, preserve_index=False)
+    except Exception:
+        return df
+
+
+def carregar_tabela_memorizada(nome_arquivo):
+    """
+    Como carregar_tabela (pickle, senão CSV), mas só relê o arquivo quando mtime/tamanho mudam.
+    O DataFrame devolvido é somente leitura (compartilhado entre reruns e sessões).
+    """
+    for extensao in ('.pkl', '.csv'):
+        caminho = nome_arquivo + extensao
+        try:
+            estado = os.stat(caminho)
+        except OSError:
+            continue
+
+        def ler():
+            try:
+                if extensao == '.pkl':
+                    return congelar(pd.read_pickle(caminho))
+                return congelar(pd.read_csv(caminho))
+            except Exception:
+                return None
+
+        tabela = memorizar('arquivo', (estado.st_mtime_ns, estado.st_size), ler, caminho=caminho)
+        if tabela is not None:
+            return tabela
+    return None
+
+
+class IndiceIdsPares:
+    """
+    buscar_id_par* com resultado guardado por consulta enquanto as tabelas não mudam. Mesma regra do
+    dashboard: segunda seleção (tabela_linha_operacao01) primeiro, depois a primeira seleção.
+    """
+
+    def __init__(self, tabela01=None, tabela0=None, log=None):
+        self.tabela01 = tabela01 if self._valida(tabela01) else None
+        self.tabela0 = tabela0 if self._valida(tabela0) else None
+        self.log = log
+        self._resultados = {}
+        self.consultas = 0
+
+    @staticmethod
+    def _valida(tabela):
+        return HAS_PANDAS and isinstance(tabela, pd.DataFrame) and not tabela.empty
+
+    def _memorizado(self, chave, buscar):
+        self.consultas += 1
+        if chave not in self._resultados:
+            self._resultados[chave] = buscar()
+        return self._resultados[chave]
+
+    def por_simbolo(self, symbol, magic_number=None):
+        """ID do par cujo Dependente ou Independente contém `symbol` (preferindo o magic); senão o magic ou "N/A"."""
+        return self._memorizado(('simbolo', symbol, magic_number), lambda: self._buscar_simbolo(symbol, magic_number))
+
+    def _buscar_simbolo(self, symbol, magic_number):
+        try:
+            for tabela in (self.tabela01, self.tabela0):
+                if tabela is None:
+                    continue
+                mask_dep = tabela['Dependente'].str.contains(symbol, na=False)
+                mask_ind = tabela['Independente'].str.contains(symbol, na=False)
+                registro_encontrado = tabela[mask_dep | mask_ind]
+                if not registro_encontrado.empty:
+                    # Se há magic number, tenta encontrar correspondência exata
+                    if magic_number:
+                        registro_magic = registro_encontrado[registro_encontrado['ID'] == magic_number]
+                        if not registro_magic.empty:
+                            return registro_magic.iloc[0]['ID']
+                    return registro_encontrado.iloc[0]['ID']
+            return magic_number if magic_number else "N/A"
+        except Exception as e:
+            if self.log:
+                self.log(f"❌ Erro ao buscar ID do par para {symbol}: {str(e)}")
+            return magic_number if magic_number else "N/A"
+
+    def por_par(self, dependente, independente, ignorar_caixa=False):
+        """ID do par Dependente/Independente (exato, depois por conteúdo na segunda seleção), ou "N/A"."""
+        return self._memorizado(('par', dependente, independente, ignorar_caixa),
+                                lambda: self._buscar_par(dependente, independente, ignorar_caixa))
+
+    def _buscar_par(self, dependente, independente, ignorar_caixa):
+        try:
+            if self.tabela01 is not None:
+                tabela = self.tabela01
+                registro_encontrado = tabela[(tabela['Dependente'] == dependente) & (tabela['Independente'] == independente)]
+                if not registro_encontrado.empty:
+                    return registro_encontrado.iloc[0]['ID']
+                # Busca alternativa por conteúdo
+                mask_dep = tabela['Dependente'].str.contains(str(dependente), na=False, case=not ignorar_caixa)
+                mask_ind = tabela['Independente'].str.contains(str(independente), na=False, case=not ignorar_caixa)
+                registro_alt = tabela[mask_dep & mask_ind]
+                if not registro_alt.empty:
+                    return registro_alt.iloc[0]['ID']
+            if self.tabela0 is not None:
+                tabela = self.tabela0
+                registro_encontrado = tabela[(tabela['Dependente'] == dependente) & (tabela['Independente'] == independente)]
+                if not registro_encontrado.empty:
+                    return registro_encontrado.iloc[0]['ID']
+            return "N/A"
+        except Exception as e:
+            if self.log:
+                self.log(f"❌ Erro ao buscar ID do par para {dependente}/{independente}: {str(e)}")
+            return "N/A"
+
+    def por_par_string(self, par_string):
+        """ID a partir de "DEPENDENTE/INDEPENDENTE" (formato da coluna de sinais)."""
+        if not par_string or '/' not in par_string:
+            return "N/A"
+        dependente, independente = par_string.split('/')[:2]
+        return self.por_par(dependente, independente)
+
+
+def indice_ids_pares(snapshot, sessao=None, log=None):
+    """IndiceIdsPares das tabelas do snapshot, reaproveitado enquanto as versões delas não mudam."""
+    versao = snapshot.versoes_de('tabela_linha_operacao01', 'tabela_linha_operacao')
+    return memorizar('ids_pares', versao,
+                     lambda: IndiceIdsPares(snapshot.get('tabela_linha_operacao01'), snapshot.get('tabela_linha_operacao'), log),
+                     sessao=sessao)
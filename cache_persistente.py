@@ -0,0 +1,355 @@
+"""
+Cache Persistente - Formato compacto e versionado para os caches em disco
+Substitui o pickle único de cache_regressoes.pkl / arima_cache.pkl por uma pasta com
+um índice JSON (versão do esquema, chave e horário de cada entrada) e um .npz por
+entrada contendo apenas números, textos e horários — objetos ajustados do statsmodels
+não são gravados. Cada arquivo é escrito em .tmp e renomeado (os.replace), as entradas
+só são lidas do disco quando acessadas, entradas além do TTL são descartadas e uma
+entrada corrompida invalida apenas a si mesma.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+VERSAO_ESQUEMA = 1
+ARQUIVO_INDICE = 'indice.json'
+
+
+# ---------------------------------------------------------------------- codificação
+def _codificar_campo(valor):
+    """(tipo, array) para um valor simples; None se o valor não é persistível (ex.: modelo ajustado)."""
+    if valor is None:
+        return 'none', np.zeros(0)
+    if isinstance(valor, (pd.Timestamp, datetime, np.datetime64)):
+        ts = pd.Timestamp(valor)
+        if pd.isna(ts):
+            return 'nat', np.zeros(0)
+        return ('ts_tz:' + str(ts.tz)) if ts.tz is not None else 'ts', np.array(ts.value, dtype=np.int64)
+    if isinstance(valor, (bool, np.bool_)):
+        return 'bool', np.array(bool(valor))
+    if isinstance(valor, (int, np.integer)):
+        return 'int', np.array(int(valor), dtype=np.int64)
+    if isinstance(valor, (float, np.floating)):
+        return 'float', np.array(float(valor), dtype=np.float64)
+    if isinstance(valor, str):
+        return 'str', np.array(valor)
+    if isinstance(valor, np.ndarray) and valor.dtype.kind in 'biuf':
+        return 'array', valor
+    return None
+
+
+def _decodificar_campo(tipo, array):
+    if tipo == 'none':
+        return None
+    if tipo == 'nat':
+        return pd.NaT
+    if tipo == 'ts':
+        return pd.Timestamp(int(array))
+    if tipo.startswith('ts_tz:'):
+        return pd.Timestamp(int(array), tz='UTC').tz_convert(tipo[len('ts_tz:'):])
+    if tipo == 'bool':
+        return bool(array)
+    if tipo == 'int':
+        return int(array)
+    if tipo == 'float':
+        return float(array)
+    if tipo == 'str':
+        return str(array)
+    return np.array(array)
+
+
+def codificar_valor(valor):
+    """
+    Converte um valor do cache (tupla/lista, dict plano ou escalar) em (meta, arrays) para o .npz.
+    Campos não persistíveis são omitidos nos dicts e gravados como None nas tuplas (preserva posições).
+    """
+    arrays = {}
+    campos = []
+    if isinstance(valor, dict):
+        container, itens = 'dict', valor.items()
+    elif isinstance(valor, (tuple, list)):
+        container, itens = type(valor).__name__, enumerate(valor)
+    else:
+        container, itens = 'escalar', [(0, valor)]
+    for k, (nome, item) in enumerate(itens):
+        codificado = _codificar_campo(item)
+        if codificado is None:
+            if container == 'dict':
+                continue
+            codificado = _codificar_campo(None)
+        tipo, array = codificado
+        arrays[f'c{k}'] = array
+        campos.append([f'c{k}', str(nome) if container == 'dict' else k, tipo])
+    return {'container': container, 'campos': campos}, arrays
+
+
+def decodificar_valor(meta, arquivo):
+    valores = [(nome, _decodificar_campo(tipo, arquivo[campo])) for campo, nome, tipo in meta['campos']]
+    if meta['container'] == 'dict':
+        return dict(valores)
+    if meta['container'] == 'escalar':
+        return valores[0][1] if valores else None
+    lista = [v for _, v in valores]
+    return tuple(lista) if meta['container'] == 'tuple' else lista
+
+
+def _chave_json(chave):
+    """Chave do cache (tupla de str/int/float) em forma serializável."""
+    if isinstance(chave, tuple):
+        return {'tupla': [_chave_json(c) for c in chave]}
+    if isinstance(chave, np.generic):
+        return chave.item()
+    return chave
+
+
+def _chave_de_json(chave):
+    if isinstance(chave, dict) and 'tupla' in chave:
+        return tuple(_chave_de_json(c) for c in chave['tupla'])
+    return chave
+
+
+# ---------------------------------------------------------------------- cache
+class CachePersistente:
+    """
+    Dicionário persistente com carga preguiçosa por chave.
+
+    Parâmetros:
+      - diretorio: pasta do cache (índice + um .npz por entrada)
+      - ttl_segundos: idade máxima de uma entrada (0 = sem expiração)
+      - capacidade_memoria: entradas já gravadas mantidas em memória (LRU); as pendentes ficam até salvar()
+
+    Usado como dict: `chave in cache`, `cache[chave]`, `cache[chave] = valor`, `cache.get(...)`.
+    Alterações só vão para o disco em salvar().
+    """
+
+    def __init__(self, diretorio, ttl_segundos=0, capacidade_memoria=1024):
+        self.diretorio = diretorio
+        self.ttl_segundos = ttl_segundos
+        self.capacidade_memoria = capacidade_memoria
+        self._indice = {}                 # nome do arquivo -> {'chave': chave, 'ts': epoch}
+        self._por_chave = {}              # chave -> nome do arquivo
+        self._memoria = OrderedDict()     # chave -> valor já lido/gravado
+        self._pendentes = {}              # chave -> valor ainda não gravado
+        self._removidos = set()           # arquivos a apagar no próximo salvar()
+        self._lock = threading.RLock()
+        self.estatisticas = {'leituras': 0, 'gravacoes': 0, 'expiradas': 0, 'corrompidas': 0}
+        os.makedirs(diretorio, exist_ok=True)
+        self._carregar_indice()
+
+    # ------------------------------------------------------------------ índice
+    @staticmethod
+    def _nome_arquivo(chave):
+        return hashlib.blake2b(repr(chave).encode('utf-8'), digest_size=12).hexdigest() + '.npz'
+
+    def _caminho(self, nome):
+        return os.path.join(self.diretorio, nome)
+
+    def _carregar_indice(self):
+        caminho = self._caminho(ARQUIVO_INDICE)
+        if not os.path.exists(caminho):
+            return
+        try:
+            with open(caminho, 'r', encoding='utf-8') as f:
+                indice = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[CACHE] Índice {caminho} ilegível ({e}). Reconstruindo a partir das entradas.")
+            self._reconstruir_indice()
+            return
+        if indice.get('versao') != VERSAO_ESQUEMA:
+            print(f"[CACHE] Esquema {indice.get('versao')} em {self.diretorio} difere de {VERSAO_ESQUEMA}. Descartando cache.")
+            self._removidos.update(indice.get('entradas', {}).keys())
+            return
+        for nome, entrada in indice.get('entradas', {}).items():
+            chave = _chave_de_json(entrada['chave'])
+            self._indice[nome] = {'chave': chave, 'ts': float(entrada['ts'])}
+            self._por_chave[chave] = nome
+        self._expirar()
+
+    def _reconstruir_indice(self):
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith('.npz'):
+                continue
+            try:
+                with np.load(self._caminho(nome), allow_pickle=False) as arquivo:
+                    meta = json.loads(str(arquivo['__meta__']))
+                if meta.get('versao') != VERSAO_ESQUEMA:
+                    raise ValueError('versão')
+                chave = _chave_de_json(meta['chave'])
+                self._indice[nome] = {'chave': chave, 'ts': float(meta['ts'])}
+                self._por_chave[chave] = nome
+            except Exception:
+                self._removidos.add(nome)
+        self._expirar()
+
+    def _expirar(self):
+        if not self.ttl_segundos:
+            return
+        limite = time.time() - self.ttl_segundos
+        for nome, entrada in list(self._indice.items()):
+            if entrada['ts'] < limite:
+                self._descartar(entrada['chave'])
+                self.estatisticas['expiradas'] += 1
+
+    def _descartar(self, chave):
+        nome = self._por_chave.pop(chave, None)
+        if nome is not None:
+            self._indice.pop(nome, None)
+            self._removidos.add(nome)
+        self._memoria.pop(chave, None)
+        self._pendentes.pop(chave, None)
+
+    # ------------------------------------------------------------------ interface de dict
+    def __contains__(self, chave):
+        with self._lock:
+            if chave in self._pendentes:
+                return True
+            nome = self._por_chave.get(chave)
+            if nome is None:
+                return False
+            if self.ttl_segundos and self._indice[nome]['ts'] < time.time() - self.ttl_segundos:
+                self._descartar(chave)
+                self.estatisticas['expiradas'] += 1
+                return False
+            return True
+
+    def __getitem__(self, chave):
+        with self._lock:
+            if chave in self._pendentes:
+                return self._pendentes[chave]
+            if chave in self._memoria:
+                self._memoria.move_to_end(chave)
+                return self._memoria[chave]
+            if chave not in self:
+                raise KeyError(chave)
+            nome = self._por_chave[chave]
+            try:
+                with np.load(self._caminho(nome), allow_pickle=False) as arquivo:
+                    meta = json.loads(str(arquivo['__meta__']))
+                    valor = decodificar_valor(meta, arquivo)
+            except Exception as e:
+                print(f"[CACHE] Entrada {nome} corrompida ({e}). Descartando apenas esta chave.")
+                self.estatisticas['corrompidas'] += 1
+                self._descartar(chave)
+                raise KeyError(chave)
+            self.estatisticas['leituras'] += 1
+            self._lembrar(chave, valor)
+            return valor
+
+    def __setitem__(self, chave, valor):
+        with self._lock:
+            self._pendentes[chave] = valor
+            self._memoria.pop(chave, None)
+
+    def __delitem__(self, chave):
+        with self._lock:
+            if chave not in self:
+                raise KeyError(chave)
+            self._descartar(chave)
+
+    def __len__(self):
+        with self._lock:
+            return len(set(self._por_chave) | set(self._pendentes))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        with self._lock:
+            return list(dict.fromkeys(list(self._por_chave) + list(self._pendentes)))
+
+    def items(self):
+        for chave in self.keys():
+            try:
+                yield chave, self[chave]
+            except KeyError:
+                continue
+
+    def get(self, chave, padrao=None):
+        try:
+            return self[chave]
+        except KeyError:
+            return padrao
+
+    def update(self, outro):
+        for chave, valor in outro.items():
+            self[chave] = valor
+
+    def _lembrar(self, chave, valor):
+        self._memoria[chave] = valor
+        self._memoria.move_to_end(chave)
+        while len(self._memoria) > self.capacidade_memoria:
+            self._memoria.popitem(last=False)
+
+    # ------------------------------------------------------------------ gravação
+    def salvar(self):
+        """Grava as entradas pendentes e o índice (cada arquivo via .tmp + os.replace) e apaga os descartados."""
+        with self._lock:
+            self._expirar()
+            pendentes, self._pendentes = self._pendentes, {}
+            for chave, valor in pendentes.items():
+                nome = self._nome_arquivo(chave)
+                agora = time.time()
+                meta, arrays = codificar_valor(valor)
+                meta.update({'versao': VERSAO_ESQUEMA, 'chave': _chave_json(chave), 'ts': agora})
+                caminho = self._caminho(nome)
+                try:
+                    with open(caminho + '.tmp', 'wb') as f:
+                        np.savez(f, __meta__=np.array(json.dumps(meta)), **arrays)
+                    os.replace(caminho + '.tmp', caminho)
+                except Exception as e:
+                    print(f"[CACHE] Falha ao gravar {caminho}: {e}")
+                    continue
+                self._removidos.discard(nome)
+                self._indice[nome] = {'chave': chave, 'ts': agora}
+                self._por_chave[chave] = nome
+                self._lembrar(chave, valor)
+                self.estatisticas['gravacoes'] += 1
+
+            for nome in list(self._removidos):
+                try:
+                    os.remove(self._caminho(nome))
+                except FileNotFoundError:
+                    pass
+                except OSError as e:
+                    print(f"[CACHE] Falha ao remover {nome}: {e}")
+                    continue
+                self._removidos.discard(nome)
+
+            indice = {'versao': VERSAO_ESQUEMA,
+                      'entradas': {nome: {'chave': _chave_json(e['chave']), 'ts': e['ts']}
+                                   for nome, e in self._indice.items()}}
+            caminho = self._caminho(ARQUIVO_INDICE)
+            with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+                json.dump(indice, f)
+            os.replace(caminho + '.tmp', caminho)
+
+
+def migrar_pickle(caminho_pickle, cache):
+    """
+    Importa um cache antigo em pickle (dict) para o CachePersistente, uma única vez, e renomeia o
+    arquivo para .migrado. Retorna quantas entradas foram importadas (0 se não havia ou era ilegível).
+    """
+    if not os.path.exists(caminho_pickle):
+        return 0
+    import pickle
+    try:
+        with open(caminho_pickle, 'rb') as f:
+            antigo = pickle.load(f)
+    except Exception as e:
+        print(f"[CACHE] Não foi possível migrar {caminho_pickle}: {e}")
+        return 0
+    if not isinstance(antigo, dict):
+        return 0
+    cache.update(antigo)
+    cache.salvar()
+    os.replace(caminho_pickle, caminho_pickle + '.migrado')
+    print(f"[CACHE] {len(antigo)} entradas migradas de {caminho_pickle}")
+    return len(antigo)
@@ -21,7 +21,6 @@ def carregar_parametros_dinamicos_integrado(path="config_dinamica.json"):
         except Exception as e:
             print(f"[ERRO] Falha ao carregar parametros_dinamicos do JSON centralizado: {e}")
 import numpy as np  # Operações numéricas
-from numpy.linalg import LinAlgError  # Erros da álgebra linear
 import statsmodels.api as sm  # Modelagem estatística
 from datetime import datetime, timedelta  # Manipulação de datas
 import pytz  # Fusos horários
@@ -79,6 +78,7 @@ except ImportError:
 import pickle  # Serialização de objetos
 import concurrent.futures  # Execução paralela
 import threading  # Controle de threads
+import multiprocessing  # parent_process(): identifica os processos trabalhadores do pool da triagem
 try:
     from ta.trend import ADXIndicator  # Indicador ADX
     HAS_ADX = True
@@ -154,6 +154,22 @@ except ImportError:
 # from tensorflow.keras.metrics import MeanSquaredError  # Para carregar o modelo corretamente
 from typing import Optional  # Para anotações de tipo opcionais
 from functools import reduce  # Para usar reduce em interseção de índices
+from triagem_pares import (  # Regressão OLS em lote, betas móveis e núcleo do z-score da primeira seleção
+    EtapasTriagem, triagem_em_etapas, calcular_betas_rolling, calcular_zscore_par
+)
+from armazem_barras import ArmazemBarras, carregar_historico  # Histórico local com busca incremental no MT5
+from cache_estacionariedade import CacheEstacionariedade  # Memoização do ADF por impressão digital da série
+from testes_estatisticos import adfuller_rapido, coint_rapido  # ADF/Engle-Granger em NumPy, validados contra o statsmodels
+from volatilidade_garch import RastreadorGARCH  # GARCH(1,1) recursivo por ativo, reajuste diário/deriva
+from cache_persistente import CachePersistente, migrar_pickle  # Caches em .npz versionados, leitura por chave
+from execucao_paralela import avaliar_pares_paralelo  # Pool de processos com séries em memória compartilhada
+from snapshot_mt5 import enviar_ordem_mt5, obter_servico_snapshot  # Posições/ordens/ticks lidos uma vez por intervalo
+from livro_posicoes import LivroPosicoes, obter_registro_magics  # Posições por magic e registro persistente dos pares
+from agendador_barras import aguardar_fechamento  # Espera única até o fechamento da próxima barra
+from hedge_kalman import resumo_beta_kalman  # Hedge ratio dinâmico por filtro de Kalman, todos os pares em uma passada
+from previsao_arima_incremental import (  # ARIMA walk-forward por filtro de Kalman e cache de previsões por ativo
+    prever_walk_forward_arima, prever_ultima_barra_arima, CachePrevisoesARIMA
+)
 try:
     from sklearn.preprocessing import StandardScaler
     HAS_SKLEARN = True
@@ -274,6 +290,46 @@ parametros_dinamicos = {
     'ajusta_ordens_minuto': 10,
     'horario_remove_pendentes': 15,
     'horario_fechamento_total': 16,
+    # Motor de análise
+    'triagem_vetorizada': True,
+    'arima_walk_forward': True,
+    'arima_refit_cada': 0,
+    'arima_forecast_only': True,
+    'triagem_workers': 0,  # processos da triagem (0 = todos os núcleos, 1 = serial)
+    'armazem_barras': True,
+    'armazem_validade_segundos': 30,
+    'triagem_prefiltro_zscore': True,
+    'cache_adf': True,
+    'cache_adf_capacidade': 512,
+    'testes_rapidos': True,       # ADF/Engle-Granger em NumPy (testes_estatisticos) no lugar do statsmodels
+    'testes_lag_revalidar': 10,   # reusa o lag do AIC por N avaliações do par (0 = busca sempre)
+    'garch_recursivo': True,      # estado GARCH por ativo/coluna compartilhado entre pares (volatilidade_garch)
+    'garch_refit_barras': 0,      # além do reajuste diário, reajusta a cada N barras (0 = só diário/deriva)
+    'cache_previsoes_arima': True,  # previsões ARIMA por ativo/coluna/barra compartilhadas entre pares
+    'cache_previsoes_arima_capacidade': 256,
+    'cache_persistente_ttl_horas': 24,  # idade máxima das entradas de cache_regressoes / arima_cache em disco
+    'estado_par_incremental': True,  # half-life e z-score pelas somas incrementais de estado_pares
+    'hedge_ratio_modo': 'ols',    # beta rotation por 'ols' (janelas deslizantes) ou 'kalman' (hedge_kalman)
+    'kalman_delta': 1e-4,         # variação do estado alpha/beta por barra no modo 'kalman'
+    'snapshot_mt5': True,         # posições/ordens/ticks pelo snapshot compartilhado (snapshot_mt5) em vez de consultas diretas
+    'snapshot_mt5_intervalo': 1.0,  # segundos entre leituras do terminal pelo serviço de snapshot
+    'agendador_eventos': True,    # SistemaIntegrado dispara tarefas por fechamento de barra/horário (agendador_barras)
+    'log_capacidade': 5000,       # registros de log mantidos em memória (buffer circular de log_estruturado)
+    'log_arquivo': 'logs/sistema_integrado.log',  # arquivo rotativo de log ('' desativa)
+    'log_nivel_arquivo': 'INFO',  # nível mínimo gravado no arquivo (DEBUG, INFO, AVISO, ERRO)
+    'log_nivel_console': 'DEBUG', # nível mínimo impresso no console
+    'log_arquivo_max_mb': 10,     # tamanho de cada arquivo antes da rotação
+    'log_arquivo_backups': 5,     # arquivos rotacionados mantidos
+    'log_registros_relatorio': 500,  # últimos registros incluídos em cada relatório JSON
+    'cache_deals': True,          # dashboard lê o histórico de deals pelo cache incremental (historico_deals)
+    'cache_deals_dias': 30,       # janela de deals mantida pelo cache (estatísticas de performance)
+    'equity_capacidade': 20000,   # pontos recentes de equity em memória (serie_equity)
+    'equity_horizonte_minutos': 120,  # pontos mais velhos que isso viram barras de 1 minuto
+    'equity_capacidade_minutos': 10080,  # barras de 1 minuto mantidas (7 dias)
+    'equity_pasta': 'equity_historico',  # pasta da gravação diária da equity ('' desativa)
+    'grafico_pontos_max': 1500,   # pontos máximos por gráfico do dashboard (dados_graficos)
+    'grafico_metodo_reducao': 'lttb',  # 'lttb' (forma da curva) ou 'minmax' (picos e vales) na curva de equity
+    'historico_linhas_max': 500,  # trades mais recentes exibidos na tabela do histórico
 }
 
 # Carrega config_perfil.json e sobrescreve parametros_dinamicos
@@ -311,19 +367,23 @@ def carregar_parametros_dinamicos(path="parametros_dinamicos.json"):
             print(f"[ERRO] Falha ao carregar parametros_dinamicos: {e}")
 
 # ─────────── API MetaTrader5 ───────────
-mt5.initialize() 
-
-if not mt5.initialize():
-    print("Erro ao inicializar MT5:", mt5.last_error())
-    quit()
-
-# opcionalmente forçar login
-# mt5.login(123456, password="SuaSenha", server="NomeDoServidor")
-info = mt5.account_info()
-if info:
-    print("Login bem-sucedido:", info.name, info.login)
-else:
-    print("Erro ao obter account_info()", mt5.last_error())
+# No spawn (Windows) cada processo do pool da triagem (execucao_paralela) reimporta o script principal, e com
+# ele este módulo: só o processo principal conecta ao MT5 (os trabalhadores recebem as séries prontas).
+info = None
+if multiprocessing.parent_process() is None:
+    mt5.initialize() 
+
+    if not mt5.initialize():
+        print("Erro ao inicializar MT5:", mt5.last_error())
+        quit()
+
+    # opcionalmente forçar login
+    # mt5.login(123456, password="SuaSenha", server="NomeDoServidor")
+    info = mt5.account_info()
+    if info:
+        print("Login bem-sucedido:", info.name, info.login)
+    else:
+        print("Erro ao obter account_info()", mt5.last_error())
 
 # ─────────── Carregar Codito de Trading ─────────── 
 
@@ -487,6 +547,8 @@ desvio_loss_venda_ind = get_parametro_dinamico('desvio_loss_venda_ind', 1.03)
 
 # ─────────── Variáveis Globais ───────────
 arima_cache = {}
+# Previsões ARIMA por (ativo, coluna, timeframe, última barra, janela, ordem, modo): uma vez por barra por ativo
+cache_previsoes_arima = CachePrevisoesARIMA(capacidade=get_parametro_dinamico('cache_previsoes_arima_capacidade', 256))
 lstm_cache = {}
 cache_reg = {}
 treinar_lock = threading.Lock()
@@ -525,8 +587,17 @@ linha_operacao01 = []
 
 
 
-def calcular_volatilidade_garch(series):
-    """Retorna volatilidade condicional prevista pelo GARCH(1,1)."""
+# Estados GARCH por (ativo, coluna), compartilhados por todos os pares da segunda seleção
+rastreador_garch = RastreadorGARCH(refit_barras=get_parametro_dinamico('garch_refit_barras', 0))
+
+def calcular_volatilidade_garch(series, ativo=None, coluna=None):
+    """
+    Retorna volatilidade condicional prevista pelo GARCH(1,1).
+    Com ativo/coluna e 'garch_recursivo' ligado, usa o estado compartilhado de rastreador_garch
+    (um ajuste por ativo/coluna por dia, σ² atualizado recursivamente nas barras novas).
+    """
+    if ativo is not None and get_parametro_dinamico('garch_recursivo', True):
+        return rastreador_garch.sigma((ativo, coluna), series)
     if HAS_ARCH:
         try:
             am = arch_model(series, vol='Garch', p=1, q=1, dist='normal', rescale=False)
@@ -539,43 +610,6 @@ def calcular_volatilidade_garch(series):
     # Fallback: usar rolling std dos últimos 20 valores
     return series.pct_change().rolling(window=20).std().iloc[-1] * series.iloc[-1]
 
-def prever_residuo_spread(resid_series):
-    """
-    Retorna forecast de um passo do spread (resíduo) usando ARIMA(1,0,0).
-    CORRIGIDO: Define frequência apropriada para evitar FutureWarning.
-    """
-    try: 
-        #print(f"[DEBUG][ARIMA] Série size={len(resid_series)}, "
-              #f"freq={getattr(resid_series.index, 'freq', None)}, "
-              #f"últimos 3={resid_series.tail(3).tolist()}")
-        # CORREÇÃO: Garante que a série tem índice temporal apropriado
-        if not isinstance(resid_series.index, pd.DatetimeIndex):
-            # Se não for DatetimeIndex, cria um índice temporal
-            resid_series = resid_series.copy()
-            resid_series.index = pd.date_range(start='2020-01-01', periods=len(resid_series), freq='D')
-        
-        # CORREÇÃO: Define frequência explicitamente se não estiver definida
-        if resid_series.index.freq is None:
-            resid_series = resid_series.asfreq('D', method='ffill')
-        
-        # Suprime warnings durante o fitting do ARIMA
-        with warnings.catch_warnings():
-            warnings.filterwarnings("ignore", category=FutureWarning)
-            warnings.filterwarnings("ignore", category=UserWarning)
-            
-            model = ARIMA(resid_series, order=(1,0,0))
-            fit = model.fit(method_kwargs={'maxiter': 500})
-            
-            # CORREÇÃO: Usa get_forecast em vez de forecast para controlar melhor o índice
-            forecast_result = fit.get_forecast(steps=1)
-            forecast_value = float(forecast_result.predicted_mean.iloc[0])
-            
-            return forecast_value
-            
-    except Exception as e:
-        print(f"[AVISO] ARIMA spread falhou ({e}), usando valor atual como previsão.")
-        return float(resid_series.iloc[-1])
-
 def get_latest_analysis_results():
     """Retorna os resultados mais recentes da análise de pares."""
     global analysis_results_store
@@ -649,38 +683,38 @@ def to_scalar(x):
             f"Esperado apenas um valor escalar na previsão, mas foram encontrados {arr.size} valores."
         )
 
+# Caches em disco abertos (um CachePersistente por nome de arquivo)
+caches_persistentes = {}
+
+def abrir_cache_persistente(nome_arquivo):
+    """
+    Abre (uma vez por processo) o CachePersistente que substitui o pickle `nome_arquivo`: pasta de mesmo
+    nome sem extensão em script_dir, com TTL 'cache_persistente_ttl_horas'. Um pickle antigo é migrado uma vez.
+    """
+    if nome_arquivo not in caches_persistentes:
+        diretorio = os.path.join(script_dir, os.path.splitext(nome_arquivo)[0])
+        ttl = get_parametro_dinamico('cache_persistente_ttl_horas', 24) * 3600
+        cache = CachePersistente(diretorio, ttl_segundos=ttl)
+        migrar_pickle(os.path.join(script_dir, nome_arquivo), cache)
+        caches_persistentes[nome_arquivo] = cache
+    return caches_persistentes[nome_arquivo]
+
 def salvar_arima_cache(arima_cache, filename="arima_cache.pkl"):
-    # CORREÇÃO: Usar caminho completo
-    filepath = os.path.join(script_dir, filename)
-    with open(filepath, "wb") as f:
-        pickle.dump(arima_cache, f)
-    print(f"[ARIMA] arima_cache salvo em {filepath}")
+    """Grava as previsões (sem os modelos ajustados) no cache persistente."""
+    cache = abrir_cache_persistente(filename)
+    if arima_cache is not cache:
+        cache.update(arima_cache)
+    cache.salvar()
+    print(f"[ARIMA] arima_cache salvo em {cache.diretorio}")
 
 def carregar_arima_cache(filename="arima_cache.pkl"):
     """
-    Tenta carregar o cache de ARIMA. Se o arquivo não existir,
-    estiver vazio ou corrompido, retorna um dict vazio.
+    Abre o cache de ARIMA persistente. As entradas são lidas do disco só quando acessadas;
+    entradas expiradas ou corrompidas são descartadas individualmente.
     """
-    # CORREÇÃO: Usar caminho completo
-    filepath = os.path.join(script_dir, filename)
-    
-    if not os.path.exists(filepath):
-        print(f"[ARIMA] Arquivo {filepath} não encontrado. Iniciando cache vazio.")
-        return {}
-    try:
-        with open(filepath, "rb") as f:
-            cache = pickle.load(f)
-        print(f"[ARIMA] arima_cache carregado de {filepath}")
-        return cache
-    except EOFError:
-        print(f"[ARIMA] Arquivo {filepath} está vazio. Iniciando cache vazio.")
-        return {}
-    except pickle.UnpicklingError:
-        print(f"[ARIMA] Falha ao desserializar {filepath}. Cache possivelmente corrompido. Iniciando cache vazio.")
-        return {}
-    except Exception as e:
-        print(f"[ARIMA] Erro ao carregar {filepath}: {e}. Iniciando cache vazio.")
-        return {}
+    cache = abrir_cache_persistente(filename)
+    print(f"[ARIMA] arima_cache aberto em {cache.diretorio} ({len(cache)} entradas)")
+    return cache
 
 def obter_saldo_inicial_do_dia(): 
     """
@@ -724,14 +758,11 @@ def calcular_quantidade(preco_ativo, valor_operacao):
 
 def aguardar_proximo_minuto():
     """Aguarda até o início do próximo minuto."""
-    while True:
-        # Obtém o segundo atual
-        segundo_atual = datetime.now().second
-        # Se estivermos no início de um novo minuto, saia do loop
-        if segundo_atual == 0:
-            break
-        # Aguarda 1 segundo antes de verificar novamente
-        time.sleep(1)
+    # Se estivermos no início de um novo minuto, não espera
+    if datetime.now().second == 0:
+        return
+    # Uma única espera até o fechamento da barra de M1 (no lugar de verificar a cada 1 segundo)
+    aguardar_fechamento('M1')
 
 def to_float(x):
     """
@@ -748,8 +779,16 @@ def to_float(x):
     else:
         return float(x)
 
+def obter_snapshot_mt5(idade_maxima=None):
+    """Snapshot compartilhado do terminal, ou None se 'snapshot_mt5' estiver desligado."""
+    if not get_parametro_dinamico('snapshot_mt5', True):
+        return None
+    servico = obter_servico_snapshot(mt5, get_parametro_dinamico('snapshot_mt5_intervalo', 1.0))
+    return servico.obter(idade_maxima)
+
 def verificar_operacao_aberta(lista_ativos):
-    contratos_abertos = mt5.positions_get()
+    snapshot = obter_snapshot_mt5(idade_maxima=0.5)
+    contratos_abertos = snapshot.posicoes if snapshot is not None else mt5.positions_get()
     if contratos_abertos := contratos_abertos:  # se não for None
         for posicao in contratos_abertos:
             if posicao.symbol in lista_ativos:
@@ -785,7 +824,10 @@ def tornar_estacionaria(serie, max_diffs=1, verbose=False):
                 print("[AVISO] Série muito curta para testar estacionariedade.")
             break
 
-        adf_result = adfuller(s.dropna(), autolag='AIC')
+        if get_parametro_dinamico('testes_rapidos', True):
+            adf_result = adfuller_rapido(s.dropna().to_numpy())
+        else:
+            adf_result = adfuller(s.dropna(), autolag='AIC')
         p_valor = adf_result[1]
 
         if verbose:
@@ -806,8 +848,12 @@ def tornar_estacionaria(serie, max_diffs=1, verbose=False):
         print("[FALHA] Série não ficou estacionária nem após múltiplas diferenças.")
     return None, None
     
-def preprocessar_dados(dados_historicos, ativos, colunas, verbose=False):
+# Resultado de tornar_estacionaria por impressão digital da série (reaproveitado entre ciclos e pares)
+cache_estacionariedade = CacheEstacionariedade(capacidade=get_parametro_dinamico('cache_adf_capacidade', 512))
+
+def preprocessar_dados(dados_historicos, ativos, colunas, verbose=False, timeframe=None):
     dados_preprocessados = {}
+    usar_cache_adf = get_parametro_dinamico('cache_adf', True)
 
     for ativo in ativos:
         if ativo in dados_historicos:
@@ -821,7 +867,12 @@ def preprocessar_dados(dados_historicos, ativos, colunas, verbose=False):
 
                 # apenas 'close' precisa de teste de estacionariedade
                 if col == 'close':
-                    estac, nd = tornar_estacionaria(serie_limpa, max_diffs=1, verbose=verbose)
+                    if usar_cache_adf:
+                        estac, nd = cache_estacionariedade.tornar_estacionaria(
+                            ativo, timeframe, serie_limpa, tornar_estacionaria, max_diffs=1, verbose=verbose
+                        )
+                    else:
+                        estac, nd = tornar_estacionaria(serie_limpa, max_diffs=1, verbose=verbose)
                     if estac is None:
                         if verbose:
                             print(f"[DESCARTE] Ativo {ativo} coluna {col}: não ficou estacionário nem após 1 diff.")
@@ -857,6 +908,14 @@ def calcular_betas_rolling_precos(precos_dep, precos_base, janela=periodo):
     precos_dep = pd.Series(precos_dep)
     precos_base = pd.Series(precos_base)
 
+    if precos_dep.index.equals(precos_base.index):
+        # Séries já alinhadas: todas as janelas [i - janela, i) de uma vez pelas somas acumuladas
+        if len(precos_dep) <= janela:
+            return np.array(betas)
+        betas_janelas, _ = calcular_betas_rolling(precos_dep.to_numpy(dtype=float), precos_base.to_numpy(dtype=float),
+                                                  janela, constante_sem_intercepto=False)
+        return betas_janelas[:-1]
+
     for i in range(janela, len(precos_dep)):
         y = precos_dep.iloc[i - janela:i]
         x = precos_base.iloc[i - janela:i]
@@ -978,8 +1037,13 @@ def calcular_metricas_modelo(dados_preprocessados, dep, ind, ibov, periodo, mode
             status = "original já estacionária" if nd == 0 else "ficou estacionária após diferenciação"
             print(f"[INFO] Ativo {a} → ndiffs={nd} → {status} → usando série original (raw).")
 
+    testes_rapidos = get_parametro_dinamico('testes_rapidos', True)
+
     # 1) Métricas do OLS
-    adf_result = adfuller(residuo, autolag='AIC')
+    if testes_rapidos:
+        adf_result = adfuller_rapido(np.asarray(residuo, dtype=float))
+    else:
+        adf_result = adfuller(residuo, autolag='AIC')
     adf_statistic = adf_result[0]
     adf_p_value = adf_result[1]
 
@@ -1007,7 +1071,10 @@ def calcular_metricas_modelo(dados_preprocessados, dep, ind, ibov, periodo, mode
 
     # 5) Teste de cointegração
     aligned_dep_coint, aligned_ind_coint = series[dep].align(series[ind], join='inner')
-    coint_teste = coint(aligned_dep_coint, aligned_ind_coint)
+    if testes_rapidos:
+        coint_teste = coint_rapido(aligned_dep_coint.to_numpy(), aligned_ind_coint.to_numpy())
+    else:
+        coint_teste = coint(aligned_dep_coint, aligned_ind_coint)
     estatistica_coint = coint_teste[0]
 
     return {
@@ -1028,7 +1095,8 @@ def calcular_residuo_zscore_timeframe(dep, ind, ibov, win, periodo, dados_prepro
                                       enable_zscore_filter=True, enable_r2_filter=True, enable_beta_filter=True,
                                       enable_cointegration_filter=True,
                                       zscore_min_threshold=-get_parametro_dinamico('zscore_min', 2.0), zscore_max_threshold=get_parametro_dinamico('zscore_max', 6.5),
-                                      r2_min_threshold=get_parametro_dinamico('r2_min', 0.5), beta_max_threshold=get_parametro_dinamico('beta_max', 1.0)):
+                                      r2_min_threshold=get_parametro_dinamico('r2_min', 0.5), beta_max_threshold=get_parametro_dinamico('beta_max', 1.0),
+                                      params_ols=None):
     """
     Calcula o z-score e parâmetros de regressão para o par selecionado.
     Sempre usa a série original (raw) mesmo se ficou estacionária após diferenciação.
@@ -1048,6 +1116,8 @@ def calcular_residuo_zscore_timeframe(dep, ind, ibov, win, periodo, dados_prepro
     - zscore_max_threshold: limite superior do Z-Score (default: 2.0)
     - r2_min_threshold: R² mínimo exigido (default: 0.50)
     - beta_max_threshold: Beta máximo permitido (default: 1.5)
+    - params_ols: tupla (alpha, beta, r2) já calculada pela triagem vetorizada; se informada,
+      o ajuste sm.OLS do par é dispensado
     
     Exemplos de uso:
     # Com filtro de cointegração habilitado (padrão):
@@ -1056,237 +1126,134 @@ def calcular_residuo_zscore_timeframe(dep, ind, ibov, win, periodo, dados_prepro
     # Sem filtro de cointegração (estratégia mean reversion simples):
     resultado = calcular_residuo_zscore_timeframe('PETR4', 'VALE3', 'IBOV', 'M5', 21, dados, enable_cointegration_filter=False)
     """
-    series = {}
-    ativos = [dep, ind, win, ibov]
-
-    for a in ativos:
-        info = dados_preprocessados[a]['close']
-        nd = info["ndiffs"]
-
-        if verbose:
+    if verbose:
+        for a in [dep, ind, win, ibov]:
+            nd = dados_preprocessados[a]['close']["ndiffs"]
             status = "original já estacionária" if nd == 0 else "ficou estacionária após diferenciação"
             print(f"[INFO] Ativo {a} → ndiffs={nd} → {status} → usando série original (raw).")
 
-        serie_base = info["raw"]  # Sempre usa a série original
-        series[a] = serie_base.iloc[-periodo:]
-
-    # Alinha os índices
-    idxs = [series[a].index for a in ativos]
-    common = reduce(lambda x, y: x.intersection(y), idxs)
-    for a in ativos:
-        series[a] = series[a].loc[common]
-
-    if len(common) < 3:
-        if verbose:
-            print("[ERRO] Insuficientes dados após alinhamento.")
-        return None
-
-    # Regressão dep ~ ind
-    dep_close = pd.to_numeric(series[dep], errors='coerce')
-    ind_close = pd.to_numeric(series[ind], errors='coerce')
-    df_reg = pd.concat([dep_close, ind_close], axis=1, keys=[dep, ind]).dropna()
-    dep_close, ind_close = df_reg[dep], df_reg[ind]
-
-    X = sm.add_constant(df_reg[ind].to_frame(name=ind))
-    modelo = sm.OLS(df_reg[dep], X).fit()
-    alpha = modelo.params['const']
-    beta = modelo.params[ind]
-    r2 = modelo.rsquared
-
-    residuo = df_reg[dep] - (alpha + beta * df_reg[ind])
-    
-    # ===================================================================
-    # FILTRO 1: BETA MÁXIMO (aplicado primeiro por ser mais rápido)
-    # ===================================================================
-    if enable_beta_filter and abs(beta) >= beta_max_threshold:
-        if verbose:
-            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Beta={beta:.4f} >= {beta_max_threshold} (beta muito alto)")
-        return None
-    
-    # ===================================================================
-    # FILTRO 2: R² MÍNIMO (segundo filtro por usar resultado já calculado)
-    # ===================================================================
-    if enable_r2_filter and r2 < r2_min_threshold:
-        if verbose:
-            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: R²={r2:.4f} < {r2_min_threshold} (R² muito baixo)")
-        return None
-    
-    # ===================================================================
-    # FILTRO 3: TESTE DE ESTACIONARIEDADE (ADF)
-    # ===================================================================
-    adf_result = adfuller(residuo, autolag='AIC')
-    adf_statistic = adf_result[0]
-    adf_p_value = adf_result[1]
-    
-    # FILTRO: Se resíduo não for estacionário, rejeita o par
-    if adf_p_value >= 0.05:
-        if verbose:
-            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: ADF p-value={adf_p_value:.4f} >= 0.05 (não estacionário)")
-        return None
-    
-    # ===================================================================
-    # FILTRO 4: TESTE DE COINTEGRAÇÃO (aplicado por último por ser mais complexo)
-    # ===================================================================
-    if enable_cointegration_filter:
-        try:
-            from statsmodels.tsa.stattools import coint
-            coint_result = coint(df_reg[dep], df_reg[ind])
-            coint_statistic = coint_result[0]
-            coint_p_value = coint_result[1]
-            coint_critical_values = coint_result[2]
-            
-            # FILTRO: Se não for cointegrado (p-value >= 0.05), rejeita o par
-            if coint_p_value >= 0.05:
-                if verbose:
-                    print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Cointegração p-value={coint_p_value:.4f} >= 0.05 (não cointegrado)")
-                return None
-                
-            # Verificação adicional: estatística deve ser menor que valor crítico 5%
-            critical_5pct = coint_critical_values[1]  # 5% critical value
-            if coint_statistic > critical_5pct:
-                if verbose:
-                    print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Cointegração estatística={coint_statistic:.4f} > crítico 5%={critical_5pct:.4f}")
-                return None
-                
-        except Exception as e:
-            if verbose:
-                print(f"[ERRO] Falha no teste de cointegração para {dep}x{ind}: {e}")
-            return None
-    else:
-        # Se filtro de cointegração está desabilitado, define valores padrão
-        coint_statistic = 0.0
-        coint_p_value = 0.01  # Valor que passaria no filtro
-        coint_critical_values = [0.0, 0.0, 0.0]
-        if verbose:
-            print(f"[INFO] Filtro de cointegração desabilitado para par {dep}x{ind}")
-
-    # ===================================================================
-    # CÁLCULO DO Z-SCORE (necessário para o filtro final)
-    # ===================================================================
-    
-    # Estima half-life
-    residuo_lag = residuo.shift(1).dropna().rename('residuo_lag')
-    delta = residuo.diff().dropna()
-
-    if len(residuo_lag) >= 3 and len(delta) >= 3:
-        try:
-            ou = sm.OLS(delta, sm.add_constant(residuo_lag)).fit()
-            coef_ou = ou.params['residuo_lag']
-            half_life = (0 if coef_ou <= -1 or np.isnan(coef_ou)
-                         else np.log(2) / (-np.log(1 + coef_ou)))
-        except Exception as e:
-            half_life = 0
-            if verbose:
-                print(f"[ERRO] Erro ao calcular half-life: {e}")
-    else:
-        half_life = 0
-        if verbose:
-            print("[AVISO] Série insuficiente para calcular half-life.")
-
-    # Z-score móvel pair-trading
-    window = max(20, int(round(half_life)))
-    media_movel = residuo.rolling(window, min_periods=window).mean()
-    std_movel = residuo.rolling(window, min_periods=window).std()
-    zscore = (residuo.iloc[-1] - media_movel) / std_movel
-    
-    # CORRIGIDO: Valores atuais do resíduo
-    try:
-        zscore_final = float(zscore.iloc[-1])
-    except Exception:
-        zscore_final = 0.0
-    
-    # ===================================================================
-    # FILTRO 5: Z-SCORE EXTREMO (aplicado por último por ser mais complexo)
-    # ===================================================================
-    if enable_zscore_filter and not (zscore_final <= zscore_min_threshold or zscore_final >= zscore_max_threshold):
-        if verbose:
-            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Z-Score={zscore_final:.4f} não está em faixa extrema (|z| < {abs(zscore_min_threshold)})")
-        return None
-
-    # ===================================================================
-    # SE PASSOU EM TODOS OS FILTROS, CONTINUA COM O PROCESSAMENTO NORMAL
-    # ===================================================================
-    if verbose:
-        print(f"[FILTRO APROVADO] Par {dep}x{ind}: "
-              f"Beta={beta:.4f}, R²={r2:.4f}, Z-Score={zscore_final:.4f}, "
-              f"ADF p-value={adf_p_value:.4f}, Coint p-value={coint_p_value:.4f}")
-   
-    resid_atual = float(residuo.iloc[-1])
-    # CORRIGIDO: Sempre calcular previsão do resíduo independente do flag USE_SPREAD_FORECAST
-    try:
-        pred_resid_calc = prever_residuo_spread(residuo)
-        if pred_resid_calc is not None:
-            pred_resid = float(pred_resid_calc)
-        else:
-            # Se a previsão falhar, usar uma estimativa baseada na média móvel
-            pred_resid = float(media_movel.iloc[-1]) if not pd.isna(media_movel.iloc[-1]) else resid_atual
-    except Exception as e:
-        if verbose:
-            print(f"[AVISO] Erro ao calcular previsão do resíduo: {e}")
-        pred_resid = float(media_movel.iloc[-1]) if not pd.isna(media_movel.iloc[-1]) else resid_atual
+    # Regressão, filtros e z-score no núcleo sem estado (o mesmo usado pelos processos de execucao_paralela)
+    series_close = {a: dados_preprocessados[a]['close']["raw"] for a in [dep, ind, win, ibov]}
+    return calcular_zscore_par(
+        series_close, dep, ind, ibov, win, periodo,
+        nd_dep=dados_preprocessados[dep]['close']["ndiffs"],
+        nd_ind=dados_preprocessados[ind]['close']["ndiffs"],
+        USE_SPREAD_FORECAST=USE_SPREAD_FORECAST, zscore_threshold=zscore_threshold, verbose=verbose,
+        enable_zscore_filter=enable_zscore_filter, enable_r2_filter=enable_r2_filter,
+        enable_beta_filter=enable_beta_filter, enable_cointegration_filter=enable_cointegration_filter,
+        zscore_min_threshold=zscore_min_threshold, zscore_max_threshold=zscore_max_threshold,
+        r2_min_threshold=r2_min_threshold, beta_max_threshold=beta_max_threshold,
+        params_ols=params_ols,
+        testes_rapidos=get_parametro_dinamico('testes_rapidos', True),
+        revalidar_lag=get_parametro_dinamico('testes_lag_revalidar', 10),
+        estado_incremental=get_parametro_dinamico('estado_par_incremental', True)
+    )
 
-    #print(f"[DEBUG] resid_atual={resid_atual:.6f}, pred_resid={pred_resid:.6f}, "
-        #f"diff={pred_resid - resid_atual:.6f}")
+# Etapas da última triagem vetorizada (entrada, aprovados e tempo de cada uma)
+estatisticas_triagem = []
 
-    # GARANTIR que pred_resid nunca seja None
-    if pred_resid is None:
-        pred_resid = 0.0
+def montar_registro_zscore(id_registro, dep, ind, nome_timeframe, period, resultado):
+    """Monta uma linha de resultados_zscore_dependente_atual a partir do retorno de calcular_residuo_zscore_timeframe."""
+    alpha, beta, half_life, zscore, residuo, adf_p_value, pred_resid, resid_atual, zscore_forecast_compra, zscore_forecast_venda, zf_compra, zf_venda, nd_dep, nd_ind, coint_p_value, r2 = resultado
+    return {
+        'ID': id_registro,
+        'Dependente': dep,
+        'Independente': ind,
+        'Timeframe': nome_timeframe,
+        'Período': period,
+        'Z-Score': zscore,
+        'alpha':     alpha,
+        'beta':      beta,
+        'half_life': half_life,
+        'residuo':   residuo,
+        'adf_p_value': adf_p_value,
+        'pred_resid': pred_resid,
+        'resid_atual': resid_atual,
+        'zf_compra': zf_compra,
+        'zf_venda': zf_venda,
+        'zscore_forecast_compra': bool(zscore_forecast_compra is not None and pred_resid is not None and zscore_forecast_compra < pred_resid),
+        'zscore_forecast_venda': bool(zscore_forecast_venda is not None and resid_atual is not None and zscore_forecast_venda > resid_atual),
+        'nd_dep': nd_dep,
+        'nd_ind': nd_ind,
+        'coint_p_value': coint_p_value,
+        'r2': r2,
+        'Timestamp': datetime.now()
+    }
 
-    # GARANTIR que resid_atual nunca seja None  
-    resid_atual = float(residuo.iloc[-1]) if residuo.iloc[-1] is not None else 0.0
-    
-    # Inicializa outras variáveis
-    zscore_forecast_compra = 0.0
-    zscore_forecast_venda = 0.0
-    zf_compra = 0.0
-    zf_venda = 0.0
-    
-    # Se habilitado, usar forecast do spread para decisão
-    if USE_SPREAD_FORECAST:
-        try:
-            # Atualiza os sinais de forecast baseado nas condições
-            if zscore_final < -zscore_threshold: 
-                zscore_forecast_compra = pred_resid > resid_atual
-            elif zscore_final > zscore_threshold:
-                zscore_forecast_venda = pred_resid < resid_atual
-            else:
-                zscore_forecast_compra = 0.0
-                zscore_forecast_venda = 0.0
-        except Exception as e:
-            if verbose:
-                print(f"[ERRO] Erro no forecast do spread: {e}")
+def calcular_zscores_triagem_vetorizada(dependentes, independentes, periodos, dados_preprocessados,
+                                        nome_timeframe, id_inicial, enable_cointegration_filter=True, verbose=False):
+    """
+    Primeira seleção em lote, em etapas do mais barato para o mais caro:
+      1. OLS: alpha, beta, r² e correlação de todos os pares e períodos de uma vez (triagem_ols_vetorizada)
+      2. beta/R²: filtros sobre os parâmetros já estimados, só nas linhas em que a janela da grade é a mesma
+         do par (janelas_exatas); nas demais (lacunas, WIN$/IBOV com barras a mais ou a menos) o par segue
+         para o cálculo completo e refaz o OLS na própria janela
+      3. z-score: z-score do resíduo atual estimado em lote (calcular_zscore_atual_vetorizado); só rejeita
+         linhas em que a estimativa reproduz exatamente o cálculo do par
+      4. ADF/EG lote: ADF e Engle-Granger de todos os resíduos exatos em lote (calcular_testes_residuo_vetorizado,
+         com 'testes_rapidos'); só rejeita linhas fora da fronteira de 5%
+      5. ADF/coint: ADF, Engle-Granger, z-score e previsão do resíduo em calcular_residuo_zscore_timeframe
+         (pool de processos de execucao_paralela, 'triagem_workers'), apenas para os sobreviventes
+
+    Etapas 1-4 e o envio para a etapa 5 ficam em triagem_pares.triagem_em_etapas.
+    Quantidade aprovada e tempo de cada etapa ficam em estatisticas_triagem.
+    Retorna DataFrame com as mesmas colunas de resultados_zscore_dependente_atual.
+    """
+    global estatisticas_triagem
+    etapas = EtapasTriagem()
+    r2_min_dyn = get_parametro_dinamico('r2_min', 0.5)
+    beta_max_dyn = get_parametro_dinamico('beta_max', 1.0)
+    zscore_min_dyn = -get_parametro_dinamico('zscore_min', 2.0)
+    zscore_max_dyn = get_parametro_dinamico('zscore_max', 6.5)
+    testes_rapidos = get_parametro_dinamico('testes_rapidos', True)
+    n_workers = get_parametro_dinamico('triagem_workers', 0)
+
+    def avaliar(tarefas):
+        return avaliar_pares_paralelo(
+            dados_preprocessados, tarefas, ibov_symbol, win_symbol, n_workers=n_workers,
+            USE_SPREAD_FORECAST=True,
+            zscore_threshold=2.0,
+            verbose=verbose,
+            enable_cointegration_filter=enable_cointegration_filter,
+            zscore_min_threshold=zscore_min_dyn,
+            zscore_max_threshold=zscore_max_dyn,
+            r2_min_threshold=r2_min_dyn,
+            beta_max_threshold=beta_max_dyn,
+            testes_rapidos=testes_rapidos,
+            revalidar_lag=get_parametro_dinamico('testes_lag_revalidar', 10),
+            estado_incremental=get_parametro_dinamico('estado_par_incremental', True)
+        )
 
-    nd_dep = dados_preprocessados[dep]['close']["ndiffs"]
-    nd_ind = dados_preprocessados[ind]['close']["ndiffs"]
+    tarefas, resultados = triagem_em_etapas(
+        dados_preprocessados, dependentes, independentes, periodos, [ibov_symbol, win_symbol], avaliar,
+        r2_min=r2_min_dyn, beta_max=beta_max_dyn, zscore_min=zscore_min_dyn, zscore_max=zscore_max_dyn,
+        prefiltro_zscore=get_parametro_dinamico('triagem_prefiltro_zscore', True),
+        testes_rapidos=testes_rapidos, cointegracao=enable_cointegration_filter, etapas=etapas
+    )
 
-    if verbose:
-        print(f"[RESULTADO] alpha={alpha:.4f}, beta={beta:.4f}, r2={r2:.4f}, half_life={half_life:.2f}, zscore={zscore_final:.4f}")
-        print(f"[FORECAST] pred_resid={pred_resid:.4f}, resid_atual={resid_atual:.4f}")
-        print(f"[DIFERENÇA] pred_resid - resid_atual = {pred_resid - resid_atual:.4f}")
-        print(f"[SINAIS] zscore_forecast_compra={zscore_forecast_compra}, zscore_forecast_venda={zscore_forecast_venda}")
+    registros = []
+    id_counter = id_inicial
+    for (dep, ind, period, _, _, _), resultado in zip(tarefas, resultados):
+        if resultado is None or resultado[3] is None:
+            continue
+        registros.append(montar_registro_zscore(id_counter, dep, ind, nome_timeframe, period, resultado))
+        id_counter += 1
+    etapas.registrar('ADF/coint', len(tarefas), len(registros))
 
-    return alpha, beta, half_life, zscore_final, residuo.iloc[-1], adf_p_value, pred_resid, resid_atual, zscore_forecast_compra, zscore_forecast_venda, zf_compra, zf_venda, nd_dep, nd_ind, coint_p_value, r2
+    estatisticas_triagem = etapas.etapas
+    print(f"[TRIAGEM] {etapas.resumo()}")
+    return pd.DataFrame(registros)
 
 def carregar_cache_regressoes(nome_arquivo="cache_regressoes.pkl"):
-    """Carrega cache de regressões { (dep, ind, periodo): resultado }."""
-    # CORREÇÃO: Usar caminho completo
-    filepath = os.path.join(script_dir, nome_arquivo)
-    
-    if os.path.exists(filepath):
-        try:
-            with open(filepath, 'rb') as f:
-                return pickle.load(f)
-        except (pickle.UnpicklingError, EOFError) as e:
-            print(f"Erro ao carregar {filepath}: {e}. Recriando cache.")
-            return {}
-    return {}
+    """Abre o cache de regressões { (dep, ind, periodo): resultado } persistente (leitura por chave sob demanda)."""
+    return abrir_cache_persistente(nome_arquivo)
 
 def salvar_cache_regressoes(cache_dict, nome_arquivo="cache_regressoes.pkl"):
-    """Salva dicionário de cache de regressões."""
-    # CORREÇÃO: Usar caminho completo
-    filepath = os.path.join(script_dir, nome_arquivo)
-    with open(filepath, 'wb') as f:
-        pickle.dump(cache_dict, f)
+    """Grava as entradas novas do cache de regressões (somente valores numéricos, escrita atômica)."""
+    cache = abrir_cache_persistente(nome_arquivo)
+    if cache_dict is not cache:
+        cache.update(cache_dict)
+    cache.salvar()
 
 def calcular_regressao_com_cache(dep, ind, periodo, ibov, win, dados_preprocessados, cache_regressoes):
     """
@@ -1406,7 +1373,23 @@ def gerar_previsao_arima_ativo(df_ativo, colunas=['close','high','low'], order=(
 def calcular_erro(real, previsao):
     return abs(real - previsao) / real if real != 0 else 0
 
-def calcular_residuo_zscore_timeframe01(dep, ind, ibov, win, periodo, dados_preprocessados, tabela_linha_operacao, tolerancia=0.010, min_train=70, verbose=False):
+def calcular_residuo_zscore_timeframe01(dep, ind, ibov, win, periodo, dados_preprocessados, tabela_linha_operacao, tolerancia=0.010, min_train=70, verbose=False,
+                                        walk_forward=None, refit_cada=None, forecast_only=False, timeframe=None):
+    """
+    Segunda seleção: previsões ARIMA (close/high/low de dep e ind), volatilidade GARCH e spreads de entrada.
+
+    As previsões são geradas em walk-forward para cada barra a partir de min_train, alimentando a tabela
+    de acertos. Com walk_forward=True (padrão, 'arima_walk_forward') cada série é ajustada uma vez na janela
+    de treino e avançada por atualização de Kalman; refit_cada=N ('arima_refit_cada') reajusta a cada N barras.
+    Com walk_forward=False o modelo é reajustado em todas as barras, como na versão original.
+
+    Com forecast_only=True (caminho de trading de main) a tabela de acertos não é montada: cada série recebe
+    um único ajuste nas min_train barras anteriores à última e apenas a previsão da última barra é gerada.
+    O backtest completo fica para coletar_dados_historicos_para_analise / centro_comando_otimizacao.
+
+    As previsões de cada série passam por cache_previsoes_arima ('cache_previsoes_arima'): um ativo que
+    aparece em vários pares (ex.: o mesmo independente) é previsto uma única vez por barra e timeframe.
+    """
    
     # Verifica se os ativos estão presentes nos dados preprocessados
     ativos = [dep, ind, win, ibov]
@@ -1530,235 +1513,98 @@ def calcular_residuo_zscore_timeframe01(dep, ind, ibov, win, periodo, dados_prep
 
     # Inicializa os modelos ARIMA de forma incremental para 'dep' e 'ind'
     arima_order = (1, 1, 1)
-    model_arima_close_dep = None
-    model_arima_high_dep  = None
-    model_arima_low_dep   = None
-    model_arima_close_ind = None
-    model_arima_high_ind  = None
-    model_arima_low_ind   = None
+    if walk_forward is None:
+        walk_forward = get_parametro_dinamico('arima_walk_forward', True)
+    if refit_cada is None:
+        refit_cada = get_parametro_dinamico('arima_refit_cada', 0)
+    # Walk-forward: um ajuste na janela de treino + atualizações de Kalman; sem ele, reajusta a cada barra
+    refit_cada = refit_cada if walk_forward else 1
 
     results = []
     
     # Ajustar min_train baseado no tamanho dos dados disponíveis
     tamanho_dados = len(df_dep)
     min_train_ajustado = min(min_train, max(10, int(tamanho_dados * 0.7)))  # Usa no máximo 70% dos dados para treino
-    
-    # Debug: verificar tamanhos dos dados antes do loop
-    #print(f"[DEBUG] Tamanho df_dep: {tamanho_dados}, min_train original: {min_train}")
-    #print(f"[DEBUG] min_train ajustado: {min_train_ajustado}")
-    #print(f"[DEBUG] Range do loop: {min_train_ajustado} até {tamanho_dados}")
-    
-    # Loop para previsão incremental (para cada dia a partir de min_train_ajustado)
-    for i in range(min_train_ajustado, len(df_dep)):
-        #print(f"[DEBUG] Iteração {i}: processando ponto de dados {i}")
-        df_ate_ontem = df_dep[i-min_train_ajustado : i]
-        # Previsões para o ativo dependente
-        #df_ate_ontem = df_dep.iloc[:i]
-        df_hoje = df_dep.iloc[i:i+1]
-        if df_hoje.empty or len(df_ate_ontem) < 3:
-            print(f"[DEBUG] Pulando iteração {i}: df_hoje.empty={df_hoje.empty}, len(df_ate_ontem)={len(df_ate_ontem)}")
-            continue
-        date = df_hoje.index[0]
-        real_close_dep  = df_hoje['close'].iloc[0]
-        real_high_dep   = df_hoje['high'].iloc[0]
-        real_low_dep    = df_hoje['low'].iloc[0]
-        #real_volume_dep = df_hoje['real_volume'].iloc[0]
-
-        # Para 'dep': se o modelo ainda não foi criado, treina; caso contrário, atualiza incrementalmente.
-       # model_arima_close_dep = ARIMA(df_ate_ontem['close'], order=arima_order).fit(method_kwargs={'maxiter': 5})
-       # model_arima_high_dep  = ARIMA(df_ate_ontem['high'],  order=arima_order).fit(method_kwargs={'maxiter': 5})
-       # model_arima_low_dep   = ARIMA(df_ate_ontem['low'],   order=arima_order).fit(method_kwargs={'maxiter': 5})
-
-        # 1) close: se falhar, usar último valor como proxy em vez de abortar
-        try:
-            model_arima_close_dep = ARIMA(
-                df_ate_ontem['close'],
-                order=arima_order
-            ).fit(method_kwargs={'maxiter': 5})
-            forecast_close_dep = model_arima_close_dep.get_forecast(steps=1)
-            pred_close_dep = float(forecast_close_dep.predicted_mean.iloc[0])
-            std_close_dep = float(forecast_close_dep.se_mean.iloc[0])
-        except (LinAlgError, ValueError) as e:
-            print(f"[AVISO] ARIMA close falhou ({e}), usando último fechamento como previsão.")
-            pred_close_dep = float(df_ate_ontem['close'].iloc[-1])
-            std_close_dep = 0.0
-            model_arima_close_dep = None
-        # 2) high: fallback para close
-        try:
-            model_arima_high_dep = ARIMA(
-                df_ate_ontem['high'],
-                order=arima_order
-            ).fit(method_kwargs={'maxiter': 5})
-            forecast_high_dep = model_arima_high_dep.get_forecast(steps=1)
-            pred_high_dep = float(forecast_high_dep.predicted_mean.iloc[0])
-            std_high_dep = float(forecast_high_dep.se_mean.iloc[0])
-        except (LinAlgError, ValueError) as e:
-            print(f"[AVISO] ARIMA high falhou ({e}), usando fechamento como proxy.")
-            pred_high_dep = pred_close_dep
-            std_high_dep = std_close_dep
-        # 3) low: fallback para close
-        try:
-            model_arima_low_dep = ARIMA(
-                df_ate_ontem['low'],
-                order=arima_order
-            ).fit(method_kwargs={'maxiter': 5})
-            forecast_low_dep = model_arima_low_dep.get_forecast(steps=1)
-            pred_low_dep = float(forecast_low_dep.predicted_mean.iloc[0])
-            std_low_dep = float(forecast_low_dep.se_mean.iloc[0])
-        except (LinAlgError, ValueError) as e:
-            print(f"[AVISO] ARIMA low falhou ({e}), usando fechamento como proxy.")
-            pred_low_dep = pred_close_dep
-            std_low_dep = std_close_dep
-                    
-        try:
-            data_prev = pd.to_datetime(forecast_close_dep.predicted_mean.index[0]).tz_localize(None)
-        except Exception:
-            data_prev = None
-
-        # Processamento dos erros para 'dep'
-        erro_close_dep = real_close_dep - pred_close_dep
-        abs_erro_close_dep = abs(erro_close_dep)
-        tolerancia_close_dep = real_close_dep * tolerancia
-        acerto_close_dep = abs_erro_close_dep <= tolerancia_close_dep
-
-        erro_high_dep = real_high_dep - pred_high_dep
-        abs_erro_high_dep = abs(erro_high_dep)
-        tolerancia_high_dep = real_high_dep * tolerancia
-        acerto_high_dep = abs_erro_high_dep <= tolerancia_high_dep
-
-        erro_low_dep = real_low_dep - pred_low_dep
-        abs_erro_low_dep = abs(erro_low_dep)
-        tolerancia_low_dep = real_low_dep * tolerancia
-        acerto_low_dep = abs_erro_low_dep <= tolerancia_low_dep
-
-        results.append({
-            'data': date,
-            'variavel': 'close',
-            'previsao': pred_close_dep,
-            'std': std_close_dep,
-            'real': real_close_dep,
-            'erro': erro_close_dep,
-            'abs_erro': abs_erro_close_dep,
-            'tolerancia': tolerancia_close_dep,
-            'acerto': acerto_close_dep
-        })
-        results.append({
-            'data': date,
-            'variavel': 'high',
-            'previsao': pred_high_dep,
-            'std': std_high_dep,
-            'real': real_high_dep,
-            'erro': erro_high_dep,
-            'abs_erro': abs_erro_high_dep,
-            'tolerancia': tolerancia_high_dep,
-            'acerto': acerto_high_dep
-        })
-        results.append({
-            'data': date,
-            'variavel': 'low',
-            'previsao': pred_low_dep,
-            'std': std_low_dep,
-            'real': real_low_dep,
-            'erro': erro_low_dep,
-            'abs_erro': abs_erro_low_dep,
-            'tolerancia': tolerancia_low_dep,
-            'acerto': acerto_low_dep
-        })
-
-        # Processamento incremental para o ativo independente (ind)
-        df_ate_ontem_ind = df_ind[i-min_train_ajustado : i]
-        #df_ate_ontem_ind = df_ind.iloc[:i]
-        df_hoje_ind = df_ind.iloc[i:i+1]
-        if df_hoje_ind.empty or len(df_ate_ontem_ind) < 3:
-            continue
-        date_ind        = df_hoje_ind.index[0]
-        real_close_ind  = df_hoje_ind['close'].iloc[0]
-        real_high_ind   = df_hoje_ind['high'].iloc[0]
-        real_low_ind    = df_hoje_ind['low'].iloc[0]
-       
-       
-      #  model_arima_close_ind = ARIMA(df_ate_ontem_ind['close'], order=arima_order).fit(method_kwargs={'maxiter': 5})
-    #   model_arima_high_ind  = ARIMA(df_ate_ontem_ind['high'], order=arima_order).fit(method_kwargs={'maxiter': 5})
-     #   model_arima_low_ind   = ARIMA(df_ate_ontem_ind['low'], order=arima_order).fit(method_kwargs={'maxiter': 5})
-
-        # 1) close: se falhar, aborta (ou trate como preferir)
-        try:
-            model_arima_close_ind = ARIMA(
-                df_ate_ontem_ind['close'],
-                order=arima_order
-            ).fit(method_kwargs={'maxiter': 5})
-            forecast_close_ind = model_arima_close_ind.get_forecast(steps=1)
-            pred_close_ind = float(forecast_close_ind.predicted_mean.iloc[0])
-            std_close_ind = float(forecast_close_ind.se_mean.iloc[0])
-        except (LinAlgError, ValueError) as e:
-            print(f"[AVISO] ARIMA close ind falhou ({e}), usando último fechamento como previsão.")
-            pred_close_ind = float(df_ate_ontem_ind['close'].iloc[-1])
-            std_close_ind = 0.0
-            model_arima_close_ind = None
-
-        # 2) high: fallback para close
-        try:
-            model_arima_high_ind = ARIMA(
-                df_ate_ontem_ind['high'],
-                order=arima_order
-            ).fit(method_kwargs={'maxiter': 5})
-            forecast_high_ind = model_arima_high_ind.get_forecast(steps=1)
-            pred_high_ind = float(forecast_high_ind.predicted_mean.iloc[0])
-            std_high_ind = float(forecast_high_ind.se_mean.iloc[0])
-        except (LinAlgError, ValueError) as e:
-            print(f"[AVISO] ARIMA high (indep) falhou ({e}), usando último fechamento como previsão.")
-            pred_high_ind = pred_close_ind
-            std_high_ind = std_close_ind
-
-        # 3) low: fallback para close
-        try:
-            model_arima_low_ind = ARIMA(
-                df_ate_ontem_ind['low'],
-                order=arima_order
-            ).fit(method_kwargs={'maxiter': 5})
-            forecast_low_ind = model_arima_low_ind.get_forecast(steps=1)
-            pred_low_ind = float(forecast_low_ind.predicted_mean.iloc[0])
-            std_low_ind = float(forecast_low_ind.se_mean.iloc[0])
-        except (LinAlgError, ValueError) as e:
-            print(f"[AVISO] ARIMA low (indep) falhou ({e}), usando último fechamento como previsão.")
-            pred_low_ind = pred_close_ind
-            std_low_ind = std_close_ind       
-        
-        try:
-            data_prev_ind = pd.to_datetime(forecast_close_ind.predicted_mean.index[0]).tz_localize(None)
-        except Exception:
-            data_prev_ind = None
 
-        # Atualiza o cache para 'ind'
-        arima_cache[ind] = {
-            'model_close': model_arima_close_ind,
-            'pred_close': pred_close_ind,
-            'std_close': std_close_ind,
-            'model_high': model_arima_high_ind,
-            'pred_high': pred_high_ind,
-            'std_high': std_high_ind,
-            'model_low': model_arima_low_ind,
-            'pred_low': pred_low_ind,
-            'std_low': std_low_ind,
-            'data_da_previsao': data_prev_ind
-        }
+    # Previsões de um passo para cada dia a partir de min_train_ajustado (close/high/low de dep e ind)
+    # (forecast_only: somente a última barra, com um ajuste por série)
+    previsoes_geradas = len(df_dep) > min_train_ajustado
+    previsoes_arima = {}
+    usar_cache_previsoes = get_parametro_dinamico('cache_previsoes_arima', True)
+    modo = ('ultima', min_train_ajustado) if forecast_only else ('walk_forward', min_train_ajustado, refit_cada)
+    for ativo, df_ativo, df_ativo_tempo in ((dep, df_dep, df_dep1), (ind, df_ind, df_ind1)):
+        for col in ('close', 'high', 'low'):
+            serie_col = df_ativo[col]
+            if forecast_only:
+                calcular = lambda: prever_ultima_barra_arima(serie_col, min_train_ajustado, order=arima_order)
+            else:
+                calcular = lambda: prever_walk_forward_arima(serie_col, min_train_ajustado, order=arima_order,
+                                                             refit_cada=refit_cada)
+            if usar_cache_previsoes:
+                # Chave e resumo pelos horários reais das barras (df_dep1/df_ind1): df_dep/df_ind têm RangeIndex,
+                # e a posição da última barra muda com o período do par.
+                # forecast_only só usa as últimas min_train+1 barras: pares com períodos diferentes compartilham
+                serie_tempo = df_ativo_tempo[col]
+                janela_usada = serie_tempo.iloc[-(min_train_ajustado + 1):] if forecast_only else serie_tempo
+                chave = CachePrevisoesARIMA.chave(ativo, col, timeframe, janela_usada, arima_order, modo)
+                # Cópia rasa: o fallback de high/low abaixo não pode alterar a entrada compartilhada
+                previsoes_arima[(ativo, col)] = dict(cache_previsoes_arima.obter_ou_calcular(chave, janela_usada, calcular))
+            else:
+                previsoes_arima[(ativo, col)] = calcular()
+        # high/low: fallback para a previsão de fechamento onde o ajuste falhou
+        prev_close = previsoes_arima[(ativo, 'close')]
+        if prev_close['falhou'].any():
+            print(f"[AVISO] ARIMA close ({ativo}) falhou em {int(prev_close['falhou'].sum())} barras, usando último fechamento como previsão.")
+        for col in ('high', 'low'):
+            prev = previsoes_arima[(ativo, col)]
+            if prev['falhou'].any():
+                print(f"[AVISO] ARIMA {col} ({ativo}) falhou em {int(prev['falhou'].sum())} barras, usando fechamento como proxy.")
+                prev['previsao'] = np.where(prev['falhou'], prev_close['previsao'], prev['previsao'])
+                prev['std'] = np.where(prev['falhou'], prev_close['std'], prev['std'])
+
+    # Tabela de acertos do dependente (previsão x realizado em cada barra)
+    barras_backtest = [] if forecast_only else range(min_train_ajustado, len(df_dep))
+    for k, i in enumerate(barras_backtest):
+        date = df_dep.index[i]
+        for col in ('close', 'high', 'low'):
+            real = df_dep[col].iloc[i]
+            previsao = float(previsoes_arima[(dep, col)]['previsao'][k])
+            erro = real - previsao
+            abs_erro = abs(erro)
+            tolerancia_col = real * tolerancia
+            results.append({
+                'data': date,
+                'variavel': col,
+                'previsao': previsao,
+                'std': float(previsoes_arima[(dep, col)]['std'][k]),
+                'real': real,
+                'erro': erro,
+                'abs_erro': abs_erro,
+                'tolerancia': tolerancia_col,
+                'acerto': abs_erro <= tolerancia_col
+            })
 
-        # Atualiza o cache para 'dep'
-        arima_cache[dep] = {
-            'model_close': model_arima_close_dep,
-            'pred_close': pred_close_dep,
-            'std_close': std_close_dep,
-            'model_high': model_arima_high_dep,
-            'pred_high': pred_high_dep,
-            'std_high': std_high_dep,
-            'model_low': model_arima_low_dep,
-            'pred_low': pred_low_dep,
-            'std_low': std_low_dep,
-            'data_da_previsao': data_prev
-        }
+    # Atualiza o cache com a previsão da última barra para 'dep' e 'ind'
+    if previsoes_geradas:
+        for ativo in (dep, ind):
+            indice_previsao = previsoes_arima[(ativo, 'close')]['indice_previsao']
+            try:
+                data_da_previsao = pd.to_datetime(indice_previsao).tz_localize(None) if indice_previsao is not None else None
+            except Exception:
+                data_da_previsao = None
+            arima_cache[ativo] = {
+                'data_da_previsao': data_da_previsao
+            }
+            for col in ('close', 'high', 'low'):
+                prev = previsoes_arima[(ativo, col)]
+                arima_cache[ativo][f'model_{col}'] = prev['resultado']
+                arima_cache[ativo][f'pred_{col}'] = float(prev['previsao'][-1])
+                arima_cache[ativo][f'std_{col}'] = float(prev['std'][-1])
+        data_prev = arima_cache[dep]['data_da_previsao']
+        data_prev_ind = arima_cache[ind]['data_da_previsao']
     # Fim do loop de ARIMA
 
-    if not results:
+    if not previsoes_geradas:
         print(f"[AVISO] Nenhuma previsão gerada para {dep} com período {periodo}. Ignorando este par.")
         # Fallback: usar últimos valores históricos como previsões
         last_close = series[dep]['close'].iloc[-1]
@@ -1814,12 +1660,12 @@ def calcular_residuo_zscore_timeframe01(dep, ind, ibov, win, periodo, dados_prep
         hist_high_ind  = series[ind]['high']
         hist_low_ind   = series[ind]['low']
 
-        sigma_close = calcular_volatilidade_garch(hist_close)
-        sigma_high  = calcular_volatilidade_garch(hist_high)
-        sigma_low   = calcular_volatilidade_garch(hist_low)
-        sigma_close_ind = calcular_volatilidade_garch(hist_close_ind)
-        sigma_high_ind  = calcular_volatilidade_garch(hist_high_ind)
-        sigma_low_ind   = calcular_volatilidade_garch(hist_low_ind)
+        sigma_close = calcular_volatilidade_garch(hist_close, dep, 'close')
+        sigma_high  = calcular_volatilidade_garch(hist_high, dep, 'high')
+        sigma_low   = calcular_volatilidade_garch(hist_low, dep, 'low')
+        sigma_close_ind = calcular_volatilidade_garch(hist_close_ind, ind, 'close')
+        sigma_high_ind  = calcular_volatilidade_garch(hist_high_ind, ind, 'high')
+        sigma_low_ind   = calcular_volatilidade_garch(hist_low_ind, ind, 'low')
 
         # define os spreads usando volatilidade de high/low
         spread_compra = previsao_minimo - k * sigma_low
@@ -1965,6 +1811,16 @@ def encontrar_linha_monitorada(tabela_zscore_mesmo_segmento, linha_operacao, dad
             .reset_index(drop=True)
     )
 
+    # Modo Kalman: trajetória de alpha/beta de todos os pares selecionados em uma única passada
+    resumo_kalman = None
+    if get_parametro_dinamico('hedge_ratio_modo', 'ols') == 'kalman':
+        try:
+            pares_kalman = list(dict.fromkeys(zip(selecao['Dependente'], selecao['Independente'])))
+            resumo_kalman = resumo_beta_kalman(dados_preprocessados, pares_kalman, ['IBOV'],
+                                               delta=get_parametro_dinamico('kalman_delta', 1e-4))
+        except Exception as e:
+            print(f"[AVISO] Hedge ratio Kalman falhou ({e}), usando beta rotation OLS.")
+
     for _, linha in selecao.iterrows():
         dep = linha['Dependente']
         ind = linha['Independente']
@@ -2017,26 +1873,27 @@ def encontrar_linha_monitorada(tabela_zscore_mesmo_segmento, linha_operacao, dad
         # =================================================================
         
         # Rolling Beta univariado - ÚNICA COISA NOVA A CALCULAR
-        win_len = periodo if len(idx_all) >= periodo else MIN_BETA_WINDOW
-        betas = []
-        for i in range(len(idx_all) - win_len + 1):
-            widx = idx_all[i:i+win_len]
-            y_w = s_dep_full.loc[widx]
-            x_w = s_ind_full.loc[widx]
-            Xu = sm.add_constant(pd.DataFrame({'ind': x_w}, index=widx))
-            try:
-                mu = sm.OLS(y_w, Xu).fit()
-                betas.append(mu.params.get('ind', np.nan))
-            except:
-                pass
-       
-        betas = pd.Series(betas)
-        if betas.empty:
-            continue
-            
-        b_cur = betas.iloc[-1]
-        b_mean = betas.mean()
-        b_std = betas.std(ddof=0)
+        kalman = {}
+        if resumo_kalman is not None and (dep, ind) in resumo_kalman.index:
+            kalman = resumo_kalman.loc[(dep, ind)].to_dict()
+        if not pd.isna(kalman.get('beta_rotation', np.nan)):
+            # Trajetória do beta filtrado no lugar das regressões em janela
+            b_cur = kalman['beta_rotation']
+            b_mean = kalman['beta_rotation_mean']
+            b_std = kalman['beta_rotation_std']
+        else:
+            # Todas as janelas idx_all[i:i+win_len] em O(n) pelas somas acumuladas (mesmo resultado do OLS por janela)
+            win_len = periodo if len(idx_all) >= periodo else MIN_BETA_WINDOW
+            betas, janelas_validas = calcular_betas_rolling(
+                s_dep_full.loc[idx_all].to_numpy(dtype=float), s_ind_full.loc[idx_all].to_numpy(dtype=float), win_len
+            )
+            betas = pd.Series(betas[janelas_validas])
+            if betas.empty:
+                continue
+
+            b_cur = betas.iloc[-1]
+            b_mean = betas.mean()
+            b_std = betas.std(ddof=0)
         coef_var = ((b_std/abs(b_mean))*100) if b_mean != 0 else np.nan
         
         # =================================================================
@@ -2126,6 +1983,10 @@ def encontrar_linha_monitorada(tabela_zscore_mesmo_segmento, linha_operacao, dad
             'previsao_dep': previsao_dep,
             'forecast_dep': forecast_val,
         }
+        # Modo Kalman: hedge ratio, spread e z-score dinâmicos da última barra
+        for chave_kalman in ('alpha_kalman', 'beta_kalman', 'spread_kalman', 'zscore_kalman'):
+            if chave_kalman in kalman:
+                out[chave_kalman] = kalman[chave_kalman]
         
         # =================================================================
         # FILTROS FINAIS - USA VALORES JÁ CALCULADOS
@@ -2290,7 +2151,7 @@ def fechar_posicoes(magic, posicoes_abertas, posicoes_pendentes=None, resultados
                     "type_time": mt5.ORDER_TIME_GTC,
                     "type_filling": mt5.ORDER_FILLING_IOC,
                 }
-                result = mt5.order_send(request)
+                result = enviar_ordem_mt5(request)
                 if result is None:
                     print(f"[ERRO] order_send retornou None ao fechar posição ticket={posicao.ticket}.")
                     print(f"Último erro: {mt5.last_error()}")
@@ -2320,7 +2181,7 @@ def fechar_posicoes(magic, posicoes_abertas, posicoes_pendentes=None, resultados
                     "type_time": mt5.ORDER_TIME_GTC,
                     "type_filling": mt5.ORDER_FILLING_IOC,
                 }
-                result = mt5.order_send(request)
+                result = enviar_ordem_mt5(request)
                 if result is None:
                     print(f"[ERRO] order_send retornou None ao cancelar ordem pendente={ordem.ticket}.")
                     print(f"Último erro: {mt5.last_error()}")
@@ -2382,8 +2243,9 @@ def calcular_lucro_prejuizo_por_magic(magic, limite_lucro, limite_prejuizo):
     return lucro_prejuizo
 
 def verificar_operacao_aberta_tipo(depende, tipo_operacao):
+    snapshot = obter_snapshot_mt5(idade_maxima=0.5)
     # Obter ordens pendentes para o símbolo
-    ordens_pendentes = mt5.orders_get(symbol=depende)
+    ordens_pendentes = snapshot.ordens_de(symbol=depende) if snapshot is not None else mt5.orders_get(symbol=depende)
     if ordens_pendentes:
         for ordem in ordens_pendentes:
             if tipo_operacao == 'sell' and ordem.type in [mt5.ORDER_TYPE_SELL_LIMIT, mt5.ORDER_TYPE_SELL_STOP, mt5.ORDER_TYPE_SELL]:
@@ -2392,7 +2254,7 @@ def verificar_operacao_aberta_tipo(depende, tipo_operacao):
                 return True
 
     # Obter posições abertas para o símbolo
-    posicoes = mt5.positions_get(symbol=depende)
+    posicoes = snapshot.posicoes_de(symbol=depende) if snapshot is not None else mt5.positions_get(symbol=depende)
     if posicoes:
         for pos in posicoes:
             if tipo_operacao == 'sell' and pos.type == mt5.ORDER_TYPE_SELL:
@@ -2618,7 +2480,7 @@ def fechar_posicao_especifica(pos):
         "type_time": mt5.ORDER_TIME_GTC,
         "type_filling": mt5.ORDER_FILLING_IOC,
     }
-    result = mt5.order_send(request)
+    result = enviar_ordem_mt5(request)
     if result is None:
         print(f"[ERRO] order_send retornou None ao fechar posição ticket={pos.ticket}.")
         print(f"Último erro: {mt5.last_error()}")
@@ -2667,7 +2529,7 @@ def mover_stop_loss_para_break_even(pos, preco_abertura):
         "type_filling": mt5.ORDER_FILLING_FOK,
     }
 
-    result_mod = mt5.order_send(request_mod)
+    result_mod = enviar_ordem_mt5(request_mod)
     if result_mod is None:
         print(f"[ERRO] mover_stop_loss_para_profit_dez retornou None ao modificar SL do ticket {pos.ticket}.")
         print(f"Último erro: {mt5.last_error()}")
@@ -2704,7 +2566,7 @@ def monitor_e_converter_pares(pair_id, interval=5):
                             "action": mt5.TRADE_ACTION_REMOVE,
                             "order": ordem.ticket,
                         }
-                        cancel_result = mt5.order_send(cancel_request)
+                        cancel_result = enviar_ordem_mt5(cancel_request)
                         if cancel_result is None or cancel_result.retcode != mt5.TRADE_RETCODE_DONE:
                             print(f"[ERRO] Falha ao cancelar ordem pendente: {ordem.ticket}")
                             continue
@@ -2734,7 +2596,7 @@ def monitor_e_converter_pares(pair_id, interval=5):
                             "type_time": mt5.ORDER_TIME_GTC,
                             "type_filling": mt5.ORDER_FILLING_IOC,
                         }
-                        market_result = mt5.order_send(market_request)
+                        market_result = enviar_ordem_mt5(market_request)
                         if market_result and market_result.retcode == mt5.TRADE_RETCODE_DONE:
                             print(f"[OK] Ordem de mercado enviada com sucesso para {ordem.symbol}")
                         else:
@@ -2762,7 +2624,8 @@ def ajustar_para_0_5_int(ticker: str, preco: float) -> float:
         return round(preco * 2) / 2
   
 def contar_operacoes_por_prefixo(prefixo: str) -> int:
-    contratos = mt5.positions_get()
+    snapshot = obter_snapshot_mt5(idade_maxima=0.5)
+    contratos = snapshot.posicoes if snapshot is not None else mt5.positions_get()
     if contratos is None:
         return 0
     return len([op for op in contratos if str(op.magic).startswith(prefixo)])
@@ -2844,7 +2707,9 @@ def coletar_dados_historicos_para_analise(
                 tabela_linha_operacao=tabela_linha_operacao,
                 tolerancia=0.010,
                 min_train=70,
-                verbose=False
+                verbose=False,
+                forecast_only=False,
+                timeframe=timeframe_atual
             )
 
             if resultado is not None:
@@ -3665,6 +3530,9 @@ dados_historicos01 = {}
 dados_preprocessados01 = {}
 ultima_atualizacao = {}
 ultima_atualizacao01 = {}
+# Barras persistidas por (ativo, timeframe); primeira e segunda seleção leem a mesma cópia em memória
+armazem_historico = ArmazemBarras(os.path.join(script_dir, "armazem_barras"), mt5.copy_rates_range,
+                                  validade_segundos=get_parametro_dinamico('armazem_validade_segundos', 30))
 pares = {}
 linha_operacao = []
 linha_operacao01 = []
@@ -4436,113 +4304,102 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                     resultados_zscore_dependente_atual = []
                     tabela_linha_operacao = []
 
-                    # 1) Coleta de dados IBOV e WIN
-                    dados_ibov = mt5.copy_rates_range(ibov_symbol, tf_mt5, data_inicio, data_fim)
-                    if dados_ibov is not None and len(dados_ibov) > 0:
-                        df_ibov = pd.DataFrame(dados_ibov)
-                        df_ibov['time'] = pd.to_datetime(df_ibov['time'], unit='s')
-                        dados_historicos[ibov_symbol] = df_ibov.set_index('time')
-                        ultima_atualizacao[ibov_symbol] = df_ibov['time'].max()
-                    else:
-                        print(f"[ERRO] Falha ao coletar dados do IBOV {ibov_symbol}")
-
-                    dados_win = mt5.copy_rates_range(win_symbol, tf_mt5, data_inicio, data_fim)
-                    if dados_win is not None and len(dados_win) > 0:
-                        df_win = pd.DataFrame(dados_win)
-                        df_win['time'] = pd.to_datetime(df_win['time'], unit='s')
-                        dados_historicos[win_symbol] = df_win.set_index('time')
-                        ultima_atualizacao[win_symbol] = df_win['time'].max()
+                    if get_parametro_dinamico('armazem_barras', True):
+                        # 1-3) Histórico pelo armazém local: após a carga inicial só o delta vai ao MT5
+                        sem_dados = carregar_historico(
+                            armazem_historico, [ibov_symbol, win_symbol] + independente + dependente,
+                            tf_mt5, data_inicio, datetime.now(timezone),
+                            dados_historicos, ultima_atualizacao, validade_segundos=0
+                        )
+                        if ibov_symbol in sem_dados:
+                            print(f"[ERRO] Falha ao coletar dados do IBOV {ibov_symbol}")
+                        if win_symbol in sem_dados:
+                            print(f"[ERRO] Falha ao coletar dados do WIN {win_symbol}")
                     else:
-                        print(f"[ERRO] Falha ao coletar dados do WIN {win_symbol}")
+                        # 1) Coleta de dados IBOV e WIN
+                        dados_ibov = mt5.copy_rates_range(ibov_symbol, tf_mt5, data_inicio, data_fim)
+                        if dados_ibov is not None and len(dados_ibov) > 0:
+                            df_ibov = pd.DataFrame(dados_ibov)
+                            df_ibov['time'] = pd.to_datetime(df_ibov['time'], unit='s')
+                            dados_historicos[ibov_symbol] = df_ibov.set_index('time')
+                            ultima_atualizacao[ibov_symbol] = df_ibov['time'].max()
+                        else:
+                            print(f"[ERRO] Falha ao coletar dados do IBOV {ibov_symbol}")
 
-                    # 2) Loop para cada ativo independente
-                    for independente_atual in independente:
-                        dados_independente[independente_atual] = mt5.copy_rates_range(
-                            independente_atual, tf_mt5, data_inicio, data_fim
-                        )
-                        if (dados_independente[independente_atual] is not None and
-                                len(dados_independente[independente_atual]) > 0):
-                            df_independente = pd.DataFrame(dados_independente[independente_atual])
-                            df_independente['time'] = pd.to_datetime(df_independente['time'], unit='s')
-                            dados_historicos[independente_atual] = df_independente.set_index('time')
-                            ultima_atualizacao[independente_atual] = df_independente['time'].max()                    
+                        dados_win = mt5.copy_rates_range(win_symbol, tf_mt5, data_inicio, data_fim)
+                        if dados_win is not None and len(dados_win) > 0:
+                            df_win = pd.DataFrame(dados_win)
+                            df_win['time'] = pd.to_datetime(df_win['time'], unit='s')
+                            dados_historicos[win_symbol] = df_win.set_index('time')
+                            ultima_atualizacao[win_symbol] = df_win['time'].max()
+                        else:
+                            print(f"[ERRO] Falha ao coletar dados do WIN {win_symbol}")
+
+                        # 2) Loop para cada ativo independente
+                        for independente_atual in independente:
+                            dados_independente[independente_atual] = mt5.copy_rates_range(
+                                independente_atual, tf_mt5, data_inicio, data_fim
+                            )
+                            if (dados_independente[independente_atual] is not None and
+                                    len(dados_independente[independente_atual]) > 0):
+                                df_independente = pd.DataFrame(dados_independente[independente_atual])
+                                df_independente['time'] = pd.to_datetime(df_independente['time'], unit='s')
+                                dados_historicos[independente_atual] = df_independente.set_index('time')
+                                ultima_atualizacao[independente_atual] = df_independente['time'].max()                    
                             
-                    # 3) Loop para cada ativo dependente
-                    for dependente_atual in dependente:
-                        dados_dependente = mt5.copy_rates_range(dependente_atual, tf_mt5,
-                                                                data_inicio, data_fim)
-                        if dados_dependente is not None and len(dados_dependente) > 0:
-                            df_dependente = pd.DataFrame(dados_dependente)
-                            df_dependente['time'] = pd.to_datetime(df_dependente['time'], unit='s')
-                            dados_historicos[dependente_atual] = df_dependente.set_index('time')
-                            ultima_atualizacao[dependente_atual] = df_dependente['time'].max()
+                        # 3) Loop para cada ativo dependente
+                        for dependente_atual in dependente:
+                            dados_dependente = mt5.copy_rates_range(dependente_atual, tf_mt5,
+                                                                    data_inicio, data_fim)
+                            if dados_dependente is not None and len(dados_dependente) > 0:
+                                df_dependente = pd.DataFrame(dados_dependente)
+                                df_dependente['time'] = pd.to_datetime(df_dependente['time'], unit='s')
+                                dados_historicos[dependente_atual] = df_dependente.set_index('time')
+                                ultima_atualizacao[dependente_atual] = df_dependente['time'].max()
                    
                     # 4) Pré-processa os dados uma única vez
                     # Define a lista de ativos a serem pré-processados:
                     ativos_preprocessar = dependente + independente + [ibov_symbol, win_symbol]
                     colunas = ['close', 'open', 'high', 'low']
-                    dados_preprocessados = preprocessar_dados(dados_historicos, ativos_preprocessar, colunas)
+                    dados_preprocessados = preprocessar_dados(dados_historicos, ativos_preprocessar, colunas,
+                                                              timeframe=tf_mt5)
              
                     # Para cada dependente, também pré-processa o volume
                     
-                    # 5) Loop para calcular o Z-Score para cada par e cada período usando os dados pré-processados
-                    for period in periodo:
-                        for dependente_atual in dependente:
-                            for independente_atual in independente:
-                                if dependente_atual != independente_atual:
-                                    #if segmentos.get(dependente_atual) != segmentos.get(independente_atual):
-                                        
-                                        #continue
-                                    # Call calcular_residuo_zscore_timeframe with correct argument order
-                                    resultado = calcular_residuo_zscore_timeframe(
-                                        dep=dependente_atual,
-                                        ind=independente_atual,
-                                        ibov=ibov_symbol,
-                                        win=win_symbol,
-                                        periodo=period,
-                                        dados_preprocessados=dados_preprocessados,
-                                        USE_SPREAD_FORECAST=True,
-                                        zscore_threshold=2.0,
-                                        verbose=False,
-                                        enable_cointegration_filter=filter_params.get('enable_cointegration_filter', True)
-                                    )
-                                    #print(resultado)
-
-                                    if resultado is None:
-                                        #print(f"[ALERTA] Não foi possível calcular Z-Score para {dependente_atual} x {independente_atual} no período {period}.")
-                                        continue
-                                    
-                                    # Desempacota o resultado
-                                    alpha, beta, half_life, zscore, residuo, adf_p_value, pred_resid, resid_atual, zscore_forecast_compra, zscore_forecast_venda, zf_compra, zf_venda, nd_dep, nd_ind, coint_p_value, r2 = resultado
-                                    if zscore is not None:
-                                        resultados_zscore_dependente_atual.append({
-                                            'ID': id_counter,
-                                            'Dependente': dependente_atual,
-                                            'Independente': independente_atual, 
-                                            'Timeframe': nome_timeframe,
-                                            'Período': period,
-                                            'Z-Score': zscore, 
-                                            'alpha':     alpha,
-                                            'beta':      beta,
-                                            'half_life': half_life,
-                                            'residuo':   residuo,
-                                            'adf_p_value': adf_p_value,
-                                            'pred_resid': pred_resid,
-                                            'resid_atual': resid_atual,
-                                            'zf_compra': zf_compra,
-                                            'zf_venda': zf_venda,
-                                            'zscore_forecast_compra': bool(zscore_forecast_compra is not None and pred_resid is not None and zscore_forecast_compra < pred_resid),
-                                            'zscore_forecast_venda': bool(zscore_forecast_venda is not None and resid_atual is not None and zscore_forecast_venda > resid_atual),
-                                            'nd_dep': nd_dep,
-                                            'nd_ind': nd_ind,
-                                            'coint_p_value': coint_p_value,
-                                            'r2': r2,
-                                            'Timestamp': datetime.now()
-                                        })
+                    # 5) Calcula o Z-Score para cada par e cada período usando os dados pré-processados
+                    if get_parametro_dinamico('triagem_vetorizada', True):
+                        # Regressão de todos os pares/períodos em lote; só os aprovados em beta/R² seguem para ADF/coint
+                        resultados_zscore_dependente_atual = calcular_zscores_triagem_vetorizada(
+                            dependente, independente, periodo, dados_preprocessados,
+                            nome_timeframe, id_counter,
+                            enable_cointegration_filter=filter_params.get('enable_cointegration_filter', True)
+                        ).to_dict('records')
+                    else:
+                        for period in periodo:
+                            for dependente_atual in dependente:
+                                for independente_atual in independente:
+                                    if dependente_atual != independente_atual:
+                                        resultado = calcular_residuo_zscore_timeframe(
+                                            dep=dependente_atual,
+                                            ind=independente_atual,
+                                            ibov=ibov_symbol,
+                                            win=win_symbol,
+                                            periodo=period,
+                                            dados_preprocessados=dados_preprocessados,
+                                            USE_SPREAD_FORECAST=True,
+                                            zscore_threshold=2.0,
+                                            verbose=False,
+                                            enable_cointegration_filter=filter_params.get('enable_cointegration_filter', True)
+                                        )
+
+                                        if resultado is None or resultado[3] is None:
+                                            continue
+
+                                        resultados_zscore_dependente_atual.append(
+                                            montar_registro_zscore(id_counter, dependente_atual, independente_atual,
+                                                                   nome_timeframe, period, resultado)
+                                        )
                                         id_counter += 1
-                                    else:
-                                        #print(f"[ALERTA] Não foi possível calcular Z-Score para {dependente_atual} x {independente_atual} no período {period}.")
-                                        continue
                     # Converte a lista de resultados em DataFrame e encontra linhas monitoradas
                     tabela_zscore_dependente_atual = pd.DataFrame(resultados_zscore_dependente_atual)
                     print("Total de Z-Scores calculados:", len(resultados_zscore_dependente_atual))
@@ -4608,7 +4465,11 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                     dados_independente01 = {}
                     id_atualizado01 = []
 
-                    # Loop pelas linhas da tabela de operação da primeira seleção
+                    # Loop pelas linhas da tabela de operação da primeira seleção.
+                    # Fica no processo principal: com armazem_barras as barras já vêm do armazém, mas as previsões
+                    # ARIMA (cache_previsoes_arima), os estados GARCH (rastreador_garch) e arima_cache são por
+                    # processo e compartilhados entre as linhas (o mesmo ativo aparece em vários pares). Num pool
+                    # cada trabalhador refaria os ajustes e os estados GARCH avançados não voltariam ao principal.
                     for linha in tabela_linha_operacao.itertuples():
                         dependente_atual01      = linha.Dependente
                         independente_atual01    = linha.Independente
@@ -4659,47 +4520,59 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                         nd_ind           = registro.get("nd_ind")  
                         coint_p_value    = registro.get("coint_p_value") 
             
-                        # (Re)Coleta dados atualizados para o par (aqui, exemplo simplificado)
-                        dados_ibov = mt5.copy_rates_range(ibov_symbol, tf_mt5, data_inicio, data_fim)
-                        if dados_ibov is not None and len(dados_ibov) > 0:
-                            df_ibov = pd.DataFrame(dados_ibov)
-                            df_ibov['time'] = pd.to_datetime(df_ibov['time'], unit='s')
-                            dados_historicos01[ibov_symbol] = df_ibov.set_index('time')
-                            ultima_atualizacao01[ibov_symbol] = df_ibov['time'].max()
-
-                        dados_win = mt5.copy_rates_range(win_symbol, tf_mt5, data_inicio, data_fim)
-                        if dados_win is not None and len(dados_win) > 0:
-                            df_win = pd.DataFrame(dados_win)
-                            df_win['time'] = pd.to_datetime(df_win['time'], unit='s')
-                            dados_historicos01[win_symbol] = df_win.set_index('time')
-                            ultima_atualizacao01[win_symbol] = df_win['time'].max()
+                        if get_parametro_dinamico('armazem_barras', True):
+                            # Mesmas barras da primeira seleção: dentro da validade não há nova consulta ao MT5
+                            sem_dados = carregar_historico(
+                                armazem_historico,
+                                [ibov_symbol, win_symbol, independente_atual01, dependente_atual01],
+                                tf_mt5, data_inicio, datetime.now(timezone),
+                                dados_historicos01, ultima_atualizacao01
+                            )
+                            if win_symbol in sem_dados:
+                                print(f"[ERRO] Falha ao coletar dados do WIN {win_symbol}")
                         else:
-                            print(f"[ERRO] Falha ao coletar dados do WIN {win_symbol}")                        
+                            # (Re)Coleta dados atualizados para o par (aqui, exemplo simplificado)
+                            dados_ibov = mt5.copy_rates_range(ibov_symbol, tf_mt5, data_inicio, data_fim)
+                            if dados_ibov is not None and len(dados_ibov) > 0:
+                                df_ibov = pd.DataFrame(dados_ibov)
+                                df_ibov['time'] = pd.to_datetime(df_ibov['time'], unit='s')
+                                dados_historicos01[ibov_symbol] = df_ibov.set_index('time')
+                                ultima_atualizacao01[ibov_symbol] = df_ibov['time'].max()
+
+                            dados_win = mt5.copy_rates_range(win_symbol, tf_mt5, data_inicio, data_fim)
+                            if dados_win is not None and len(dados_win) > 0:
+                                df_win = pd.DataFrame(dados_win)
+                                df_win['time'] = pd.to_datetime(df_win['time'], unit='s')
+                                dados_historicos01[win_symbol] = df_win.set_index('time')
+                                ultima_atualizacao01[win_symbol] = df_win['time'].max()
+                            else:
+                                print(f"[ERRO] Falha ao coletar dados do WIN {win_symbol}")                        
                         
-                        # Coleta dos dados para o Independente
-                        dados_independente01[independente_atual01] = mt5.copy_rates_range(
-                            independente_atual01, tf_mt5, data_inicio, data_fim
-                        )
-                        if (dados_independente01[independente_atual01] is not None and
-                                len(dados_independente01[independente_atual01]) > 0):
-                            df_independente01 = pd.DataFrame(dados_independente01[independente_atual01])
-                            df_independente01['time'] = pd.to_datetime(df_independente01['time'], unit='s')
-                            dados_historicos01[independente_atual01] = df_independente01.set_index('time')
-                            ultima_atualizacao01[independente_atual01] = df_independente01['time'].max()                        
+                            # Coleta dos dados para o Independente
+                            dados_independente01[independente_atual01] = mt5.copy_rates_range(
+                                independente_atual01, tf_mt5, data_inicio, data_fim
+                            )
+                            if (dados_independente01[independente_atual01] is not None and
+                                    len(dados_independente01[independente_atual01]) > 0):
+                                df_independente01 = pd.DataFrame(dados_independente01[independente_atual01])
+                                df_independente01['time'] = pd.to_datetime(df_independente01['time'], unit='s')
+                                dados_historicos01[independente_atual01] = df_independente01.set_index('time')
+                                ultima_atualizacao01[independente_atual01] = df_independente01['time'].max()                        
                             
-                        # Coleta dos dados para o Dependente
-                        dados_dependente01 = mt5.copy_rates_range(
-                            dependente_atual01, tf_mt5, data_inicio, data_fim
-                        )
-                        if dados_dependente01 is not None and len(dados_dependente01) > 0:
-                            df_dependente01 = pd.DataFrame(dados_dependente01)
-                            df_dependente01['time'] = pd.to_datetime(df_dependente01['time'], unit='s')
-                            dados_historicos01[dependente_atual01] = df_dependente01.set_index('time')
-                            ultima_atualizacao01[dependente_atual01] = df_dependente01['time'].max()
+                            # Coleta dos dados para o Dependente
+                            dados_dependente01 = mt5.copy_rates_range(
+                                dependente_atual01, tf_mt5, data_inicio, data_fim
+                            )
+                            if dados_dependente01 is not None and len(dados_dependente01) > 0:
+                                df_dependente01 = pd.DataFrame(dados_dependente01)
+                                df_dependente01['time'] = pd.to_datetime(df_dependente01['time'], unit='s')
+                                dados_historicos01[dependente_atual01] = df_dependente01.set_index('time')
+                                ultima_atualizacao01[dependente_atual01] = df_dependente01['time'].max()
                         
                         ativos_para_pre = [dependente_atual01, independente_atual01, ibov_symbol, win_symbol]
                         colunas = ['close','open','high','low']
-                        dados_preprocessados = preprocessar_dados(dados_historicos01, ativos_para_pre, colunas)
+                        dados_preprocessados = preprocessar_dados(dados_historicos01, ativos_para_pre, colunas,
+                                                                  timeframe=tf_mt5)
 
                         # Calcula o Z-Score para o par usando a função original (ou uma versão similar)
                         resultado = calcular_residuo_zscore_timeframe01(
@@ -4712,7 +4585,9 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                             tabela_linha_operacao,                        
                             tolerancia=0.010, 
                             min_train=70,
-                            verbose=False
+                            verbose=False,
+                            forecast_only=get_parametro_dinamico('arima_forecast_only', True),
+                            timeframe=tf_mt5
                         )
 
                         if resultado is None:
@@ -5333,7 +5208,7 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                                     "type_filling": mt5.ORDER_FILLING_RETURN,
                                 }
                                 
-                                result_compra_dep = mt5.order_send(ordem_compra_dep)
+                                result_compra_dep = enviar_ordem_mt5(ordem_compra_dep)
                                 print(f" - [ENVIO] Ordem de COMPRA DEP para {depende_atual} enviada ao servidor MT5.\n")
                                 if result_compra_dep is None:
                                     print(" - [ERRO] result_COMPRA_DEP retornou None (sem resposta do MT5). "
@@ -5345,8 +5220,10 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                                    
                                                               
                                 if result_compra_dep and result_compra_dep.retcode == mt5.TRADE_RETCODE_DONE:
-                                    
-                                    result_venda_ind = mt5.order_send(ordem_venda_ind)
+                                    # Par do magic gravado antes da segunda perna (pernas órfãs sobrevivem a reinícios)
+                                    obter_registro_magics().registrar(magic_id, depende_atual, independe_atual)
+
+                                    result_venda_ind = enviar_ordem_mt5(ordem_venda_ind)
                                     print(f" - [ENVIO] Ordem de VENDA_IND para {independe_atual} enviada ao servidor MT5.\n")
                                     if result_venda_ind is None:
                                         print(" - [ERRO] result_VENDA_IND retornou None (sem resposta do MT5). "
@@ -5716,7 +5593,7 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                                     "type_filling": mt5.ORDER_FILLING_RETURN,
                                 }
                                 
-                                result_venda_dep = mt5.order_send(ordem_venda_dep)
+                                result_venda_dep = enviar_ordem_mt5(ordem_venda_dep)
                                 print(f" - [ENVIO] Ordem de VENDA DEP para {depende_atual} enviada ao servidor MT5.\n")
                                 if result_venda_dep is None:
                                     print(" - [ERRO] result_VENDA_DEP retornou None (sem resposta do MT5). "
@@ -5727,7 +5604,9 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                                     print(f" - [RETORNO MT5] Comentário: {result_venda_dep.comment}\n")
 
                                 if result_venda_dep and result_venda_dep.retcode == mt5.TRADE_RETCODE_DONE:
-                                    result_compra_ind = mt5.order_send(ordem_compra_ind)
+                                    # Par do magic gravado antes da segunda perna (pernas órfãs sobrevivem a reinícios)
+                                    obter_registro_magics().registrar(magic_id, depende_atual, independe_atual)
+                                    result_compra_ind = enviar_ordem_mt5(ordem_compra_ind)
                                     print(f" - [ENVIO] Ordem de COMPRA_IND para {independe_atual} enviada ao servidor MT5.\n")
                                     if result_compra_ind is None:
                                         print(" - [ERRO] result_COMPRA_IND retornou None (sem resposta do MT5). "
@@ -5977,8 +5856,9 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                     # Filtra apenas as posições com magic prefixo "1"
                     magics_abertas = set(p.magic for p in posicoes_abertas if magic_comeca_com(p.magic, prefixo_script))
                     
+                    livro = LivroPosicoes(posicoes_abertas, posicoes_pendentes)
                     for magic in magics_abertas:
-                        pos_magic = [p for p in posicoes_abertas if p.magic == magic]
+                        pos_magic = livro.posicoes_do_magic(magic)
 
                         # Se apenas uma perna do par está aberta:
                         if len(pos_magic) == 1:
@@ -5986,7 +5866,7 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                             ativo_aberto = posicao.symbol
 
                             # Busca o ativo dependente do par
-                            depende_atual, independe_atual = pares.get(magic, (None, None))
+                            depende_atual, independe_atual = pares.get(magic) or obter_registro_magics().par(magic)
 
                             if depende_atual is None or independe_atual is None:
                                 print(f"[AVISO] Par de ativos não encontrado para magic {magic}. Pulando...")
@@ -6008,14 +5888,14 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                             posicao = pos_magic[0]
                             ativo_aberto = posicao.symbol
 
-                            depende_atual, independe_atual = pares.get(magic, (None, None))
+                            depende_atual, independe_atual = pares.get(magic) or obter_registro_magics().par(magic)
                             if depende_atual is None or independe_atual is None:
                                 print(f"[AVISO] Par de ativos não encontrado para magic {magic}. Pulando...")
                                 continue
 
                             # Se o ativo aberto É o dependente, verifique se existe ordem pendente para o independente
                             if ativo_aberto == depende_atual:
-                                ordens_pendentes_indep = [o for o in posicoes_pendentes if o.symbol == independe_atual and o.magic == magic]
+                                ordens_pendentes_indep = [o for o in livro.ordens_do_magic(magic) if o.symbol == independe_atual]
                                 if ordens_pendentes_indep:
                                     for ordem in ordens_pendentes_indep:
                                         # Cancela a ordem pendente
@@ -6023,7 +5903,7 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                                             "action": mt5.TRADE_ACTION_REMOVE,
                                             "order": ordem.ticket,
                                         }
-                                        result_cancel = mt5.order_send(cancel_request)
+                                        result_cancel = enviar_ordem_mt5(cancel_request)
                                         if result_cancel and result_cancel.retcode == mt5.TRADE_RETCODE_DONE:
                                             print(f"[OK] Ordem pendente do independente ({independe_atual}) cancelada para magic {magic}.")
                                         else:
@@ -6052,7 +5932,7 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
                                             "type_time": mt5.ORDER_TIME_DAY,
                                             "type_filling": mt5.ORDER_FILLING_RETURN,
                                         }
-                                        result_envio = mt5.order_send(ordem_mercado)
+                                        result_envio = enviar_ordem_mt5(ordem_mercado)
                                         if result_envio and result_envio.retcode == mt5.TRADE_RETCODE_DONE:
                                             print(f"[OK] Ordem a mercado enviada para o independente ({independe_atual}) do magic {magic}.")
                                         else:
@@ -6384,7 +6264,7 @@ def main(loop=True, timeframe_atual=None, filter_params=None):
 
                             # Enviar a modificação
                             try:
-                                result_mod = mt5.order_send(request_modificacao)
+                                result_mod = enviar_ordem_mt5(request_modificacao)
                                 
                                 if result_mod is None:
                                     print(f"❌ Erro: result_mod retornou None para ticket {ticket_posicao}")
@@ -0,0 +1,172 @@
+"""
+Dados de Gráficos - Redução de séries (LTTB / min-max) e cache de figuras Plotly por versão dos dados
+render_equity_chart, render_profit_distribution e ChartGenerator.create_pair_analysis_chart mandavam
+todos os pontos brutos para o Plotly a cada rerun do Streamlit (e o st_autorefresh dispara reruns em
+intervalo fixo): com meses de ticks e deals o payload para o navegador e o tempo de montagem da figura
+cresciam sem limite. Aqui:
+
+  1. reduzir_indices() escolhe no máximo `alvo` pontos de uma ou mais séries com o mesmo eixo x —
+     LTTB (Largest-Triangle-Three-Buckets, preserva a forma visual) ou min-max por balde (preserva
+     picos e vales, útil para drawdown e spread);
+  2. CacheFiguras guarda a figura pronta por (nome, versão dos dados, parâmetros): enquanto a versão
+     da série não muda, o rerun reaproveita a figura sem refazer agrupamentos nem traces.
+"""
+
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+PONTOS_PADRAO = 1500
+
+
+def _eixo_numerico(x):
+    """Eixo x como float64 (datetime64, Timestamp/datetime, índices numéricos)."""
+    valores = np.asarray(x)
+    if np.issubdtype(valores.dtype, np.datetime64):
+        return valores.astype('datetime64[ns]').astype(np.int64).astype(np.float64)
+    if valores.dtype == object:
+        return np.array([v.timestamp() if hasattr(v, 'timestamp') else float(v) for v in valores], dtype=np.float64)
+    return valores.astype(np.float64)
+
+
+def lttb(x, y, alvo):
+    """Índices escolhidos pelo Largest-Triangle-Three-Buckets (sempre inclui o primeiro e o último)."""
+    n = len(y)
+    if alvo >= n or alvo < 3:
+        return np.arange(n)
+    x = _eixo_numerico(x)
+    y = np.asarray(y, dtype=np.float64)
+    # alvo - 2 baldes entre o primeiro e o último ponto
+    limites = np.linspace(1, n - 1, alvo - 1).astype(np.int64)
+    indices = np.empty(alvo, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n - 1
+    anterior = 0
+    for balde in range(alvo - 2):
+        inicio, fim = limites[balde], limites[balde + 1]
+        proximo_inicio, proximo_fim = fim, (limites[balde + 2] if balde + 2 < len(limites) else n)
+        if proximo_fim <= proximo_inicio:
+            proximo_fim = proximo_inicio + 1
+        media_x = x[proximo_inicio:proximo_fim].mean()
+        media_y = y[proximo_inicio:proximo_fim].mean()
+        xa, ya = x[anterior], y[anterior]
+        areas = np.abs((xa - media_x) * (y[inicio:fim] - ya) - (xa - x[inicio:fim]) * (media_y - ya))
+        anterior = inicio + int(np.argmax(areas)) if fim > inicio else inicio
+        indices[balde + 1] = anterior
+    return indices
+
+
+def minmax(y, alvo):
+    """Índices do mínimo e do máximo de cada balde (alvo/2 baldes), mais o primeiro e o último."""
+    n = len(y)
+    if alvo >= n or alvo < 4:
+        return np.arange(n)
+    y = np.asarray(y, dtype=np.float64)
+    baldes = max(1, (alvo - 2) // 2)
+    limites = np.linspace(0, n, baldes + 1).astype(np.int64)
+    escolhidos = [0, n - 1]
+    for inicio, fim in zip(limites[:-1], limites[1:]):
+        if fim > inicio:
+            trecho = y[inicio:fim]
+            escolhidos.append(inicio + int(np.nanargmin(trecho)) if not np.all(np.isnan(trecho)) else inicio)
+            escolhidos.append(inicio + int(np.nanargmax(trecho)) if not np.all(np.isnan(trecho)) else fim - 1)
+    return np.unique(np.array(escolhidos, dtype=np.int64))
+
+
+def reduzir_indices(x, series, alvo=PONTOS_PADRAO, metodo='lttb'):
+    """
+    Índices (ordenados, sem repetição) para desenhar as `series` que compartilham o eixo `x` com no
+    máximo ~`alvo` pontos. Cada série contribui com alvo/len(series) pontos e os índices são unidos,
+    de modo que degraus de uma série (ex.: balance) não se percam pela escolha feita em outra.
+    """
+    series = [np.asarray(s, dtype=np.float64) for s in series]
+    n = len(x)
+    if not series or n <= alvo:
+        return np.arange(n)
+    por_serie = max(4, alvo // len(series))
+    partes = []
+    for serie in series:
+        if metodo == 'minmax':
+            partes.append(minmax(serie, por_serie))
+        else:
+            partes.append(lttb(x, serie, por_serie))
+    return np.unique(np.concatenate(partes))
+
+
+def reduzir_dataframe(df, colunas, alvo=PONTOS_PADRAO, metodo='lttb', coluna_x=None):
+    """Linhas do DataFrame escolhidas por reduzir_indices (eixo x = coluna_x ou o índice)."""
+    if len(df) <= alvo:
+        return df
+    x = df.index.values if coluna_x is None else df[coluna_x].values
+    indices = reduzir_indices(x, [df[c].values for c in colunas], alvo, metodo)
+    return df.iloc[indices]
+
+
+class CacheFiguras:
+    """
+    Figuras Plotly prontas por (nome, versão dos dados, parâmetros), em LRU de tamanho fixo.
+
+    Uso:
+        fig = cache_figuras.obter('equity', (serie.versao, pontos_max), lambda: montar_figura(...))
+    """
+
+    def __init__(self, capacidade=16):
+        self.capacidade = capacidade
+        self._figuras = OrderedDict()
+        self._trava = threading.Lock()
+        self.acertos = 0
+        self.faltas = 0
+
+    def buscar(self, nome, versao):
+        """Figura guardada para (nome, versão), ou None (versão None nunca está em cache)."""
+        if versao is None:
+            self.faltas += 1
+            return None
+        chave = (nome, versao)
+        with self._trava:
+            figura = self._figuras.get(chave)
+            if figura is None:
+                self.faltas += 1
+                return None
+            self._figuras.move_to_end(chave)
+            self.acertos += 1
+            return figura
+
+    def guardar(self, nome, versao, figura):
+        if versao is None:
+            return figura
+        with self._trava:
+            # Versões antigas do mesmo gráfico não voltam: descarta-as logo
+            for antiga in [k for k in self._figuras if k[0] == nome]:
+                del self._figuras[antiga]
+            self._figuras[(nome, versao)] = figura
+            while len(self._figuras) > self.capacidade:
+                self._figuras.popitem(last=False)
+        return figura
+
+    def obter(self, nome, versao, construir):
+        """Figura em cache para (nome, versão) ou construir() — versão None nunca usa o cache."""
+        figura = self.buscar(nome, versao)
+        if figura is None:
+            figura = self.guardar(nome, versao, construir())
+        return figura
+
+    def limpar(self, nome=None):
+        with self._trava:
+            if nome is None:
+                self._figuras.clear()
+            else:
+                for chave in [k for k in self._figuras if k[0] == nome]:
+                    del self._figuras[chave]
+
+    def __len__(self):
+        return len(self._figuras)
+
+
+_cache_padrao = CacheFiguras()
+
+
+def obter_cache_figuras():
+    """Cache de figuras compartilhado pelo processo (sobrevive aos reruns do Streamlit)."""
+    return _cache_padrao
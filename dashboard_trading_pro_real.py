@@ -64,6 +64,7 @@ import time as time_module
 import io
 import random
 import traceback
+import uuid
 from typing import Dict, List, Optional, Tuple
 import warnings
 warnings.filterwarnings('ignore')
@@ -72,6 +73,14 @@ warnings.filterwarnings('ignore')
 import sys
 sys.path.append('.')
 
+from envio_ordens_pareadas import EnvioPareado  # Envio com latência/slippage medidos por perna
+from log_estruturado import BufferLog  # Logs em buffer circular consultável por nível/evento/texto
+from historico_deals import CacheDeals  # Histórico de deals incremental com estatísticas acumuladas
+from serie_equity import RegistroEquity  # Equity em arrays pré-alocados com pico/drawdown em O(1)
+from dados_graficos import obter_cache_figuras, reduzir_dataframe  # Séries reduzidas (LTTB/min-max) e figuras em cache
+from publicacao_snapshots import PublicadorSnapshots  # Snapshots versionados e imutáveis para o dashboard
+from cache_paineis import carregar_tabela_memorizada, indice_ids_pares, memorizar, tabela_exibicao  # Modelos dos painéis por versão/filtros
+
 # Import do sistema integrado para threading otimizado
 try:
     from sistema_integrado import SistemaIntegrado
@@ -638,16 +647,23 @@ class TradingSystemReal:
             "ultimo_update": None
         }
 
-        self.logs = []
+        self.logs = BufferLog(capacidade=get_parametro_dinamico('log_capacidade', 5000), formato_hora="%H:%M:%S")
         self.trade_history = []
         self.posicoes_abertas = []
         self.sinais_ativos = []
-        self.equity_historico = []
+        self.equity_historico = RegistroEquity(
+            capacidade=get_parametro_dinamico('equity_capacidade', 20000),
+            horizonte_segundos=get_parametro_dinamico('equity_horizonte_minutos', 120) * 60,
+            capacidade_minutos=get_parametro_dinamico('equity_capacidade_minutos', 7 * 24 * 60),
+            pasta=get_parametro_dinamico('equity_pasta', 'equity_historico') or None,
+            log=self.log)
 
         # Inicializa DataFrames vazios
         self.tabela_linha_operacao = pd.DataFrame()
         self.tabela_linha_operacao01 = pd.DataFrame()
         self.thread_sistema = None
+        # Snapshots publicados pela thread de sincronização (só copiam o que mudou)
+        self.snapshots = PublicadorSnapshots(log=self.log)
         
         # Inicializar modo_otimizado como True para exibir logs do SistemaIntegrado
         self.modo_otimizado = True
@@ -779,6 +795,7 @@ class TradingSystemReal:
 
             account_info = mt5.account_info()
             if account_info:
+                self._cache_deals = None  # a conta pode ter mudado: cache de deals recriado no próximo uso
                 saldo_inicial_dia = self.calcular_saldo_inicial_do_dia()
                 self.dados_sistema["saldo_inicial"] = saldo_inicial_dia
                 self.dados_sistema["equity_atual"] = account_info.equity
@@ -819,24 +836,29 @@ class TradingSystemReal:
             self.log(f"📅 Calculando saldo inicial para {hoje}")
             self.log(f"🔍 Buscando deals desde {inicio_dia.strftime('%H:%M:%S')}")
             
-            # Busca deals do dia
-            deals = mt5.history_deals_get(inicio_dia, datetime.now())
+            # Busca deals do dia (pelo cache incremental, quando disponível)
+            cache = self._historico_deals()
+            if cache is not None:
+                cache.atualizar()
+                lucro_total_dia, total_deals = cache.lucro_realizado(desde=inicio_dia)
+            else:
+                deals = mt5.history_deals_get(inicio_dia, datetime.now())
+                total_deals = len(deals) if deals else 0
+                # Calcula total de lucros/perdas dos deals de hoje
+                lucro_total_dia = sum([deal.profit for deal in deals if hasattr(deal, 'profit') and deal.profit != 0]) if deals else 0.0
             
-            if not deals or len(deals) == 0:
+            if total_deals == 0:
                 # Se não há deals hoje, usa o balance atual como inicial
                 self.log("📊 Sem deals hoje - usando balance atual como inicial")
                 self.log(f"💰 Balance usado como inicial: R$ {account_info.balance:,.2f}")
                 return account_info.balance
             
-            # Calcula total de lucros/perdas dos deals de hoje
-            lucro_total_dia = sum([deal.profit for deal in deals if hasattr(deal, 'profit') and deal.profit != 0])
-            
             # Saldo inicial = Balance atual - Lucros do dia
             saldo_inicial = account_info.balance - lucro_total_dia
             
             # LOGS DETALHADOS
             self.log(f"📊 CÁLCULO SALDO INICIAL:")
-            self.log(f"   • Deals hoje: {len(deals)}")
+            self.log(f"   • Deals hoje: {total_deals}")
             self.log(f"   • Lucro total dos deals: R$ {lucro_total_dia:+,.2f}")
             self.log(f"   • Balance atual: R$ {account_info.balance:,.2f}")
             self.log(f"   • Saldo inicial calculado: R$ {saldo_inicial:,.2f}")
@@ -861,20 +883,14 @@ class TradingSystemReal:
     
     def log(self, mensagem: str):
         """Adiciona log com timestamp - Otimizado sem duplicação"""
-        timestamp = datetime.now().strftime("%H:%M:%S")
-        log_entry = f"[{timestamp}] {mensagem}"
-        self.logs.append(log_entry)
-        
         # Sincroniza com sistema integrado se disponível
         if self.modo_otimizado and self.sistema_integrado:
-            # O sistema integrado já faz print(), então não duplicamos aqui
+            # O sistema integrado já guarda e faz print(), então não duplicamos aqui
             self.sistema_integrado.log(f"[Dashboard] {mensagem}")
         else:
-            # Só faz print se não há sistema integrado (evita duplicação)
-            print(log_entry)
-        
-        if len(self.logs) > 1000:  # Limita logs
-            self.logs = self.logs[-500:]
+            # Buffer circular: memória constante, sem cortes manuais da lista
+            registro = self.logs.registrar(mensagem)
+            print(registro.formatar("%H:%M:%S"))
     
     def processar_envio_ordens_automatico(self, tabela_linha_operacao01, config):
         """
@@ -1783,6 +1799,24 @@ class TradingSystemReal:
             self.log(f"[ERRO] Erro ao calcular stop loss compra independente: {e}")
             return float(preco_entrada * 0.99)
                 
+    def _historico_deals(self):
+        """CacheDeals da conta conectada: deals guardados por ticket, só os novos são buscados no MT5"""
+        if not self.mt5_connected or not get_parametro_dinamico('cache_deals', True):
+            return None
+        if getattr(self, '_cache_deals', None) is None:
+            conta = mt5.account_info()
+            login = getattr(conta, 'login', 0) if conta else 0
+            self._cache_deals = CacheDeals(mt5, dias=get_parametro_dinamico('cache_deals_dias', 30),
+                                           caminho=f"cache_deals_{login}.jsonl", log=self.log)
+        return self._cache_deals
+
+    def _envio_ordens(self):
+        """EnvioPareado compartilhado pelas ordens enviadas do dashboard (métricas em .historico/.resumo())"""
+        if getattr(self, '_envio_pareado', None) is None:
+            self._envio_pareado = EnvioPareado(calc_mod.enviar_ordem_mt5, retcodes_ok=(mt5.TRADE_RETCODE_DONE,),
+                                               log=self.log)
+        return self._envio_pareado
+
     def _enviar_ordem_mt5(self, symbol, volume, order_type, price, tp, sl, magic, comment):
         """Envia ordem para o MT5"""
         try:
@@ -1800,9 +1834,12 @@ class TradingSystemReal:
                 "type_filling": mt5.ORDER_FILLING_IOC,
             }
             
-            result = mt5.order_send(request)
+            # Mesmo caminho do sistema: terminal serializado, snapshot invalidado e latência/slippage medidos
+            snapshot = calc_mod.obter_snapshot_mt5(idade_maxima=1.0)
+            result, metricas = self._envio_ordens().enviar_perna(request, snapshot.tick(symbol) if snapshot else None)
+            self.log(f"⏱️ {symbol}: order_send em {metricas['latencia_ms']:.1f}ms")
             
-            if result.retcode == mt5.TRADE_RETCODE_DONE:
+            if result is not None and result.retcode == mt5.TRADE_RETCODE_DONE:
                 self.log(f"✅ Ordem enviada: {symbol} - Ticket: {result.order}")
                 return True
             else:
@@ -2054,13 +2091,16 @@ class TradingSystemReal:
             return []
             
         try:
-            positions = mt5.positions_get()
+            # Snapshot compartilhado com o sistema (até 5 s de idade): posições e ticks numa leitura só
+            snapshot = calc_mod.obter_snapshot_mt5(idade_maxima=5.0)
+            positions = snapshot.posicoes if snapshot is not None else mt5.positions_get()
             if positions is None:
                 return []
                 
             posicoes = []
             for pos in positions:
-                preco_atual = self.obter_preco_atual(pos.symbol)
+                tick = snapshot.tick(pos.symbol) if snapshot is not None else None
+                preco_atual = tick.bid if tick else self.obter_preco_atual(pos.symbol)
                 if preco_atual:
                     pl_atual = (preco_atual - pos.price_open) * pos.volume if pos.type == 0 else (pos.price_open - preco_atual) * pos.volume
                 else:
@@ -2394,8 +2434,9 @@ class TradingSystemReal:
             self.log(f"❌ Erro ao fechar posição {ticket}: {str(e)}")
             return False
 
-    def validar_consistencia_drawdown(self, drawdown_equity_pct, drawdown_trades_pct, trades_reais):
-        """Valida e escolhe o melhor método de cálculo de drawdown - CONVERTIDO PARA VALORES MONETÁRIOS"""
+    def validar_consistencia_drawdown(self, drawdown_equity_pct, drawdown_trades_pct, trades_reais, drawdown_trades_reais=None):
+        """Valida e escolhe o melhor método de cálculo de drawdown - CONVERTIDO PARA VALORES MONETÁRIOS
+        drawdown_trades_reais: drawdown dos trades já calculado (ex.: agregados do CacheDeals), evita reconstruir a curva"""
         try:
             # Obter dados da conta para conversão
             account_info = mt5.account_info() if self.mt5_connected else None
@@ -2406,7 +2447,7 @@ class TradingSystemReal:
                 
                 # Converte percentuais para valores monetários
                 if self.equity_historico:
-                    max_equity = max([entry['equity'] for entry in self.equity_historico])
+                    max_equity = self.equity_historico.pico  # pico mantido a cada registro (O(1))
                     # Drawdown em R$ = diferença entre pico máximo e valor atual
                     drawdown_equity_reais = max(0, max_equity - equity_atual)
                 else:
@@ -2414,7 +2455,9 @@ class TradingSystemReal:
                     drawdown_equity_reais = (drawdown_equity_pct / 100) * equity_atual
                 
                 # Converte drawdown dos trades para valores monetários
-                if trades_reais and len(trades_reais) > 0:
+                if drawdown_trades_reais is not None:
+                    pass
+                elif trades_reais and len(trades_reais) > 0:
                     lucros = [trade['Lucro'] for trade in trades_reais if 'Lucro' in trade]
                     if lucros:
                         # Reconstrói curva de equity dos trades
@@ -2431,7 +2474,8 @@ class TradingSystemReal:
             else:
                 # Fallback: valores simulados se não houver conexão MT5
                 drawdown_equity_reais = drawdown_equity_pct * 100  # Simula R$ 100 por cada 1%
-                drawdown_trades_reais = drawdown_trades_pct * 100
+                if drawdown_trades_reais is None:
+                    drawdown_trades_reais = drawdown_trades_pct * 100
             
             # Método 1: Drawdown baseado no equity histórico (mais confiável para risco real da conta)
             drawdown_final = drawdown_equity_reais
@@ -2471,13 +2515,7 @@ class TradingSystemReal:
             account_info = mt5.account_info()
             if account_info:
                 self.dados_sistema["equity_atual"] = account_info.equity
-                equity_entry = {
-                    'timestamp': datetime.now(),
-                    'equity': account_info.equity,
-                    'balance': account_info.balance,
-                    'profit': account_info.profit
-                }
-                self.equity_historico.append(equity_entry)                
+                self.equity_historico.registrar(account_info.equity, account_info.balance, account_info.profit)
                 
                 # ✅ CORREÇÃO ADICIONAL: Verifica se saldo inicial é válido
                 saldo_inicial = self.dados_sistema.get("saldo_inicial", 0)
@@ -2505,7 +2543,7 @@ class TradingSystemReal:
                 # Prioriza o cálculo baseado no equity histórico da conta (mais preciso para risco real)
                 drawdown_equity_reais = 0.0
                 if self.equity_historico:
-                    max_equity = max([entry['equity'] for entry in self.equity_historico])
+                    max_equity = self.equity_historico.pico  # pico mantido a cada registro (O(1))
                     current_equity = account_info.equity
                     # Drawdown em R$ = diferença entre pico máximo e equity atual
                     drawdown_equity_reais = max(0, max_equity - current_equity)
@@ -2513,15 +2551,24 @@ class TradingSystemReal:
                 # ✅ MELHORIA: Atualiza estatísticas de performance COM VALIDAÇÃO INTELIGENTE
                 try:
                     # Busca trades realizados do MT5 (últimos 30 dias)
-                    data_inicio = datetime.now() - timedelta(days=30)
-                    data_fim = datetime.now()
-                    trades_reais = self.obter_historico_trades_real(data_inicio, data_fim)
+                    cache = self._historico_deals()
+                    if cache is not None:
+                        # Cache incremental: só os deals novos vêm do MT5 e as estatísticas já estão acumuladas
+                        cache.atualizar()
+                        trades_reais = cache.trades()
+                        estatisticas = cache.estatisticas()
+                    else:
+                        data_inicio = datetime.now() - timedelta(days=30)
+                        data_fim = datetime.now()
+                        trades_reais = self.obter_historico_trades_real(data_inicio, data_fim)
+                        estatisticas = None
                     
                     drawdown_trades_reais = 0.0
                     
                     if trades_reais:
                         # Calcula estatísticas de performance
-                        estatisticas = self.calcular_estatisticas_performance_real(trades_reais)
+                        if estatisticas is None:
+                            estatisticas = self.calcular_estatisticas_performance_real(trades_reais)
                         
                         # Atualiza dados_sistema com as estatísticas calculadas
                         self.dados_sistema["win_rate"] = estatisticas.get('win_rate', 0.0)
@@ -2536,7 +2583,7 @@ class TradingSystemReal:
                         drawdown_trades_pct = 0  # Não usado, mas mantido para compatibilidade
                         
                         drawdown_final, metodo_usado = self.validar_consistencia_drawdown(
-                            drawdown_equity_pct, drawdown_trades_pct, trades_reais
+                            drawdown_equity_pct, drawdown_trades_pct, trades_reais, drawdown_trades_reais
                         )
                         
                         self.dados_sistema["drawdown_max"] = drawdown_final  # Agora em R$
@@ -2884,6 +2931,13 @@ class TradingSystemReal:
             return []
             
         try:
+            # Período dentro da janela do cache incremental: sem nova busca completa nem conversão
+            cache = self._historico_deals()
+            if cache is not None:
+                cache.atualizar()
+                if cache.cobre(data_inicio):
+                    return list(cache.trades(data_inicio, data_fim))
+
             # Busca histórico de ordens do MT5
             deals = mt5.history_deals_get(data_inicio, data_fim)
             
@@ -3127,11 +3181,7 @@ class TradingSystemReal:
                         if not self.tabela_linha_operacao01.empty:
                             self.sinais_ativos = self.tabela_linha_operacao01.to_dict(orient='records')
                             self.sinais_ativos_exibicao = self.sinais_ativos.copy()
-                    if hasattr(self.sistema_integrado, 'logs') and self.sistema_integrado.logs:
-                        novos_logs = self.sistema_integrado.logs[-10:]
-                        for log in novos_logs:
-                            if log not in self.logs[-10:]:
-                                self.logs.append(log)
+                    # Logs: lidos direto do buffer do sistema integrado (logs_exibicao), sem cópia a cada ciclo
                     self.dados_sistema["execucoes"] = getattr(self.sistema_integrado, 'execucoes_totais', 0)
                     if hasattr(self.sistema_integrado, 'tabela_linha_operacao01') and not self.sistema_integrado.tabela_linha_operacao01.empty:
                         pares_count = len(self.sistema_integrado.tabela_linha_operacao01)
@@ -3190,46 +3240,59 @@ class TradingSystemReal:
             self.log("🔄 Tentando fallback para sistema básico...")
             self.executar_sistema_principal(config)
     
+    def _dados_para_publicar(self):
+        """Referências (sem cópia) dos dados exibidos pelo dashboard; tabelas vazias são publicadas como None"""
+        dados_sistema = self.dados_sistema
+        # Mesma regra de dados_sistema_exibicao, sem o log de debug a cada leitura
+        if self.modo_otimizado and self.sistema_integrado:
+            dados_integrado = getattr(self.sistema_integrado, 'dados_sistema', None)
+            if isinstance(dados_integrado, dict) and 'equity_atual' in dados_integrado:
+                dados_sistema = dados_integrado
+        dados_para_publicar = {
+            'sinais_ativos': None,
+            'tabela_linha_operacao': None,
+            'tabela_linha_operacao01': None,
+            'dados_sistema': dados_sistema,
+            'equity_historico': None,
+            'posicoes_abertas': None
+        }
+        if self.sinais_ativos_exibicao:
+            dados_para_publicar['sinais_ativos'] = self.sinais_ativos_exibicao
+        if hasattr(self.tabela_linha_operacao, 'empty') and not self.tabela_linha_operacao.empty:
+            dados_para_publicar['tabela_linha_operacao'] = self.tabela_linha_operacao
+        if hasattr(self.tabela_linha_operacao01, 'empty') and not self.tabela_linha_operacao01.empty:
+            dados_para_publicar['tabela_linha_operacao01'] = self.tabela_linha_operacao01
+        if self.equity_historico_exibicao:
+            # RegistroEquity se versiona sozinho: é publicado por referência
+            dados_para_publicar['equity_historico'] = self.equity_historico_exibicao
+        if self.posicoes_abertas_exibicao:
+            dados_para_publicar['posicoes_abertas'] = self.posicoes_abertas_exibicao
+        return dados_para_publicar
+
+    def publicar_exibicao(self):
+        """Publica o estado atual para os painéis (barato quando nada mudou) e retorna o snapshot vigente"""
+        try:
+            return self.snapshots.publicar(**self._dados_para_publicar())
+        except Exception as e:
+            # Ex.: dict alterado por outra thread durante a comparação - fica a versão anterior
+            self.log(f"⚠️ Erro ao publicar snapshot de exibição: {str(e)}")
+            return self.snapshots.atual()
+
     def sincronizar_dados_sistema(self):
         """Thread para sincronizar dados entre thread de análise e dashboard - THREAD SAFE"""
         while self.running:
             try:
                 if self.modo_otimizado:
-                    dados_sincronizados = 0
-                    dados_para_sincronizar = {
-                        'timestamp_sync': datetime.now(),
-                        'sinais_ativos': None,
-                        'tabela_linha_operacao': None,
-                        'tabela_linha_operacao01': None,
-                        'dados_sistema': None,
-                        'equity_historico': None,
-                        'posicoes_abertas': None
-                    }
-                    # 1. Coleta dados da thread de análise (self)
-                    tamanho_0 = 'N/A'
-                    tamanho_1 = 'N/A'
-                    if hasattr(self, 'sinais_ativos_exibicao') and self.sinais_ativos_exibicao:
-                        dados_para_sincronizar['sinais_ativos'] = self.sinais_ativos_exibicao.copy()
-                        dados_sincronizados += 1
-                    if hasattr(self, 'tabela_linha_operacao') and hasattr(self.tabela_linha_operacao, 'empty'):
-                        if not self.tabela_linha_operacao.empty:
-                            dados_para_sincronizar['tabela_linha_operacao'] = self.tabela_linha_operacao.copy()
-                            dados_sincronizados += 1
-                        tamanho_0 = len(self.tabela_linha_operacao) if hasattr(self.tabela_linha_operacao, '__len__') else 'N/A'
-                    if hasattr(self, 'tabela_linha_operacao01') and hasattr(self.tabela_linha_operacao01, 'empty'):
-                        if not self.tabela_linha_operacao01.empty:
-                            dados_para_sincronizar['tabela_linha_operacao01'] = self.tabela_linha_operacao01.copy()
-                            dados_sincronizados += 1
-                        tamanho_1 = len(self.tabela_linha_operacao01) if hasattr(self.tabela_linha_operacao01, '__len__') else 'N/A'
-                    if hasattr(self, 'dados_sistema'):
-                        dados_para_sincronizar['dados_sistema'] = self.dados_sistema.copy()
-                    if hasattr(self, 'equity_historico_exibicao') and self.equity_historico_exibicao:
-                        dados_para_sincronizar['equity_historico'] = self.equity_historico_exibicao.copy()
-                    if hasattr(self, 'posicoes_abertas_exibicao') and self.posicoes_abertas_exibicao:
-                        dados_para_sincronizar['posicoes_abertas'] = self.posicoes_abertas_exibicao.copy()
-                    self._dados_sincronizados = dados_para_sincronizar
-                    # Log de sincronização a cada ciclo, incluindo tamanho das tabelas
-                    self.log(f"[SYNC-THREAD] Sincronização executada: {dados_sincronizados} estruturas sincronizadas às {dados_para_sincronizar['timestamp_sync'].strftime('%H:%M:%S')} | Tabela 0: {tamanho_0} linhas | Tabela 1: {tamanho_1} linhas")
+                    # 1. Coleta referências da thread de análise (self) - sem copiar aqui
+                    dados_para_publicar = self._dados_para_publicar()
+                    tamanho_0 = len(self.tabela_linha_operacao) if hasattr(self.tabela_linha_operacao, '__len__') else 'N/A'
+                    tamanho_1 = len(self.tabela_linha_operacao01) if hasattr(self.tabela_linha_operacao01, '__len__') else 'N/A'
+                    # 2. Publica: só os campos que mudaram são copiados (e congelados); sem mudança a versão não anda
+                    versao_anterior = self.snapshots.versao
+                    snapshot = self.snapshots.publicar(**dados_para_publicar)
+                    if snapshot.versao != versao_anterior:
+                        mudaram = [campo for campo in dados_para_publicar if snapshot.versao_de(campo) == snapshot.versao]
+                        self.log(f"[SYNC-THREAD] Snapshot v{snapshot.versao} publicado às {snapshot.timestamp.strftime('%H:%M:%S')}: {', '.join(mudaram)} | Tabela 0: {tamanho_0} linhas | Tabela 1: {tamanho_1} linhas")
                 # Aguarda próximo ciclo de sincronização (2 segundos)
                 for i in range(2):
                     if not self.running:
@@ -3242,32 +3305,11 @@ class TradingSystemReal:
                         break
                     time_module.sleep(1)
     
-    def obter_dados_sincronizados(self):
-        """Obtém dados sincronizados de forma thread-safe
-        Returns:
-            dict: Dados sincronizados ou None se não houver dados recentes (< 30 segundos)
-        """
-        try:
-            if not hasattr(self, '_dados_sincronizados') or not self._dados_sincronizados:
-                return None
-            
-            # Verifica se os dados são recentes (últimos 30 segundos)
-            timestamp_sync = self._dados_sincronizados.get('timestamp_sync')
-            if timestamp_sync:
-                tempo_desde_sync = (datetime.now() - timestamp_sync).total_seconds()
-                if tempo_desde_sync > 30:
-                    return None
-            
-            return self._dados_sincronizados.copy()
-            
-        except Exception as e:
-            self.log(f"❌ Erro ao obter dados sincronizados: {str(e)}")
-            return None
-    
     def parar_sistema(self):
         """Para o sistema de trading - Versão otimizada"""
         self.running = False
         self.log("🛑 Iniciando parada do sistema...")
+        self.equity_historico.gravar()  # grava a equity do dia corrente
         
         if self.modo_otimizado:
             self.log("� Parando sistema OTIMIZADO...")
@@ -3324,11 +3366,11 @@ class TradingSystemReal:
             
             # Equity histórico
             if self.equity_historico_exibicao:
-                equity_df = pd.DataFrame(self.equity_historico_exibicao)
+                equity_df = self.equity_historico_exibicao.para_dataframe()
                 equity_df.to_excel(writer, sheet_name='Equity Histórico', index=False)
             
             # Logs
-            logs_df = pd.DataFrame({'Log': self.logs_exibicao})
+            logs_df = pd.DataFrame({'Log': list(self.logs_exibicao)})
             logs_df.to_excel(writer, sheet_name='Logs', index=False)
         
         output.seek(0)
@@ -3394,8 +3436,8 @@ backend_disponivel = garantir_backend_disponivel()
 
 # Sincroniza as tabelas do sistema com os arquivos salvos para uso nas abas
 sistema = st.session_state.trading_system
-tabela1 = carregar_tabela("tabela_linha_operacao")
-tabela2 = carregar_tabela("tabela_linha_operacao01")
+tabela1 = carregar_tabela_memorizada("tabela_linha_operacao")
+tabela2 = carregar_tabela_memorizada("tabela_linha_operacao01")
 if tabela1 is not None:
     sistema.tabela_linha_operacao = tabela1
 if tabela2 is not None:
@@ -4290,6 +4332,11 @@ def render_sidebar():
     # A análise só é iniciada/parada pelos botões de controle de análise.
     return config_final
 
+def sessao_paineis():
+    """Chave estável da sessão do navegador no cache de painéis (id(sistema) pode ser reaproveitado por outro objeto)"""
+    return st.session_state.setdefault('sessao_paineis', uuid.uuid4().hex)
+
+
 def render_status_cards():
     """Renderiza cartões de status"""
     sistema = st.session_state.trading_system
@@ -4307,87 +4354,97 @@ def render_status_cards():
                 sistema.dados_sistema['ultimo_update_status'] = datetime.now()
                 sistema.log(f"📊 Status cards atualizados automaticamente")
             
-            # DEBUG: Log dos valores para verificação
-            dados = sistema.dados_sistema
-            #sistema.log(f"🔧 DEBUG STATUS: saldo_inicial={dados.get('saldo_inicial', 0):,.2f}")
-            #sistema.log(f"🔧 DEBUG STATUS: equity_atual={dados.get('equity_atual', 0):,.2f}")
-            #sistema.log(f"🔧 DEBUG STATUS: lucro_diario={dados.get('lucro_diario', 0):,.2f}")
-            
         except Exception as e:
             sistema.log(f"❌ Erro ao atualizar dados do status: {str(e)}")
     
-    # ✅ CORREÇÃO: Usar dados_sistema_exibicao para obter dados corretos do sistema integrado ou local
-    dados = sistema.dados_sistema_exibicao
-    
-    # ✅ PROTEÇÃO CONTRA CHAVES AUSENTES: Garante que todas as chaves necessárias existam
-    dados_seguros = {
-        'pares_processados': dados.get('pares_processados', 0),
-        'execucoes': dados.get('execucoes', 0),
-        'posicoes_abertas': dados.get('posicoes_abertas', 0),
-        'equity_atual': dados.get('equity_atual', 0.0),
-        'saldo_inicial': dados.get('saldo_inicial', 0.0),
-        'lucro_diario': dados.get('lucro_diario', 0.0),
-        'win_rate': dados.get('win_rate', 0.0),
-        'sharpe_ratio': dados.get('sharpe_ratio', 0.0),
-        'drawdown_max': dados.get('drawdown_max', 0.0),
-        'ultimo_update': dados.get('ultimo_update', None)
-    }
+    # ✅ CORREÇÃO: Usar dados_sistema_exibicao (publicado no snapshot) para obter dados corretos do sistema integrado ou local
+    # Publica após a eventual atualização da conta; os valores só são reformatados quando dados_sistema muda
+    snapshot = sistema.publicar_exibicao()
+    metodo_drawdown = getattr(sistema, '_ultimo_metodo_drawdown', None)
+
+    def montar_modelo():
+        dados = snapshot.get('dados_sistema') or {}
+        
+        # ✅ PROTEÇÃO CONTRA CHAVES AUSENTES: Garante que todas as chaves necessárias existam
+        dados_seguros = {
+            'pares_processados': dados.get('pares_processados', 0),
+            'execucoes': dados.get('execucoes', 0),
+            'posicoes_abertas': dados.get('posicoes_abertas', 0),
+            'equity_atual': dados.get('equity_atual', 0.0),
+            'saldo_inicial': dados.get('saldo_inicial', 0.0),
+            'lucro_diario': dados.get('lucro_diario', 0.0),
+            'win_rate': dados.get('win_rate', 0.0),
+            'sharpe_ratio': dados.get('sharpe_ratio', 0.0),
+            'drawdown_max': dados.get('drawdown_max', 0.0),
+            'ultimo_update': dados.get('ultimo_update', None)
+        }
+        equity_delta = dados_seguros['equity_atual'] - dados_seguros['saldo_inicial'] if dados_seguros['saldo_inicial'] > 0 else 0
+        lucro_percentual = (dados_seguros['lucro_diario']/dados_seguros['saldo_inicial']*100) if dados_seguros['saldo_inicial'] > 0 else 0
+        # Determina a fonte do cálculo para o help text
+        metodo_info = f" (método: {metodo_drawdown})" if metodo_drawdown is not None else ""
+        return {
+            'pares_processados': f"{dados_seguros['pares_processados']:,}",
+            'execucoes': f"+{dados_seguros['execucoes']}",
+            'posicoes_abertas': dados_seguros['posicoes_abertas'],
+            'equity_atual': f"R$ {dados_seguros['equity_atual']:,.2f}",
+            'equity_delta': f"R$ {equity_delta:,.2f}",
+            'lucro_diario': f"R$ {dados_seguros['lucro_diario']:,.2f}",
+            'lucro_percentual': f"{lucro_percentual:.2f}%",
+            'win_rate': f"{dados_seguros['win_rate']:.1f}%",
+            'sharpe_ratio': f"{dados_seguros['sharpe_ratio']:.2f}",
+            # ✅ Drawdown Máximo: Agora em valores monetários
+            'drawdown_max': f"R$ {dados_seguros['drawdown_max']:,.2f}",  # Agora exibe em R$ ao invés de %
+            'drawdown_help': f"Maior queda monetária observada desde o pico máximo. Baseado no equity histórico da conta e trades realizados{metodo_info}",
+            'ultimo_update': dados_seguros['ultimo_update'].strftime("%H:%M:%S") if dados_seguros['ultimo_update'] else "Nunca",
+        }
+
+    modelo = memorizar('status_cards', (snapshot.versao_de('dados_sistema'), metodo_drawdown), montar_modelo,
+                       sessao=sessao_paineis())
     
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
         st.metric(
             "Pares Processados",
-            f"{dados_seguros['pares_processados']:,}",
-            delta=f"+{dados_seguros['execucoes']}"
+            modelo['pares_processados'],
+            delta=modelo['execucoes']
         )
     
     with col2:
         st.metric(
             "Posições Abertas",
-            dados_seguros['posicoes_abertas'],
+            modelo['posicoes_abertas'],
             delta=None
         )
     
     with col3:
-        equity_delta = dados_seguros['equity_atual'] - dados_seguros['saldo_inicial'] if dados_seguros['saldo_inicial'] > 0 else 0
         st.metric(
             "Equity Atual",
-            f"R$ {dados_seguros['equity_atual']:,.2f}",
-            delta=f"R$ {equity_delta:,.2f}"
+            modelo['equity_atual'],
+            delta=modelo['equity_delta']
         )
     
     with col4:
-        lucro_cor = "normal" if dados_seguros['lucro_diario'] >= 0 else "inverse"
         st.metric(
             "Lucro/Prejuízo Diário",
-            f"R$ {dados_seguros['lucro_diario']:,.2f}",
-            delta=f"{(dados_seguros['lucro_diario']/dados_seguros['saldo_inicial']*100) if dados_seguros['saldo_inicial'] > 0 else 0:.2f}%"
+            modelo['lucro_diario'],
+            delta=modelo['lucro_percentual']
         )
     
     # Segunda linha de métricas
     col5, col6, col7, col8 = st.columns(4)
     
     with col5:
-        st.metric("Win Rate", f"{dados_seguros['win_rate']:.1f}%")
+        st.metric("Win Rate", modelo['win_rate'])
     
     with col6:
-        st.metric("Sharpe Ratio", f"{dados_seguros['sharpe_ratio']:.2f}")
+        st.metric("Sharpe Ratio", modelo['sharpe_ratio'])
     
     with col7:
-        # ✅ Drawdown Máximo: Agora em valores monetários
-        drawdown_valor = dados_seguros['drawdown_max']
-        
-        # Determina a fonte do cálculo para o help text
-        if hasattr(sistema, '_ultimo_metodo_drawdown'):
-            metodo_info = f" (método: {sistema._ultimo_metodo_drawdown})"
-        else:
-            metodo_info = ""
-        
         st.metric(
             "Drawdown Máx.", 
-            f"R$ {drawdown_valor:,.2f}",  # Agora exibe em R$ ao invés de %
-            help=f"Maior queda monetária observada desde o pico máximo. Baseado no equity histórico da conta e trades realizados{metodo_info}"
+            modelo['drawdown_max'],
+            help=modelo['drawdown_help']
         )
     
     with col8:
@@ -4395,8 +4452,7 @@ def render_status_cards():
         col8_metric, col8_btn = st.columns([3, 1])
         
         with col8_metric:
-            ultimo_update = dados_seguros['ultimo_update'].strftime("%H:%M:%S") if dados_seguros['ultimo_update'] else "Nunca"
-            st.metric("Última Atualização", ultimo_update)
+            st.metric("Última Atualização", modelo['ultimo_update'])
         
         with col8_btn:
             st.markdown("<br>", unsafe_allow_html=True)  # Espaçamento para alinhar com a métrica
@@ -4466,7 +4522,8 @@ def render_equity_chart():
                 # Coleta novos dados de equity do MT5
                 equity_dados_mt5 = obter_equity_historico_mt5(sistema)
                 if equity_dados_mt5:
-                    sistema.equity_historico = equity_dados_mt5
+                    # Curva dos deals entra antes dos pontos registrados ao vivo, sem substituí-los
+                    sistema.equity_historico.semear(equity_dados_mt5)
                     sistema.dados_sistema['ultimo_update_equity'] = datetime.now()
                     sistema.log(f"� Equity atualizado automaticamente: {len(equity_dados_mt5)} pontos")
                 
@@ -4497,8 +4554,6 @@ def render_equity_chart():
             st.warning("🔌 Conecte ao MT5 para visualizar curva de equity real")
             return
     
-    df_equity = pd.DataFrame(sistema.equity_historico_exibicao)
-    
     # ✅ EXPLICAÇÃO DAS LINHAS DO GRÁFICO
     #with st.expander("💡 Como interpretar o gráfico", expanded=False):
         #col1, col2, col3 = st.columns(3)
@@ -4523,69 +4578,82 @@ def render_equity_chart():
             #- Diferença: Equity - Balance
             #- Linha pontilhada
             #""")
+
+    serie_equity = sistema.equity_historico_exibicao
+    pontos_max = get_parametro_dinamico('grafico_pontos_max', 1500)
+    metodo_reducao = get_parametro_dinamico('grafico_metodo_reducao', 'lttb')
+
+    def montar_figura():
+        # Série reduzida a no máximo ~pontos_max pontos antes de montar os traces
+        df_equity = reduzir_dataframe(serie_equity.para_dataframe(), ['equity', 'balance', 'profit'],
+                                      pontos_max, metodo_reducao, coluna_x='timestamp')
+
+        fig = go.Figure()
     
-    fig = go.Figure()
-    
-    # Linha secundária: Balance (Lucros Realizados) - COM ÁREA PREENCHIDA (primeira)
-    fig.add_trace(go.Scatter(
-        x=df_equity['timestamp'],
-        y=df_equity['balance'],
-        mode='lines',
-        name='🏦 Balance (Lucros Realizados)',
-        line=dict(color='#28a745', width=2, dash='dash'),
-        fill='tozeroy',  # Preenche área até o zero
-        fillcolor='rgba(40, 167, 69, 0.1)',  # Verde com transparência
-        hovertemplate='<b>Balance</b><br>' +
-                      'Data: %{x}<br>' + 
-                      'Valor: R$ %{y:,.2f}<extra></extra>'
-    ))
-    
-    # Linha principal: Equity (Patrimônio Total) - COM ÁREA PREENCHIDA (segunda)
-    fig.add_trace(go.Scatter(
-        x=df_equity['timestamp'],
-        y=df_equity['equity'],
-        mode='lines+markers',
-        name='💰 Equity (Patrimônio Total)',
-        line=dict(color='#2980b9', width=3),
-        marker=dict(size=5),
-        fill='tonexty',  # Preenche área até o trace anterior (Balance)
-        fillcolor='rgba(41, 128, 185, 0.1)',  # Azul com transparência
-        hovertemplate='<b>Equity</b><br>' +
-                      'Data: %{x}<br>' + 
-                      'Valor: R$ %{y:,.2f}<extra></extra>'
-    ))
-    
-    # Linha de Profit (diferença entre Equity e Balance)
-    if 'profit' in df_equity.columns:
+        # Linha secundária: Balance (Lucros Realizados) - COM ÁREA PREENCHIDA (primeira)
         fig.add_trace(go.Scatter(
             x=df_equity['timestamp'],
-            y=df_equity['profit'],
+            y=df_equity['balance'],
             mode='lines',
-            name='📊 Profit (Posições Abertas)',
-            line=dict(color='#e74c3c', width=1, dash='dot'),
-            hovertemplate='<b>Profit</b><br>' +
+            name='🏦 Balance (Lucros Realizados)',
+            line=dict(color='#28a745', width=2, dash='dash'),
+            fill='tozeroy',  # Preenche área até o zero
+            fillcolor='rgba(40, 167, 69, 0.1)',  # Verde com transparência
+            hovertemplate='<b>Balance</b><br>' +
+                          'Data: %{x}<br>' + 
+                          'Valor: R$ %{y:,.2f}<extra></extra>'
+        ))
+    
+        # Linha principal: Equity (Patrimônio Total) - COM ÁREA PREENCHIDA (segunda)
+        fig.add_trace(go.Scatter(
+            x=df_equity['timestamp'],
+            y=df_equity['equity'],
+            mode='lines+markers',
+            name='💰 Equity (Patrimônio Total)',
+            line=dict(color='#2980b9', width=3),
+            marker=dict(size=5),
+            fill='tonexty',  # Preenche área até o trace anterior (Balance)
+            fillcolor='rgba(41, 128, 185, 0.1)',  # Azul com transparência
+            hovertemplate='<b>Equity</b><br>' +
                           'Data: %{x}<br>' + 
-                          'Valor: R$ %{y:+,.2f}<extra></extra>'
+                          'Valor: R$ %{y:,.2f}<extra></extra>'
         ))
     
-    fig.update_layout(
-        title="📈 Curva de Equity - Patrimônio vs Lucros Realizados",
-        xaxis_title="🔵 Patrimônio Líquido  | 🟢 Saldo  |  " \
-        "🔴 Profit ",
-        yaxis_title="💵 Valor (R$)",
-        hovermode='x unified',
-        showlegend=False,  # Remove legenda lateral
-        height=400,
-        template="plotly_white",
-        # Configurações do eixo X para melhor visualização das legendas
-        xaxis=dict(
-            title=dict(
-                text="🔵 Patrimônio Líquido  | 🟢 Saldo  | 🔴 Profit ",
-                font=dict(size=12, color='white')  # Cor branca para a legenda
+        # Linha de Profit (diferença entre Equity e Balance)
+        if 'profit' in df_equity.columns:
+            fig.add_trace(go.Scatter(
+                x=df_equity['timestamp'],
+                y=df_equity['profit'],
+                mode='lines',
+                name='📊 Profit (Posições Abertas)',
+                line=dict(color='#e74c3c', width=1, dash='dot'),
+                hovertemplate='<b>Profit</b><br>' +
+                              'Data: %{x}<br>' + 
+                              'Valor: R$ %{y:+,.2f}<extra></extra>'
+            ))
+    
+        fig.update_layout(
+            title="📈 Curva de Equity - Patrimônio vs Lucros Realizados",
+            xaxis_title="🔵 Patrimônio Líquido  | 🟢 Saldo  |  " \
+            "🔴 Profit ",
+            yaxis_title="💵 Valor (R$)",
+            hovermode='x unified',
+            showlegend=False,  # Remove legenda lateral
+            height=400,
+            template="plotly_white",
+            # Configurações do eixo X para melhor visualização das legendas
+            xaxis=dict(
+                title=dict(
+                    text="🔵 Patrimônio Líquido  | 🟢 Saldo  | 🔴 Profit ",
+                    font=dict(size=12, color='white')  # Cor branca para a legenda
+                )
             )
         )
-    )
-    
+        return fig
+
+    # Figura reaproveitada entre reruns enquanto a série não muda
+    fig = obter_cache_figuras().obter('equity', (id(serie_equity), getattr(serie_equity, 'versao', None),
+                                                 pontos_max, metodo_reducao), montar_figura)
     st.plotly_chart(fig, use_container_width=True)
 
 def render_positions_table():
@@ -4651,48 +4719,12 @@ def render_positions_table():
     # ==================================================================================
     # FUNÇÃO AUXILIAR PARA BUSCAR ID DO PAR
     # ==================================================================================
+    # Índice reaproveitado entre reruns enquanto as tabelas de seleção não mudam (versões do snapshot)
+    indice_ids = indice_ids_pares(sistema.snapshots.atual(), sessao=sessao_paineis(), log=sistema.log)
+
     def buscar_id_par(symbol, magic_number=None):
-        """Busca o ID do par na tabela_linha_operacao01 baseado no símbolo e magic number"""
-        try:
-            # Prioridade 1: Busca na tabela_linha_operacao01 (segunda seleção)
-            if hasattr(sistema, 'tabela_linha_operacao01') and isinstance(sistema.tabela_linha_operacao01, pd.DataFrame) and not sistema.tabela_linha_operacao01.empty:
-                # Busca por símbolo que contenha o symbol
-                mask_dep = sistema.tabela_linha_operacao01['Dependente'].str.contains(symbol, na=False)
-                mask_ind = sistema.tabela_linha_operacao01['Independente'].str.contains(symbol, na=False)
-                
-                registro_encontrado = sistema.tabela_linha_operacao01[mask_dep | mask_ind]
-                
-                if not registro_encontrado.empty:
-                    # Se há magic number, tenta encontrar correspondência exata
-                    if magic_number:
-                        registro_magic = registro_encontrado[registro_encontrado['ID'] == magic_number]
-                        if not registro_magic.empty:
-                            return registro_magic.iloc[0]['ID']
-                    
-                    # Retorna o primeiro ID encontrado
-                    return registro_encontrado.iloc[0]['ID']
-            
-            # Prioridade 2: Busca na tabela_linha_operacao (primeira seleção)
-            if hasattr(sistema, 'tabela_linha_operacao') and isinstance(sistema.tabela_linha_operacao, pd.DataFrame) and not sistema.tabela_linha_operacao.empty:
-                mask_dep = sistema.tabela_linha_operacao['Dependente'].str.contains(symbol, na=False)
-                mask_ind = sistema.tabela_linha_operacao['Independente'].str.contains(symbol, na=False)
-                
-                registro_encontrado = sistema.tabela_linha_operacao[mask_dep | mask_ind]
-                
-                if not registro_encontrado.empty:
-                    if magic_number:
-                        registro_magic = registro_encontrado[registro_encontrado['ID'] == magic_number]
-                        if not registro_magic.empty:
-                            return registro_magic.iloc[0]['ID']
-                    
-                    return registro_encontrado.iloc[0]['ID']
-            
-            # Fallback: Retorna o magic number se disponível, senão "N/A"
-            return magic_number if magic_number else "N/A"
-            
-        except Exception as e:
-            sistema.log(f"❌ Erro ao buscar ID do par para {symbol}: {str(e)}")
-            return magic_number if magic_number else "N/A"
+        """Busca o ID do par na tabela_linha_operacao01 (depois na tabela_linha_operacao) pelo símbolo e magic number"""
+        return indice_ids.por_simbolo(symbol, magic_number)
     
     # ==================================================================================
     # NOVA FUNCIONALIDADE: DUAS TABELAS LADO A LADO
@@ -4990,47 +5022,8 @@ def render_signals_table():
     # FUNÇÃO AUXILIAR PARA BUSCAR ID DO PAR NOS SINAIS
     # ==================================================================================
     def buscar_id_par_sinal(par_string, sistema):
-        """Busca o ID do par na tabela_linha_operacao01 baseado na string do par"""
-        try:
-            if not par_string or '/' not in par_string:
-                return "N/A"
-            
-            # Extrai dependente e independente do par
-            dependente, independente = par_string.split('/')[:2]
-            
-            # Prioridade 1: Busca na tabela_linha_operacao01 (segunda seleção)
-            if hasattr(sistema, 'tabela_linha_operacao01') and isinstance(sistema.tabela_linha_operacao01, pd.DataFrame) and not sistema.tabela_linha_operacao01.empty:
-                # Busca correspondência exata
-                mask = (sistema.tabela_linha_operacao01['Dependente'] == dependente) & \
-                       (sistema.tabela_linha_operacao01['Independente'] == independente)
-                
-                registro_encontrado = sistema.tabela_linha_operacao01[mask]
-                
-                if not registro_encontrado.empty:
-                    return registro_encontrado.iloc[0]['ID']
-                
-                # Busca alternativa por conteúdo
-                mask_dep = sistema.tabela_linha_operacao01['Dependente'].str.contains(dependente, na=False)
-                mask_ind = sistema.tabela_linha_operacao01['Independente'].str.contains(independente, na=False)
-                
-                registro_alt = sistema.tabela_linha_operacao01[mask_dep & mask_ind]
-                if not registro_alt.empty:
-                    return registro_alt.iloc[0]['ID']
-            
-            # Prioridade 2: Busca na tabela_linha_operacao (primeira seleção)
-            if hasattr(sistema, 'tabela_linha_operacao') and isinstance(sistema.tabela_linha_operacao, pd.DataFrame) and not sistema.tabela_linha_operacao.empty:
-                mask = (sistema.tabela_linha_operacao['Dependente'] == dependente) & \
-                       (sistema.tabela_linha_operacao['Independente'] == independente)
-                
-                registro_encontrado = sistema.tabela_linha_operacao[mask]
-                if not registro_encontrado.empty:
-                    return registro_encontrado.iloc[0]['ID']
-            
-            return "N/A"
-            
-        except Exception as e:
-            sistema.log(f"❌ Erro ao buscar ID do par para {par_string}: {str(e)}")
-            return "N/A"
+        """Busca o ID do par na tabela_linha_operacao01 baseado na string do par (memorizado por versão das tabelas)"""
+        return indice_ids_pares(sistema.snapshots.atual(), sessao=sessao_paineis(), log=sistema.log).por_par_string(par_string)
     
     sistema = st.session_state.trading_system
     # ========================================================================
@@ -5072,9 +5065,14 @@ def render_signals_table():
     # PROCESSAMENTO DE DADOS SIMPLES - PRIORIDADE ABSOLUTA PARA DADOS REAIS
     # ========================================================================
     # Exibição explícita conforme exemplo do usuário
-    if sistema.tabela_linha_operacao is not None and not sistema.tabela_linha_operacao.empty:
+    # Tabela do snapshot, convertida para exibição só quando a versão dela muda
+    snapshot = sistema.snapshots.atual()
+    tabela = snapshot.get('tabela_linha_operacao')
+    if tabela is not None and not tabela.empty:
         st.markdown("### Sinais e Posições (Primeira Seleção)")
-        st.dataframe(sistema.tabela_linha_operacao, use_container_width=True, hide_index=True, height=400)
+        tabela_pronta = memorizar('sinais', snapshot.versao_de('tabela_linha_operacao'), lambda: tabela_exibicao(tabela),
+                                  sessao=sessao_paineis())
+        st.dataframe(tabela_pronta, use_container_width=True, hide_index=True, height=400)
     else:
         st.warning("Nenhum sinal disponível na primeira seleção.")
     return
@@ -5104,6 +5102,19 @@ def render_profit_distribution():
             data_inicio = datetime.now() - timedelta(days=30)
             data_fim = datetime.now()
             
+            # Figura reaproveitada enquanto o histórico de deals não muda - consultada antes de
+            # montar a lista de trades, que só é necessária para refazer a figura
+            cache_deals = sistema._historico_deals()
+            versao_figura = None
+            if cache_deals is not None:
+                cache_deals.atualizar()
+                versao_figura = (id(cache_deals), cache_deals.versao, data_inicio.date())
+            fig = obter_cache_figuras().buscar('distribuicao_resultados', versao_figura)
+            if fig is not None:
+                st.plotly_chart(fig, use_container_width=True)
+                sistema._dados_reais_carregados = True
+                return
+            
             trades_reais = sistema.obter_historico_trades_real(data_inicio, data_fim)
             
             # Debug temporário
@@ -5199,6 +5210,7 @@ def render_profit_distribution():
                         )
                     )
                     
+                    obter_cache_figuras().guardar('distribuicao_resultados', versao_figura, fig)
                     st.plotly_chart(fig, use_container_width=True)
                     
                     # Exibe métricas resumidas
@@ -5275,10 +5287,13 @@ def render_trade_history():
             dt_inicio = datetime.combine(data_inicio, datetime_time.min)
             dt_fim = datetime.combine(data_fim, datetime_time.max)
             
-            # Busca trades reais do MT5
-            trades_reais = sistema.obter_historico_trades_real(dt_inicio, dt_fim)
-            
-            if trades_reais and len(trades_reais) > 0:
+            linhas_max = get_parametro_dinamico('historico_linhas_max', 500)
+
+            def montar_modelo():
+                # Busca trades reais do MT5
+                trades_reais = sistema.obter_historico_trades_real(dt_inicio, dt_fim)
+                if not trades_reais:
+                    return {'trades': 0}
                 df_trades = pd.DataFrame(trades_reais)
                 
                 # Aplica filtros
@@ -5289,80 +5304,106 @@ def render_trade_history():
                 
                 # Formata colunas para exibição
                 df_display = df_trades.copy()
-                if not df_display.empty:
-                    # Formata data
-                    df_display['Data'] = df_display['Data'].dt.strftime('%d/%m/%Y %H:%M')
-                    
-                    # Formata valores monetários
-                    df_display['Preço'] = df_display['Preço'].apply(lambda x: f"R$ {x:.2f}")
-                    df_display['Lucro'] = df_display['Lucro'].apply(lambda x: f"R$ {x:.2f}")
-                    if 'Comissão' in df_display.columns:
-                        df_display['Comissão'] = df_display['Comissão'].apply(lambda x: f"R$ {x:.2f}")
-                    if 'Swap' in df_display.columns:
-                        df_display['Swap'] = df_display['Swap'].apply(lambda x: f"R$ {x:.2f}")
-                    
-                    # Seleciona colunas relevantes para exibição
-                    cols_exibir = ['Ticket', 'Par', 'Tipo', 'Data', 'Volume', 'Preço', 'Lucro']
-                    if 'Comissão' in df_display.columns:
-                        cols_exibir.append('Comissão')
-                    if 'Comentário' in df_display.columns:
-                        cols_exibir.append('Comentário')
-                    
-                    df_display = df_display[cols_exibir]
-                    
-                    # ESTATÍSTICAS PRIMEIRO - Calcula e exibe estatísticas reais ANTES da tabela
-                    estatisticas = sistema.calcular_estatisticas_performance_real(trades_reais)
-                    
-                    #st.markdown("### 📊 Estatísticas do Período (Dados Reais)")
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    with col1:
-                        st.metric("Total Trades", estatisticas['total_trades'])
-                    
-                    with col2:
-                        st.metric("Win Rate", f"{estatisticas['win_rate']:.1f}%")
-                    
-                    with col3:
-                        st.metric("Resultado Total", f"R$ {estatisticas['resultado_total']:,.2f}")
-                    
-                    with col4:
-                        st.metric("Resultado Médio", f"R$ {estatisticas['resultado_medio']:.2f}")
-                    
-                    # Segunda linha de estatísticas
-                    col5, col6, col7, col8 = st.columns(4)
-                    
-                    with col5:
-                        st.metric("Melhor Trade", f"R$ {estatisticas['melhor_trade']:,.2f}")
-                    
-                    with col6:
-                        st.metric("Pior Trade", f"R$ {estatisticas['pior_trade']:,.2f}")
-                    
-                    with col7:
-                        st.metric("Profit Factor", f"{estatisticas['profit_factor']:.2f}")
-                    
-                    with col8:
-                        st.metric("Max Drawdown", f"{estatisticas['max_drawdown']:.2f}%")
-                    
-                    #st.success(f"✅ Estatísticas baseadas em {len(trades_reais)} trades reais do MT5")
-                    
-                    st.markdown("---")
-                    
-                    # TABELA DEPOIS - Exibe tabela APÓS as estatísticas
-                    #st.markdown("### 📋 Detalhamento dos Trades")
-                    st.dataframe(
-                        df_display,
-                        use_container_width=True,
-                        hide_index=True
-                    )
-                    
-                    st.success(f"✅ {len(trades_reais)} trades REAIS exibidos com estatísticas completas")
-                    return  # Sai da função - dados reais exibidos com sucesso
-                else:
-                    st.info(f"📊 Nenhum trade REAL encontrado no período com filtro '{filtro_resultado}'")
-                    return
-            else:
+                if df_display.empty:
+                    return {'trades': len(trades_reais), 'tabela': None}
+                
+                # Formata data
+                df_display['Data'] = df_display['Data'].dt.strftime('%d/%m/%Y %H:%M')
+                
+                # Formata valores monetários
+                df_display['Preço'] = df_display['Preço'].apply(lambda x: f"R$ {x:.2f}")
+                df_display['Lucro'] = df_display['Lucro'].apply(lambda x: f"R$ {x:.2f}")
+                if 'Comissão' in df_display.columns:
+                    df_display['Comissão'] = df_display['Comissão'].apply(lambda x: f"R$ {x:.2f}")
+                if 'Swap' in df_display.columns:
+                    df_display['Swap'] = df_display['Swap'].apply(lambda x: f"R$ {x:.2f}")
+                
+                # Seleciona colunas relevantes para exibição
+                cols_exibir = ['Ticket', 'Par', 'Tipo', 'Data', 'Volume', 'Preço', 'Lucro']
+                if 'Comissão' in df_display.columns:
+                    cols_exibir.append('Comissão')
+                if 'Comentário' in df_display.columns:
+                    cols_exibir.append('Comentário')
+                
+                df_display = df_display[cols_exibir]
+                
+                # Payload limitado: estatísticas sobre todos os trades, tabela só com os mais recentes
+                linhas_total = len(df_display)
+                if linhas_total > linhas_max:
+                    df_display = df_display.tail(linhas_max)
+                return {
+                    'trades': len(trades_reais),
+                    'estatisticas': sistema.calcular_estatisticas_performance_real(trades_reais),
+                    'tabela': tabela_exibicao(df_display),
+                    'linhas_total': linhas_total,
+                }
+
+            # Modelo reaproveitado enquanto o histórico de deals e os filtros não mudam
+            cache_deals = sistema._historico_deals()
+            versao_modelo = None
+            if cache_deals is not None:
+                cache_deals.atualizar()
+                versao_modelo = (id(cache_deals), cache_deals.versao)
+            modelo = memorizar('historico_trades', versao_modelo, montar_modelo, sessao=sessao_paineis(),
+                               data_inicio=data_inicio, data_fim=data_fim, resultado=filtro_resultado,
+                               linhas_max=linhas_max)
+            
+            if not modelo['trades']:
                 st.info("📊 Nenhum trade REAL encontrado no período selecionado")
                 return
+            if modelo['tabela'] is None:
+                st.info(f"📊 Nenhum trade REAL encontrado no período com filtro '{filtro_resultado}'")
+                return
+            
+            # ESTATÍSTICAS PRIMEIRO - Calcula e exibe estatísticas reais ANTES da tabela
+            estatisticas = modelo['estatisticas']
+            
+            #st.markdown("### 📊 Estatísticas do Período (Dados Reais)")
+            col1, col2, col3, col4 = st.columns(4)
+            
+            with col1:
+                st.metric("Total Trades", estatisticas['total_trades'])
+            
+            with col2:
+                st.metric("Win Rate", f"{estatisticas['win_rate']:.1f}%")
+            
+            with col3:
+                st.metric("Resultado Total", f"R$ {estatisticas['resultado_total']:,.2f}")
+            
+            with col4:
+                st.metric("Resultado Médio", f"R$ {estatisticas['resultado_medio']:.2f}")
+            
+            # Segunda linha de estatísticas
+            col5, col6, col7, col8 = st.columns(4)
+            
+            with col5:
+                st.metric("Melhor Trade", f"R$ {estatisticas['melhor_trade']:,.2f}")
+            
+            with col6:
+                st.metric("Pior Trade", f"R$ {estatisticas['pior_trade']:,.2f}")
+            
+            with col7:
+                st.metric("Profit Factor", f"{estatisticas['profit_factor']:.2f}")
+            
+            with col8:
+                st.metric("Max Drawdown", f"{estatisticas['max_drawdown']:.2f}%")
+            
+            #st.success(f"✅ Estatísticas baseadas em {len(trades_reais)} trades reais do MT5")
+            
+            st.markdown("---")
+            
+            # TABELA DEPOIS - Exibe tabela APÓS as estatísticas
+            #st.markdown("### 📋 Detalhamento dos Trades")
+            if modelo['linhas_total'] > linhas_max:
+                st.caption(f"Exibindo os {linhas_max} trades mais recentes de {modelo['linhas_total']}")
+            st.dataframe(
+                modelo['tabela'],
+                use_container_width=True,
+                hide_index=True
+            )
+            
+            st.success(f"✅ {modelo['trades']} trades REAIS exibidos com estatísticas completas")
+            return  # Sai da função - dados reais exibidos com sucesso
                 
         except Exception as e:
             sistema.log(f"❌ Erro ao buscar histórico real: {str(e)}")
@@ -5437,9 +5478,24 @@ def render_logs():
     
     #st.markdown("### 📝 Log de Eventos do Sistema")
     
+    logs = sistema.logs_exibicao
+    col_nivel, col_evento, col_texto = st.columns([1, 1, 2])
+    with col_nivel:
+        nivel = st.selectbox("Nível", ["DEBUG", "INFO", "AVISO", "ERRO"], index=1, key="logs_nivel")
+    with col_evento:
+        eventos = logs.eventos() if hasattr(logs, 'eventos') else []
+        evento = st.selectbox("Evento", ["Todos"] + eventos, key="logs_evento")
+    with col_texto:
+        texto = st.text_input("Buscar", key="logs_texto")
+
     # Container com scroll para logs
-    if sistema.logs:
-        logs_text = "\n".join(sistema.logs[-50:])  # Últimos 50 logs
+    if hasattr(logs, 'ultimos'):
+        linhas = logs.ultimos(200, nivel_minimo=nivel, texto=texto or None,
+                              evento=None if evento == "Todos" else evento)
+    else:
+        linhas = list(logs)[-50:]
+    if linhas:
+        logs_text = "\n".join(linhas)
         st.text_area(
             "Logs",
             value=logs_text,
@@ -5452,7 +5508,7 @@ def render_logs():
     
     # Botão para limpar logs
     if st.button("🗑️ Limpar Logs"):
-        sistema.logs.clear()
+        logs.clear()
         st.rerun()
 
 def render_export_section():
@@ -5489,41 +5545,9 @@ def render_segunda_selecao():
     # FUNÇÃO AUXILIAR PARA BUSCAR ID DO PAR NA SEGUNDA SELEÇÃO
     # ==================================================================================
     def buscar_id_par_segunda_selecao(dependente, independente, sistema):
-        """Busca o ID do par na tabela_linha_operacao01 baseado nos ativos"""
-        try:
-            # Prioridade 1: Busca exata na tabela_linha_operacao01 (segunda seleção)
-            if hasattr(sistema, 'tabela_linha_operacao01') and isinstance(sistema.tabela_linha_operacao01, pd.DataFrame) and not sistema.tabela_linha_operacao01.empty:
-                # Busca correspondência exata
-                mask = (sistema.tabela_linha_operacao01['Dependente'] == dependente) & \
-                       (sistema.tabela_linha_operacao01['Independente'] == independente)
-                
-                registro_encontrado = sistema.tabela_linha_operacao01[mask]
-                
-                if not registro_encontrado.empty:
-                    return registro_encontrado.iloc[0]['ID']
-                
-                # Busca alternativa por conteúdo
-                mask_dep = sistema.tabela_linha_operacao01['Dependente'].str.contains(str(dependente), na=False, case=False)
-                mask_ind = sistema.tabela_linha_operacao01['Independente'].str.contains(str(independente), na=False, case=False)
-                
-                registro_alt = sistema.tabela_linha_operacao01[mask_dep & mask_ind]
-                if not registro_alt.empty:
-                    return registro_alt.iloc[0]['ID']
-            
-            # Prioridade 2: Busca na tabela_linha_operacao (primeira seleção)
-            if hasattr(sistema, 'tabela_linha_operacao') and isinstance(sistema.tabela_linha_operacao, pd.DataFrame) and not sistema.tabela_linha_operacao.empty:
-                mask = (sistema.tabela_linha_operacao['Dependente'] == dependente) & \
-                       (sistema.tabela_linha_operacao['Independente'] == independente)
-                
-                registro_encontrado = sistema.tabela_linha_operacao[mask]
-                if not registro_encontrado.empty:
-                    return registro_encontrado.iloc[0]['ID']
-            
-            return "N/A"
-            
-        except Exception as e:
-            sistema.log(f"❌ Erro ao buscar ID do par para {dependente}/{independente}: {str(e)}")
-            return "N/A"
+        """Busca o ID do par na tabela_linha_operacao01 baseado nos ativos (memorizado por versão das tabelas)"""
+        return indice_ids_pares(sistema.snapshots.atual(), sessao=sessao_paineis(), log=sistema.log).por_par(
+            dependente, independente, ignorar_caixa=True)
     
     try:
         sistema = st.session_state.trading_system
@@ -5534,9 +5558,13 @@ def render_segunda_selecao():
         
         # DEBUG controlado pelo usuário (evita auto-refresh que causa erros DOM)
         # Exibição explícita conforme exemplo do usuário
-        if sistema.tabela_linha_operacao01 is not None and not sistema.tabela_linha_operacao01.empty:
+        snapshot = sistema.snapshots.atual()
+        tabela = snapshot.get('tabela_linha_operacao01')
+        if tabela is not None and not tabela.empty:
             st.markdown("### Pares Validados (Segunda Seleção)")
-            st.dataframe(sistema.tabela_linha_operacao01, use_container_width=True, hide_index=True, height=400)
+            tabela_pronta = memorizar('segunda_selecao', snapshot.versao_de('tabela_linha_operacao01'),
+                                      lambda: tabela_exibicao(tabela), sessao=sessao_paineis())
+            st.dataframe(tabela_pronta, use_container_width=True, hide_index=True, height=400)
         else:
             st.warning("Nenhum par validado disponível.")
         return
@@ -5624,12 +5652,15 @@ def main():
     """Função principal do dashboard"""
     # Sincroniza as tabelas do sistema com os arquivos salvos para uso nas abas
     sistema = st.session_state.trading_system
-    tabela1 = carregar_tabela("tabela_linha_operacao")
-    tabela2 = carregar_tabela("tabela_linha_operacao01")
+    # Arquivos só são relidos quando mudam (DataFrames somente leitura, compartilhados entre sessões)
+    tabela1 = carregar_tabela_memorizada("tabela_linha_operacao")
+    tabela2 = carregar_tabela_memorizada("tabela_linha_operacao01")
     if tabela1 is not None:
         sistema.tabela_linha_operacao = tabela1
     if tabela2 is not None:
         sistema.tabela_linha_operacao01 = tabela2
+    # Snapshot deste rerun: os painéis usam as versões dele como chave do cache de modelos
+    sistema.publicar_exibicao()
 
     # Header
     render_header()
@@ -5713,7 +5744,12 @@ def obter_equity_historico_mt5(sistema):
         data_inicio = data_fim - timedelta(days=7)  # Últimos 7 dias
         
         # Tenta obter o histórico de deals para reconstruir a curva de equity
-        deals = mt5.history_deals_get(data_inicio, data_fim)
+        cache = sistema._historico_deals() if hasattr(sistema, '_historico_deals') else None
+        if cache is not None:
+            cache.atualizar()
+            deals = cache.deals(desde=data_inicio, ate=data_fim, com_lucro=True)
+        else:
+            deals = mt5.history_deals_get(data_inicio, data_fim)
         
         if not deals or len(deals) == 0:
             # Se não há deals, cria um ponto com dados atuais
@@ -0,0 +1,171 @@
+"""
+Envio de Ordens Pareadas - As duas pernas preparadas juntas e enviadas em sequência imediata
+enviar_ordens_compra/enviar_ordens_venda montavam e enviavam a perna dependente, logavam, e só
+então montavam e enviavam a independente; as validações antes do envio consultavam de novo
+positions_get()/orders_get() e cada perna lia seu próprio tick. Entre uma perna e outra o preço
+andava (risco de perna) e nada media quanto. Aqui:
+
+  1. as duas requisições são montadas antes de qualquer envio, com o tick de referência das duas
+     pernas tirado do mesmo SnapshotMT5;
+  2. a validação (posição/ordem já existente no dependente, magic repetido) usa o LivroPosicoes
+     do snapshot, sem nova consulta ao terminal;
+  3. a perna independente sai logo após o retorno da dependente — entre as duas só roda o passo
+     `antes_segunda` (ex.: registro do magic, feito apenas com a dependente aceita); os logs ficam
+     para depois do envio;
+  4. cada perna registra a latência do order_send e o slippage (preço executado/referência vs.
+     preço pedido), e o par registra o intervalo entre as pernas.
+"""
+
+import threading
+import time
+from collections import deque
+
+TRADE_RETCODE_DONE = 10009      # mt5.TRADE_RETCODE_DONE
+TRADE_RETCODE_PLACED = 10008    # mt5.TRADE_RETCODE_PLACED
+HISTORICO_PADRAO = 500
+
+
+def _preco_referencia(tick, tipo_ordem):
+    """Preço de mercado que a ordem enfrentaria: ask para compras (tipos pares), bid para vendas (ímpares)."""
+    if tick is None:
+        return None
+    return tick.ask if tipo_ordem % 2 == 0 else tick.bid
+
+
+def validar_pernas(livro, dependente, magic, prefixo=None):
+    """
+    Validação pré-envio contra o livro de posições em cache.
+    Retorna (True, None) ou (False, motivo).
+    """
+    posicoes_dep = [p for p in livro.posicoes_do_simbolo(dependente)
+                    if prefixo is None or str(p.magic).startswith(str(prefixo))]
+    if posicoes_dep:
+        return False, f"já existe posição aberta para {dependente}"
+    if livro.ordens_do_simbolo(dependente):
+        return False, f"já existe ordem pendente para {dependente}"
+    if magic is not None and (livro.posicoes_do_magic(magic) or livro.ordens_do_magic(magic)):
+        return False, f"magic {magic} já em uso"
+    return True, None
+
+
+class EnvioPareado:
+    """
+    Envia pares de ordens (dependente, independente) e guarda métricas por perna.
+
+    Uso:
+        envio = EnvioPareado(enviar=enviar_ordem_mt5, retcodes_ok=(mt5.TRADE_RETCODE_DONE,))
+        resultado = envio.enviar_par(ordem_dep, ordem_ind, snapshot=snap,
+                                     antes_segunda=lambda: registro.registrar(magic, dep, ind))
+    """
+
+    def __init__(self, enviar, retcodes_ok=(TRADE_RETCODE_DONE,), historico=HISTORICO_PADRAO, log=print,
+                 relogio=time.perf_counter):
+        self.enviar = enviar
+        self.retcodes_ok = tuple(retcodes_ok)
+        self.log = log
+        self.relogio = relogio
+        self._trava = threading.Lock()
+        self.historico = deque(maxlen=historico)   # um dict por par enviado
+
+    def enviar_perna(self, request, tick=None):
+        """Envia uma requisição e devolve (resultado, métricas da perna)."""
+        referencia = _preco_referencia(tick, request.get('type', 0))
+        inicio = self.relogio()
+        try:
+            resultado = self.enviar(request)
+        except Exception as e:
+            resultado = None
+            self.log(f"[ENVIO_PAREADO] Exceção no envio de {request.get('symbol')}: {e}")
+        fim = self.relogio()
+        executado = getattr(resultado, 'price', 0.0) or None
+        pedido = request.get('price')
+        metricas = {
+            'symbol': request.get('symbol'),
+            'latencia_ms': (fim - inicio) * 1000.0,
+            'retcode': getattr(resultado, 'retcode', None),
+            'preco_pedido': pedido,
+            'preco_referencia': referencia,
+            'preco_executado': executado,
+            # Positivo = pior para a ordem (comprou mais caro / vendeu mais barato que o pedido)
+            'slippage': self._slippage(request, executado),
+            'distancia_referencia': self._slippage(request, referencia),
+            'inicio': inicio,
+            'fim': fim,
+        }
+        return resultado, metricas
+
+    @staticmethod
+    def _slippage(request, preco):
+        pedido = request.get('price')
+        if preco is None or not pedido:
+            return None
+        sinal = 1.0 if request.get('type', 0) % 2 == 0 else -1.0
+        return sinal * (preco - pedido)
+
+    def _aceita(self, resultado):
+        return resultado is not None and getattr(resultado, 'retcode', None) in self.retcodes_ok
+
+    def enviar_par(self, ordem_dep, ordem_ind, snapshot=None, antes_segunda=None):
+        """
+        Envia a perna dependente e, se aceita, a independente em seguida.
+        `antes_segunda` (opcional) roda entre as pernas — deve ser rápido (ex.: registro do magic).
+
+        Retorna dict com 'sucesso', 'falha' ('dependente'/'independente'/None), 'resultado_dep',
+        'resultado_ind', 'pernas' (métricas) e 'intervalo_pernas_ms'.
+        """
+        tick_dep = snapshot.tick(ordem_dep['symbol']) if snapshot is not None else None
+        tick_ind = snapshot.tick(ordem_ind['symbol']) if snapshot is not None else None
+
+        resultado_dep, metricas_dep = self.enviar_perna(ordem_dep, tick_dep)
+        par = {'sucesso': False, 'falha': 'dependente', 'resultado_dep': resultado_dep, 'resultado_ind': None,
+               'pernas': [metricas_dep], 'intervalo_pernas_ms': None,
+               'versao_snapshot': getattr(snapshot, 'versao', None)}
+        if self._aceita(resultado_dep):
+            if antes_segunda is not None:
+                try:
+                    antes_segunda()
+                except Exception as e:
+                    self.log(f"[ENVIO_PAREADO] Falha no passo entre pernas: {e}")
+            resultado_ind, metricas_ind = self.enviar_perna(ordem_ind, tick_ind)
+            par['resultado_ind'] = resultado_ind
+            par['pernas'].append(metricas_ind)
+            par['intervalo_pernas_ms'] = (metricas_ind['inicio'] - metricas_dep['fim']) * 1000.0
+            par['sucesso'] = self._aceita(resultado_ind)
+            par['falha'] = None if par['sucesso'] else 'independente'
+        with self._trava:
+            self.historico.append(par)
+        return par
+
+    def resumo(self):
+        """Médias e p95 de latência por perna, intervalo entre pernas e slippage dos últimos pares."""
+        with self._trava:
+            pares = list(self.historico)
+
+        def estatistica(valores):
+            valores = sorted(v for v in valores if v is not None)
+            if not valores:
+                return {'n': 0, 'media': None, 'p95': None}
+            return {'n': len(valores), 'media': sum(valores) / len(valores),
+                    'p95': valores[min(len(valores) - 1, int(0.95 * len(valores)))]}
+
+        return {
+            'pares': len(pares),
+            'pernas_incompletas': sum(1 for p in pares if p['falha'] == 'independente'),
+            'latencia_dep_ms': estatistica(p['pernas'][0]['latencia_ms'] for p in pares),
+            'latencia_ind_ms': estatistica(p['pernas'][1]['latencia_ms'] for p in pares if len(p['pernas']) > 1),
+            'intervalo_pernas_ms': estatistica(p['intervalo_pernas_ms'] for p in pares),
+            'slippage': estatistica(m['slippage'] for p in pares for m in p['pernas']),
+        }
+
+
+def formatar_metricas_par(par):
+    """Linha de log com latência e slippage das pernas de um envio."""
+    partes = []
+    for metricas in par['pernas']:
+        texto = f"{metricas['symbol']} {metricas['latencia_ms']:.1f}ms"
+        if metricas['slippage'] is not None:
+            texto += f" slip={metricas['slippage']:+.4f}"
+        partes.append(texto)
+    if par['intervalo_pernas_ms'] is not None:
+        partes.append(f"intervalo entre pernas {par['intervalo_pernas_ms']:.1f}ms")
+    return " | ".join(partes)
@@ -0,0 +1,295 @@
+"""
+Estado Incremental de Pares - Momentos da regressão, half-life e z-score atualizados por barra
+calcular_zscore_par refazia, para cada par a cada ciclo, o OLS dep~ind, a regressão OU do
+half-life (Δresíduo sobre resíduo defasado) e a média/desvio móveis do resíduo sobre a janela
+inteira, mesmo quando só uma barra nova tinha chegado. Aqui cada (dep, ind, período) guarda
+somas prefixadas dos momentos de x = ind e y = dep (níveis e transições barra a barra); com
+elas alpha, beta, R², o coeficiente OU e a média/variância do resíduo de qualquer janela final
+saem em O(1) para qualquer (alpha, beta), sem montar a série de resíduos.
+
+Para não perder precisão nas somas acumuladas, os momentos são guardados numa base centrada
+(u = x - x0, v = y - b0·x - c0) fixada no último recálculo completo. O recálculo completo
+acontece quando a janela já rolou `rebase_barras` barras desde a base, quando o beta deriva da
+base além de `limiar_beta`, ou quando a série recebida não é continuação da guardada.
+"""
+
+import math
+import threading
+
+import numpy as np
+
+# Colunas das somas prefixadas: níveis (janela de n barras) e transições (n-1 pares de barras)
+_N, _U, _V, _UU, _UV, _VV = range(6)
+_T, _UL, _VL, _DU, _DV, _ULUL, _ULVL, _VLVL, _DUUL, _DUVL, _DVUL, _DVVL = range(6, 18)
+_COLUNAS = 18
+
+
+def _momentos(u, v):
+    """Linhas de momentos por barra (uma linha por barra; a primeira não tem transição)."""
+    f = np.zeros((len(u), _COLUNAS))
+    f[:, _N] = 1.0
+    f[:, _U] = u
+    f[:, _V] = v
+    f[:, _UU] = u * u
+    f[:, _UV] = u * v
+    f[:, _VV] = v * v
+    if len(u) > 1:
+        ul, vl = u[:-1], v[:-1]
+        du, dv = np.diff(u), np.diff(v)
+        t = f[1:]
+        t[:, _T] = 1.0
+        t[:, _UL] = ul
+        t[:, _VL] = vl
+        t[:, _DU] = du
+        t[:, _DV] = dv
+        t[:, _ULUL] = ul * ul
+        t[:, _ULVL] = ul * vl
+        t[:, _VLVL] = vl * vl
+        t[:, _DUUL] = du * ul
+        t[:, _DUVL] = du * vl
+        t[:, _DVUL] = dv * ul
+        t[:, _DVVL] = dv * vl
+    return f
+
+
+def _cov(s, n, a, b, ab):
+    """Soma dos produtos centrados (n·cov) a partir das somas."""
+    return s[ab] - s[a] * s[b] / n
+
+
+class EstadoPar:
+    """
+    Janela alinhada (índice, x, y) de um par com as somas prefixadas dos momentos.
+
+    Os buffers têm folga de `rebase_barras` barras: barras novas são anexadas em O(1) e, ao
+    encher a folga, a janela é compactada e a base refeita (custo O(n) amortizado por barra).
+    """
+
+    def __init__(self, indice, x, y, rebase_barras):
+        self.rebase_barras = max(1, int(rebase_barras))
+        self._reconstruir(np.asarray(indice), np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+
+    # ------------------------------------------------------------------ base e buffers
+    def _reconstruir(self, indice, x, y):
+        n = len(x)
+        capacidade = n + self.rebase_barras + 1
+        self.ts = np.empty(capacidade, dtype=indice.dtype)
+        self.x = np.empty(capacidade)
+        self.y = np.empty(capacidade)
+        self.acum = np.zeros((capacidade + 1, _COLUNAS))
+        self.ts[:n], self.x[:n], self.y[:n] = indice, x, y
+        self.fim = n          # barras válidas nos buffers
+        self.inicio = 0       # primeira barra da janela atual
+
+        # Base: beta e intercepto do OLS da própria janela, x centrado na média
+        self.x0 = float(x.mean())
+        xc = x - self.x0
+        sxx = float(xc @ xc)
+        self.b0 = float(xc @ (y - y.mean()) / sxx) if sxx > 0 else 0.0
+        self.c0 = float((y - self.b0 * x).mean())
+        self.acum[1:n + 1] = np.cumsum(_momentos(xc, y - self.b0 * x - self.c0), axis=0)
+        self.barras_desde_base = 0
+
+    def _uv(self, k):
+        return self.x[k] - self.x0, self.y[k] - self.b0 * self.x[k] - self.c0
+
+    def _linha(self, k):
+        """Momentos da barra k (transição a partir de k-1, se houver)."""
+        u, v = self._uv(k)
+        f = np.zeros(_COLUNAS)
+        f[_N], f[_U], f[_V], f[_UU], f[_UV], f[_VV] = 1.0, u, v, u * u, u * v, v * v
+        if k > 0:
+            ul, vl = self._uv(k - 1)
+            du, dv = u - ul, v - vl
+            f[_T], f[_UL], f[_VL], f[_DU], f[_DV] = 1.0, ul, vl, du, dv
+            f[_ULUL], f[_ULVL], f[_VLVL] = ul * ul, ul * vl, vl * vl
+            f[_DUUL], f[_DUVL], f[_DVUL], f[_DVVL] = du * ul, du * vl, dv * ul, dv * vl
+        return f
+
+    def _anexar(self, ts, x, y):
+        k = self.fim
+        self.ts[k], self.x[k], self.y[k] = ts, x, y
+        self.acum[k + 1] = self.acum[k] + self._linha(k)
+        self.fim += 1
+        self.barras_desde_base += 1
+
+    def _substituir_ultima(self, x, y):
+        k = self.fim - 1
+        self.x[k], self.y[k] = x, y
+        self.acum[k + 1] = self.acum[k] + self._linha(k)
+
+    def rebase(self):
+        """Recálculo completo a partir das barras brutas da janela atual."""
+        janela = slice(self.inicio, self.fim)
+        self._reconstruir(self.ts[janela].copy(), self.x[janela].copy(), self.y[janela].copy())
+
+    @property
+    def n(self):
+        return self.fim - self.inicio
+
+    @property
+    def indice(self):
+        return self.ts[self.inicio:self.fim]
+
+    # ------------------------------------------------------------------ atualização
+    def atualizar(self, indice, x, y):
+        """
+        Leva a janela até o fim de (indice, x, y). Retorna False quando a janela recebida não é
+        a janela guardada deslocada por barras novas (lacuna, barras revisadas, outra série)
+        ou quando a folga dos buffers acabou; nesses casos quem chama faz o recálculo completo.
+        Só as bordas são conferidas, não a janela inteira.
+        """
+        m = len(indice)
+        ultimo = self.ts[self.fim - 1]
+        # Posição da última barra conhecida na janela nova: normalmente a penúltima ou a última
+        pos = -1
+        for candidato in range(m - 1, max(-1, m - 1 - self.rebase_barras - 1), -1):
+            if indice[candidato] == ultimo:
+                pos = candidato
+                break
+            if indice[candidato] < ultimo:
+                break
+        if pos < 0:
+            return False
+        novas = m - 1 - pos
+        if self.fim + novas > len(self.x):
+            return False
+        inicio = self.fim - 1 - pos
+        if inicio < 0 or self.ts[inicio] != indice[0]:
+            return False
+        # Valores já conhecidos (exceto a última barra, que pode estar em formação) devem coincidir
+        for k in {0, max(0, pos - 1)}:
+            if k < pos and (self.x[inicio + k] != x[k] or self.y[inicio + k] != y[k]):
+                return False
+
+        if self.x[self.fim - 1] != x[pos] or self.y[self.fim - 1] != y[pos]:
+            self._substituir_ultima(x[pos], y[pos])
+        for k in range(pos + 1, m):
+            self._anexar(indice[k], x[k], y[k])
+        self.inicio = self.fim - m
+        return True
+
+    # ------------------------------------------------------------------ estatísticas
+    def _somas(self, barras):
+        """Somas de níveis das últimas `barras` barras e de transições dentro delas."""
+        s = self.acum[self.fim] - self.acum[self.fim - barras]
+        t = self.acum[self.fim] - self.acum[self.fim - barras + 1]
+        s[_T:] = t[_T:]
+        return s
+
+    def regressao(self):
+        """(alpha, beta, r2) do OLS dep~ind na janela, como sm.OLS(y, add_constant(x))."""
+        n = self.n
+        s = self._somas(n)
+        suu = _cov(s, n, _U, _U, _UU)
+        suv = _cov(s, n, _U, _V, _UV)
+        svv = _cov(s, n, _V, _V, _VV)
+        db = suv / suu if suu > 0 else 0.0
+        beta = self.b0 + db
+        # y = v + b0·u + (c0 + b0·x0)
+        media_x = self.x0 + s[_U] / n
+        media_y = s[_V] / n + self.b0 * media_x + self.c0
+        alpha = media_y - beta * media_x
+        syy = svv + 2 * self.b0 * suv + self.b0 ** 2 * suu
+        ssr = svv - db * suv
+        r2 = 1.0 - ssr / syy if syy > 0 else np.nan
+        return float(alpha), float(beta), float(r2)
+
+    def deriva_beta(self, beta):
+        """Distância relativa entre beta e a base dos momentos."""
+        return abs(beta - self.b0) / max(abs(self.b0), abs(beta), 1e-12)
+
+    def zscore(self, alpha, beta):
+        """
+        (half_life, zscore, media_movel, residuo_atual) do resíduo y - (alpha + beta·x), com as
+        mesmas regras de calcular_zscore_par: half-life pelo OLS de Δresíduo sobre o resíduo
+        defasado e z-score na janela max(20, round(half_life)) com desvio amostral.
+        """
+        n = self.n
+        db = beta - self.b0
+        k = self.c0 - alpha - db * self.x0
+        residuo_atual = float(self.y[self.fim - 1] - alpha - beta * self.x[self.fim - 1])
+
+        half_life = 0.0
+        if n >= 4:
+            s = self._somas(n)
+            t = s[_T]
+            cov_dr_rl = (_cov(s, t, _DV, _VL, _DVVL) - db * _cov(s, t, _DV, _UL, _DVUL)
+                         - db * _cov(s, t, _DU, _VL, _DUVL) + db * db * _cov(s, t, _DU, _UL, _DUUL))
+            var_rl = (_cov(s, t, _VL, _VL, _VLVL) - 2 * db * _cov(s, t, _UL, _VL, _ULVL)
+                      + db * db * _cov(s, t, _UL, _UL, _ULUL))
+            coef_ou = cov_dr_rl / var_rl if var_rl > 0 else np.nan
+            if not (coef_ou <= -1 or np.isnan(coef_ou)):
+                with np.errstate(divide='ignore'):
+                    half_life = float(np.log(2) / (-np.log(1 + coef_ou)))
+
+        if not math.isfinite(half_life):
+            return half_life, float('nan'), float('nan'), residuo_atual
+        janela = max(20, int(round(half_life)))
+        if janela > n:
+            return half_life, float('nan'), float('nan'), residuo_atual
+        s = self._somas(janela)
+        media = s[_V] / janela - db * s[_U] / janela + k
+        var = (_cov(s, janela, _V, _V, _VV) - 2 * db * _cov(s, janela, _U, _V, _UV)
+               + db * db * _cov(s, janela, _U, _U, _UU)) / (janela - 1)
+        desvio = math.sqrt(var) if var > 0 else 0.0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            zscore = float(np.float64(residuo_atual - media) / desvio)
+        return half_life, zscore, float(media), residuo_atual
+
+
+class RastreadorPares:
+    """
+    Estados incrementais por chave (ex.: (dep, ind, período)).
+
+    Parâmetros:
+      - rebase_barras: barras anexadas antes de refazer a base das somas (0 = uma janela)
+      - limiar_beta: refaz a base quando o beta usado se afasta da base mais que essa fração
+      - capacidade: número máximo de pares guardados (os mais antigos saem primeiro)
+    """
+
+    def __init__(self, rebase_barras=0, limiar_beta=0.25, capacidade=4096):
+        self.rebase_barras = rebase_barras
+        self.limiar_beta = limiar_beta
+        self.capacidade = capacidade
+        self._estados = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {'completos': 0, 'incrementais': 0, 'rebases': 0}
+
+    def __len__(self):
+        return len(self._estados)
+
+    def limpar(self):
+        with self._lock:
+            self._estados.clear()
+
+    def atualizar(self, chave, indice, x, y):
+        """Estado da chave levado até o fim da janela alinhada (indice, x = ind, y = dep)."""
+        indice = np.asarray(indice)
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        with self._lock:
+            estado = self._estados.get(chave)
+            if estado is not None and estado.barras_desde_base >= estado.rebase_barras:
+                estado = None
+            if estado is not None and estado.atualizar(indice, x, y):
+                self.estatisticas['incrementais'] += 1
+                return estado
+            estado = EstadoPar(indice, x, y, self.rebase_barras or len(x))
+            self._estados.pop(chave, None)
+            self._estados[chave] = estado
+            while len(self._estados) > self.capacidade:
+                self._estados.pop(next(iter(self._estados)))
+            self.estatisticas['completos'] += 1
+            return estado
+
+    def zscore(self, estado, alpha, beta):
+        """estado.zscore, refazendo a base antes se beta derivou além do limiar."""
+        if estado.deriva_beta(beta) > self.limiar_beta:
+            with self._lock:
+                estado.rebase()
+                self.estatisticas['rebases'] += 1
+        return estado.zscore(alpha, beta)
+
+
+rastreador_pares = RastreadorPares()
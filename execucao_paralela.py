@@ -0,0 +1,265 @@
+"""
+Execução Paralela - Pool de processos para a triagem de pares
+As séries de fechamento são publicadas uma única vez em memória compartilhada
+(multiprocessing.shared_memory); cada tarefa enviada aos processos carrega apenas
+o descritor dos blocos e a lista de pares, nunca os dados. Os resultados voltam
+na mesma ordem das tarefas, independentemente da ordem de conclusão.
+
+Cada (dep, ind, período) vai sempre para o mesmo processo (um pool de um processo por
+trabalhador, escolhido pelo crc32 da chave): o estado incremental do par (estado_pares) e o
+lag guardado do ADF (cache_lags) vivem no processo e só são reaproveitados se o par voltar
+para ele no ciclo seguinte.
+"""
+
+import atexit
+import os
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from triagem_pares import calcular_zscore_par
+
+# Pools persistentes entre ciclos (evitam o custo de subir os processos a cada análise), um processo cada
+_executores = []
+_executor_lock = threading.Lock()
+
+# Anexos à memória compartilhada mantidos em cada processo trabalhador
+_anexos_trabalhador = {}
+
+
+def resolver_num_workers(valor):
+    """0/None → número de núcleos da máquina; valores negativos deixam núcleos livres (ex.: -1)."""
+    nucleos = os.cpu_count() or 1
+    if not valor:
+        return nucleos
+    valor = int(valor)
+    if valor < 0:
+        return max(1, nucleos + valor)
+    return max(1, valor)
+
+
+class SeriesCompartilhadas:
+    """
+    Publica em memória compartilhada as séries 'raw' de uma coluna de todos os ativos.
+
+    Valores (float64) e timestamps (int64, ns) de todos os ativos ficam concatenados em dois
+    blocos; o descritor (nomes dos blocos + deslocamentos por ativo) é o único dado enviado
+    aos processos. Use como context manager para liberar os blocos ao final do ciclo.
+    """
+
+    def __init__(self, dados_preprocessados, ativos, coluna='close'):
+        valores, tempos, deslocamentos, ndiffs = [], [], {}, {}
+        inicio = 0
+        for ativo in dict.fromkeys(ativos):
+            try:
+                info = dados_preprocessados[ativo][coluna]
+                serie = info['raw']
+            except (KeyError, TypeError):
+                continue
+            if serie is None or len(serie) == 0:
+                continue
+            valores.append(pd.to_numeric(serie, errors='coerce').to_numpy(dtype=np.float64))
+            tempos.append(pd.DatetimeIndex(serie.index).asi8)
+            deslocamentos[ativo] = (inicio, inicio + len(serie))
+            ndiffs[ativo] = info.get('ndiffs', 0)
+            inicio += len(serie)
+
+        total = max(inicio, 1)
+        self._shm_valores = shared_memory.SharedMemory(create=True, size=total * 8)
+        self._shm_tempos = shared_memory.SharedMemory(create=True, size=total * 8)
+        if inicio:
+            np.ndarray(inicio, dtype=np.float64, buffer=self._shm_valores.buf)[:] = np.concatenate(valores)
+            np.ndarray(inicio, dtype=np.int64, buffer=self._shm_tempos.buf)[:] = np.concatenate(tempos)
+
+        self.descritor = {
+            'valores': self._shm_valores.name,
+            'tempos': self._shm_tempos.name,
+            'tamanho': inicio,
+            'deslocamentos': deslocamentos,
+            'ndiffs': ndiffs,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.liberar()
+        return False
+
+    def liberar(self):
+        for shm in (self._shm_valores, self._shm_tempos):
+            try:
+                shm.close()
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _series_do_descritor(descritor):
+    """(Processo trabalhador) Anexa os blocos do descritor e monta as séries por ativo."""
+    chave = descritor['valores']
+    if chave not in _anexos_trabalhador:
+        # Ciclo novo: solta os anexos do ciclo anterior antes de abrir os atuais
+        for shms, _ in _anexos_trabalhador.values():
+            for shm in shms:
+                shm.close()
+        _anexos_trabalhador.clear()
+
+        shm_valores = shared_memory.SharedMemory(name=descritor['valores'])
+        shm_tempos = shared_memory.SharedMemory(name=descritor['tempos'])
+        tamanho = descritor['tamanho']
+        valores = np.ndarray(tamanho, dtype=np.float64, buffer=shm_valores.buf)
+        tempos = np.ndarray(tamanho, dtype=np.int64, buffer=shm_tempos.buf)
+        series = {}
+        for ativo, (ini, fim) in descritor['deslocamentos'].items():
+            series[ativo] = pd.Series(valores[ini:fim], index=pd.DatetimeIndex(tempos[ini:fim]), copy=False)
+        _anexos_trabalhador[chave] = ((shm_valores, shm_tempos), series)
+    return _anexos_trabalhador[chave][1]
+
+
+def params_da_grade(alpha, beta, r2):
+    """(alpha, beta, r2) da triagem, ou None (valores ausentes/NaN) para o par refazer o OLS na própria janela."""
+    if any(valor is None or pd.isna(valor) for valor in (alpha, beta, r2)):
+        return None
+    return alpha, beta, r2
+
+
+def avaliar_lote_triagem(descritor, contexto, lote):
+    """
+    (Processo trabalhador) Executa calcular_zscore_par para um lote de tarefas.
+
+    lote: lista de (dep, ind, periodo, alpha, beta, r2); contexto: ibov, win e os kwargs de filtro.
+    Retorna a lista de resultados na ordem do lote (None para pares rejeitados ou com erro).
+    """
+    series = _series_do_descritor(descritor)
+    ndiffs = descritor['ndiffs']
+    kwargs = contexto['kwargs']
+    resultados = []
+    for dep, ind, periodo, alpha, beta, r2 in lote:
+        try:
+            resultados.append(calcular_zscore_par(
+                series, dep, ind, contexto['ibov'], contexto['win'], periodo,
+                nd_dep=ndiffs.get(dep, 0), nd_ind=ndiffs.get(ind, 0),
+                params_ols=params_da_grade(alpha, beta, r2), **kwargs
+            ))
+        except Exception as e:
+            print(f"[PARALELO] Erro no par {dep}x{ind} ({periodo}): {e}")
+            resultados.append(None)
+    return resultados
+
+
+def trabalhador_da_tarefa(dep, ind, periodo, n_workers):
+    """Processo fixo de (dep, ind, período): crc32 da chave (estável entre ciclos, ao contrário de hash())."""
+    return zlib.crc32(f"{dep}|{ind}|{periodo}".encode()) % n_workers
+
+
+def obter_executores(n_workers):
+    """Retorna os pools persistentes (um processo cada), recriando-os se o número de processos mudou."""
+    global _executores
+    with _executor_lock:
+        if len(_executores) != n_workers:
+            for executor in _executores:
+                executor.shutdown(wait=True)
+            _executores = [ProcessPoolExecutor(max_workers=1) for _ in range(n_workers)]
+        return _executores
+
+
+def encerrar_executor():
+    """Encerra os pools persistentes (chamado automaticamente na saída do processo)."""
+    global _executores
+    with _executor_lock:
+        for executor in _executores:
+            executor.shutdown(wait=True, cancel_futures=True)
+        _executores = []
+
+
+atexit.register(encerrar_executor)
+
+
+def avaliar_pares_paralelo(dados_preprocessados, tarefas, ibov, win, n_workers=0, tamanho_lote=None,
+                           **kwargs):
+    """
+    Avalia as tarefas (dep, ind, periodo, alpha, beta, r2) com calcular_zscore_par em paralelo.
+
+    Parâmetros:
+      - dados_preprocessados: saída de preprocessar_dados (usa as séries 'raw' de 'close')
+      - tarefas: lista de tuplas (dep, ind, periodo, alpha, beta, r2); alpha/beta/r2 NaN → OLS do par
+      - ibov / win: ativos de referência do alinhamento
+      - n_workers: processos (0 = todos os núcleos, -1 = todos menos um; 1 = execução serial)
+      - tamanho_lote: tarefas por envio (padrão: ~4 lotes por processo); cada lote só tem tarefas
+        de um processo (trabalhador_da_tarefa)
+      - kwargs: filtros repassados a calcular_zscore_par (thresholds, enable_*, USE_SPREAD_FORECAST...)
+
+    Gera os resultados um a um, na ordem de `tarefas` (None para pares rejeitados).
+    """
+    tarefas = list(tarefas)
+    if not tarefas:
+        return
+    n_workers = resolver_num_workers(n_workers)
+    ativos = {a for t in tarefas for a in t[:2]} | {ibov, win}
+
+    if n_workers <= 1:
+        series = {a: dados_preprocessados[a]['close']['raw'] for a in ativos}
+        for dep, ind, periodo, alpha, beta, r2 in tarefas:
+            # Mesmo tratamento de avaliar_lote_triagem: um par com erro não interrompe a triagem
+            try:
+                resultado = calcular_zscore_par(
+                    series, dep, ind, ibov, win, periodo,
+                    nd_dep=dados_preprocessados[dep]['close']['ndiffs'],
+                    nd_ind=dados_preprocessados[ind]['close']['ndiffs'],
+                    params_ols=params_da_grade(alpha, beta, r2), **kwargs
+                )
+            except Exception as e:
+                print(f"[PARALELO] Erro no par {dep}x{ind} ({periodo}): {e}")
+                resultado = None
+            yield resultado
+        return
+
+    if tamanho_lote is None:
+        tamanho_lote = max(1, -(-len(tarefas) // (n_workers * 4)))
+    # Posições das tarefas por processo, em lotes (trabalhador, posições)
+    por_trabalhador = [[] for _ in range(n_workers)]
+    for posicao, (dep, ind, periodo, *_) in enumerate(tarefas):
+        por_trabalhador[trabalhador_da_tarefa(dep, ind, periodo, n_workers)].append(posicao)
+    lotes = [(trabalhador, posicoes[k:k + tamanho_lote])
+             for trabalhador, posicoes in enumerate(por_trabalhador)
+             for k in range(0, len(posicoes), tamanho_lote)]
+    lote_da_tarefa = {}
+    for j, (_, posicoes) in enumerate(lotes):
+        for p, posicao in enumerate(posicoes):
+            lote_da_tarefa[posicao] = (j, p)
+    contexto = {'ibov': ibov, 'win': win, 'kwargs': kwargs}
+
+    with SeriesCompartilhadas(dados_preprocessados, ativos) as compartilhadas:
+        try:
+            executores = obter_executores(n_workers)
+            futuros = [executores[trabalhador].submit(avaliar_lote_triagem, compartilhadas.descritor, contexto,
+                                                      [tarefas[posicao] for posicao in posicoes])
+                       for trabalhador, posicoes in lotes]
+        except (BrokenProcessPool, OSError, RuntimeError) as e:
+            print(f"[PARALELO] Pool indisponível ({e}), executando em série.")
+            encerrar_executor()
+            yield from avaliar_pares_paralelo(dados_preprocessados, tarefas, ibov, win, n_workers=1, **kwargs)
+            return
+
+        # Consome na ordem das tarefas: resultados determinísticos, lotes liberados quando esgotados
+        resultados = {}
+        for posicao in range(len(tarefas)):
+            j, p = lote_da_tarefa[posicao]
+            if j not in resultados:
+                try:
+                    resultados[j] = futuros[j].result()
+                except BrokenProcessPool as e:
+                    print(f"[PARALELO] Pool interrompido ({e}), concluindo as tarefas restantes em série.")
+                    encerrar_executor()
+                    yield from avaliar_pares_paralelo(dados_preprocessados, tarefas[posicao:], ibov, win,
+                                                      n_workers=1, **kwargs)
+                    return
+            yield resultados[j][p]
+            if p == len(lotes[j][1]) - 1:
+                del resultados[j]
@@ -0,0 +1,188 @@
+"""
+Hedge Ratio por Filtro de Kalman - alpha/beta dinâmicos de todos os pares em uma passada
+O caminho OLS ajusta uma regressão por par e por período em calcular_residuo_zscore_timeframe
+e depois mais uma por janela deslizante no beta rotation de encontrar_linha_monitorada. Aqui o
+estado (alpha, beta) de cada par é um passeio aleatório observado por dep = alpha + beta·ind + e,
+filtrado barra a barra para todos os pares ao mesmo tempo (arrays pares x 2, covariância 2x2
+explícita): uma passada linear no número de barras no lugar das regressões em janela.
+
+Saídas por barra e par: alpha, beta, spread (erro de previsão do dep pela barra anterior),
+variância do spread e z-score = spread / desvio. O filtro parte do OLS das primeiras
+`aquecimento` barras válidas de cada par, que também dá a escala do ruído de observação e do
+ruído do estado: diagonal e proporcional a δ/(1-δ), como em Chan, mas com o intercepto na escala
+da variância residual e o beta na escala variância residual / variância de ind do par.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from triagem_pares import alinhar_series_fechamento
+
+DELTA_PADRAO = 1e-4
+AQUECIMENTO_PADRAO = 20
+
+
+def _ols_aquecimento(y, x, valido, aquecimento):
+    """
+    OLS de y ~ const + x nas primeiras `aquecimento` barras válidas de cada coluna.
+    Retorna (alpha, beta, ruido_obs, cov_por_barra (3 arrays da (XᵀX/n)⁻¹), ultima_barra_aquecimento).
+    """
+    ordem = np.cumsum(valido, axis=0)
+    no_aquecimento = valido & (ordem <= aquecimento)
+    n = no_aquecimento.sum(axis=0).astype(float)
+    xa = np.where(no_aquecimento, x, 0.0)
+    ya = np.where(no_aquecimento, y, 0.0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mx, my = xa.sum(axis=0) / n, ya.sum(axis=0) / n
+        dx = np.where(no_aquecimento, x - mx, 0.0)
+        dy = np.where(no_aquecimento, y - my, 0.0)
+        sxx = (dx * dx).sum(axis=0)
+        beta = (dx * dy).sum(axis=0) / sxx
+        alpha = my - beta * mx
+        resid = np.where(no_aquecimento, y - alpha - beta * x, 0.0)
+        ruido_obs = (resid * resid).sum(axis=0) / np.maximum(n - 2, 1)
+        # (XᵀX/n)⁻¹ de X = [1, x]: escala por barra das incertezas de alpha e beta
+        var_x = sxx / n
+        c00 = 1 + mx * mx / var_x
+        c01 = -mx / var_x
+        c11 = 1 / var_x
+    ultima = np.where(n >= aquecimento, np.argmax(ordem >= aquecimento, axis=0), len(y))
+    return alpha, beta, ruido_obs, (c00, c01, c11), ultima
+
+
+def filtrar_hedge_kalman(y, x, delta=DELTA_PADRAO, aquecimento=AQUECIMENTO_PADRAO, ruido_obs=None):
+    """
+    Filtro de Kalman do hedge ratio para vários pares de uma vez.
+
+    Parâmetros:
+      - y, x: arrays (barras x pares) do dependente e do independente; NaN = barra ausente no par
+      - delta: taxa de variação do estado por barra (maior = beta mais móvel)
+      - aquecimento: barras válidas usadas no OLS inicial de cada par (antes disso as saídas são NaN)
+      - ruido_obs: variância do ruído de observação por par (padrão: variância residual do OLS inicial)
+
+    Retorna dict de arrays (barras x pares): 'alpha', 'beta', 'spread', 'variancia', 'zscore'.
+    Em barras ausentes o estado é mantido e as saídas ficam NaN.
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    if y.ndim == 1:
+        y, x = y[:, None], x[:, None]
+    barras, pares = y.shape
+    valido = np.isfinite(y) & np.isfinite(x)
+
+    alpha, beta, ve, (c00, c01, c11), ultima = _ols_aquecimento(y, x, valido, max(3, int(aquecimento)))
+    if ruido_obs is not None:
+        ve = np.broadcast_to(np.asarray(ruido_obs, dtype=float), (pares,)).copy()
+    ativo = np.isfinite(alpha) & np.isfinite(beta) & np.isfinite(ve) & (ve > 0)
+    alpha = np.where(ativo, alpha, 0.0)
+    beta = np.where(ativo, beta, 0.0)
+    ve = np.where(ativo, ve, 1.0)
+
+    # Covariância inicial: a do OLS do aquecimento (ve·(XᵀX)⁻¹)
+    n0 = max(3, int(aquecimento))
+    escala = np.where(ativo, ve, 0.0)
+    p00, p01, p11 = (np.nan_to_num(escala * c / n0) for c in (c00, c01, c11))
+    # Ruído do estado diagonal: o da forma de (XᵀX)⁻¹ ficaria quase todo na direção em que alpha e
+    # beta se compensam e o beta quase não se moveria
+    fator = delta / (1 - delta)
+    w00 = fator * escala
+    w11 = np.nan_to_num(fator * escala * c11)
+
+    saida = {nome: np.full((barras, pares), np.nan) for nome in ('alpha', 'beta', 'spread', 'variancia', 'zscore')}
+    # Última barra do aquecimento: estado = OLS inicial
+    iniciados = np.flatnonzero(ativo & (ultima < barras))
+    saida['alpha'][ultima[iniciados], iniciados] = alpha[iniciados]
+    saida['beta'][ultima[iniciados], iniciados] = beta[iniciados]
+
+    for t in range(int(ultima.min(initial=barras)) + 1, barras):
+        atualiza = valido[t] & ativo & (t > ultima)
+        if not atualiza.any():
+            continue
+        xt = np.where(atualiza, x[t], 0.0)
+        yt = np.where(atualiza, y[t], 0.0)
+
+        # Predição: passeio aleatório
+        r00, r01, r11 = p00 + w00, p01, p11 + w11
+        # Observação F = [1, x]
+        e = yt - (alpha + beta * xt)
+        fr0 = r00 + xt * r01           # (F·R)₀
+        fr1 = r01 + xt * r11           # (F·R)₁
+        q = fr0 + xt * fr1 + ve
+        k0, k1 = fr0 / q, fr1 / q
+
+        alpha = np.where(atualiza, alpha + k0 * e, alpha)
+        beta = np.where(atualiza, beta + k1 * e, beta)
+        p00 = np.where(atualiza, r00 - k0 * fr0, p00)
+        p01 = np.where(atualiza, r01 - k0 * fr1, p01)
+        p11 = np.where(atualiza, r11 - k1 * fr1, p11)
+
+        saida['alpha'][t, atualiza] = alpha[atualiza]
+        saida['beta'][t, atualiza] = beta[atualiza]
+        saida['spread'][t, atualiza] = e[atualiza]
+        saida['variancia'][t, atualiza] = q[atualiza]
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        saida['zscore'] = saida['spread'] / np.sqrt(saida['variancia'])
+    return saida
+
+
+def hedge_kalman_pares(dados_preprocessados, pares, ativos_referencia=None, coluna='close',
+                       delta=DELTA_PADRAO, aquecimento=AQUECIMENTO_PADRAO):
+    """
+    Roda filtrar_hedge_kalman para uma lista de pares (dep, ind) sobre as séries 'raw' do preprocessamento,
+    no calendário de alinhar_series_fechamento (barras com cotação de todos os ativos_referencia).
+
+    Retorna (index, pares_validos, saida), com as colunas de saida na ordem de pares_validos.
+    """
+    ativos = list(dict.fromkeys(a for par in pares for a in par))
+    index, matriz, simbolos = alinhar_series_fechamento(dados_preprocessados, ativos, ativos_referencia, coluna)
+    coluna_de = {a: k for k, a in enumerate(simbolos)}
+    pares_validos = [(dep, ind) for dep, ind in pares if dep in coluna_de and ind in coluna_de]
+    if not pares_validos or len(index) == 0:
+        return index, pares_validos, {}
+    y = matriz[:, [coluna_de[dep] for dep, _ in pares_validos]]
+    x = matriz[:, [coluna_de[ind] for _, ind in pares_validos]]
+    return index, pares_validos, filtrar_hedge_kalman(y, x, delta=delta, aquecimento=aquecimento)
+
+
+def resumo_beta_kalman(dados_preprocessados, pares, ativos_referencia=None, delta=DELTA_PADRAO,
+                       aquecimento=AQUECIMENTO_PADRAO):
+    """
+    Beta rotation pelo Kalman para encontrar_linha_monitorada: por par (dep, ind), a trajetória do beta
+    resumida como no caminho OLS (atual, média e desvio populacional) mais alpha, beta, spread e z-score
+    da última barra.
+
+    Retorna DataFrame indexado por (Dependente, Independente) com as colunas beta_rotation,
+    beta_rotation_mean, beta_rotation_std, alpha_kalman, beta_kalman, spread_kalman e zscore_kalman.
+    """
+    index, pares_validos, saida = hedge_kalman_pares(dados_preprocessados, pares, ativos_referencia,
+                                                     delta=delta, aquecimento=aquecimento)
+    colunas = ['beta_rotation', 'beta_rotation_mean', 'beta_rotation_std',
+               'alpha_kalman', 'beta_kalman', 'spread_kalman', 'zscore_kalman']
+    indice = pd.MultiIndex.from_tuples(pares_validos, names=['Dependente', 'Independente'])
+    if not saida:
+        return pd.DataFrame(columns=colunas, index=indice)
+
+    betas = saida['beta']
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", category=RuntimeWarning)   # par sem barras após o aquecimento
+        media = np.nanmean(betas, axis=0)
+        desvio = np.nanstd(betas, axis=0)
+
+    def ultimo_valido(matriz):
+        finitos = np.isfinite(matriz)
+        pos = len(matriz) - 1 - np.argmax(finitos[::-1], axis=0)
+        valores = matriz[pos, np.arange(matriz.shape[1])]
+        return np.where(finitos.any(axis=0), valores, np.nan)
+
+    return pd.DataFrame({
+        'beta_rotation': ultimo_valido(betas),
+        'beta_rotation_mean': media,
+        'beta_rotation_std': desvio,
+        'alpha_kalman': ultimo_valido(saida['alpha']),
+        'beta_kalman': ultimo_valido(betas),
+        'spread_kalman': ultimo_valido(saida['spread']),
+        'zscore_kalman': ultimo_valido(saida['zscore']),
+    }, index=indice)
@@ -0,0 +1,351 @@
+"""
+Histórico de Deals - Cache incremental do histórico de deals do MT5 com agregados acumulados
+A cada atualização do dashboard, atualizar_account_info buscava 30 dias de deals
+(obter_historico_trades_real), convertia cada um para dict e recalculava win rate, Sharpe, profit
+factor e drawdown em calcular_estatisticas_performance_real; obter_equity_historico_mt5 buscava de
+novo 7 dias e calcular_saldo_inicial_do_dia buscava os deals do dia mais uma vez. Aqui:
+
+  1. os deals ficam guardados por ticket (em memória e num arquivo JSON por linha, só acrescentado)
+     e cada atualização pede ao terminal só os deals a partir do último horário visto (com uma
+     pequena margem para deals do mesmo segundo);
+  2. os agregados dos trades (contagens de ganho/perda, soma, média/variância por Welford, melhor/pior,
+     resultado acumulado, pico e drawdown máximo) avançam deal a deal — custo O(deals novos);
+  3. somas acumuladas de lucro por deal respondem "lucro realizado desde X" por busca binária.
+
+A janela é alinhada ao início do dia (hoje - dias): os deals que saem dela são descartados uma vez
+por dia, quando os agregados são refeitos e o arquivo é regravado. Deals que chegam fora de ordem
+também forçam o recálculo.
+"""
+
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+CAMPOS_DEAL = ('ticket', 'order', 'time', 'type', 'entry', 'magic', 'symbol', 'volume', 'price',
+               'commission', 'swap', 'profit', 'comment')
+Deal = namedtuple('Deal', CAMPOS_DEAL)
+
+DEAL_ENTRY_OUT = 1  # mt5.DEAL_ENTRY_OUT
+
+
+def deal_do_mt5(deal):
+    """Copia os campos usados de um TradeDeal do MT5 (ou objeto equivalente) para um Deal."""
+    return Deal(int(deal.ticket), int(getattr(deal, 'order', 0) or 0), int(deal.time),
+                int(getattr(deal, 'type', 0) or 0), int(getattr(deal, 'entry', 0) or 0),
+                int(getattr(deal, 'magic', 0) or 0), str(getattr(deal, 'symbol', '')),
+                float(getattr(deal, 'volume', 0.0) or 0.0), float(getattr(deal, 'price', 0.0) or 0.0),
+                float(getattr(deal, 'commission', 0.0) or 0.0), float(getattr(deal, 'swap', 0.0) or 0.0),
+                float(getattr(deal, 'profit', 0.0) or 0.0), str(getattr(deal, 'comment', '') or ''))
+
+
+def eh_trade(deal):
+    """Deals que representam resultado (mesmo critério de obter_historico_trades_real)."""
+    return deal.profit != 0 or deal.entry == DEAL_ENTRY_OUT
+
+
+def deal_para_trade(deal):
+    """Deal no formato de linha usado pelas tabelas e estatísticas do dashboard."""
+    return {
+        'Ticket': deal.ticket,
+        'Par': deal.symbol,
+        'Tipo': 'COMPRA' if deal.type == 0 else 'VENDA',
+        'Data': datetime.fromtimestamp(deal.time),
+        'Volume': deal.volume,
+        'Preço': deal.price,
+        'Comissão': deal.commission,
+        'Swap': deal.swap,
+        'Lucro': deal.profit,
+        'Comentário': deal.comment,
+        'Ordem': deal.order
+    }
+
+
+class AgregadosTrades:
+    """Estatísticas dos trades atualizadas um resultado por vez (ordem cronológica)."""
+
+    def __init__(self):
+        self.n = 0
+        self.vitorias = 0
+        self.derrotas = 0
+        self.soma_ganhos = 0.0
+        self.soma_perdas = 0.0
+        self.media = 0.0
+        self.m2 = 0.0               # soma dos quadrados dos desvios (Welford)
+        self.melhor = None
+        self.pior = None
+        self.acumulado = 0.0        # curva de resultado acumulado, começando em 0
+        self.pico = 0.0             # máximo da curva até aqui
+        self.max_drawdown = 0.0     # maior distância pico → curva, em R$
+
+    def adicionar(self, lucro):
+        self.n += 1
+        if lucro > 0:
+            self.vitorias += 1
+            self.soma_ganhos += lucro
+        elif lucro < 0:
+            self.derrotas += 1
+            self.soma_perdas += lucro
+        delta = lucro - self.media
+        self.media += delta / self.n
+        self.m2 += delta * (lucro - self.media)
+        self.melhor = lucro if self.melhor is None else max(self.melhor, lucro)
+        self.pior = lucro if self.pior is None else min(self.pior, lucro)
+        self.acumulado += lucro
+        self.pico = max(self.pico, self.acumulado)
+        self.max_drawdown = max(self.max_drawdown, self.pico - self.acumulado)
+
+    def estatisticas(self):
+        """Mesmas chaves e fórmulas de calcular_estatisticas_performance_real."""
+        if self.n == 0:
+            return {'total_trades': 0, 'win_rate': 0.0, 'resultado_total': 0.0, 'resultado_medio': 0.0,
+                    'melhor_trade': 0.0, 'pior_trade': 0.0, 'sharpe_ratio': 0.0, 'max_drawdown': 0.0,
+                    'max_drawdown_reais': 0.0, 'profit_factor': 0.0}
+        desvio = math.sqrt(max(self.m2 / self.n, 0.0))
+        total_perdas = abs(self.soma_perdas) if self.derrotas else 1
+        max_drawdown_percentual = (self.max_drawdown / self.pico * 100) if self.pico > 0 else 0
+        return {
+            'total_trades': self.n,
+            'win_rate': self.vitorias / self.n * 100,
+            'resultado_total': self.acumulado,
+            'resultado_medio': self.media,
+            'melhor_trade': self.melhor,
+            'pior_trade': self.pior,
+            'sharpe_ratio': self.media / desvio if self.n > 1 and desvio > 0 else 0,
+            'max_drawdown': min(max_drawdown_percentual, 100),
+            'max_drawdown_reais': self.max_drawdown,
+            'profit_factor': self.soma_ganhos / total_perdas if total_perdas > 0 else 0
+        }
+
+
+class CacheDeals:
+    """
+    Cache incremental de deals do MT5.
+
+    Uso:
+        cache = CacheDeals(mt5, dias=30, caminho=f"cache_deals_{login}.json")
+        cache.atualizar()                      # busca só os deals novos
+        cache.estatisticas()                   # win rate, Sharpe, drawdown... sem varrer o histórico
+        cache.trades(desde=inicio, ate=fim)    # linhas no formato do dashboard
+        cache.lucro_realizado(desde=inicio_dia)
+    """
+
+    def __init__(self, terminal, dias=30, caminho=None, margem_segundos=60, intervalo_minimo=2.0,
+                 log=print, relogio=datetime.now):
+        self.terminal = terminal
+        self.dias = dias
+        self.caminho = caminho
+        self.margem_segundos = margem_segundos
+        self.intervalo_minimo = intervalo_minimo
+        self.log = log
+        self.relogio = relogio
+        self._trava = threading.RLock()
+        self._deals = []                 # Deal em ordem (time, ticket)
+        self._chaves = []                # (time, ticket) de cada deal, para bisect
+        self._lucro_acumulado = [0.0]    # _lucro_acumulado[i] = soma dos lucros dos i primeiros deals
+        self._tickets = set()
+        self._trades = []                # linha do dashboard de cada deal que é trade
+        self._tempos_trades = []         # time de cada linha de _trades, para bisect
+        self._agregados = AgregadosTrades()
+        self._inicio_janela = None
+        self._ultima_busca = None
+        self.buscas = 0
+        self.deals_recebidos = 0
+        self.recalculos = 0
+        self.versao = 0                  # muda quando o conteúdo muda (chave do cache de figuras)
+        self._carregar()
+
+    # ------------------------------------------------------------------ janela e persistência
+    def _janela(self, agora):
+        return datetime.combine((agora - timedelta(days=self.dias)).date(), datetime.min.time())
+
+    def _carregar(self):
+        if not self.caminho:
+            return
+        por_ticket = {}
+        cobertura = None
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                for numero, linha in enumerate(f, 1):
+                    try:
+                        dados = json.loads(linha)
+                        if isinstance(dados, dict):
+                            # Cabeçalho: desde quando o arquivo tem todos os deals
+                            cobertura = dados.get('cobertura')
+                            continue
+                        deal = Deal(*dados)
+                    except Exception:
+                        # Linha incompleta (processo interrompido no meio da gravação): ignora só ela
+                        self.log(f"[CACHE_DEALS] Linha {numero} inválida em {self.caminho}, ignorada")
+                        continue
+                    por_ticket[deal.ticket] = deal
+        except FileNotFoundError:
+            return
+        except Exception as e:
+            self.log(f"[CACHE_DEALS] Arquivo {self.caminho} inválido, começando vazio: {e}")
+            return
+        self._inicio_janela = self._janela(self.relogio())
+        limite = self._inicio_janela.timestamp()
+        if cobertura is None or cobertura > limite:
+            # Arquivo não cobre a janela inteira (ex.: `dias` aumentou): busca tudo de novo
+            self.log(f"[CACHE_DEALS] {self.caminho} não cobre a janela de {self.dias} dias, recarregando do MT5")
+            self._inicio_janela = None
+            return
+        self._reconstruir([d for d in por_ticket.values() if d.time >= limite])
+        if len(self._deals) < len(por_ticket):
+            self._regravar()
+
+    def _acrescentar_arquivo(self, deals):
+        """Acrescenta os deals novos ao arquivo (O(deals novos))."""
+        if not self.caminho:
+            return
+        if not os.path.exists(self.caminho):
+            self._regravar()
+            return
+        try:
+            with open(self.caminho, 'a', encoding='utf-8') as f:
+                for deal in deals:
+                    f.write(json.dumps(list(deal), ensure_ascii=False) + "\n")
+        except Exception as e:
+            self.log(f"[CACHE_DEALS] Falha ao gravar {self.caminho}: {e}")
+
+    def _regravar(self):
+        """Regrava o arquivo só com os deals da janela (após a poda diária)."""
+        if not self.caminho:
+            return
+        temporario = self.caminho + '.tmp'
+        try:
+            with open(temporario, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'cobertura': self._inicio_janela.timestamp(), 'dias': self.dias}) + "\n")
+                for deal in self._deals:
+                    f.write(json.dumps(list(deal), ensure_ascii=False) + "\n")
+            os.replace(temporario, self.caminho)
+        except Exception as e:
+            self.log(f"[CACHE_DEALS] Falha ao gravar {self.caminho}: {e}")
+
+    # ------------------------------------------------------------------ manutenção dos índices
+    def _reconstruir(self, deals):
+        """Refaz índices e agregados do zero (poda diária ou deal fora de ordem)."""
+        self.recalculos += 1
+        self.versao += 1
+        self._deals = sorted(deals, key=lambda d: (d.time, d.ticket))
+        self._chaves = [(d.time, d.ticket) for d in self._deals]
+        self._tickets = {d.ticket for d in self._deals}
+        self._lucro_acumulado = [0.0]
+        self._trades = []
+        self._tempos_trades = []
+        self._agregados = AgregadosTrades()
+        for deal in self._deals:
+            self._acrescentar(deal)
+
+    def _acrescentar(self, deal):
+        self._lucro_acumulado.append(self._lucro_acumulado[-1] + deal.profit)
+        if eh_trade(deal):
+            self._trades.append(deal_para_trade(deal))
+            self._tempos_trades.append(deal.time)
+            self._agregados.adicionar(deal.profit)
+
+    def _incorporar(self, novos):
+        self.versao += 1
+        novos = sorted(novos, key=lambda d: (d.time, d.ticket))
+        if self._chaves and (novos[0].time, novos[0].ticket) < self._chaves[-1]:
+            self._reconstruir(self._deals + novos)
+            return
+        for deal in novos:
+            self._deals.append(deal)
+            self._chaves.append((deal.time, deal.ticket))
+            self._tickets.add(deal.ticket)
+            self._acrescentar(deal)
+
+    # ------------------------------------------------------------------ atualização
+    def atualizar(self, forcar=False):
+        """Busca no terminal os deals novos. Retorna quantos entraram no cache."""
+        with self._trava:
+            instante = time.monotonic()
+            if not forcar and self._ultima_busca is not None and instante - self._ultima_busca < self.intervalo_minimo:
+                return 0
+            agora = self.relogio()
+            janela = self._janela(agora)
+            if self._inicio_janela is None or janela > self._inicio_janela:
+                limite = janela.timestamp()
+                if self._deals and self._deals[0].time < limite:
+                    self._reconstruir([d for d in self._deals if d.time >= limite])
+                    self._regravar()
+                self._inicio_janela = janela
+
+            if self._deals:
+                desde = max(datetime.fromtimestamp(self._deals[-1].time - self.margem_segundos), janela)
+            else:
+                desde = janela
+            # Limite superior folgado: o relógio do servidor pode estar à frente do local
+            deals = self.terminal.history_deals_get(desde, agora + timedelta(days=1))
+            self._ultima_busca = instante
+            self.buscas += 1
+            if not deals:
+                return 0
+            novos = {}
+            limite = janela.timestamp()
+            for deal in deals:
+                if deal.ticket not in self._tickets and deal.time >= limite:
+                    novos[deal.ticket] = deal_do_mt5(deal)
+            if not novos:
+                return 0
+            self._incorporar(list(novos.values()))
+            self.deals_recebidos += len(novos)
+            self._acrescentar_arquivo(novos.values())
+            return len(novos)
+
+    # ------------------------------------------------------------------ consultas
+    @property
+    def inicio_janela(self):
+        return self._inicio_janela
+
+    def cobre(self, desde):
+        """True se o período a partir de `desde` está inteiro dentro da janela do cache."""
+        return self._inicio_janela is not None and desde >= self._inicio_janela
+
+    def _posicao(self, instante, lado=bisect.bisect_left):
+        if instante is None:
+            return 0 if lado is bisect.bisect_left else len(self._chaves)
+        return lado(self._chaves, (int(instante.timestamp()), -1 if lado is bisect.bisect_left else float('inf')))
+
+    def deals(self, desde=None, ate=None, com_lucro=False):
+        """Deals do período, em ordem cronológica (com_lucro=True: só os de profit != 0)."""
+        with self._trava:
+            inicio = self._posicao(desde)
+            fim = self._posicao(ate, bisect.bisect_right)
+            selecionados = self._deals[inicio:fim]
+        if com_lucro:
+            return [d for d in selecionados if d.profit != 0]
+        return selecionados
+
+    def lucro_realizado(self, desde=None, ate=None):
+        """Soma de profit dos deals do período, pelas somas acumuladas (O(log n))."""
+        with self._trava:
+            inicio = self._posicao(desde)
+            fim = self._posicao(ate, bisect.bisect_right)
+            return self._lucro_acumulado[fim] - self._lucro_acumulado[inicio], max(0, fim - inicio)
+
+    def trades(self, desde=None, ate=None):
+        """Linhas de trade (formato de obter_historico_trades_real) do período. Não alterar os dicts."""
+        with self._trava:
+            tempos = self._tempos_trades
+            inicio = bisect.bisect_left(tempos, int(desde.timestamp())) if desde is not None else 0
+            fim = bisect.bisect_right(tempos, int(ate.timestamp())) if ate is not None else len(tempos)
+            return self._trades[inicio:fim]
+
+    def estatisticas(self):
+        """Estatísticas de todos os trades da janela, a partir dos agregados acumulados."""
+        with self._trava:
+            return self._agregados.estatisticas()
+
+    @property
+    def total_trades(self):
+        return self._agregados.n
+
+    def __len__(self):
+        return len(self._deals)
@@ -0,0 +1,204 @@
+"""
+Livro de Posições - Posições e ordens indexadas por magic, símbolo e ticket + registro persistente de pares
+executar_monitoramento_real montava magics_abertas e, para cada magic, varria todas as posições
+([p for p in posicoes_abertas if p.magic == magic]); calcular_lucros_por_magic varria de novo por magic
+e, para cada perna órfã, obter_pares_configurados consultava o MT5 e reconstruía o mapa
+magic → símbolos a partir das posições vivas. Aqui o LivroPosicoes é montado uma vez por snapshot
+(dicionários por magic, símbolo e ticket, consultas O(1)) e o RegistroMagics guarda em disco o par
+(dependente, independente) de cada magic no envio das ordens, de modo que a detecção de pernas
+órfãs não precise mais inferir o par pelas posições abertas — nem depois de reiniciar o processo.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+ARQUIVO_REGISTRO_PADRAO = 'registro_magics.json'
+
+
+def _indexar(itens, campo):
+    indice = {}
+    for item in itens:
+        indice.setdefault(getattr(item, campo), []).append(item)
+    return {chave: tuple(lista) for chave, lista in indice.items()}
+
+
+class LivroPosicoes:
+    """Índices somente leitura de posições e ordens pendentes (objetos do MT5 ou equivalentes)."""
+
+    def __init__(self, posicoes=(), ordens=(), versao=None):
+        self.versao = versao
+        self.posicoes = tuple(posicoes or ())
+        self.ordens = tuple(ordens or ())
+        self._posicoes_por_magic = _indexar(self.posicoes, 'magic')
+        self._ordens_por_magic = _indexar(self.ordens, 'magic')
+        self._posicoes_por_simbolo = _indexar(self.posicoes, 'symbol')
+        self._ordens_por_simbolo = _indexar(self.ordens, 'symbol')
+        self._posicao_por_ticket = {p.ticket: p for p in self.posicoes}
+        self._ordem_por_ticket = {o.ticket: o for o in self.ordens}
+
+    @classmethod
+    def do_snapshot(cls, snapshot):
+        return cls(snapshot.posicoes, snapshot.ordens, versao=snapshot.versao)
+
+    # ------------------------------------------------------------------ consultas O(1)
+    def posicoes_do_magic(self, magic):
+        return self._posicoes_por_magic.get(magic, ())
+
+    def ordens_do_magic(self, magic):
+        return self._ordens_por_magic.get(magic, ())
+
+    def posicoes_do_simbolo(self, symbol):
+        return self._posicoes_por_simbolo.get(symbol, ())
+
+    def ordens_do_simbolo(self, symbol):
+        return self._ordens_por_simbolo.get(symbol, ())
+
+    def posicao(self, ticket):
+        return self._posicao_por_ticket.get(ticket)
+
+    def ordem(self, ticket):
+        return self._ordem_por_ticket.get(ticket)
+
+    def magics(self, prefixo=None):
+        """Magics com posição aberta (opcionalmente só os que começam com o prefixo do script)."""
+        if prefixo is None:
+            return set(self._posicoes_por_magic)
+        prefixo = str(prefixo)
+        return {m for m in self._posicoes_por_magic if str(m).startswith(prefixo)}
+
+    def simbolos_do_magic(self, magic):
+        """Símbolos distintos com posição aberta no magic, na ordem de abertura."""
+        return list(dict.fromkeys(p.symbol for p in self.posicoes_do_magic(magic)))
+
+    def pernas_orfas(self, prefixo=None):
+        """{magic: posição} dos magics do prefixo com uma única perna aberta."""
+        return {m: self._posicoes_por_magic[m][0] for m in self.magics(prefixo)
+                if len(self._posicoes_por_magic[m]) == 1}
+
+    def __len__(self):
+        return len(self.posicoes)
+
+
+def acao_perna_unica(livro, magic, ativo_aberto, dependente, independente):
+    """
+    O que fazer com um magic que tem uma única perna aberta:
+      ('converter', ordens) - dependente aberto com ordem pendente do independente: converte para mercado;
+      ('fechar', ())        - par desconhecido, independente remanescente ou dependente sem o independente
+                              (nem posição nem ordem pendente: a perna ficaria sem hedge).
+    """
+    if dependente is None or independente is None or ativo_aberto != dependente:
+        return 'fechar', ()
+    ordens_independente = tuple(o for o in livro.ordens_do_magic(magic) if o.symbol == independente)
+    if ordens_independente:
+        return 'converter', ordens_independente
+    return 'fechar', ()
+
+
+_ultimo_livro = None
+_trava_livro = threading.Lock()
+
+
+def livro_do_snapshot(snapshot):
+    """LivroPosicoes do snapshot, montado uma única vez por versão (todas as threads reaproveitam)."""
+    global _ultimo_livro
+    with _trava_livro:
+        livro = _ultimo_livro
+        if livro is None or livro.versao != snapshot.versao:
+            livro = LivroPosicoes.do_snapshot(snapshot)
+            _ultimo_livro = livro
+        return livro
+
+
+class RegistroMagics:
+    """
+    Registro persistente magic → (dependente, independente), gravado no envio das ordens.
+    Arquivo JSON escrito via .tmp + os.replace; entradas mais velhas que `dias_retencao`
+    são descartadas ao podar(), exceto as de magics ainda abertos.
+    """
+
+    def __init__(self, caminho=ARQUIVO_REGISTRO_PADRAO, dias_retencao=30, log=print):
+        self.caminho = caminho
+        self.dias_retencao = dias_retencao
+        self.log = log
+        self._trava = threading.Lock()
+        self._pares = {}
+        self._carregar()
+
+    def _carregar(self):
+        try:
+            with open(self.caminho, 'r', encoding='utf-8') as f:
+                dados = json.load(f)
+            self._pares = {int(magic): dict(valor) for magic, valor in dados.items()}
+        except FileNotFoundError:
+            self._pares = {}
+        except Exception as e:
+            self.log(f"[REGISTRO_MAGICS] Arquivo {self.caminho} inválido, começando vazio: {e}")
+            self._pares = {}
+
+    def _gravar(self):
+        temporario = self.caminho + '.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump({str(magic): valor for magic, valor in self._pares.items()}, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.caminho)
+
+    def registrar(self, magic, dependente, independente, **extras):
+        """Grava o par do magic (chamar antes/ao enviar a primeira perna)."""
+        entrada = {'dependente': dependente, 'independente': independente,
+                   'registrado': datetime.now().isoformat(timespec='seconds')}
+        entrada.update(extras)
+        with self._trava:
+            self._pares[int(magic)] = entrada
+            try:
+                self._gravar()
+            except Exception as e:
+                self.log(f"[REGISTRO_MAGICS] Falha ao gravar {self.caminho}: {e}")
+
+    def par(self, magic):
+        """(dependente, independente) do magic, ou (None, None) se nunca registrado."""
+        entrada = self._pares.get(int(magic)) if magic is not None else None
+        if entrada is None:
+            return (None, None)
+        return (entrada['dependente'], entrada['independente'])
+
+    def pares(self):
+        """Dicionário magic → (dependente, independente), no formato da variável global `pares`."""
+        with self._trava:
+            return {magic: (e['dependente'], e['independente']) for magic, e in self._pares.items()}
+
+    def remover(self, magic):
+        with self._trava:
+            if self._pares.pop(int(magic), None) is not None:
+                self._gravar()
+
+    def podar(self, magics_abertos=()):
+        """Descarta entradas antigas de magics que não estão mais abertos. Retorna quantas saíram."""
+        limite = datetime.now() - timedelta(days=self.dias_retencao)
+        abertos = {int(m) for m in magics_abertos}
+        with self._trava:
+            antigos = [m for m, e in self._pares.items()
+                       if m not in abertos and datetime.fromisoformat(e['registrado']) < limite]
+            for magic in antigos:
+                del self._pares[magic]
+            if antigos:
+                self._gravar()
+        return len(antigos)
+
+    def __contains__(self, magic):
+        return int(magic) in self._pares
+
+    def __len__(self):
+        return len(self._pares)
+
+
+_registro_padrao = None
+
+
+def obter_registro_magics(caminho=ARQUIVO_REGISTRO_PADRAO):
+    """Registro compartilhado do processo (carregado do disco na primeira chamada)."""
+    global _registro_padrao
+    with _trava_livro:
+        if _registro_padrao is None:
+            _registro_padrao = RegistroMagics(caminho)
+        return _registro_padrao
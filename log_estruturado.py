@@ -0,0 +1,346 @@
+"""
+Log Estruturado - Buffer circular de registros com nível, thread e código de evento
+SistemaIntegrado.log e TradingSystemReal.log acumulavam cada mensagem em self.logs para sempre
+(centenas de milhares de strings depois de um pregão) e salvar_relatorio gravava a lista inteira
+em cada relatório JSON. Aqui:
+
+  1. cada mensagem vira um RegistroLog (ts, nível, thread, evento, mensagem, campos) guardado num
+     deque de tamanho fixo — a memória fica constante em execuções de vários dias;
+  2. o nível e o código de evento são inferidos do texto já usado no repositório
+     ("[ERRO] ...", "❌", "⚠️", "[DEBUG] ...", "[BREAK_EVEN] ...") quando não informados;
+  3. um sink opcional grava em arquivo (uma linha JSON por registro) numa thread própria, com
+     rotação por tamanho e nível mínimo — o chamador nunca espera pelo disco;
+  4. consultar() filtra por nível, evento, texto e horário para a aba de logs do dashboard.
+
+BufferLog imita a lista antiga (len, iteração, índice/fatia, append, clear), então o código que
+lê `sistema.logs[-50:]` continua funcionando com strings formatadas.
+"""
+
+import json
+import os
+import queue
+import re
+import threading
+from collections import deque
+from datetime import datetime
+
+DEBUG, INFO, AVISO, ERRO = 10, 20, 30, 40
+NOMES_NIVEIS = {DEBUG: 'DEBUG', INFO: 'INFO', AVISO: 'AVISO', ERRO: 'ERRO'}
+NIVEIS_POR_NOME = {'DEBUG': DEBUG, 'INFO': INFO, 'AVISO': AVISO, 'WARNING': AVISO, 'ERRO': ERRO, 'ERROR': ERRO}
+
+CAPACIDADE_PADRAO = 5000
+_MARCAS_ERRO = ('❌', '🚨', '💥', '[ERRO', 'ERRO:', 'ERRO ', 'Erro ', 'Erro:', 'Exception', 'Traceback', 'FALHA', 'Falha')
+_MARCAS_AVISO = ('⚠️', '[AVISO', 'AVISO', '[WARN')
+_MARCAS_DEBUG = ('[DEBUG', 'DEBUG ', '🔍')
+_TAG = re.compile(r'^\s*(?:\[([A-Za-z][A-Za-z0-9_ \-]{1,40})\])')
+
+
+def nivel_numerico(nivel):
+    """Aceita 10/20/30/40 ou o nome ('INFO', 'AVISO', ...); desconhecido vira INFO."""
+    if isinstance(nivel, int):
+        return nivel
+    return NIVEIS_POR_NOME.get(str(nivel).upper(), INFO)
+
+
+def inferir_nivel(mensagem):
+    """Nível pelas marcas que o código já usa nas mensagens."""
+    texto = str(mensagem)
+    if any(marca in texto for marca in _MARCAS_ERRO):
+        return ERRO
+    if any(marca in texto for marca in _MARCAS_AVISO):
+        return AVISO
+    if any(marca in texto for marca in _MARCAS_DEBUG):
+        return DEBUG
+    return INFO
+
+
+def inferir_evento(mensagem):
+    """Código de evento pela primeira tag entre colchetes ("[BREAK_EVEN] ..." → 'BREAK_EVEN')."""
+    encontrado = _TAG.match(str(mensagem))
+    if not encontrado:
+        return None
+    return encontrado.group(1).strip().upper().replace(' ', '_')
+
+
+class RegistroLog:
+    """Registro imutável de log."""
+
+    __slots__ = ('seq', 'ts', 'nivel', 'thread', 'evento', 'mensagem', 'campos')
+
+    def __init__(self, seq, ts, nivel, thread, evento, mensagem, campos=None):
+        object.__setattr__(self, 'seq', seq)
+        object.__setattr__(self, 'ts', ts)
+        object.__setattr__(self, 'nivel', nivel)
+        object.__setattr__(self, 'thread', thread)
+        object.__setattr__(self, 'evento', evento)
+        object.__setattr__(self, 'mensagem', mensagem)
+        object.__setattr__(self, 'campos', campos or None)
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("RegistroLog é somente leitura")
+
+    @property
+    def nome_nivel(self):
+        return NOMES_NIVEIS.get(self.nivel, str(self.nivel))
+
+    def formatar(self, formato_hora="%Y-%m-%d %H:%M:%S"):
+        """Linha no formato antigo de self.logs: "[timestamp] mensagem"."""
+        return f"[{datetime.fromtimestamp(self.ts).strftime(formato_hora)}] {self.mensagem}"
+
+    def como_dict(self):
+        dados = {'ts': datetime.fromtimestamp(self.ts).isoformat(timespec='milliseconds'),
+                 'nivel': self.nome_nivel, 'thread': self.thread, 'evento': self.evento,
+                 'mensagem': self.mensagem}
+        if self.campos:
+            dados['campos'] = self.campos
+        return dados
+
+    def __str__(self):
+        return self.formatar()
+
+    def __eq__(self, outro):
+        if isinstance(outro, str):
+            return self.formatar() == outro
+        return isinstance(outro, RegistroLog) and outro.seq == self.seq and outro.ts == self.ts
+
+    def __hash__(self):
+        return hash((self.seq, self.ts))
+
+
+class SinkArquivoRotativo:
+    """
+    Grava registros em arquivo (JSON por linha) numa thread própria, com rotação por tamanho:
+    arquivo.log → arquivo.log.1 → ... → arquivo.log.<backups>. A fila é limitada; se o disco
+    não acompanhar, registros são descartados e contados em vez de bloquear quem loga.
+    """
+
+    def __init__(self, caminho, nivel_minimo=INFO, max_bytes=10 * 1024 * 1024, backups=5,
+                 tamanho_fila=10000, log=print):
+        self.caminho = caminho
+        self.nivel_minimo = nivel_numerico(nivel_minimo)
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.log = log
+        self.descartados = 0
+        self.gravados = 0
+        self._fila = queue.Queue(maxsize=tamanho_fila)
+        self._arquivo = None
+        self._thread = threading.Thread(target=self._loop, name="SinkLog", daemon=True)
+        self._thread.start()
+
+    def enviar(self, registro):
+        if registro.nivel < self.nivel_minimo:
+            return
+        try:
+            self._fila.put_nowait(registro)
+        except queue.Full:
+            self.descartados += 1
+
+    def _abrir(self):
+        pasta = os.path.dirname(self.caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+        self._arquivo = open(self.caminho, 'a', encoding='utf-8')
+
+    def _rotacionar(self):
+        self._arquivo.close()
+        for i in range(self.backups - 1, 0, -1):
+            origem = f"{self.caminho}.{i}"
+            if os.path.exists(origem):
+                os.replace(origem, f"{self.caminho}.{i + 1}")
+        if self.backups > 0:
+            os.replace(self.caminho, f"{self.caminho}.1")
+        else:
+            os.remove(self.caminho)
+        self._abrir()
+
+    def _gravar(self, registro):
+        if self._arquivo is None:
+            self._abrir()
+        linha = json.dumps(registro.como_dict(), ensure_ascii=False, default=str) + "\n"
+        if self.max_bytes and self._arquivo.tell() + len(linha.encode('utf-8')) > self.max_bytes \
+                and self._arquivo.tell() > 0:
+            self._rotacionar()
+        self._arquivo.write(linha)
+        self.gravados += 1
+
+    def _loop(self):
+        while True:
+            registro = self._fila.get()
+            try:
+                if registro is None:
+                    return
+                self._gravar(registro)
+                if self._fila.empty() and self._arquivo is not None:
+                    self._arquivo.flush()
+            except Exception as e:
+                self.log(f"[LOG] Falha ao gravar {self.caminho}: {e}")
+            finally:
+                self._fila.task_done()
+
+    def esvaziar(self, timeout=5.0):
+        """Espera a fila ser gravada (útil antes de salvar relatório ou encerrar)."""
+        fim = threading.Event()
+
+        def aguardar():
+            self._fila.join()
+            fim.set()
+
+        threading.Thread(target=aguardar, daemon=True).start()
+        return fim.wait(timeout)
+
+    def fechar(self, timeout=5.0):
+        if not self._thread.is_alive():
+            return
+        self._fila.put(None)
+        self._thread.join(timeout)
+        if self._arquivo is not None:
+            self._arquivo.close()
+            self._arquivo = None
+
+
+class BufferLog:
+    """
+    Buffer circular de RegistroLog com a interface da lista antiga de strings.
+
+    Uso:
+        logs = BufferLog(capacidade=5000, arquivo='logs/sistema.log', nivel_arquivo='INFO')
+        logs.registrar("[BREAK_EVEN] Stop movido", magic=20001)
+        logs.consultar(nivel_minimo='AVISO', texto='PETR4', limite=100)
+        logs[-50:]      # strings "[timestamp] mensagem", como antes
+    """
+
+    def __init__(self, capacidade=CAPACIDADE_PADRAO, arquivo=None, nivel_arquivo=INFO,
+                 max_bytes_arquivo=10 * 1024 * 1024, backups_arquivo=5, formato_hora="%Y-%m-%d %H:%M:%S",
+                 log=print):
+        self.capacidade = max(1, int(capacidade))
+        self.formato_hora = formato_hora
+        self._registros = deque(maxlen=self.capacidade)
+        self._trava = threading.Lock()
+        self._seq = 0
+        self._por_nivel = {DEBUG: 0, INFO: 0, AVISO: 0, ERRO: 0}
+        self.sink = None
+        if arquivo:
+            self.sink = SinkArquivoRotativo(arquivo, nivel_arquivo, max_bytes_arquivo, backups_arquivo, log=log)
+
+    # ------------------------------------------------------------------ escrita
+    def registrar(self, mensagem, nivel=None, evento=None, ts=None, **campos):
+        """Adiciona um registro e devolve-o. Nível/evento inferidos do texto se não informados."""
+        mensagem = str(mensagem)
+        nivel = inferir_nivel(mensagem) if nivel is None else nivel_numerico(nivel)
+        evento = inferir_evento(mensagem) if evento is None else evento
+        ts = datetime.now().timestamp() if ts is None else ts
+        thread = threading.current_thread().name
+        with self._trava:
+            self._seq += 1
+            registro = RegistroLog(self._seq, ts, nivel, thread, evento, mensagem, campos)
+            self._registros.append(registro)
+            self._por_nivel[nivel] = self._por_nivel.get(nivel, 0) + 1
+        if self.sink is not None:
+            self.sink.enviar(registro)
+        return registro
+
+    def append(self, item):
+        """Compatibilidade com a lista antiga: aceita RegistroLog ou string "[timestamp] mensagem"."""
+        if isinstance(item, RegistroLog):
+            with self._trava:
+                self._registros.append(item)
+            return
+        mensagem = str(item)
+        ts = None
+        if mensagem.startswith('['):
+            fecha = mensagem.find('] ')
+            for formato in ("%Y-%m-%d %H:%M:%S", "%H:%M:%S"):
+                try:
+                    instante = datetime.strptime(mensagem[1:fecha], formato)
+                except ValueError:
+                    continue
+                if formato == "%H:%M:%S":
+                    instante = datetime.combine(datetime.now().date(), instante.time())
+                ts, mensagem = instante.timestamp(), mensagem[fecha + 2:]
+                break
+        self.registrar(mensagem, ts=ts)
+
+    def clear(self):
+        with self._trava:
+            self._registros.clear()
+
+    # ------------------------------------------------------------------ leitura
+    def consultar(self, nivel_minimo=None, evento=None, texto=None, desde=None, limite=None, thread=None):
+        """
+        Registros (mais antigo → mais recente) que passam nos filtros; `limite` mantém os últimos N.
+        `desde` aceita datetime, timestamp ou seq (int) do último registro já exibido.
+        """
+        with self._trava:
+            registros = list(self._registros)
+        if nivel_minimo is not None:
+            minimo = nivel_numerico(nivel_minimo)
+            registros = [r for r in registros if r.nivel >= minimo]
+        if evento is not None:
+            eventos = {evento} if isinstance(evento, str) else set(evento)
+            registros = [r for r in registros if r.evento in eventos]
+        if thread is not None:
+            registros = [r for r in registros if r.thread == thread]
+        if texto:
+            texto = str(texto).lower()
+            registros = [r for r in registros if texto in r.mensagem.lower()]
+        if desde is not None:
+            if isinstance(desde, datetime):
+                registros = [r for r in registros if r.ts >= desde.timestamp()]
+            elif isinstance(desde, int):
+                registros = [r for r in registros if r.seq > desde]
+            else:
+                registros = [r for r in registros if r.ts >= desde]
+        if limite is not None:
+            registros = registros[-limite:] if limite > 0 else []
+        return registros
+
+    def ultimos(self, n=50, **filtros):
+        """Últimos N registros formatados como as linhas antigas de self.logs."""
+        return [r.formatar(self.formato_hora) for r in self.consultar(limite=n, **filtros)]
+
+    def eventos(self):
+        """Códigos de evento presentes no buffer (para o filtro da aba de logs)."""
+        with self._trava:
+            return sorted({r.evento for r in self._registros if r.evento})
+
+    @property
+    def estatisticas(self):
+        with self._trava:
+            dados = {'capacidade': self.capacidade, 'em_memoria': len(self._registros), 'total': self._seq,
+                     'por_nivel': {NOMES_NIVEIS.get(n, str(n)): c for n, c in self._por_nivel.items()}}
+        if self.sink is not None:
+            dados.update({'arquivo': self.sink.caminho, 'gravados': self.sink.gravados,
+                          'descartados_arquivo': self.sink.descartados})
+        return dados
+
+    def fechar(self):
+        if self.sink is not None:
+            self.sink.fechar()
+
+    # ------------------------------------------------------------------ interface de lista
+    def __len__(self):
+        return len(self._registros)
+
+    def __bool__(self):
+        return len(self._registros) > 0
+
+    def __iter__(self):
+        with self._trava:
+            registros = list(self._registros)
+        return iter([r.formatar(self.formato_hora) for r in registros])
+
+    def __getitem__(self, indice):
+        with self._trava:
+            if isinstance(indice, slice):
+                inicio, fim, passo = indice.indices(len(self._registros))
+                if passo == 1 and fim - inicio < len(self._registros) // 2:
+                    # fatia curta (o caso comum logs[-50:]): sem copiar o buffer inteiro
+                    registros = [self._registros[i] for i in range(inicio, fim)]
+                else:
+                    registros = list(self._registros)[indice]
+                return [r.formatar(self.formato_hora) for r in registros]
+            return self._registros[indice].formatar(self.formato_hora)
+
+    def __contains__(self, item):
+        return any(linha == item for linha in self)
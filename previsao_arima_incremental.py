@@ -0,0 +1,219 @@
+"""
+Previsão ARIMA Incremental - Walk-forward por filtragem de espaço de estados
+Ajusta o ARIMA uma única vez na janela de treino e avança o modelo ajustado uma
+observação por vez (atualização de Kalman com parâmetros fixos), gerando as
+previsões de um passo e o se_mean sem reajustar o modelo a cada barra.
+CachePrevisoesARIMA guarda essas previsões por ativo/coluna/barra para que um ativo
+presente em vários pares da segunda seleção seja previsto uma única vez.
+"""
+
+import hashlib
+import threading
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.linalg import LinAlgError
+from statsmodels.tools.sm_exceptions import ConvergenceWarning
+from statsmodels.tsa.arima.model import ARIMA
+
+
+def ajustar_arima(serie, order=(1, 1, 1), maxiter=5):
+    """Ajusta ARIMA(order) na série informada, com os mesmos avisos suprimidos do sistema original."""
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="No frequency information was provided")
+        warnings.simplefilter("ignore", category=UserWarning)
+        warnings.simplefilter("ignore", category=ConvergenceWarning)
+        warnings.simplefilter("ignore", category=FutureWarning)
+        return ARIMA(serie, order=order).fit(method_kwargs={'maxiter': maxiter})
+
+
+class FiltroARIMA:
+    """
+    Estado de Kalman de um ARIMA já ajustado.
+
+    Parte do estado previsto ao fim da amostra de treino e incorpora novas observações
+    com os parâmetros fixos; prever() devolve a mesma média e o mesmo se_mean que
+    resultado.extend(novas_obs).get_forecast(1) produziria, a uma fração do custo.
+    """
+
+    def __init__(self, resultado):
+        fr = resultado.filter_results
+        self.resultado = resultado
+        self.Z = np.array(fr.design[:, :, 0])
+        self.T = np.array(fr.transition[:, :, 0])
+        self.H = np.array(fr.obs_cov[:, :, 0])
+        self.d = np.array(fr.obs_intercept[:, 0])
+        self.c = np.array(fr.state_intercept[:, 0])
+        R = np.array(fr.selection[:, :, 0])
+        self.RQR = R @ np.array(fr.state_cov[:, :, 0]) @ R.T
+        self.a = np.array(fr.predicted_state[:, -1], dtype=float)
+        self.P = np.array(fr.predicted_state_cov[:, :, -1], dtype=float)
+        self.n_atualizacoes = 0
+
+    def prever(self):
+        """Retorna (previsão, erro padrão) de um passo à frente."""
+        media = float((self.Z @ self.a + self.d)[0])
+        variancia = float((self.Z @ self.P @ self.Z.T + self.H)[0, 0])
+        return media, float(np.sqrt(max(variancia, 0.0)))
+
+    def atualizar(self, y):
+        """Incorpora a observação y e avança o estado para o próximo passo."""
+        if y is None or not np.isfinite(y):
+            self.a = self.T @ self.a + self.c
+            self.P = self.T @ self.P @ self.T.T + self.RQR
+        else:
+            v = float(y) - float((self.Z @ self.a + self.d)[0])
+            F = float((self.Z @ self.P @ self.Z.T + self.H)[0, 0])
+            if F <= 0:
+                raise LinAlgError("Variância de inovação não positiva no filtro ARIMA")
+            K = (self.T @ self.P @ self.Z.T)[:, 0] / F
+            self.a = self.T @ self.a + self.c + K * v
+            self.P = self.T @ self.P @ self.T.T + self.RQR - np.outer(K, K) * F
+        self.n_atualizacoes += 1
+
+
+def prever_walk_forward_arima(serie, janela, order=(1, 1, 1), refit_cada=0, maxiter=5):
+    """
+    Previsões de um passo para cada barra i em [janela, len(serie)), usando apenas dados até i-1.
+
+    Parâmetros:
+      - serie: pd.Series com os preços (índice posicional, como df_dep/df_ind)
+      - janela: tamanho da janela de treino (min_train_ajustado)
+      - order: ordem do ARIMA
+      - refit_cada: 0/None → ajusta uma única vez e só filtra daí em diante;
+                    N → reajusta na janela deslizante a cada N barras;
+                    1 → reajusta em todas as barras (comportamento original)
+      - maxiter: iterações do otimizador em cada ajuste
+
+    Retorna dicionário com:
+      - 'previsao', 'std': np.ndarray com previsão e se_mean de cada barra
+      - 'falhou': np.ndarray bool, True onde não havia modelo válido (previsão = último valor)
+      - 'resultado': último resultado ARIMA ajustado (ou None)
+      - 'indice_previsao': índice da barra prevista no último passo (ou None se falhou)
+      - 'n_ajustes': quantidade de ajustes de modelo realizados
+    """
+    n = len(serie)
+    passos = max(0, n - janela)
+    previsao = np.full(passos, np.nan)
+    std = np.zeros(passos)
+    falhou = np.zeros(passos, dtype=bool)
+    valores = serie.to_numpy(dtype=float)
+
+    filtro = None
+    n_ajustes = 0
+    indice_previsao = None
+
+    for k, i in enumerate(range(janela, n)):
+        reajustar = filtro is None or bool(refit_cada and k % refit_cada == 0)
+        if not reajustar:
+            try:
+                filtro.atualizar(valores[i - 1])
+            except (LinAlgError, ValueError):
+                filtro = None
+                reajustar = True
+
+        if reajustar:
+            try:
+                resultado = ajustar_arima(serie.iloc[i - janela:i], order=order, maxiter=maxiter)
+                filtro = FiltroARIMA(resultado)
+                n_ajustes += 1
+            except (LinAlgError, ValueError):
+                # Reajuste programado falhou: segue filtrando com os parâmetros anteriores
+                if filtro is not None:
+                    try:
+                        filtro.atualizar(valores[i - 1])
+                    except (LinAlgError, ValueError):
+                        filtro = None
+
+        if filtro is None:
+            previsao[k] = valores[i - 1]
+            std[k] = 0.0
+            falhou[k] = True
+            indice_previsao = None
+        else:
+            previsao[k], std[k] = filtro.prever()
+            indice_previsao = serie.index[i]
+
+    return {
+        'previsao': previsao,
+        'std': std,
+        'falhou': falhou,
+        'resultado': filtro.resultado if filtro is not None else None,
+        'indice_previsao': indice_previsao,
+        'n_ajustes': n_ajustes,
+    }
+
+
+def prever_ultima_barra_arima(serie, janela, order=(1, 1, 1), maxiter=5):
+    """
+    Previsão de um passo apenas para a última barra da série (modo forecast_only).
+
+    Ajusta um único modelo nas `janela` barras anteriores à última, exatamente a iteração
+    final do walk-forward com reajuste por barra, sem montar a tabela de acertos.
+    Retorna o mesmo dicionário de prever_walk_forward_arima, com arrays de um elemento.
+    """
+    if len(serie) <= janela:
+        return prever_walk_forward_arima(serie, janela, order=order, refit_cada=1, maxiter=maxiter)
+    return prever_walk_forward_arima(serie.iloc[-(janela + 1):], janela, order=order,
+                                     refit_cada=1, maxiter=maxiter)
+
+
+class CachePrevisoesARIMA:
+    """
+    Previsões ARIMA por série, compartilhadas entre os pares que usam o mesmo ativo.
+
+    Chave: (ativo, coluna, timeframe, horário da última barra, tamanho da janela, ordem, modo), onde modo
+    descreve como as previsões foram geradas (ex.: ('ultima', janela) ou ('walk_forward', janela, refit_cada)).
+    Cada entrada guarda também um resumo dos valores da série: se outro par alinhar o ativo com barras
+    diferentes sob a mesma chave, a previsão é recalculada. Despejo LRU limita a memória.
+    A série passada para chave() e obter_ou_calcular() deve ter o índice de horários das barras: com
+    RangeIndex a "última barra" seria uma posição, que muda com o período do par.
+
+    Os dicts devolvidos são compartilhados: copie antes de alterar (dict(previsao)).
+    """
+
+    def __init__(self, capacidade=256):
+        self.capacidade = capacidade
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def limpar(self):
+        with self._lock:
+            self._entradas.clear()
+
+    @staticmethod
+    def chave(ativo, coluna, timeframe, serie, order, modo):
+        ultima = serie.index[-1] if len(serie) else None
+        return (ativo, coluna, timeframe, ultima, len(serie), tuple(order), modo)
+
+    @staticmethod
+    def _resumo(serie):
+        resumo = hashlib.blake2b(np.ascontiguousarray(serie.to_numpy(dtype=float)).tobytes(), digest_size=16)
+        if not isinstance(serie.index, pd.RangeIndex):
+            resumo.update(pd.util.hash_pandas_object(serie.index, index=False).to_numpy().tobytes())
+        return resumo.hexdigest()
+
+    def obter_ou_calcular(self, chave, serie, calcular):
+        """Retorna a previsão guardada para a chave, ou calcular() (guardando o resultado)."""
+        resumo = self._resumo(serie)
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None and entrada[0] == resumo:
+                self._entradas.move_to_end(chave)
+                self.acertos += 1
+                return entrada[1]
+            self.falhas += 1
+        previsao = calcular()
+        with self._lock:
+            self._entradas[chave] = (resumo, previsao)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.capacidade:
+                self._entradas.popitem(last=False)
+        return previsao
@@ -0,0 +1,257 @@
+"""
+Publicação de Snapshots - Dados do backend para o Streamlit em versões imutáveis (copy-on-write)
+TradingSystemReal.sincronizar_dados_sistema copiava a cada 2 segundos tabela_linha_operacao,
+tabela_linha_operacao01, sinais, posições e dados_sistema para _dados_sincronizados, mudassem ou não, e
+obter_dados_sincronizados copiava o dict inteiro de novo (e devolvia None após 30 s sem sincronizar,
+perdendo a última atualização). Aqui:
+
+  1. publicar(**campos) compara cada campo com o último publicado e só copia o que mudou; campos
+     iguais reaproveitam a cópia congelada anterior (copy-on-write);
+  2. cada publicação com alguma mudança gera um Snapshot com versão monotônica e versão por campo;
+     sem mudança, nada é copiado e a versão não anda;
+  3. os valores do snapshot são somente leitura: DataFrames com arrays não graváveis, dicts
+     congelados, listas viram tuplas — o snapshot pode ser compartilhado entre threads e sessões
+     do navegador sem cópia;
+  4. consumidores comparam a versão (ou versao_de(campo)) com a última que desenharam e só
+     redesenham quando ela muda; aguardar() e assinar() atendem quem prefere ser avisado.
+
+Objetos que já se versionam e são thread-safe (atributo inteiro `versao`, ex.: RegistroEquity)
+são publicados por referência, e a mudança é detectada pela versão deles.
+"""
+
+import threading
+import time
+from collections.abc import Mapping
+from datetime import datetime
+from types import MappingProxyType
+
+try:
+    import pandas as pd
+    HAS_PANDAS = True
+except ImportError:
+    HAS_PANDAS = False
+
+
+class DictCongelado(dict):
+    """dict somente leitura (continua sendo dict para pd.DataFrame, json e st.json)."""
+
+    def _somente_leitura(self, *args, **kwargs):
+        raise TypeError("snapshot publicado é somente leitura - use dict(valor) para alterar uma cópia")
+
+    __setitem__ = __delitem__ = _somente_leitura
+    update = pop = popitem = clear = setdefault = _somente_leitura
+    __ior__ = _somente_leitura
+
+    def __copy__(self):
+        return dict(self)
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return (dict, (dict(self),))
+
+
+def _versionado(valor):
+    """Objeto que se versiona sozinho (publicado por referência)."""
+    return isinstance(getattr(valor, 'versao', None), int) and not isinstance(valor, (dict, list, tuple))
+
+
+def _somente_leitura(df):
+    """DataFrame com todos os blocos não graváveis (resultado de congelar)."""
+    try:
+        blocos = df._mgr.blocks
+        return len(blocos) > 0 and all(not bloco.values.flags.writeable for bloco in blocos)
+    except Exception:
+        return False
+
+
+def congelar(valor):
+    """Cópia somente leitura de `valor` (DataFrame, dict, lista/tupla ou escalar)."""
+    if valor is None or isinstance(valor, (str, bytes, int, float, bool, datetime, DictCongelado)):
+        return valor
+    if _versionado(valor):
+        return valor
+    if HAS_PANDAS and isinstance(valor, pd.DataFrame):
+        if _somente_leitura(valor):
+            return valor    # já congelado (ex.: tabela de outro snapshot ou do cache de arquivos)
+        copia = valor.copy(deep=True)
+        try:
+            for bloco in copia._mgr.blocks:
+                bloco.values.flags.writeable = False
+        except Exception:
+            pass    # versão do pandas sem blocos acessíveis: fica só a cópia isolada
+        return copia
+    if isinstance(valor, Mapping):
+        return DictCongelado((chave, congelar(item)) for chave, item in valor.items())
+    if isinstance(valor, (list, tuple)):
+        return tuple(congelar(item) for item in valor)
+    return valor
+
+
+def _igual(congelado, valor):
+    """valor (do backend) tem o mesmo conteúdo que a cópia congelada publicada?"""
+    if congelado is valor:
+        return True
+    if congelado is None or valor is None:
+        return False
+    if HAS_PANDAS and isinstance(valor, pd.DataFrame):
+        return isinstance(congelado, pd.DataFrame) and congelado.shape == valor.shape and congelado.equals(valor)
+    # Recursivo: DataFrames dentro de dicts/listas não suportam == (comparados acima com .equals)
+    if isinstance(valor, Mapping):
+        return (isinstance(congelado, Mapping) and congelado.keys() == valor.keys()
+                and all(_igual(congelado[chave], item) for chave, item in valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return (isinstance(congelado, tuple) and len(congelado) == len(valor)
+                and all(_igual(a, b) for a, b in zip(congelado, valor)))
+    try:
+        return bool(congelado == valor)
+    except Exception:
+        return False
+
+
+class Snapshot(Mapping):
+    """
+    Versão publicada e imutável dos dados. Funciona como dict somente leitura.
+
+    snapshot.versao             # versão global (monotônica)
+    snapshot.versao_de('campo') # versão em que o campo mudou pela última vez
+    snapshot.timestamp          # quando esta versão foi publicada
+    """
+
+    __slots__ = ('versao', 'timestamp', '_dados', '_versoes')
+
+    def __init__(self, versao=0, dados=None, versoes=None, timestamp=None):
+        self.versao = versao
+        self.timestamp = timestamp
+        self._dados = MappingProxyType(dict(dados or {}))
+        self._versoes = MappingProxyType(dict(versoes or {}))
+
+    def __getitem__(self, campo):
+        return self._dados[campo]
+
+    def __iter__(self):
+        return iter(self._dados)
+
+    def __len__(self):
+        return len(self._dados)
+
+    def versao_de(self, campo):
+        """Versão em que `campo` mudou pela última vez (0 se nunca publicado)."""
+        return self._versoes.get(campo, 0)
+
+    def versoes_de(self, *campos):
+        """Tupla de versões dos campos — chave de cache para quem depende de vários campos."""
+        return tuple(self._versoes.get(campo, 0) for campo in campos)
+
+    @property
+    def idade_segundos(self):
+        if self.timestamp is None:
+            return None
+        return (datetime.now() - self.timestamp).total_seconds()
+
+    def __repr__(self):
+        return f"Snapshot(versao={self.versao}, campos={list(self._dados)})"
+
+
+class PublicadorSnapshots:
+    """
+    Publica snapshots versionados do backend para os consumidores (render do Streamlit).
+
+    Uso (produtor, thread de sincronização):
+        publicador.publicar(tabela_linha_operacao=df, dados_sistema=dados, ...)
+
+    Uso (consumidor):
+        snapshot = publicador.atual()
+        if snapshot.versao != versao_desenhada:
+            desenhar(snapshot)
+    """
+
+    def __init__(self, log=None):
+        self.log = log
+        self._condicao = threading.Condition()
+        self._atual = Snapshot()
+        self._versoes_origem = {}   # campo -> versão própria do objeto publicado por referência
+        self._assinantes = []
+        self.publicacoes = 0        # chamadas a publicar()
+        self.sem_mudanca = 0        # chamadas que não geraram versão nova
+        self.copias = 0             # campos efetivamente copiados
+        self.ultima_publicacao = None
+
+    @property
+    def versao(self):
+        return self._atual.versao
+
+    def atual(self):
+        """Último snapshot publicado (versão 0 e vazio antes da primeira publicação)."""
+        return self._atual
+
+    def publicar(self, **campos):
+        """
+        Publica os campos informados; campos omitidos mantêm o valor anterior. Só gera versão nova
+        (e só copia) se algum campo mudou. Devolve o snapshot vigente.
+        """
+        with self._condicao:
+            self.publicacoes += 1
+            self.ultima_publicacao = datetime.now()
+            anterior = self._atual
+            dados = dict(anterior._dados)
+            versoes = dict(anterior._versoes)
+            proxima = anterior.versao + 1
+            mudou = False
+            for campo, valor in campos.items():
+                if campo in dados and self._sem_mudanca(campo, dados[campo], valor):
+                    continue
+                dados[campo] = congelar(valor)
+                versoes[campo] = proxima
+                if _versionado(valor):
+                    self._versoes_origem[campo] = valor.versao
+                elif valor is not None:
+                    self.copias += 1
+                mudou = True
+            if not mudou:
+                self.sem_mudanca += 1
+                return anterior
+            snapshot = Snapshot(proxima, dados, versoes, self.ultima_publicacao)
+            self._atual = snapshot
+            self._condicao.notify_all()
+            assinantes = list(self._assinantes)
+        for callback in assinantes:
+            try:
+                callback(snapshot)
+            except Exception as e:
+                if self.log:
+                    self.log(f"[SNAPSHOT] Erro em assinante {getattr(callback, '__name__', callback)}: {e}")
+        return snapshot
+
+    def _sem_mudanca(self, campo, congelado, valor):
+        if _versionado(valor):
+            return congelado is valor and self._versoes_origem.get(campo) == valor.versao
+        return _igual(congelado, valor)
+
+    def aguardar(self, versao_vista, timeout=None):
+        """Bloqueia até existir versão maior que `versao_vista`; devolve o snapshot ou None no timeout."""
+        limite = None if timeout is None else time.monotonic() + timeout
+        with self._condicao:
+            while self._atual.versao <= versao_vista:
+                restante = None if limite is None else limite - time.monotonic()
+                if restante is not None and restante <= 0:
+                    return None
+                self._condicao.wait(restante)
+            return self._atual
+
+    def assinar(self, callback):
+        """callback(snapshot) é chamado (na thread do produtor) a cada versão nova."""
+        with self._condicao:
+            self._assinantes.append(callback)
+        return callback
+
+    def cancelar(self, callback):
+        with self._condicao:
+            if callback in self._assinantes:
+                self._assinantes.remove(callback)
+
+    @property
+    def estatisticas(self):
+        return {'versao': self.versao, 'publicacoes': self.publicacoes, 'sem_mudanca': self.sem_mudanca,
+                'copias': self.copias, 'assinantes': len(self._assinantes)}
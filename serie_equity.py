@@ -0,0 +1,282 @@
+"""
+Série de Equity - Registro colunar e limitado de equity/balance/profit
+TradingSystemReal.atualizar_account_info acrescentava um dict em self.equity_historico a cada
+atualização (lista sem limite) e calculava max([entry['equity'] for entry in ...]) a cada vez — O(n)
+por atualização. Aqui:
+
+  1. os pontos recentes ficam em arrays NumPy pré-alocados (timestamp, equity, balance, profit);
+  2. pontos mais velhos que o horizonte são compactados em barras de 1 minuto (último valor de cada
+     minuto) num buffer circular também pré-alocado — a memória não cresce com o tempo de execução;
+  3. pico de equity e drawdown máximo são mantidos a cada registro (consulta O(1));
+  4. na virada do dia os pontos do dia anterior são gravados em disco (equity_AAAAMMDD.npz);
+  5. a curva reconstruída pelos deals (obter_equity_historico_mt5) entra como "semente" antes do
+     primeiro ponto registrado, sem substituir o que foi registrado ao vivo.
+
+O gráfico lê só os pontos visíveis (pontos()/para_dataframe()), sem montar dicts.
+"""
+
+import os
+import threading
+from datetime import datetime
+
+import numpy as np
+
+COLUNAS = ('timestamp', 'equity', 'balance', 'profit')
+
+
+def _instante(valor):
+    if valor is None:
+        return datetime.now().timestamp()
+    if isinstance(valor, datetime):
+        return valor.timestamp()
+    if hasattr(valor, 'timestamp'):
+        return valor.timestamp()
+    return float(valor)
+
+
+class RegistroEquity:
+    """
+    Série de equity com memória constante.
+
+    Uso:
+        serie = RegistroEquity(capacidade=20000, horizonte_segundos=7200, pasta='equity_historico')
+        serie.registrar(conta.equity, conta.balance, conta.profit)
+        serie.pico, serie.drawdown_atual, serie.max_drawdown     # O(1)
+        serie.para_dataframe(desde=inicio)                       # colunas timestamp/equity/balance/profit
+    """
+
+    def __init__(self, capacidade=20000, horizonte_segundos=2 * 3600, capacidade_minutos=7 * 24 * 60,
+                 pasta=None, log=print):
+        self.capacidade = max(2, int(capacidade))
+        self.horizonte_segundos = horizonte_segundos
+        self.capacidade_minutos = max(1, int(capacidade_minutos))
+        self.pasta = pasta
+        self.log = log
+        self._trava = threading.Lock()
+        # Pontos recentes: arrays lineares [0, _n)
+        self._recentes = np.empty((self.capacidade, 4), dtype=np.float64)
+        self._n = 0
+        # Barras de 1 minuto: buffer circular, _inicio_barras é o mais antigo
+        self._barras = np.empty((self.capacidade_minutos, 4), dtype=np.float64)
+        self._inicio_barras = 0
+        self._n_barras = 0
+        self._semente = np.empty((0, 4), dtype=np.float64)
+        self._dia = None
+        self.pico = None
+        self.max_drawdown = 0.0
+        self.registros = 0
+        self.versao = 0             # muda a cada alteração (chave do cache de figuras)
+        self.compactacoes = 0
+        self.arquivos_gravados = []
+
+    # ------------------------------------------------------------------ escrita
+    def registrar(self, equity, balance=None, profit=0.0, timestamp=None):
+        """Acrescenta um ponto. O(1) amortizado."""
+        ts = _instante(timestamp)
+        equity = float(equity)
+        balance = equity if balance is None else float(balance)
+        with self._trava:
+            dia = datetime.fromtimestamp(ts).date()
+            if self._dia is not None and dia != self._dia:
+                self._gravar_dia(self._dia)
+            self._dia = dia
+            if self._n and ts < self._recentes[self._n - 1, 0]:
+                ts = self._recentes[self._n - 1, 0]   # relógio andou para trás: mantém a série ordenada
+            if self._n == self.capacidade:
+                self._compactar(ts, forcar=True)
+            elif self._n and ts - self._recentes[0, 0] > self.horizonte_segundos + 60:
+                self._compactar(ts)
+            self._recentes[self._n] = (ts, equity, balance, float(profit))
+            self._n += 1
+            self.registros += 1
+            self.versao += 1
+            self.pico = equity if self.pico is None else max(self.pico, equity)
+            self.max_drawdown = max(self.max_drawdown, self.pico - equity)
+
+    def append(self, entrada):
+        """Compatibilidade com a lista antiga de dicts {'timestamp', 'equity', 'balance', 'profit'}."""
+        self.registrar(entrada['equity'], entrada.get('balance'), entrada.get('profit', 0.0), entrada.get('timestamp'))
+
+    def semear(self, pontos):
+        """
+        Pontos históricos (ex.: curva reconstruída pelos deals) exibidos antes do primeiro ponto
+        registrado. Substitui a semente anterior; não altera os pontos registrados.
+        """
+        linhas = [(_instante(p.get('timestamp')), float(p['equity']), float(p.get('balance', p['equity'])),
+                   float(p.get('profit', 0.0) or 0.0)) for p in pontos]
+        semente = np.array(sorted(linhas), dtype=np.float64).reshape(-1, 4)
+        with self._trava:
+            primeiro = self._primeiro_ts()
+            if primeiro is not None:
+                semente = semente[semente[:, 0] < primeiro]
+            self._semente = semente
+            self.versao += 1
+            if len(semente):
+                maximo = float(semente[:, 1].max())
+                self.pico = maximo if self.pico is None else max(self.pico, maximo)
+
+    def clear(self):
+        with self._trava:
+            self._n = 0
+            self._n_barras = 0
+            self._inicio_barras = 0
+            self._semente = np.empty((0, 4), dtype=np.float64)
+            self.pico = None
+            self.max_drawdown = 0.0
+            self.versao += 1
+
+    # ------------------------------------------------------------------ compactação em barras de 1 minuto
+    def _compactar(self, agora, forcar=False):
+        """Move para as barras de 1 minuto os pontos recentes mais velhos que o horizonte."""
+        recentes = self._recentes[:self._n]
+        corte = np.floor((agora - self.horizonte_segundos) / 60.0) * 60.0   # só minutos completos
+        fim = int(np.searchsorted(recentes[:, 0], corte, side='left'))
+        if forcar and fim < self._n // 2:
+            # Registro mais rápido que o horizonte comporta: compacta a metade mais antiga mesmo assim
+            fim = self._n // 2
+        if fim <= 0:
+            return
+        antigos = recentes[:fim]
+        minutos = np.floor(antigos[:, 0] / 60.0)
+        ultimo_do_minuto = np.append(minutos[1:] != minutos[:-1], True)
+        barras = antigos[ultimo_do_minuto].copy()
+        barras[:, 0] = minutos[ultimo_do_minuto] * 60.0
+        for barra in barras:
+            self._acrescentar_barra(barra)
+        restantes = self._n - fim
+        self._recentes[:restantes] = self._recentes[fim:self._n]
+        self._n = restantes
+        self.compactacoes += 1
+
+    def _acrescentar_barra(self, barra):
+        if self._n_barras:
+            ultima = (self._inicio_barras + self._n_barras - 1) % self.capacidade_minutos
+            if self._barras[ultima, 0] == barra[0]:
+                self._barras[ultima] = barra     # mesmo minuto (compactação forçada no meio dele)
+                return
+        if self._n_barras == self.capacidade_minutos:
+            self._barras[self._inicio_barras] = barra
+            self._inicio_barras = (self._inicio_barras + 1) % self.capacidade_minutos
+        else:
+            self._barras[(self._inicio_barras + self._n_barras) % self.capacidade_minutos] = barra
+            self._n_barras += 1
+
+    # ------------------------------------------------------------------ leitura
+    def _barras_ordenadas(self):
+        indices = (self._inicio_barras + np.arange(self._n_barras)) % self.capacidade_minutos
+        return self._barras[indices]
+
+    def _primeiro_ts(self):
+        if self._n_barras:
+            return float(self._barras[self._inicio_barras, 0])
+        if self._n:
+            return float(self._recentes[0, 0])
+        return None
+
+    def pontos(self, desde=None, ate=None, incluir_semente=True):
+        """Array (n, 4) timestamp/equity/balance/profit em ordem, só do período pedido."""
+        inicio = None if desde is None else _instante(desde)
+        fim = None if ate is None else _instante(ate)
+        with self._trava:
+            partes = []
+            if incluir_semente and len(self._semente):
+                partes.append(self._semente)
+            if self._n_barras:
+                partes.append(self._barras_ordenadas())
+            if self._n:
+                partes.append(self._recentes[:self._n].copy())
+        if not partes:
+            return np.empty((0, 4), dtype=np.float64)
+        dados = np.concatenate(partes) if len(partes) > 1 else partes[0]
+        if inicio is not None:
+            dados = dados[np.searchsorted(dados[:, 0], inicio, side='left'):]
+        if fim is not None:
+            dados = dados[:np.searchsorted(dados[:, 0], fim, side='right')]
+        return dados
+
+    def para_dataframe(self, desde=None, ate=None):
+        """DataFrame com as colunas da lista antiga (timestamp como datetime)."""
+        import pandas as pd
+        dados = self.pontos(desde, ate)
+        df = pd.DataFrame(dados, columns=list(COLUNAS))
+        # Horário local, como os datetime.now() da lista antiga
+        df['timestamp'] = [datetime.fromtimestamp(t) for t in dados[:, 0].tolist()]
+        return df
+
+    def para_lista(self, desde=None, ate=None):
+        """Lista de dicts no formato antigo de equity_historico (exportação)."""
+        return [{'timestamp': datetime.fromtimestamp(t), 'equity': e, 'balance': b, 'profit': p}
+                for t, e, b, p in self.pontos(desde, ate).tolist()]
+
+    def ultimo(self):
+        """Último ponto registrado como dict, ou None."""
+        with self._trava:
+            if not self._n:
+                return None
+            t, e, b, p = self._recentes[self._n - 1].tolist()
+        return {'timestamp': datetime.fromtimestamp(t), 'equity': e, 'balance': b, 'profit': p}
+
+    @property
+    def drawdown_atual(self):
+        """Distância do pico até a equity do último ponto (R$)."""
+        with self._trava:
+            if not self._n or self.pico is None:
+                return 0.0
+            return max(0.0, self.pico - float(self._recentes[self._n - 1, 1]))
+
+    @property
+    def estatisticas(self):
+        with self._trava:
+            return {'recentes': self._n, 'barras_minuto': self._n_barras, 'semente': len(self._semente),
+                    'registros': self.registros, 'compactacoes': self.compactacoes,
+                    'bytes': self._recentes.nbytes + self._barras.nbytes + self._semente.nbytes}
+
+    def __len__(self):
+        return self._n + self._n_barras + len(self._semente)
+
+    def __bool__(self):
+        return len(self) > 0
+
+    # ------------------------------------------------------------------ persistência diária
+    def _gravar_dia(self, dia):
+        """Grava os pontos (barras + recentes) de um dia em <pasta>/equity_AAAAMMDD.npz."""
+        if not self.pasta:
+            return None
+        inicio = datetime.combine(dia, datetime.min.time()).timestamp()
+        fim = inicio + 86400
+        partes = []
+        if self._n_barras:
+            partes.append(self._barras_ordenadas())
+        if self._n:
+            partes.append(self._recentes[:self._n])
+        if not partes:
+            return None
+        dados = np.concatenate(partes)
+        dados = dados[(dados[:, 0] >= inicio) & (dados[:, 0] < fim)]
+        if not len(dados):
+            return None
+        try:
+            os.makedirs(self.pasta, exist_ok=True)
+            caminho = os.path.join(self.pasta, f"equity_{dia.strftime('%Y%m%d')}.npz")
+            np.savez_compressed(caminho, **{coluna: dados[:, i] for i, coluna in enumerate(COLUNAS)})
+            self.arquivos_gravados.append(caminho)
+            return caminho
+        except Exception as e:
+            self.log(f"[EQUITY] Falha ao gravar equity de {dia}: {e}")
+            return None
+
+    def gravar(self):
+        """Grava o dia corrente (ex.: ao parar o sistema)."""
+        with self._trava:
+            if self._dia is not None:
+                return self._gravar_dia(self._dia)
+        return None
+
+
+def carregar_dia(pasta, dia):
+    """Pontos gravados de um dia: array (n, 4) timestamp/equity/balance/profit, ou vazio."""
+    caminho = os.path.join(pasta, f"equity_{dia.strftime('%Y%m%d')}.npz")
+    if not os.path.exists(caminho):
+        return np.empty((0, 4), dtype=np.float64)
+    with np.load(caminho) as arquivo:
+        return np.column_stack([arquivo[coluna] for coluna in COLUNAS])
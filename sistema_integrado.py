@@ -70,6 +70,11 @@ import pandas as pd
 sys.path.append('.')
 # Integração direta com os parâmetros dinâmicos do cálculo
 from calculo_entradas_v55 import parametros_dinamicos, atualizar_variaveis_globais
+from snapshot_mt5 import enviar_ordem_mt5, obter_servico_snapshot  # Leitura única e compartilhada de posições/ordens/ticks
+from livro_posicoes import LivroPosicoes, acao_perna_unica, livro_do_snapshot, obter_registro_magics  # Índices por magic/símbolo/ticket e pares por magic
+from envio_ordens_pareadas import EnvioPareado, formatar_metricas_par, validar_pernas  # Pernas preparadas juntas e enviadas em sequência
+from agendador_barras import AgendadorBarras  # Disparo por fechamento de barra/horário no lugar dos laços com sleep
+from log_estruturado import BufferLog, nivel_numerico  # Logs em buffer circular com nível/evento e arquivo rotativo
 
 class SistemaIntegrado:
     def sincronizar_parametros_dinamicos(self):
@@ -250,7 +255,14 @@ class SistemaIntegrado:
             "ultimo_ciclo": None,
             "status": "Desconectado"
         }
-        self.logs = []
+        # Buffer circular de tamanho fixo (log_estruturado); mantém a interface da lista antiga
+        self.logs = BufferLog(
+            capacidade=getattr(self, 'log_capacidade', 5000),
+            arquivo=getattr(self, 'log_arquivo', None) or None,
+            nivel_arquivo=getattr(self, 'log_nivel_arquivo', 'INFO'),
+            max_bytes_arquivo=int(getattr(self, 'log_arquivo_max_mb', 10) * 1024 * 1024),
+            backups_arquivo=getattr(self, 'log_arquivo_backups', 5),
+        )
 
         # Controles para as novas threads
         self.stops_ja_ajustados = set()
@@ -274,6 +286,8 @@ class SistemaIntegrado:
         self.thread_break_even = None
         self.thread_ajustes = None
         self.thread_ordens = None
+        self.agendador = None
+        self.envio_pareado = None
 
         # --- Horários e janelas (mantém valores padrão, pode ser sobrescrito por parametros_dinamicos) ---
         self.JANELA_BREAK_EVEN = getattr(self, 'JANELA_BREAK_EVEN', (8, 17))
@@ -344,12 +358,11 @@ class SistemaIntegrado:
 
 
     
-    def log(self, mensagem):
-        """Log com timestamp"""
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        evento = f"[{timestamp}] {mensagem}"
-        self.logs.append(evento)
-        print(evento)
+    def log(self, mensagem, nivel=None, evento=None, **campos):
+        """Log com timestamp (registro estruturado no buffer circular; nível/evento inferidos do texto)"""
+        registro = self.logs.registrar(mensagem, nivel=nivel, evento=evento, **campos)
+        if registro.nivel >= nivel_numerico(getattr(self, 'log_nivel_console', 'DEBUG')):
+            print(registro.formatar())
     
     def executar_sistema_original(self):
         """
@@ -515,22 +528,46 @@ class SistemaIntegrado:
                 self.log(f"❌ ERRO no monitoramento de posições: {str(e)}")
                 time.sleep(60)
 
+    def obter_par_do_magic(self, magic, livro=None):
+        """
+        (dependente, independente) do magic pelo registro gravado no envio das ordens (livro_posicoes.RegistroMagics).
+        Magics sem registro (enviados antes do registro existir) são inferidos uma única vez pelo livro,
+        sem nova consulta ao MT5, e passam a constar do registro.
+        """
+        registro = obter_registro_magics()
+        depende_atual, independe_atual = registro.par(magic)
+        if depende_atual is not None:
+            return depende_atual, independe_atual
+        if livro is None:
+            return None, None
+
+        simbolos = livro.simbolos_do_magic(magic)
+        if len(simbolos) == 2:
+            registro.registrar(magic, simbolos[0], simbolos[1], origem='inferido')
+            return simbolos[0], simbolos[1]
+        if len(simbolos) == 1:
+            # Perna única: completa com a ordem pendente do mesmo magic, se houver
+            for ordem in livro.ordens_do_magic(magic):
+                if ordem.symbol != simbolos[0]:
+                    self.log(f"📌 Par completado com ordem pendente - Magic {magic}: {simbolos[0]} / {ordem.symbol}")
+                    registro.registrar(magic, simbolos[0], ordem.symbol, origem='inferido')
+                    return simbolos[0], ordem.symbol
+            self.log(f"⚠️ Posição órfã detectada - Magic {magic}: {simbolos[0]} (será fechada)")
+            return simbolos[0], None
+        return None, None
+
     def obter_pares_configurados(self):
         """Obtém pares configurados analisando posições reais do MT5"""
         try:
             import MetaTrader5 as mt5
             
-            # Primeiro tenta acessar a variável global 'pares' do código original
-            if 'pares' in globals() and globals()['pares']:
-                self.log("✅ Usando variável 'pares' do sistema original")
-                return globals()['pares']
-            
-            # Se não encontrou, analisa posições reais do MT5 para inferir pares
+            # Analisa posições reais do MT5 para inferir pares
             self.log("📋 Analisando posições reais do MT5 para identificar pares...")
             pares_inferidos = {}
             
             # Obtém todas as posições abertas
-            posicoes_abertas = mt5.positions_get()
+            snapshot = self.obter_snapshot_mt5()
+            posicoes_abertas = snapshot.posicoes if snapshot is not None else mt5.positions_get()
             
             if posicoes_abertas:
                 # Agrupa posições por magic number
@@ -557,7 +594,7 @@ class SistemaIntegrado:
                         pares_inferidos[magic] = (unique_symbols[0], None)
             
             # Também verifica ordens pendentes para completar informações
-            ordens_pendentes = mt5.orders_get()
+            ordens_pendentes = snapshot.ordens if snapshot is not None else mt5.orders_get()
             if ordens_pendentes:
                 for ordem in ordens_pendentes:
                     if str(ordem.magic).startswith(self.prefixo):
@@ -1106,7 +1143,8 @@ class SistemaIntegrado:
             # Verifica se já existe ordem pendente para o ativo no MT5
             try:
                 import MetaTrader5 as mt5
-                ordens_pendentes_dep = mt5.orders_get(symbol=depende_atual)
+                snapshot = self.obter_snapshot_mt5(idade_maxima=0.5)
+                ordens_pendentes_dep = snapshot.ordens_de(symbol=depende_atual) if snapshot is not None else mt5.orders_get(symbol=depende_atual)
                 ordem_existente_dep = any(o.symbol == depende_atual for o in ordens_pendentes_dep) if ordens_pendentes_dep else False
                 if ordem_existente_dep:
                     self.log(f"❌ Já existe ordem pendente para {depende_atual} no MT5. Abortando entrada.")
@@ -1174,7 +1212,8 @@ class SistemaIntegrado:
 
             # Verifica se já existe ordem pendente para o ativo no MT5
             try:
-                ordens_pendentes_dep = mt5.orders_get(symbol=depende_atual)
+                snapshot = self.obter_snapshot_mt5(idade_maxima=0.5)
+                ordens_pendentes_dep = snapshot.ordens_de(symbol=depende_atual) if snapshot is not None else mt5.orders_get(symbol=depende_atual)
                 ordem_existente_dep = any(o.symbol == depende_atual for o in ordens_pendentes_dep) if ordens_pendentes_dep else False
                 if ordem_existente_dep:
                     self.log(f"❌ Já existe ordem pendente para {depende_atual} no MT5. Abortando entrada.")
@@ -1255,32 +1294,8 @@ class SistemaIntegrado:
                 "type_filling": mt5.ORDER_FILLING_RETURN,
             }
             
-            # Envia ordem do dependente
-            result_dep = mt5.order_send(ordem_compra_dep)
-            self.log(f"📤 Ordem COMPRA {depende_atual} enviada")
-            
-            if result_dep is None:
-                self.log(f"❌ Erro: result_dep retornou None - {mt5.last_error()}")
-                return False
-            
-            if result_dep.retcode != mt5.TRADE_RETCODE_DONE:
-                self.log(f"❌ Falha na ordem {depende_atual}: retcode {result_dep.retcode}")
-                return False
-            
-            # Envia ordem do independente
-            result_ind = mt5.order_send(ordem_venda_ind)
-            self.log(f"📤 Ordem VENDA {independe_atual} enviada")
-            
-            if result_ind is None:
-                self.log(f"❌ Erro: result_ind retornou None - {mt5.last_error()}")
-                return False
-            
-            if result_ind.retcode != mt5.TRADE_RETCODE_DONE:
-                self.log(f"❌ Falha na ordem {independe_atual}: retcode {result_ind.retcode}")
-                return False
-            
-            self.log(f"✅ Par enviado com sucesso: {depende_atual} / {independe_atual}")
-            return True
+            # Envia as duas pernas em sequência imediata (validação e ticks do mesmo snapshot)
+            return self._enviar_par(ordem_compra_dep, ordem_venda_ind, "COMPRA", "VENDA")
             
         except Exception as e:
             self.log(f"❌ ERRO ao enviar ordens de compra: {str(e)}")
@@ -1325,43 +1340,87 @@ class SistemaIntegrado:
                 "type_filling": mt5.ORDER_FILLING_RETURN,
             }
             
-            # Envia ordem do dependente
-            result_dep = mt5.order_send(ordem_venda_dep)
-            self.log(f"📤 Ordem VENDA {depende_atual} enviada")
-            
-            if result_dep is None:
-                self.log(f"❌ Erro: result_dep retornou None - {mt5.last_error()}")
-                return False
-            
-            if result_dep.retcode != mt5.TRADE_RETCODE_DONE:
-                self.log(f"❌ Falha na ordem {depende_atual}: retcode {result_dep.retcode}")
-                return False
-            
-            # Envia ordem do independente
-            result_ind = mt5.order_send(ordem_compra_ind)
-            self.log(f"📤 Ordem COMPRA {independe_atual} enviada")
-            
-            if result_ind is None:
-                self.log(f"❌ Erro: result_ind retornou None - {mt5.last_error()}")
-                return False
-            
-            if result_ind.retcode != mt5.TRADE_RETCODE_DONE:
-                self.log(f"❌ Falha na ordem {independe_atual}: retcode {result_ind.retcode}")
-                return False
-            
-            self.log(f"✅ Par enviado com sucesso: {depende_atual} / {independe_atual}")
-            return True
+            # Envia as duas pernas em sequência imediata (validação e ticks do mesmo snapshot)
+            return self._enviar_par(ordem_venda_dep, ordem_compra_ind, "VENDA", "COMPRA")
             
         except Exception as e:
             self.log(f"❌ ERRO ao enviar ordens de venda: {str(e)}")
             return False
 
+    def _enviar_par(self, ordem_dep, ordem_ind, rotulo_dep, rotulo_ind):
+        """
+        Envia as pernas dependente e independente já montadas pelo EnvioPareado: valida contra o livro
+        do snapshot, registra o magic só depois que a dependente foi aceita (entre as pernas) e manda a
+        independente logo em seguida. Se a independente falhar, a dependente é desfeita na hora.
+        Latência, slippage e intervalo entre pernas vão para o log e para envio_pareado.historico.
+        """
+        import MetaTrader5 as mt5
+        
+        depende_atual, independe_atual = ordem_dep['symbol'], ordem_ind['symbol']
+        magic_id = ordem_dep['magic']
+        
+        snapshot = self.obter_snapshot_mt5(idade_maxima=0.5)
+        if snapshot is not None:
+            ok, motivo = validar_pernas(livro_do_snapshot(snapshot), depende_atual, magic_id)
+            if not ok:
+                self.log(f"❌ Envio cancelado: {motivo}")
+                return False
+        
+        if self.envio_pareado is None:
+            self.envio_pareado = EnvioPareado(enviar_ordem_mt5, retcodes_ok=(mt5.TRADE_RETCODE_DONE,), log=self.log)
+        # Registro do par entre as pernas: só existe se a dependente foi aceita, e a perna órfã é
+        # reconhecida pelo monitoramento mesmo se a segunda falhar
+        par = self.envio_pareado.enviar_par(
+            ordem_dep, ordem_ind, snapshot=snapshot,
+            antes_segunda=lambda: obter_registro_magics().registrar(magic_id, depende_atual, independe_atual))
+        
+        self.log(f"📤 Ordem {rotulo_dep} {depende_atual} enviada")
+        if par['falha'] == 'dependente':
+            resultado = par['resultado_dep']
+            if resultado is None:
+                self.log(f"❌ Erro: result_dep retornou None - {mt5.last_error()}")
+            else:
+                self.log(f"❌ Falha na ordem {depende_atual}: retcode {resultado.retcode}")
+            return False
+        
+        self.log(f"📤 Ordem {rotulo_ind} {independe_atual} enviada")
+        self.log(f"⏱️ Envio do par: {formatar_metricas_par(par)}")
+        if par['falha'] == 'independente':
+            resultado = par['resultado_ind']
+            if resultado is None:
+                self.log(f"❌ Erro: result_ind retornou None - {mt5.last_error()}")
+            else:
+                self.log(f"❌ Falha na ordem {independe_atual}: retcode {resultado.retcode}")
+            # Dependente sem hedge: fecha a posição / remove a ordem do magic em vez de esperar o monitoramento
+            self.log(f"🔄 Desfazendo perna dependente {depende_atual} (Magic {magic_id})...")
+            self.programar_fechamento_posicao(magic_id, mt5.positions_get(symbol=depende_atual),
+                                              mt5.orders_get(symbol=depende_atual))
+            return False
+        
+        self.log(f"✅ Par enviado com sucesso: {depende_atual} / {independe_atual}")
+        return True
+
+    def obter_snapshot_mt5(self, idade_maxima=None):
+        """
+        Snapshot compartilhado de posições, ordens e ticks (snapshot_mt5), com no máximo `idade_maxima`
+        segundos. Retorna None com 'snapshot_mt5' desligado ou sem leitura válida: aí cada método consulta o MT5.
+        """
+        if not getattr(self, 'snapshot_mt5', True):
+            return None
+        try:
+            import MetaTrader5 as mt5
+        except ImportError:
+            return None
+        servico = obter_servico_snapshot(mt5, getattr(self, 'snapshot_mt5_intervalo', 1.0))
+        return servico.obter(idade_maxima)
+
     def verificar_operacao_aberta(self, ativos):
         """Verifica se existe operação aberta para os ativos"""
         import MetaTrader5 as mt5
         
         try:
-            posicoes = mt5.positions_get()
+            snapshot = self.obter_snapshot_mt5(idade_maxima=0.5)
+            posicoes = snapshot.posicoes if snapshot is not None else mt5.positions_get()
             if not posicoes:
                 return False
             
@@ -1382,7 +1441,8 @@ class SistemaIntegrado:
         import MetaTrader5 as mt5
         
         try:
-            posicoes = mt5.positions_get(symbol=ativo)
+            snapshot = self.obter_snapshot_mt5(idade_maxima=0.5)
+            posicoes = snapshot.posicoes_de(symbol=ativo) if snapshot is not None else mt5.positions_get(symbol=ativo)
             if not posicoes:
                 return False
             
@@ -1405,7 +1465,8 @@ class SistemaIntegrado:
         import MetaTrader5 as mt5
         
         try:
-            posicoes = mt5.positions_get()
+            snapshot = self.obter_snapshot_mt5(idade_maxima=0.5)
+            posicoes = snapshot.posicoes if snapshot is not None else mt5.positions_get()
             if not posicoes:
                 return 0
             
@@ -1451,9 +1512,13 @@ class SistemaIntegrado:
         import MetaTrader5 as mt5
         
         try:
-            # Obtém posições e ordens pendentes
-            posicoes_abertas = mt5.positions_get()
-            posicoes_pendentes = mt5.orders_get()
+            # Obtém posições e ordens pendentes (snapshot compartilhado, no máximo 2 s de idade)
+            snapshot = self.obter_snapshot_mt5(idade_maxima=2.0)
+            if snapshot is not None:
+                posicoes_abertas, posicoes_pendentes = snapshot.posicoes, snapshot.ordens
+            else:
+                posicoes_abertas = mt5.positions_get()
+                posicoes_pendentes = mt5.orders_get()
             
             if posicoes_abertas is not None and len(posicoes_abertas) > 0:
                 self.log(f"📊 Número de operações em aberto: {len(posicoes_abertas)}")
@@ -1461,14 +1526,17 @@ class SistemaIntegrado:
                 # Prefixo do script (configurável)
                 prefixo_script = self.prefixo  # Usa o prefixo da configuração da classe
                 
-                # Filtra apenas as posições com magic prefixo específico
-                def magic_comeca_com(magic, prefixo):
-                    return str(magic).startswith(prefixo)
+                # Livro indexado por magic/símbolo/ticket, montado uma vez por snapshot
+                if snapshot is not None:
+                    livro = livro_do_snapshot(snapshot)
+                else:
+                    livro = LivroPosicoes(posicoes_abertas, posicoes_pendentes)
                 
-                magics_abertas = set(p.magic for p in posicoes_abertas if magic_comeca_com(p.magic, prefixo_script))
+                # Filtra apenas as posições com magic prefixo específico
+                magics_abertas = livro.magics(prefixo_script)
                 
                 for magic in magics_abertas:
-                    pos_magic = [p for p in posicoes_abertas if p.magic == magic]
+                    pos_magic = livro.posicoes_do_magic(magic)
                     
                     # Se apenas uma perna do par está aberta
                     if len(pos_magic) == 1:
@@ -1477,9 +1545,8 @@ class SistemaIntegrado:
                         
                         self.log(f"⚠️ Magic {magic}: Apenas uma perna aberta ({ativo_aberto})")
                         
-                        # Busca o par configurado
-                        pares = self.obter_pares_configurados()
-                        depende_atual, independe_atual = pares.get(magic, (None, None))
+                        # Busca o par registrado no envio das ordens
+                        depende_atual, independe_atual = self.obter_par_do_magic(magic, livro)
                         
                         if depende_atual is None or independe_atual is None:
                             self.log(f"[AVISO] Par de ativos não encontrado para magic {magic}. Fechando posição órfã...")
@@ -1487,6 +1554,8 @@ class SistemaIntegrado:
                             self.programar_fechamento_posicao(magic, posicoes_abertas, posicoes_pendentes)
                             continue
                         
+                        acao, ordens_pendentes_indep = acao_perna_unica(livro, magic, ativo_aberto, depende_atual, independe_atual)
+                        
                         # Se o ativo aberto NÃO for o dependente, fecha o restante (independente)
                         if ativo_aberto != depende_atual:
                             self.log(f"📌 Magic={magic}: ativo dependente ({depende_atual}) já foi fechado.")
@@ -1494,16 +1563,17 @@ class SistemaIntegrado:
                             self.programar_fechamento_posicao(magic, posicoes_abertas, posicoes_pendentes)
                         
                         # Se o ativo aberto É o dependente, verifica ordens pendentes do independente
-                        elif ativo_aberto == depende_atual:
-                            ordens_pendentes_indep = [o for o in posicoes_pendentes 
-                                                    if o.symbol == independe_atual and o.magic == magic] if posicoes_pendentes else []
-                            
-                            if ordens_pendentes_indep:
-                                self.log(f"🔄 Magic={magic}: Dependente aberto, convertendo ordem pendente do independente para mercado")
-                                self.converter_ordem_pendente_para_mercado(magic, posicao, ordens_pendentes_indep, independe_atual)
+                        elif acao == 'converter':
+                            self.log(f"🔄 Magic={magic}: Dependente aberto, convertendo ordem pendente do independente para mercado")
+                            self.converter_ordem_pendente_para_mercado(magic, posicao, list(ordens_pendentes_indep), independe_atual)
+                        
+                        # Dependente sem posição nem ordem do independente (perna não enviada ou rejeitada): fecha
+                        else:
+                            self.log(f"⚠️ Magic={magic}: Dependente ({depende_atual}) aberto sem o independente ({independe_atual}). Fechando perna sem hedge...")
+                            self.programar_fechamento_posicao(magic, posicoes_abertas, posicoes_pendentes)
                 
                 # Calcula lucros/prejuízos por magic
-                self.calcular_lucros_por_magic(magics_abertas, posicoes_abertas)
+                self.calcular_lucros_por_magic(magics_abertas, posicoes_abertas, livro)
             else:
                 self.log("✅ Nenhuma posição aberta no momento")
 
@@ -1550,7 +1620,7 @@ class SistemaIntegrado:
                         }
                         
                         # Executa fechamento
-                        result = mt5.order_send(request)
+                        result = enviar_ordem_mt5(request)
                         if result is None:
                             self.log(f"❌ [ERRO] order_send retornou None ao fechar posição ticket={posicao.ticket}")
                             self.log(f"   Último erro: {mt5.last_error()}")
@@ -1576,7 +1646,7 @@ class SistemaIntegrado:
                         }
                         
                         # Executa cancelamento
-                        result = mt5.order_send(request)
+                        result = enviar_ordem_mt5(request)
                         if result is None:
                             self.log(f"❌ [ERRO] order_send retornou None ao cancelar ordem pendente={ordem.ticket}")
                             self.log(f"   Último erro: {mt5.last_error()}")
@@ -1601,7 +1671,7 @@ class SistemaIntegrado:
                     "action": mt5.TRADE_ACTION_REMOVE,
                     "order": ordem.ticket,
                 }
-                result_cancel = mt5.order_send(cancel_request)
+                result_cancel = enviar_ordem_mt5(cancel_request)
                 
                 if result_cancel and result_cancel.retcode == mt5.TRADE_RETCODE_DONE:
                     self.log(f"✅ [OK] Ordem pendente do independente ({independe_atual}) cancelada para magic {magic}")
@@ -1634,7 +1704,7 @@ class SistemaIntegrado:
                 }
                 
                 # Executa ordem a mercado
-                result_envio = mt5.order_send(ordem_mercado)
+                result_envio = enviar_ordem_mt5(ordem_mercado)
                 if result_envio and result_envio.retcode == mt5.TRADE_RETCODE_DONE:
                     self.log(f"✅ [OK] Ordem a mercado enviada para o independente ({independe_atual}) do magic {magic}")
                 else:
@@ -1644,29 +1714,30 @@ class SistemaIntegrado:
         except Exception as e:
             self.log(f"❌ ERRO na conversão de ordem pendente: {str(e)}")
     
-    def calcular_lucros_por_magic(self, magics_abertas, posicoes_abertas):
+    def calcular_lucros_por_magic(self, magics_abertas, posicoes_abertas, livro=None):
         """Calcula lucros/prejuízos por magic - baseado na função calcular_lucro_prejuizo_por_magic do calculo_entradas_v55.py"""
+        import MetaTrader5 as mt5
+        
         self.log("💰 ANÁLISE DE LUCROS/PREJUÍZOS POR MAGIC:")
+        if livro is None:
+            livro = LivroPosicoes(posicoes_abertas)
         
         for magic in magics_abertas:
             lucro_prejuizo = 0.00
             
             # Calcula lucro/prejuízo para cada posição do magic
-            for posicao in posicoes_abertas:
-                if posicao.magic == magic:
-                    import MetaTrader5 as mt5
-                    
-                    symbol = posicao.symbol
-                    type_pos = posicao.type
-                    volume = posicao.volume
-                    open_price = posicao.price_open
-                    close_price = posicao.price_current if posicao.price_current else mt5.symbol_info_tick(symbol).bid
-                    
-                    # Calcula P&L baseado no tipo de posição
-                    if type_pos == mt5.POSITION_TYPE_BUY:
-                        lucro_prejuizo += (close_price - open_price) * volume
-                    else:
-                        lucro_prejuizo += (open_price - close_price) * volume
+            for posicao in livro.posicoes_do_magic(magic):
+                symbol = posicao.symbol
+                type_pos = posicao.type
+                volume = posicao.volume
+                open_price = posicao.price_open
+                close_price = posicao.price_current if posicao.price_current else mt5.symbol_info_tick(symbol).bid
+                
+                # Calcula P&L baseado no tipo de posição
+                if type_pos == mt5.POSITION_TYPE_BUY:
+                    lucro_prejuizo += (close_price - open_price) * volume
+                else:
+                    lucro_prejuizo += (open_price - close_price) * volume
             
             status = "🟢" if lucro_prejuizo > 0 else "🔴" if lucro_prejuizo < 0 else "⚪"
             self.log(f"   Magic {magic}: {status} R$ {lucro_prejuizo:+.2f}")
@@ -1719,7 +1790,9 @@ class SistemaIntegrado:
         import MetaTrader5 as mt5
         
         try:
-            posicoes_abertas = mt5.positions_get()
+            # Snapshot de no máximo 1 s: posições e ticks dos símbolos abertos numa única leitura
+            snapshot = self.obter_snapshot_mt5(idade_maxima=1.0)
+            posicoes_abertas = snapshot.posicoes if snapshot is not None else mt5.positions_get()
             if not posicoes_abertas:
                 return
             
@@ -1738,7 +1811,9 @@ class SistemaIntegrado:
                 if ticket in self.stops_ja_ajustados or sl_atual <= 0:
                     continue
 
-                tick = mt5.symbol_info_tick(symbol)
+                tick = snapshot.tick(pos.symbol) if snapshot is not None else None
+                if tick is None:
+                    tick = mt5.symbol_info_tick(symbol)
                 if not tick:
                     continue
 
@@ -1986,7 +2061,7 @@ class SistemaIntegrado:
                 "type_filling": mt5.ORDER_FILLING_FOK,
             }
 
-            result_mod = mt5.order_send(request_modificacao)
+            result_mod = enviar_ordem_mt5(request_modificacao)
             
             if result_mod and result_mod.retcode == mt5.TRADE_RETCODE_DONE:
                 self.log(f"✅ Ticket {ticket_posicao} ({symbol}): TP ajustado com sucesso")
@@ -2084,7 +2159,7 @@ class SistemaIntegrado:
                 "type_filling": mt5.ORDER_FILLING_FOK,
             }
             
-            result = mt5.order_send(request)
+            result = enviar_ordem_mt5(request)
             if result and result.retcode == mt5.TRADE_RETCODE_DONE:
                 self.log(f"✅ Stop Loss movido para break-even: ticket {pos.ticket}")
             else:
@@ -2118,7 +2193,7 @@ class SistemaIntegrado:
                 "type_filling": mt5.ORDER_FILLING_IOC,
             }
             
-            result = mt5.order_send(request)
+            result = enviar_ordem_mt5(request)
             if result and result.retcode == mt5.TRADE_RETCODE_DONE:
                 self.log(f"✅ Posição fechada: ticket {pos.ticket} ({pos.symbol})")
             else:
@@ -2141,7 +2216,7 @@ class SistemaIntegrado:
                 "comment": "Cancelamento_s_i",
             }
             
-            result = mt5.order_send(request)
+            result = enviar_ordem_mt5(request)
             if result and result.retcode == mt5.TRADE_RETCODE_DONE:
                 self.log(f"✅ Ordem pendente cancelada: ticket {ordem.ticket} ({ordem.symbol})")
             else:
@@ -2179,34 +2254,40 @@ class SistemaIntegrado:
         self.dados_sistema["inicio"] = datetime.now()
         self.dados_sistema["status"] = "Iniciando"
         
-        # Thread principal do sistema de trading - CORRIGIDA
-        thread_trading = threading.Thread(target=self.executar_sistema_original_periodico, name="SistemaTrading", daemon=True)
-        # Thread de monitoramento geral
-        thread_monitor = threading.Thread(target=self.thread_monitoramento, name="Monitoramento")
-        # Thread de monitoramento de posições (pernas órfãs, conversões)
-        thread_monitor_posicoes = threading.Thread(target=self.thread_monitoramento_posicoes, name="MonitoramentoPosicoes")
-        # Thread: Break-even contínuo
-        thread_break_even = threading.Thread(target=self.thread_break_even_continuo, name="BreakEvenContinuo")
-        # Thread: Ajustes programados
-        thread_ajustes = threading.Thread(target=self.thread_ajustes_programados, name="AjustesProgramados")
-        # NOVA Thread: Análise e envio de ordens
-        thread_ordens = threading.Thread(target=self.thread_analise_e_envio_ordens, name="AnaliseEnvioOrdens")
-
-        # Salva as threads como atributos para controle externo (ex: dashboard)
-        self.thread_trading = thread_trading
-        self.thread_monitor = thread_monitor
-        self.thread_monitor_posicoes = thread_monitor_posicoes
-        self.thread_break_even = thread_break_even
-        self.thread_ajustes = thread_ajustes
-        self.thread_ordens = thread_ordens
-
-        # Inicia todas as threads
-        thread_trading.start()
-        thread_monitor.start()
-        thread_monitor_posicoes.start()
-        thread_break_even.start()
-        thread_ajustes.start()
-        thread_ordens.start()  # NOVA thread
+        if getattr(self, 'agendador_eventos', True):
+            # Tarefas disparadas pelo AgendadorBarras (fechamento de barra e horários exatos)
+            self._iniciar_agendador()
+            thread_trading = thread_monitor = thread_monitor_posicoes = self.agendador.thread
+            thread_break_even = thread_ajustes = thread_ordens = self.agendador.thread
+        else:
+            # Thread principal do sistema de trading - CORRIGIDA
+            thread_trading = threading.Thread(target=self.executar_sistema_original_periodico, name="SistemaTrading", daemon=True)
+            # Thread de monitoramento geral
+            thread_monitor = threading.Thread(target=self.thread_monitoramento, name="Monitoramento")
+            # Thread de monitoramento de posições (pernas órfãs, conversões)
+            thread_monitor_posicoes = threading.Thread(target=self.thread_monitoramento_posicoes, name="MonitoramentoPosicoes")
+            # Thread: Break-even contínuo
+            thread_break_even = threading.Thread(target=self.thread_break_even_continuo, name="BreakEvenContinuo")
+            # Thread: Ajustes programados
+            thread_ajustes = threading.Thread(target=self.thread_ajustes_programados, name="AjustesProgramados")
+            # NOVA Thread: Análise e envio de ordens
+            thread_ordens = threading.Thread(target=self.thread_analise_e_envio_ordens, name="AnaliseEnvioOrdens")
+
+            # Salva as threads como atributos para controle externo (ex: dashboard)
+            self.thread_trading = thread_trading
+            self.thread_monitor = thread_monitor
+            self.thread_monitor_posicoes = thread_monitor_posicoes
+            self.thread_break_even = thread_break_even
+            self.thread_ajustes = thread_ajustes
+            self.thread_ordens = thread_ordens
+
+            # Inicia todas as threads
+            thread_trading.start()
+            thread_monitor.start()
+            thread_monitor_posicoes.start()
+            thread_break_even.start()
+            thread_ajustes.start()
+            thread_ordens.start()  # NOVA thread
         
         self.log("✅ Todas as threads iniciadas - Sistema operacional!")
         self.log("🔍 Thread de monitoramento de posições: A cada 30 segundos")
@@ -2262,6 +2343,8 @@ class SistemaIntegrado:
         """Para o sistema"""
         self.running = False
         self.dados_sistema["status"] = "Parando"
+        if self.agendador is not None:
+            self.agendador.parar()
         
         # Salva relatório final
         self.salvar_relatorio()
@@ -2272,7 +2355,8 @@ class SistemaIntegrado:
             relatorio = {
                 "resumo": self.dados_sistema,
                 "duracao_total": str(datetime.now() - self.dados_sistema["inicio"]) if self.dados_sistema["inicio"] else "N/A",
-                "log_completo": self.logs,
+                # Só os últimos registros: o histórico completo fica no arquivo de log rotativo
+                "log_completo": self.logs.ultimos(getattr(self, 'log_registros_relatorio', 500)),
                 "timestamp_relatorio": datetime.now().isoformat(),
                 "configuracoes": {
                     "prefixo_magic": self.prefixo,
@@ -2414,6 +2498,103 @@ class SistemaIntegrado:
             self.log(f"❌ ERRO CRÍTICO na thread Sistema Trading: {str(e)}")
             self.log(f"📋 Traceback: {traceback.format_exc()}")
 
+    def _iniciar_agendador(self):
+        """
+        Registra no AgendadorBarras o trabalho das threads de laço (sistema original, monitoramento,
+        posições, break-even, ajustes programados e análise/envio de ordens) e inicia a thread despachante.
+        Os atributos thread_* passam a apontar para ela, mantendo o status do dashboard.
+        No pregão (com MT5) o ciclo do sistema original fica só com a análise/envio, para
+        executar_sistema_original não rodar duas vezes no mesmo fechamento de barra.
+        """
+        if self.agendador is not None and self.agendador.rodando:
+            return self.agendador
+        agendador = AgendadorBarras(log=self.log)
+
+        try:
+            import MetaTrader5 as mt5
+            mt5_disponivel = True
+        except ImportError:
+            mt5_disponivel = False
+            self.log("⚠️ MetaTrader5 não disponível - agendando apenas sistema original e monitoramento")
+
+        pregao = (getattr(self, 'inicia_pregao', 9), getattr(self, 'finaliza_pregao', 17))
+
+        def analise_cobre(instante):
+            # Com MT5, no pregão o sistema original roda pela análise/envio (mesma função no fechamento da barra)
+            return mt5_disponivel and pregao[0] <= instante.hour < pregao[1]
+
+        def ciclo_sistema_original():
+            if analise_cobre(datetime.now()):
+                return
+            self.log("📊 EXECUTANDO: Ciclo do sistema original")
+            self.executar_sistema_original()
+            self.dados_sistema['execucoes'] += 1
+            self.dados_sistema['ultimo_ciclo'] = datetime.now()
+            self.log(f"✅ CONCLUÍDO: Ciclo #{self.dados_sistema['execucoes']} do sistema original")
+
+        def relatorio_monitoramento():
+            self.log("📋 RELATÓRIO DE MONITORAMENTO:")
+            self.log(f"   ⚡ Execuções: {self.dados_sistema['execucoes']}")
+            self.log(f"   📈 Pares processados: {self.dados_sistema['pares_processados']}")
+            self.log(f"   📝 Ordens enviadas: {self.dados_sistema['ordens_enviadas']}")
+            self.log(f"   🔄 Status: {self.dados_sistema['status']}")
+            if self.dados_sistema['ultimo_ciclo']:
+                tempo_ultimo = (datetime.now() - self.dados_sistema['ultimo_ciclo']).seconds
+                self.log(f"   ⏰ Último ciclo: {tempo_ultimo}s atrás")
+
+        def analise_e_envio():
+            agora = datetime.now()
+            self.log(f"📊 Executando análise às {agora.hour:02d}:{agora.minute:02d} (fechamento de barra)")
+            self.executar_sistema_original()
+            self.dados_sistema['execucoes'] += 1
+            self.dados_sistema['ultimo_ciclo'] = agora
+            self.dados_sistema['status'] = 'Análise executada'
+
+        def uma_vez_por_dia(chave, funcao):
+            # Mesmo controle de ajustes_executados_hoje da thread de ajustes programados
+            def executar():
+                marca = f"{chave}_{datetime.now().strftime('%Y-%m-%d')}"
+                if marca not in self.ajustes_executados_hoje:
+                    funcao()
+                    self.ajustes_executados_hoje.add(marca)
+            return executar
+
+        agendador.intervalo('sistema_original', ciclo_sistema_original,
+                            int(getattr(self, 'intervalo_sistema_original', 300)))
+        agendador.intervalo('monitoramento', relatorio_monitoramento, 120)
+        if mt5_disponivel:
+            # Pequeno atraso após o fechamento para a barra recém-fechada estar disponível no MT5
+            agendador.intervalo('analise_envio_ordens', analise_e_envio, int(getattr(self, 'intervalo_execucao', 300)),
+                                janela=pregao, atraso_segundos=2)
+            if getattr(self, 'snapshot_mt5', True):
+                # Leitura periódica do snapshot compartilhado (posições/ordens/ticks) pelo próprio agendador
+                servico = obter_servico_snapshot(mt5, getattr(self, 'snapshot_mt5_intervalo', 1.0))
+                agendador.intervalo('snapshot_mt5', servico.atualizar, servico.intervalo)
+            agendador.intervalo('monitoramento_posicoes', self.executar_monitoramento_real, 30)
+            agendador.intervalo('break_even', self.executar_break_even_continuo, 10,
+                                janela=tuple(self.JANELA_BREAK_EVEN))
+            # Horários exatos; se o sistema subir depois, recupera o disparo como a verificação por laço fazia
+            minuto_ajuste = int(self.ajusta_ordens_minuto)
+            agendador.horario('ajuste_posicoes', uma_vez_por_dia('ajuste_posicoes', self.executar_ajuste_posicoes_15h10),
+                              self.horario_ajuste_stops, minuto_ajuste,
+                              tolerancia_segundos=(60 - minuto_ajuste) * 60 - 1)
+            agendador.horario('remove_pendentes', uma_vez_por_dia('remove_pendentes', self.executar_remocao_pendentes),
+                              self.horario_remove_pendentes, 20,
+                              tolerancia_segundos=(24 - self.horario_remove_pendentes) * 3600 - 20 * 60 - 1)
+            agendador.horario('fechamento_total', uma_vez_por_dia('fechamento_total', self.executar_fechamento_total),
+                              self.horario_fechamento_total, 1,
+                              tolerancia_segundos=(24 - self.horario_fechamento_total) * 3600 - 60 - 1)
+
+        agendador.iniciar()
+        # Como as threads de laço, o primeiro ciclo roda logo na partida
+        agendador.executar_agora('analise_envio_ordens' if analise_cobre(datetime.now()) else 'sistema_original')
+        self.agendador = agendador
+        self.thread_trading = self.thread_monitor = self.thread_monitor_posicoes = agendador.thread
+        self.thread_break_even = self.thread_ajustes = self.thread_ordens = agendador.thread
+        for nome, instante in agendador.proximos_disparos().items():
+            self.log(f"⏰ [AGENDADOR] {nome}: próximo disparo às {instante:%d/%m %H:%M:%S}")
+        return agendador
+
     def iniciar_threads_apenas(self):
         """
         Inicia todas as threads do sistema (incluindo SistemaTrading) sem entrar no loop principal.
@@ -2425,29 +2606,33 @@ class SistemaIntegrado:
         self.dados_sistema["inicio"] = datetime.now()
         self.dados_sistema["status"] = "Iniciando"
 
-        # Thread principal do sistema de trading
-        thread_trading = threading.Thread(target=self.executar_sistema_original_periodico, name="SistemaTrading", daemon=True)
-        thread_monitor = threading.Thread(target=self.thread_monitoramento, name="Monitoramento")
-        thread_monitor_posicoes = threading.Thread(target=self.thread_monitoramento_posicoes, name="MonitoramentoPosicoes")
-        thread_break_even = threading.Thread(target=self.thread_break_even_continuo, name="BreakEvenContinuo")
-        thread_ajustes = threading.Thread(target=self.thread_ajustes_programados, name="AjustesProgramados")
-        thread_ordens = threading.Thread(target=self.thread_analise_e_envio_ordens, name="AnaliseEnvioOrdens")
-
-        # Salva as threads como atributos para controle externo (ex: dashboard)
-        self.thread_trading = thread_trading
-        self.thread_monitor = thread_monitor
-        self.thread_monitor_posicoes = thread_monitor_posicoes
-        self.thread_break_even = thread_break_even
-        self.thread_ajustes = thread_ajustes
-        self.thread_ordens = thread_ordens
-
-        # Inicia todas as threads
-        thread_trading.start()
-        thread_monitor.start()
-        thread_monitor_posicoes.start()
-        thread_break_even.start()
-        thread_ajustes.start()
-        thread_ordens.start()
+        if getattr(self, 'agendador_eventos', True):
+            # Uma thread despachante no lugar das seis threads de laço
+            self._iniciar_agendador()
+        else:
+            # Thread principal do sistema de trading
+            thread_trading = threading.Thread(target=self.executar_sistema_original_periodico, name="SistemaTrading", daemon=True)
+            thread_monitor = threading.Thread(target=self.thread_monitoramento, name="Monitoramento")
+            thread_monitor_posicoes = threading.Thread(target=self.thread_monitoramento_posicoes, name="MonitoramentoPosicoes")
+            thread_break_even = threading.Thread(target=self.thread_break_even_continuo, name="BreakEvenContinuo")
+            thread_ajustes = threading.Thread(target=self.thread_ajustes_programados, name="AjustesProgramados")
+            thread_ordens = threading.Thread(target=self.thread_analise_e_envio_ordens, name="AnaliseEnvioOrdens")
+
+            # Salva as threads como atributos para controle externo (ex: dashboard)
+            self.thread_trading = thread_trading
+            self.thread_monitor = thread_monitor
+            self.thread_monitor_posicoes = thread_monitor_posicoes
+            self.thread_break_even = thread_break_even
+            self.thread_ajustes = thread_ajustes
+            self.thread_ordens = thread_ordens
+
+            # Inicia todas as threads
+            thread_trading.start()
+            thread_monitor.start()
+            thread_monitor_posicoes.start()
+            thread_break_even.start()
+            thread_ajustes.start()
+            thread_ordens.start()
 
 
         # Loga status das threads apenas uma vez por ciclo de vida da aplicação
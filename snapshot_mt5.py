@@ -0,0 +1,231 @@
+"""
+Snapshot MT5 - Posições, ordens e ticks lidos uma vez e compartilhados entre threads
+executar_monitoramento_real, executar_break_even_continuo, obter_pares_configurados,
+verificar_operacao_aberta, contar_operacoes_por_prefixo e o dashboard chamavam positions_get() /
+orders_get() / symbol_info_tick() cada um por conta própria, várias vezes por segundo, todos
+disputando a API do terminal (que atende uma chamada por vez). Aqui um único serviço consulta o
+terminal a cada `intervalo` segundos e publica um SnapshotMT5 imutável e carimbado; cada leitor
+pede a idade máxima que aceita e só quando o snapshot está mais velho que isso uma nova leitura é
+feita — uma só, mesmo com várias threads pedindo ao mesmo tempo.
+
+Após enviar/fechar ordens, chame invalidar() para que a próxima leitura vá ao terminal.
+A trava_terminal serializa as chamadas do próprio serviço e pode ser usada por quem envia ordens.
+"""
+
+import threading
+import time
+from datetime import datetime
+from types import MappingProxyType
+
+try:
+    import MetaTrader5 as mt5
+    HAS_MT5 = True
+except ImportError:
+    mt5 = None
+    HAS_MT5 = False
+
+INTERVALO_PADRAO = 1.0
+
+
+class SnapshotMT5:
+    """Fotografia imutável do terminal: posições, ordens pendentes e ticks dos símbolos assinados."""
+
+    __slots__ = ('versao', 'instante', 'horario', 'posicoes', 'ordens', 'ticks')
+
+    def __init__(self, versao, instante, horario, posicoes, ordens, ticks):
+        object.__setattr__(self, 'versao', versao)
+        object.__setattr__(self, 'instante', instante)      # time.monotonic() da leitura
+        object.__setattr__(self, 'horario', horario)        # datetime da leitura (para logs/dashboard)
+        object.__setattr__(self, 'posicoes', tuple(posicoes or ()))
+        object.__setattr__(self, 'ordens', tuple(ordens or ()))
+        object.__setattr__(self, 'ticks', MappingProxyType(dict(ticks or {})))
+
+    def __setattr__(self, nome, valor):
+        raise AttributeError("SnapshotMT5 é imutável")
+
+    @property
+    def idade(self):
+        """Segundos desde a leitura do terminal."""
+        return time.monotonic() - self.instante
+
+    def posicoes_de(self, symbol=None, prefixo=None, magic=None, ticket=None):
+        """Posições filtradas por símbolo, prefixo do magic, magic exato ou ticket (mesmos campos do MT5)."""
+        return tuple(p for p in self.posicoes if _filtra(p, symbol, prefixo, magic, ticket))
+
+    def ordens_de(self, symbol=None, prefixo=None, magic=None, ticket=None):
+        """Ordens pendentes filtradas como em posicoes_de."""
+        return tuple(o for o in self.ordens if _filtra(o, symbol, prefixo, magic, ticket))
+
+    def tick(self, symbol):
+        """Último tick lido do símbolo (None se o símbolo não está assinado ou não tinha tick)."""
+        return self.ticks.get(symbol)
+
+
+def _filtra(item, symbol, prefixo, magic, ticket):
+    if symbol is not None and item.symbol != symbol:
+        return False
+    if prefixo is not None and not str(item.magic).startswith(str(prefixo)):
+        return False
+    if magic is not None and item.magic != magic:
+        return False
+    if ticket is not None and item.ticket != ticket:
+        return False
+    return True
+
+
+class ServicoSnapshotMT5:
+    """
+    Publica SnapshotMT5 a partir de um terminal (módulo MetaTrader5 ou objeto com a mesma API).
+
+    Uso:
+        servico = ServicoSnapshotMT5(intervalo=1.0)
+        servico.assinar_ticks(['PETR4', 'VALE3'])
+        servico.iniciar()                       # leitura periódica em segundo plano (opcional)
+        snap = servico.obter(idade_maxima=2.0)  # cada consumidor escolhe o quão fresco precisa
+        snap.posicoes_de(prefixo='2')
+    """
+
+    def __init__(self, terminal=None, intervalo=INTERVALO_PADRAO, simbolos=(), ticks_posicoes=True, log=print):
+        self.terminal = terminal if terminal is not None else mt5
+        self.intervalo = float(intervalo)
+        self.ticks_posicoes = ticks_posicoes     # lê também o tick dos símbolos com posição/ordem aberta
+        self.log = log
+        self.trava_terminal = threading.RLock()
+        self._trava_publicacao = threading.Condition()
+        self._simbolos = set(simbolos)
+        self._snapshot = None
+        self._versao = 0
+        self._atualizando = False
+        self._invalidado = False
+        self._invalidacoes = 0
+        self._parar = threading.Event()
+        self.thread = None
+        self.estatisticas = {'leituras': 0, 'chamadas_api': 0, 'consultas': 0, 'leituras_sob_demanda': 0,
+                             'erros': 0}
+
+    # ------------------------------------------------------------------ assinaturas
+    def assinar_ticks(self, simbolos):
+        """Inclui símbolos na leitura de ticks (vale a partir da próxima leitura)."""
+        with self._trava_publicacao:
+            novos = set(simbolos) - self._simbolos
+            self._simbolos |= novos
+            if novos:
+                self._invalidado = True
+
+    def cancelar_ticks(self, simbolos):
+        with self._trava_publicacao:
+            self._simbolos -= set(simbolos)
+
+    # ------------------------------------------------------------------ leitura
+    def _ler_terminal(self):
+        with self._trava_publicacao:
+            simbolos = sorted(self._simbolos)
+        with self.trava_terminal:
+            posicoes = self.terminal.positions_get()
+            ordens = self.terminal.orders_get()
+            if self.ticks_posicoes:
+                abertos = {item.symbol for item in (posicoes or ())} | {item.symbol for item in (ordens or ())}
+                simbolos = sorted(set(simbolos) | abertos)
+            ticks = {s: self.terminal.symbol_info_tick(s) for s in simbolos}
+        self.estatisticas['chamadas_api'] += 2 + len(simbolos)
+        return posicoes, ordens, ticks
+
+    def atualizar(self):
+        """Lê o terminal agora e publica um novo snapshot (uma leitura por vez; quem chega durante espera por ela)."""
+        with self._trava_publicacao:
+            while self._atualizando:
+                versao = self._versao
+                while self._atualizando and self._versao == versao:
+                    self._trava_publicacao.wait()
+                # A leitura em andamento começou antes de um invalidar(): essa não serve, lê de novo
+                if not self._invalidado:
+                    return self._snapshot
+            self._atualizando = True
+            invalidacoes = self._invalidacoes
+        snapshot = None
+        try:
+            posicoes, ordens, ticks = self._ler_terminal()
+            with self._trava_publicacao:
+                self._versao += 1
+                snapshot = SnapshotMT5(self._versao, time.monotonic(), datetime.now(), posicoes, ordens, ticks)
+                self._snapshot = snapshot
+                if self._invalidacoes == invalidacoes:
+                    self._invalidado = False
+                self.estatisticas['leituras'] += 1
+        except Exception as e:
+            self.estatisticas['erros'] += 1
+            self.log(f"[SNAPSHOT_MT5] Erro ao ler o terminal: {e}")
+        finally:
+            with self._trava_publicacao:
+                self._atualizando = False
+                self._trava_publicacao.notify_all()
+        return snapshot if snapshot is not None else self._snapshot
+
+    def obter(self, idade_maxima=None):
+        """
+        Snapshot atual. Se não existe, foi invalidado ou tem mais de `idade_maxima` segundos
+        (padrão: 2x o intervalo de leitura), lê o terminal antes de devolver.
+        """
+        if idade_maxima is None:
+            idade_maxima = 2 * self.intervalo
+        self.estatisticas['consultas'] += 1
+        snapshot = self._snapshot
+        if snapshot is None or self._invalidado or snapshot.idade > idade_maxima:
+            self.estatisticas['leituras_sob_demanda'] += 1
+            snapshot = self.atualizar()
+        return snapshot
+
+    def invalidar(self):
+        """Força a próxima consulta a ler o terminal (chamar após order_send / fechamento)."""
+        with self._trava_publicacao:
+            self._invalidacoes += 1
+            self._invalidado = True
+
+    def enviar_ordem(self, request):
+        """order_send pela trava do terminal; invalida o snapshot para a próxima consulta já ver a ordem."""
+        with self.trava_terminal:
+            resultado = self.terminal.order_send(request)
+        self.invalidar()
+        return resultado
+
+    # ------------------------------------------------------------------ leitura periódica
+    def iniciar(self):
+        if self.thread is not None and self.thread.is_alive():
+            return
+        self._parar.clear()
+        self.thread = threading.Thread(target=self._laco, name="SnapshotMT5", daemon=True)
+        self.thread.start()
+
+    def parar(self):
+        self._parar.set()
+
+    def _laco(self):
+        while not self._parar.is_set():
+            snapshot = self._snapshot
+            # Pula a leitura se alguém acabou de forçar uma leitura sob demanda
+            if snapshot is None or self._invalidado or snapshot.idade >= self.intervalo * 0.9:
+                self.atualizar()
+            self._parar.wait(self.intervalo)
+
+
+_servico_padrao = None
+_trava_servico_padrao = threading.Lock()
+
+
+def obter_servico_snapshot(terminal=None, intervalo=INTERVALO_PADRAO):
+    """Serviço compartilhado do processo (criado na primeira chamada; sem leitura periódica até iniciar())."""
+    global _servico_padrao
+    with _trava_servico_padrao:
+        if _servico_padrao is None:
+            _servico_padrao = ServicoSnapshotMT5(terminal=terminal, intervalo=intervalo)
+        return _servico_padrao
+
+
+def snapshot_mt5(idade_maxima=None):
+    """Atalho: snapshot do serviço compartilhado."""
+    return obter_servico_snapshot().obter(idade_maxima)
+
+
+def enviar_ordem_mt5(request):
+    """Atalho: order_send pelo serviço compartilhado (serializado e invalidando o snapshot)."""
+    return obter_servico_snapshot().enviar_ordem(request)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Teste do agendador por fechamento de barra (agendador_barras.py)
+Verifica o cálculo dos próximos disparos, a ordem de execução, cancelamento, não sobreposição e recuperação de horário perdido
+"""
+
+import sys
+import os
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+from agendador_barras import AgendadorBarras, proximo_fechamento_barra, proximo_horario, proximo_multiplo
+
+
+def test_proximos_disparos():
+    """Fechamento de barra alinhado à meia-noite, constantes do MT5 e horários em dias úteis"""
+    print("🧪 Calculando próximos fechamentos e horários...")
+    agora = datetime(2024, 3, 15, 10, 7, 30)            # sexta-feira
+    assert proximo_fechamento_barra(agora, 'M15') == datetime(2024, 3, 15, 10, 15)
+    assert proximo_fechamento_barra(agora, 'H1') == datetime(2024, 3, 15, 11, 0)
+    assert proximo_fechamento_barra(agora, 16385) == datetime(2024, 3, 15, 11, 0)    # mt5.TIMEFRAME_H1
+    assert proximo_fechamento_barra(agora, 'D1') == datetime(2024, 3, 16)
+    # Exatamente no fechamento: o próximo é a barra seguinte
+    assert proximo_fechamento_barra(datetime(2024, 3, 15, 10, 15), 'M15') == datetime(2024, 3, 15, 10, 30)
+    assert proximo_multiplo(agora, 30) == datetime(2024, 3, 15, 10, 8)
+
+    assert proximo_horario(agora, 15, 10) == datetime(2024, 3, 15, 15, 10)
+    # Depois do horário de sexta: próximo dia útil é segunda
+    assert proximo_horario(datetime(2024, 3, 15, 16, 30), 16, 1) == datetime(2024, 3, 18, 16, 1)
+    assert proximo_horario(datetime(2024, 3, 15, 16, 30), 16, 1, dias_uteis=False) == datetime(2024, 3, 16, 16, 1)
+    # Dentro da tolerância: o disparo de hoje ainda vale
+    assert proximo_horario(datetime(2024, 3, 15, 15, 25), 15, 10, tolerancia_segundos=3000) == datetime(2024, 3, 15, 15, 10)
+    assert proximo_horario(datetime(2024, 3, 15, 15, 10), 15, 10) == datetime(2024, 3, 18, 15, 10)
+    print("✅ Próximos disparos corretos")
+
+
+def test_ordem_cancelamento_e_sobreposicao():
+    """Tarefas disparam na ordem dos instantes; cancelada não roda; tarefa lenta não se sobrepõe"""
+    print("🧪 Testando ordem, cancelamento e sobreposição...")
+    agendador = AgendadorBarras(log=lambda msg: None)
+    disparos = []
+    lock = threading.Lock()
+
+    def registrar(nome):
+        def executar():
+            with lock:
+                disparos.append((nome, time.monotonic()))
+        return executar
+
+    def lenta():
+        registrar('lenta')()
+        time.sleep(0.35)
+
+    def uma_vez(segundos):
+        instante = datetime.now() + timedelta(seconds=segundos)
+        return lambda agora: instante if agora < instante else agora + timedelta(days=1)
+
+    agendador.agendar('b', registrar('b'), uma_vez(0.2))
+    agendador.agendar('a', registrar('a'), uma_vez(0.1))
+    agendador.agendar('cancelada', registrar('cancelada'), lambda agora: agora + timedelta(seconds=0.15))
+    agendador.agendar('lenta', lenta, lambda agora: agora + timedelta(seconds=0.1))
+    agendador.iniciar()
+    assert agendador.cancelar('cancelada') and not agendador.cancelar('inexistente')
+    time.sleep(1.0)
+    agendador.parar(aguardar=True)
+
+    nomes = [nome for nome, _ in disparos]
+    assert nomes.index('a') < nomes.index('b')
+    assert 'cancelada' not in nomes
+    estatisticas = agendador.estatisticas()
+    assert estatisticas['a']['execucoes'] == 1 and estatisticas['b']['execucoes'] == 1
+    # A cada 0.1 s por ~1 s, mas cada execução leva 0.35 s: as vencidas durante a execução são puladas
+    assert 2 <= estatisticas['lenta']['execucoes'] <= 3 and estatisticas['lenta']['puladas'] >= 4
+    print(f"📊 lenta: {estatisticas['lenta']}")
+    print("✅ Ordem, cancelamento e não sobreposição OK")
+
+
+def test_horario_recupera_e_janela():
+    """Horário perdido dentro da tolerância dispara na partida; fora da janela a tarefa não roda"""
+    print("🧪 Testando recuperação de horário perdido e janela de pregão...")
+    agora = datetime.now()
+    passado = agora - timedelta(minutes=1)
+    agendador = AgendadorBarras(log=lambda msg: None)
+    executados = []
+    agendador.horario('recupera', lambda: executados.append('recupera'), passado.hour, passado.minute,
+                      dias_uteis=False, tolerancia_segundos=600)
+    agendador.horario('perdido', lambda: executados.append('perdido'), passado.hour, passado.minute,
+                      dias_uteis=False)
+    fora = ((agora.hour + 2) % 24, (agora.hour + 3) % 24 or 24)
+    agendador.intervalo('fora_janela', lambda: executados.append('fora_janela'), 1, janela=fora)
+    agendador.intervalo('falha', lambda: 1 / 0, 1)
+    proximos = agendador.proximos_disparos()
+    assert proximos['perdido'].date() == (agora + timedelta(days=1)).date()
+    agendador.iniciar()
+    agendador.executar_agora('perdido')
+    time.sleep(1.5)
+    agendador.parar(aguardar=True)
+
+    assert executados.count('recupera') == 1 and executados.count('perdido') == 1
+    assert 'fora_janela' not in executados
+    assert agendador.estatisticas()['falha']['erros'] >= 1
+    # Disparo imediato não cria um segundo agendamento recorrente
+    assert agendador.proximos_disparos()['perdido'] == proximos['perdido']
+    print("✅ Recuperação, janela e erros tratados")
+
+
+if __name__ == "__main__":
+    test_proximos_disparos()
+    test_ordem_cancelamento_e_sobreposicao()
+    test_horario_recupera_e_janela()
+    print("\n✅ Todos os testes do agendador de barras passaram!")
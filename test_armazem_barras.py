@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Teste do armazém de barras com busca incremental (armazem_barras.py)
+Usa uma fonte de barras em memória no formato de mt5.copy_rates_range
+"""
+
+import sys
+import os
+import tempfile
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from datetime import datetime, timezone
+
+from armazem_barras import ArmazemBarras, carregar_historico
+
+DTYPE_MT5 = [('time', '<i8'), ('open', '<f8'), ('high', '<f8'), ('low', '<f8'), ('close', '<f8'),
+             ('tick_volume', '<u8'), ('spread', '<i4'), ('real_volume', '<u8')]
+INICIO = datetime(2024, 1, 1, tzinfo=timezone.utc)
+DIA = 86400
+
+
+class FonteBarras:
+    """Simula copy_rates_range sobre um histórico diário que cresce a cada pregão."""
+
+    def __init__(self, n_barras):
+        self.n_barras = n_barras
+        self.chamadas = []
+
+    def historico(self):
+        barras = np.zeros(self.n_barras, dtype=DTYPE_MT5)
+        barras['time'] = int(INICIO.timestamp()) + DIA * np.arange(self.n_barras)
+        barras['close'] = 10 + np.arange(self.n_barras) * 0.1
+        barras['open'] = barras['close'] - 0.05
+        barras['high'] = barras['close'] + 0.2
+        barras['low'] = barras['close'] - 0.2
+        return barras
+
+    def __call__(self, ativo, timeframe, data_inicio, data_fim):
+        barras = self.historico()
+        selecao = barras[(barras['time'] >= int(data_inicio.timestamp())) &
+                         (barras['time'] <= int(data_fim.timestamp()))]
+        self.chamadas.append((ativo, len(selecao)))
+        return selecao
+
+
+def _referencia(fonte):
+    df = pd.DataFrame(fonte.historico())
+    df['time'] = pd.to_datetime(df['time'], unit='s')
+    return df.set_index('time')
+
+
+def test_busca_incremental():
+    """Após a carga inicial só o delta é buscado e o resultado é igual à busca completa"""
+    print("🧪 Testando busca incremental...")
+    fonte = FonteBarras(300)
+    with tempfile.TemporaryDirectory() as pasta:
+        armazem = ArmazemBarras(pasta, fonte)
+        fim = datetime(2030, 1, 1, tzinfo=timezone.utc)
+        df = armazem.obter('PETR4', 16408, INICIO, fim)
+        pd.testing.assert_frame_equal(df, _referencia(fonte), check_freq=False)
+
+        fonte.n_barras = 302
+        df = armazem.obter('PETR4', 16408, INICIO, fim)
+        assert fonte.chamadas[-1] == ('PETR4', 3)  # última barra armazenada + 2 novas
+        pd.testing.assert_frame_equal(df, _referencia(fonte), check_freq=False)
+
+        # Sem novas barras o mesmo DataFrame é reaproveitado
+        assert armazem.obter('PETR4', 16408, INICIO, fim) is df
+        assert armazem.estatisticas['cargas_completas'] == 1
+    print("✅ Delta anexado sem recarregar o histórico")
+
+
+def test_persistencia_e_validade():
+    """Um novo processo lê do disco; dentro da validade não há consulta ao MT5"""
+    print("🧪 Testando persistência em disco e validade...")
+    fonte = FonteBarras(120)
+    fim = datetime(2030, 1, 1, tzinfo=timezone.utc)
+    with tempfile.TemporaryDirectory() as pasta:
+        ArmazemBarras(pasta, fonte).obter('WIN$', 16408, INICIO, fim)
+        assert os.path.exists(os.path.join(pasta, 'WIN__16408.npy'))
+
+        fonte.chamadas.clear()
+        armazem = ArmazemBarras(pasta, fonte, validade_segundos=60)
+        dados, ultima = {}, {}
+        sem_dados = carregar_historico(armazem, ['WIN$', 'WIN$'], 16408, INICIO, fim, dados, ultima)
+        assert sem_dados == []
+        assert fonte.chamadas == [('WIN$', 1)]
+        assert ultima['WIN$'] == pd.Timestamp(INICIO.replace(tzinfo=None)) + pd.Timedelta(days=119)
+
+        carregar_historico(armazem, ['WIN$'], 16408, INICIO, fim, dados, ultima)
+        assert len(fonte.chamadas) == 1
+    print("✅ Histórico servido do disco e da memória")
+
+
+if __name__ == "__main__":
+    test_busca_incremental()
+    test_persistencia_e_validade()
+    print("\n✅ Todos os testes do armazém de barras passaram!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Teste do cache de estacionariedade (cache_estacionariedade.py)
+Verifica acertos, invalidação por nova barra/alteração da cauda e despejo LRU
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.stattools import adfuller
+
+from cache_estacionariedade import CacheEstacionariedade, impressao_digital
+
+
+def _tornar_estacionaria(serie, max_diffs=1, verbose=False):
+    """Versão contada do tornar_estacionaria de calculo_entradas_v55 (mesmo critério ADF)."""
+    _tornar_estacionaria.chamadas += 1
+    s = serie.dropna()
+    for nd in range(max_diffs + 1):
+        if adfuller(s, autolag='AIC')[1] <= 0.05:
+            return s, nd
+        s = s.diff().dropna()
+    return None, None
+
+
+_tornar_estacionaria.chamadas = 0
+
+
+def _serie(n=300, seed=2):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=n, freq='D')
+    return pd.Series(20 + np.cumsum(rng.normal(0, 0.3, n)), index=index)
+
+
+def test_acerto_e_invalidacao():
+    """Mesma série → acerto; nova barra ou cauda alterada → novo ADF"""
+    print("🧪 Testando acertos e invalidação do cache ADF...")
+    cache = CacheEstacionariedade()
+    serie = _serie()
+    _tornar_estacionaria.chamadas = 0
+
+    estac, nd = cache.tornar_estacionaria('PETR4', 16408, serie, _tornar_estacionaria)
+    estac2, nd2 = cache.tornar_estacionaria('PETR4', 16408, serie.copy(), _tornar_estacionaria)
+    assert _tornar_estacionaria.chamadas == 1 and cache.acertos == 1
+    assert estac2 is estac and nd2 == nd
+
+    # Segunda seleção: mesmo ativo, outro timeframe → chave diferente
+    cache.tornar_estacionaria('PETR4', 16385, serie, _tornar_estacionaria)
+    assert _tornar_estacionaria.chamadas == 2
+
+    alterada = serie.copy()
+    alterada.iloc[-1] += 0.5
+    cache.tornar_estacionaria('PETR4', 16408, alterada, _tornar_estacionaria)
+    assert _tornar_estacionaria.chamadas == 3
+
+    nova_barra = pd.concat([serie, pd.Series([serie.iloc[-1]], index=[serie.index[-1] + pd.Timedelta(days=1)])])
+    assert impressao_digital('PETR4', 16408, nova_barra) != impressao_digital('PETR4', 16408, serie)
+    print("✅ Cache reaproveita séries iguais e invalida séries alteradas")
+
+
+def test_despejo_lru():
+    """Acima da capacidade o item menos usado recentemente sai"""
+    print("🧪 Testando despejo LRU...")
+    cache = CacheEstacionariedade(capacidade=2)
+    serie = _serie(n=120)
+    for ativo in ('A', 'B'):
+        cache.tornar_estacionaria(ativo, 1, serie, _tornar_estacionaria)
+    cache.tornar_estacionaria('A', 1, serie, _tornar_estacionaria)   # A passa a ser o mais recente
+    cache.tornar_estacionaria('C', 1, serie, _tornar_estacionaria)   # despeja B
+    assert len(cache) == 2
+    chamadas = _tornar_estacionaria.chamadas
+    cache.tornar_estacionaria('A', 1, serie, _tornar_estacionaria)
+    assert _tornar_estacionaria.chamadas == chamadas
+    cache.tornar_estacionaria('B', 1, serie, _tornar_estacionaria)
+    assert _tornar_estacionaria.chamadas == chamadas + 1
+    print("✅ Despejo LRU correto")
+
+
+if __name__ == "__main__":
+    test_acerto_e_invalidacao()
+    test_despejo_lru()
+    print("\n✅ Todos os testes do cache de estacionariedade passaram!")
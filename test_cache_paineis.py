@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Teste do cache de painéis (cache_paineis.py)
+Verifica que o modelo de um painel só é refeito quando a versão dos dados ou os filtros mudam, que as tabelas
+salvas só são relidas quando o arquivo muda e que o índice de IDs dos pares devolve o mesmo que a busca direta
+"""
+
+import sys
+import os
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from cache_paineis import IndiceIdsPares, carregar_tabela_memorizada, indice_ids_pares, memorizar, obter_cache_paineis
+from publicacao_snapshots import PublicadorSnapshots
+
+
+def test_modelo_por_versao_e_filtros():
+    """Mesma versão e filtros reaproveitam o modelo; versão nova ou outro filtro reconstroem"""
+    print("🧪 Testando memoização por versão e filtros...")
+    construcoes = []
+
+    def construir(rotulo):
+        construcoes.append(rotulo)
+        return {'rotulo': rotulo}
+
+    for _ in range(20):                           # autorefresh sem mudança nos dados
+        modelo = memorizar('teste_historico', 7, lambda: construir('v7'), sessao=1, resultado='Todos')
+    assert modelo == {'rotulo': 'v7'} and construcoes == ['v7']
+
+    memorizar('teste_historico', 7, lambda: construir('lucro'), sessao=1, resultado='Lucro')
+    memorizar('teste_historico', 7, lambda: construir('outra sessão'), sessao=2, resultado='Todos')
+    assert memorizar('teste_historico', 7, lambda: construir('x'), sessao=1, resultado='Todos')['rotulo'] == 'v7'
+    memorizar('teste_historico', 8, lambda: construir('v8'), sessao=1, resultado='Todos')
+    assert memorizar('teste_historico', 8, lambda: construir('x'), sessao=1, resultado='Todos')['rotulo'] == 'v8'
+    assert construcoes == ['v7', 'lucro', 'outra sessão', 'v8']
+
+    # Versão None (dado sem versão) nunca usa o cache
+    memorizar('teste_sem_versao', None, lambda: construir('a'))
+    memorizar('teste_sem_versao', None, lambda: construir('b'))
+    assert construcoes[-2:] == ['a', 'b']
+    assert len(obter_cache_paineis()) <= obter_cache_paineis().capacidade
+    print("✅ Memoização por versão e filtros OK")
+
+
+def test_tabela_relida_so_quando_arquivo_muda():
+    """carregar_tabela_memorizada relê só com mtime/tamanho novos e devolve DataFrame somente leitura"""
+    print("🧪 Testando leitura memorizada das tabelas salvas...")
+    with tempfile.TemporaryDirectory() as pasta:
+        nome = os.path.join(pasta, 'tabela_linha_operacao01')
+        assert carregar_tabela_memorizada(nome) is None
+        pd.DataFrame({'ID': [1, 2], 'Dependente': ['PETR4', 'VALE3']}).to_pickle(nome + '.pkl')
+        primeira = carregar_tabela_memorizada(nome)
+        assert carregar_tabela_memorizada(nome) is primeira
+        try:
+            primeira.loc[0, 'ID'] = 99
+            assert False, "tabela compartilhada aceitou escrita"
+        except ValueError:
+            pass
+
+        time.sleep(0.01)
+        pd.DataFrame({'ID': [1, 2, 3], 'Dependente': ['PETR4', 'VALE3', 'ITUB4']}).to_pickle(nome + '.pkl')
+        segunda = carregar_tabela_memorizada(nome)
+        assert segunda is not primeira and len(segunda) == 3
+
+        # Snapshot publicado com a mesma tabela memorizada: sem cópia e sem versão nova
+        publicador = PublicadorSnapshots()
+        v1 = publicador.publicar(tabela_linha_operacao01=segunda)
+        assert v1['tabela_linha_operacao01'] is segunda
+        assert publicador.publicar(tabela_linha_operacao01=carregar_tabela_memorizada(nome)) is v1
+    print("✅ Leitura memorizada OK")
+
+
+def test_indice_ids_pares():
+    """Índice devolve os mesmos IDs da busca do dashboard e é reaproveitado enquanto as tabelas não mudam"""
+    print("🧪 Testando índice de IDs dos pares...")
+    tabela01 = pd.DataFrame({'ID': [11, 12, 13], 'Dependente': ['PETR4', 'VALE3', 'PETR4'],
+                             'Independente': ['PETR3', 'BRAP4', 'PRIO3']})
+    tabela0 = pd.DataFrame({'ID': [21, 22], 'Dependente': ['ITUB4', 'BBDC4'], 'Independente': ['BBDC4', 'SANB11']})
+    indice = IndiceIdsPares(tabela01, tabela0)
+
+    assert indice.por_simbolo('PETR4') == 11
+    assert indice.por_simbolo('PETR4', 13) == 13
+    assert indice.por_simbolo('SANB11', 5) == 22
+    assert indice.por_simbolo('WEGE3', 5) == 5 and indice.por_simbolo('WEGE3') == "N/A"
+    assert indice.por_par_string('VALE3/BRAP4') == 12
+    assert indice.por_par('ITUB4', 'BBDC4') == 21
+    assert indice.por_par('vale3', 'brap4', ignorar_caixa=True) == 12 and indice.por_par('vale3', 'brap4') == "N/A"
+    assert indice.por_par_string('SEMBARRA') == "N/A"
+    for _ in range(50):
+        indice.por_simbolo('PETR4', 13)
+    assert indice.consultas == 59 and len(indice._resultados) == 9
+
+    publicador = PublicadorSnapshots()
+    snapshot = publicador.publicar(tabela_linha_operacao01=tabela01, tabela_linha_operacao=tabela0)
+    primeiro = indice_ids_pares(snapshot, sessao='teste')
+    mesmo = indice_ids_pares(publicador.publicar(tabela_linha_operacao01=tabela01.copy()), sessao='teste')
+    assert mesmo is primeiro
+    novo = indice_ids_pares(publicador.publicar(tabela_linha_operacao01=tabela01.iloc[1:]), sessao='teste')
+    assert novo is not primeiro and novo.por_simbolo('PETR4') == 13
+    print("✅ Índice de IDs dos pares OK")
+
+
+if __name__ == "__main__":
+    test_modelo_por_versao_e_filtros()
+    test_tabela_relida_so_quando_arquivo_muda()
+    test_indice_ids_pares()
+    print("\n✅ Todos os testes do cache de painéis passaram!")
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Teste do cache persistente em .npz (cache_persistente.py)
+Verifica ida e volta dos valores, leitura preguiçosa, TTL, corrupção isolada e migração do pickle
+"""
+
+import sys
+import os
+import json
+import pickle
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from cache_persistente import ARQUIVO_INDICE, CachePersistente, migrar_pickle
+
+
+class ModeloAjustado:
+    """Objeto não numérico (como um resultado do statsmodels), que não deve ir para o disco."""
+
+
+def _resultado_regressao(k):
+    return (pd.Timestamp('2024-05-02 10:15') + pd.Timedelta(minutes=15 * k), 31.2 + k, 31.9, 30.8, np.float64(12.5),
+            None, 3, True, np.nan)
+
+
+def test_ida_e_volta_e_leitura_preguicosa():
+    """Tuplas e dicts voltam iguais, sem os modelos; reabrir lê só o índice"""
+    print("🧪 Testando gravação e leitura preguiçosa...")
+    with tempfile.TemporaryDirectory() as pasta:
+        cache = CachePersistente(pasta)
+        for k in range(50):
+            cache[('PETR4', f'ATV{k}', 120)] = _resultado_regressao(k)
+        cache['VALE3'] = {'model_close': ModeloAjustado(), 'pred_close': 61.4, 'std_close': 0.8,
+                          'data_da_previsao': pd.Timestamp('2024-05-02')}
+        cache.salvar()
+        assert len([n for n in os.listdir(pasta) if n.endswith('.npz')]) == 51
+
+        reaberto = CachePersistente(pasta)
+        assert len(reaberto) == 51 and reaberto.estatisticas['leituras'] == 0
+        assert ('PETR4', 'ATV7', 120) in reaberto
+        valor = reaberto[('PETR4', 'ATV7', 120)]
+        esperado = _resultado_regressao(7)
+        assert isinstance(valor, tuple) and len(valor) == len(esperado)
+        assert valor[0] == esperado[0] and valor[5] is None and valor[6] == 3 and valor[7] is True
+        assert np.allclose(valor[1:5], esperado[1:5]) and np.isnan(valor[8])
+        assert reaberto['VALE3'] == {'pred_close': 61.4, 'std_close': 0.8, 'data_da_previsao': pd.Timestamp('2024-05-02')}
+        assert reaberto.estatisticas['leituras'] == 2
+    print("✅ Valores numéricos persistidos e lidos sob demanda")
+
+
+def test_ttl_corrupcao_e_versao():
+    """Entradas vencidas saem; arquivo corrompido só perde a própria chave; esquema diferente é descartado"""
+    print("🧪 Testando TTL, corrupção isolada e versão do esquema...")
+    with tempfile.TemporaryDirectory() as pasta:
+        cache = CachePersistente(pasta, ttl_segundos=3600)
+        cache['A'] = 1.0
+        cache['B'] = 2.0
+        cache.salvar()
+
+        # Envelhece 'A' no índice
+        caminho_indice = os.path.join(pasta, ARQUIVO_INDICE)
+        with open(caminho_indice, encoding='utf-8') as f:
+            indice = json.load(f)
+        nome_a = [n for n, e in indice['entradas'].items() if e['chave'] == 'A'][0]
+        indice['entradas'][nome_a]['ts'] = time.time() - 7200
+        with open(caminho_indice, 'w', encoding='utf-8') as f:
+            json.dump(indice, f)
+
+        reaberto = CachePersistente(pasta, ttl_segundos=3600)
+        assert 'A' not in reaberto and reaberto['B'] == 2.0
+        reaberto.salvar()
+        assert not os.path.exists(os.path.join(pasta, nome_a))
+
+        reaberto['C'] = 3.0
+        reaberto.salvar()
+        nome_b = [n for n, e in json.load(open(caminho_indice, encoding='utf-8'))['entradas'].items() if e['chave'] == 'B'][0]
+        with open(os.path.join(pasta, nome_b), 'wb') as f:
+            f.write(b'corrompido')
+        terceiro = CachePersistente(pasta, ttl_segundos=3600)
+        assert terceiro.get('B') is None and terceiro['C'] == 3.0
+        assert terceiro.estatisticas['corrompidas'] == 1
+
+        with open(caminho_indice, 'w', encoding='utf-8') as f:
+            json.dump({'versao': 0, 'entradas': {}}, f)
+        assert len(CachePersistente(pasta)) == 0
+    print("✅ Expiração, corrupção e versão tratadas por entrada")
+
+
+def test_migracao_do_pickle():
+    """Pickle antigo é importado uma vez e renomeado"""
+    print("🧪 Testando migração do pickle antigo...")
+    with tempfile.TemporaryDirectory() as pasta:
+        antigo = {('PETR4', 'VALE3', 120): _resultado_regressao(0)}
+        caminho = os.path.join(pasta, 'cache_regressoes.pkl')
+        with open(caminho, 'wb') as f:
+            pickle.dump(antigo, f)
+        cache = CachePersistente(os.path.join(pasta, 'cache_regressoes'))
+        assert migrar_pickle(caminho, cache) == 1
+        assert os.path.exists(caminho + '.migrado') and not os.path.exists(caminho)
+        assert CachePersistente(os.path.join(pasta, 'cache_regressoes'))[('PETR4', 'VALE3', 120)][1] == 31.2
+    print("✅ Migração concluída")
+
+
+if __name__ == "__main__":
+    test_ida_e_volta_e_leitura_preguicosa()
+    test_ttl_corrupcao_e_versao()
+    test_migracao_do_pickle()
+    print("\n✅ Todos os testes do cache persistente passaram!")
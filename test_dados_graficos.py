@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Teste da camada de dados dos gráficos (dados_graficos.py)
+Verifica que LTTB e min-max limitam o número de pontos preservando extremos e forma da série,
+a união de índices para várias séries no mesmo eixo e o cache de figuras por versão dos dados
+"""
+
+import sys
+import os
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from dados_graficos import CacheFiguras, lttb, minmax, reduzir_dataframe, reduzir_indices
+
+
+def test_reducao_preserva_extremos_e_forma():
+    """Séries longas reduzidas ao alvo sem perder picos, vales, primeiro e último ponto"""
+    print("🧪 Testando LTTB e min-max...")
+    rng = np.random.default_rng(11)
+    n = 200_000
+    x = np.arange(n, dtype=np.float64)
+    y = np.cumsum(rng.normal(0, 1, n))
+    y[123_456] = y.max() + 500          # pico isolado
+    y[54_321] = y.min() - 500           # vale isolado
+
+    indices = minmax(y, 1000)
+    assert len(indices) <= 1000 and indices[0] == 0 and indices[-1] == n - 1
+    assert 123_456 in indices and 54_321 in indices
+    assert np.all(np.diff(indices) > 0)
+
+    indices = lttb(x, y, 1000)
+    assert len(indices) == 1000 and indices[0] == 0 and indices[-1] == n - 1
+    assert np.all(np.diff(indices) > 0)
+    assert 123_456 in indices and 54_321 in indices      # maior triângulo do balde é o ponto isolado
+    # Forma: a série reduzida interpolada fica perto da original
+    reconstruida = np.interp(x, x[indices], y[indices])
+    assert np.abs(reconstruida - y).mean() < 0.1 * y.std()
+
+    curta = np.arange(50, dtype=np.float64)
+    assert len(lttb(curta, curta, 1000)) == 50 and len(minmax(curta, 1000)) == 50
+    print(f"📊 {n} pontos → {len(indices)} (erro médio {np.abs(reconstruida - y).mean():.3f})")
+    print("✅ Redução preserva extremos e forma")
+
+
+def test_varias_series_e_dataframe():
+    """Degraus do balance sobrevivem à redução conjunta com a equity; eixo datetime aceito"""
+    print("🧪 Testando redução conjunta de séries...")
+    n = 50_000
+    inicio = datetime(2025, 6, 2, 10, 0)
+    rng = np.random.default_rng(2)
+    equity = 10000 + np.cumsum(rng.normal(0, 5, n))
+    balance = np.full(n, 10000.0)
+    balance[31_337:] += 250.0            # um único degrau (trade fechado)
+    df = pd.DataFrame({'timestamp': [inicio + timedelta(seconds=i) for i in range(n)],
+                       'equity': equity, 'balance': balance, 'profit': equity - balance})
+
+    reduzido = reduzir_dataframe(df, ['equity', 'balance', 'profit'], 1500, 'minmax', coluna_x='timestamp')
+    assert len(reduzido) <= 1500 and set(reduzido['balance']) == {10000.0, 10250.0}
+    assert reduzido['equity'].max() == equity.max() and reduzido['equity'].min() == equity.min()
+    reduzido = reduzir_dataframe(df, ['equity', 'balance'], 1500, 'lttb', coluna_x='timestamp')
+    assert len(reduzido) <= 1500 and reduzido['timestamp'].is_monotonic_increasing
+    assert reduzir_dataframe(df.head(100), ['equity'], 1500) is not None
+    assert len(reduzir_indices(np.arange(10), [np.arange(10)], 1500)) == 10
+    print("✅ Redução conjunta OK")
+
+
+def test_cache_figuras_por_versao():
+    """Mesma versão reaproveita a figura; versão nova reconstrói e descarta a antiga"""
+    print("🧪 Testando cache de figuras...")
+    cache = CacheFiguras(capacidade=3)
+    construcoes = []
+
+    def construir(rotulo):
+        def _construir():
+            construcoes.append(rotulo)
+            return {'figura': rotulo}
+        return _construir
+
+    primeira = cache.obter('equity', (1, 1500), construir('v1'))
+    assert cache.obter('equity', (1, 1500), construir('v1')) is primeira and construcoes == ['v1']
+    assert cache.obter('equity', (2, 1500), construir('v2'))['figura'] == 'v2'
+    assert len(cache) == 1 and cache.buscar('equity', (1, 1500)) is None
+    cache.obter('sem_versao', None, construir('x'))
+    cache.obter('sem_versao', None, construir('x'))
+    assert construcoes.count('x') == 2 and len(cache) == 1
+    for nome in ('a', 'b', 'c'):
+        cache.obter(nome, 1, construir(nome))
+    assert len(cache) == 3 and cache.buscar('equity', (2, 1500)) is None    # LRU respeita a capacidade
+    print(f"📊 acertos={cache.acertos} faltas={cache.faltas}")
+    print("✅ Cache de figuras OK")
+
+
+if __name__ == "__main__":
+    test_reducao_preserva_extremos_e_forma()
+    test_varias_series_e_dataframe()
+    test_cache_figuras_por_versao()
+    print("\n✅ Todos os testes dos dados de gráficos passaram!")
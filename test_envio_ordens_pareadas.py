@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Teste do envio de ordens pareadas (envio_ordens_pareadas.py)
+Verifica a validação pelo livro de posições, a sequência das pernas, o tratamento de falha em cada perna
+e as métricas de latência, slippage e intervalo entre pernas
+"""
+
+import sys
+import os
+import time
+from collections import namedtuple
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from envio_ordens_pareadas import EnvioPareado, formatar_metricas_par, validar_pernas
+from livro_posicoes import LivroPosicoes
+
+Posicao = namedtuple('Posicao', 'ticket symbol magic type')
+Resultado = namedtuple('Resultado', 'retcode price order')
+Tick = namedtuple('Tick', 'bid ask')
+Snapshot = namedtuple('Snapshot', 'versao ticks')
+Snapshot.tick = lambda self, symbol: self.ticks.get(symbol)
+
+BUY_LIMIT, SELL_LIMIT, BUY, SELL = 2, 3, 0, 1
+
+
+def _ordem(symbol, tipo, preco, magic=20001):
+    return {'symbol': symbol, 'type': tipo, 'price': preco, 'volume': 100, 'magic': magic}
+
+
+class Corretora:
+    """Função de envio de teste: responde com o retcode configurado por símbolo e guarda a ordem dos envios."""
+
+    def __init__(self, retcodes=None, precos=None, atraso=0.002):
+        self.retcodes = retcodes or {}
+        self.precos = precos or {}
+        self.atraso = atraso
+        self.enviados = []
+
+    def __call__(self, request):
+        time.sleep(self.atraso)
+        self.enviados.append(request['symbol'])
+        retcode = self.retcodes.get(request['symbol'], 10009)
+        if retcode is None:
+            return None
+        return Resultado(retcode, self.precos.get(request['symbol'], 0.0), len(self.enviados))
+
+
+def test_validacao_pelo_livro():
+    """Posição ou ordem já existente no dependente e magic repetido bloqueiam o envio"""
+    print("🧪 Testando validação pré-envio pelo livro de posições...")
+    livro = LivroPosicoes([Posicao(1, 'PETR4', 20001, 0), Posicao(2, 'VALE3', 30001, 1)],
+                          [Posicao(3, 'ITUB4', 20002, 2)])
+    assert validar_pernas(livro, 'PETR4', 20009) == (False, "já existe posição aberta para PETR4")
+    assert validar_pernas(livro, 'ITUB4', 20009)[0] is False
+    assert validar_pernas(livro, 'BBDC4', 20001) == (False, "magic 20001 já em uso")
+    # Posição de outro script (prefixo diferente) não bloqueia quando o prefixo é informado
+    assert validar_pernas(livro, 'VALE3', 20009, prefixo='2') == (True, None)
+    assert validar_pernas(livro, 'VALE3', 20009)[0] is False
+    print("✅ Validação pelo livro OK")
+
+
+def test_pernas_em_sequencia_e_metricas():
+    """Independente sai logo após a dependente aceita; latência, slippage e intervalo registrados"""
+    print("🧪 Testando envio das duas pernas e métricas...")
+    corretora = Corretora(precos={'PETR4': 30.02, 'VALE3': 60.00})
+    envio = EnvioPareado(corretora, log=lambda msg: None)
+    snapshot = Snapshot(5, {'PETR4': Tick(29.99, 30.01), 'VALE3': Tick(60.05, 60.07)})
+    par = envio.enviar_par(_ordem('PETR4', BUY, 30.00), _ordem('VALE3', SELL, 60.04), snapshot=snapshot)
+
+    assert par['sucesso'] and par['falha'] is None and corretora.enviados == ['PETR4', 'VALE3']
+    dep, ind = par['pernas']
+    assert dep['latencia_ms'] >= 2.0 and ind['latencia_ms'] >= 2.0
+    assert 0.0 <= par['intervalo_pernas_ms'] < 1.0
+    # Compra executada 0.02 acima do pedido (pior), venda 0.04 abaixo (pior): slippage positivo nos dois
+    assert abs(dep['slippage'] - 0.02) < 1e-9 and abs(ind['slippage'] - 0.04) < 1e-9
+    # Referência do snapshot: ask para a compra, bid para a venda
+    assert dep['preco_referencia'] == 30.01 and ind['preco_referencia'] == 60.05
+    assert par['versao_snapshot'] == 5
+    print(f"📊 {formatar_metricas_par(par)}")
+    print("✅ Pernas em sequência com métricas")
+
+
+def test_falhas_por_perna():
+    """Dependente recusada não envia a independente; falha na independente é reportada como perna incompleta"""
+    print("🧪 Testando falha em cada perna...")
+    recusa_dep = Corretora(retcodes={'PETR4': 10006})
+    envio = EnvioPareado(recusa_dep, log=lambda msg: None)
+    registrados = []
+    par = envio.enviar_par(_ordem('PETR4', BUY_LIMIT, 30.0), _ordem('VALE3', SELL_LIMIT, 60.0),
+                           antes_segunda=lambda: registrados.append('PETR4/VALE3'))
+    assert not par['sucesso'] and par['falha'] == 'dependente' and recusa_dep.enviados == ['PETR4']
+    assert registrados == []              # magic não é registrado sem a dependente aceita
+
+    sem_resposta = Corretora(retcodes={'VALE3': None})
+    passos = []
+    envio = EnvioPareado(sem_resposta, log=lambda msg: None)
+    par = envio.enviar_par(_ordem('PETR4', BUY_LIMIT, 30.0), _ordem('VALE3', SELL_LIMIT, 60.0),
+                           antes_segunda=lambda: passos.append(list(sem_resposta.enviados)))
+    assert par['falha'] == 'independente' and par['resultado_ind'] is None
+    assert passos == [['PETR4']]          # passo entre pernas roda depois da dependente e antes da independente
+    assert par['pernas'][0]['slippage'] is None     # ordem pendente sem preço executado
+
+    for _ in range(3):
+        envio.enviar_par(_ordem('ITUB4', BUY_LIMIT, 25.0), _ordem('BBDC4', SELL_LIMIT, 15.0))
+    resumo = envio.resumo()
+    assert resumo['pares'] == 4 and resumo['pernas_incompletas'] == 1
+    assert resumo['latencia_dep_ms']['n'] == 4 and resumo['intervalo_pernas_ms']['n'] == 4
+    print(f"📊 {resumo['latencia_dep_ms']}")
+    print("✅ Falhas por perna tratadas")
+
+
+if __name__ == "__main__":
+    test_validacao_pelo_livro()
+    test_pernas_em_sequencia_e_metricas()
+    test_falhas_por_perna()
+    print("\n✅ Todos os testes do envio de ordens pareadas passaram!")
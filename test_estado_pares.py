@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Teste do estado incremental de pares (estado_pares.py)
+Compara regressão, half-life e z-score incrementais com o recálculo completo de calcular_zscore_par
+"""
+
+import sys
+import os
+import warnings
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+from estado_pares import RastreadorPares
+from triagem_pares import _zscore_completo, calcular_zscore_par
+
+
+def _par(n=600, seed=0, phi=0.9):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-02 10:00', periods=n, freq='15min')
+    fator = 30 + np.cumsum(rng.normal(0, 0.2, n))
+    ruido = np.zeros(n)
+    for t in range(1, n):
+        ruido[t] = phi * ruido[t - 1] + rng.normal(0, 0.3)
+    return pd.Series(fator, index=index), pd.Series(5 + 0.8 * fator + ruido, index=index)
+
+
+def _atualizar(rastreador, x, y):
+    return rastreador.atualizar('PETR4xVALE3', x.index.to_numpy(), x.to_numpy(), y.to_numpy())
+
+
+def test_incremental_igual_recalculo():
+    """Janela rolando barra a barra: OLS, half-life e z-score iguais ao recálculo completo"""
+    print("🧪 Comparando estado incremental com o recálculo completo...")
+    x, y = _par()
+    rastreador = RastreadorPares(rebase_barras=50)
+    for fim in range(250, 600):
+        xs, ys = x.iloc[fim - 200:fim], y.iloc[fim - 200:fim]
+        estado = _atualizar(rastreador, xs, ys)
+        alpha, beta, r2 = estado.regressao()
+        modelo = sm.OLS(ys, sm.add_constant(xs)).fit()
+        assert np.allclose([alpha, beta, r2], [modelo.params.iloc[0], modelo.params.iloc[1], modelo.rsquared],
+                           rtol=1e-9)
+        half_life, zscore, media = _zscore_completo(ys - (alpha + beta * xs))
+        obtido = rastreador.zscore(estado, alpha, beta)
+        assert np.allclose(obtido[:3], [half_life, zscore, media], rtol=1e-9, atol=1e-10)
+    # 350 barras: a base inicial e uma nova a cada 50 barras anexadas; o resto em O(1)
+    assert rastreador.estatisticas['completos'] == 7
+    print(f"📊 {rastreador.estatisticas}")
+    print("✅ Estado incremental idêntico ao recálculo")
+
+
+def test_barra_em_formacao_lacuna_e_deriva():
+    """Última barra revisada, janela não contínua e beta distante da base"""
+    print("🧪 Testando barra em formação, lacuna e deriva do beta...")
+    x, y = _par(seed=4)
+    rastreador = RastreadorPares()
+    _atualizar(rastreador, x.iloc[:200], y.iloc[:200])
+
+    # Mesma barra final com outro valor (barra em formação): substitui sem recálculo
+    y_formacao = y.iloc[1:201].copy()
+    y_formacao.iloc[-1] += 0.7
+    _atualizar(rastreador, x.iloc[1:201], y_formacao)
+    estado = _atualizar(rastreador, x.iloc[1:201], y.iloc[1:201])
+    assert rastreador.estatisticas == {'completos': 1, 'incrementais': 2, 'rebases': 0}
+    esperado = _zscore_completo(y.iloc[1:201] - (5 + 0.8 * x.iloc[1:201]))
+    assert np.allclose(rastreador.zscore(estado, 5, 0.8)[:3], esperado, rtol=1e-9)
+
+    # Lacuna (janela que não começa onde deveria) força recálculo completo
+    _atualizar(rastreador, x.iloc[10:220].drop(x.index[15]), y.iloc[10:220].drop(y.index[15]))
+    assert rastreador.estatisticas['completos'] == 2
+
+    # Beta bem diferente da base refaz a base antes do z-score
+    estado = _atualizar(rastreador, x.iloc[20:230], y.iloc[20:230])
+    esperado = _zscore_completo(y.iloc[20:230] - (1.0 + 0.3 * x.iloc[20:230]))
+    assert np.allclose(rastreador.zscore(estado, 1.0, 0.3)[:3], esperado, rtol=1e-9)
+    assert rastreador.estatisticas['rebases'] == 1
+    print("✅ Revisões, lacunas e deriva tratadas")
+
+
+def test_calcular_zscore_par_com_estado():
+    """calcular_zscore_par com estado_incremental deve devolver a mesma tupla do caminho original"""
+    print("🧪 Comparando calcular_zscore_par com e sem estado incremental...")
+    x, y = _par(n=400, seed=7, phi=0.5)
+    series = {'DEP': y, 'IND': x, 'IBOV': x * 4, 'WIN$': x * 5}
+    filtros = dict(enable_zscore_filter=False, enable_r2_filter=False, enable_beta_filter=False,
+                   USE_SPREAD_FORECAST=False)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for fim in (300, 301, 302, 340):
+            recorte = {a: s.iloc[:fim] for a, s in series.items()}
+            original = calcular_zscore_par(recorte, 'DEP', 'IND', 'IBOV', 'WIN$', 120, **filtros)
+            incremental = calcular_zscore_par(recorte, 'DEP', 'IND', 'IBOV', 'WIN$', 120,
+                                              estado_incremental=True, **filtros)
+            assert original is not None and incremental is not None
+            assert np.allclose(original[:8], incremental[:8], rtol=1e-8, atol=1e-10)
+            assert np.isclose(original[15], incremental[15], rtol=1e-9)
+
+        # Filtro de z-score antes do ADF no caminho incremental: mesmos pares aprovados/rejeitados
+        decisoes = set()
+        for fim in range(300, 400, 5):
+            recorte = {a: s.iloc[:fim] for a, s in series.items()}
+            filtro_z = dict(filtros, enable_zscore_filter=True, zscore_min_threshold=-1.0, zscore_max_threshold=1.0)
+            original = calcular_zscore_par(recorte, 'DEP', 'IND', 'IBOV', 'WIN$', 120, **filtro_z)
+            incremental = calcular_zscore_par(recorte, 'DEP', 'IND', 'IBOV', 'WIN$', 120,
+                                              estado_incremental=True, **filtro_z)
+            assert (original is None) == (incremental is None)
+            decisoes.add(original is None)
+        assert decisoes == {True, False}
+    print("✅ Mesma tupla do caminho original")
+
+
+if __name__ == "__main__":
+    test_incremental_igual_recalculo()
+    test_barra_em_formacao_lacuna_e_deriva()
+    test_calcular_zscore_par_com_estado()
+    print("\n✅ Todos os testes do estado incremental de pares passaram!")
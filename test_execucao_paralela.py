@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Teste da execução paralela da triagem (execucao_paralela.py)
+Compara o pool de processos com memória compartilhada contra a execução serial
+"""
+
+import sys
+import os
+import subprocess
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from multiprocessing import shared_memory
+
+from estado_pares import rastreador_pares
+from execucao_paralela import (
+    SeriesCompartilhadas, avaliar_pares_paralelo, encerrar_executor, obter_executores, trabalhador_da_tarefa
+)
+from triagem_pares import triagem_ols_vetorizada
+
+
+def _dados_cointegrados(n_ativos=6, n_barras=260, seed=11):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=n_barras, freq='D')
+    fator = 30 + np.cumsum(rng.normal(0, 0.5, n_barras))
+    dados = {}
+    simbolos = [f'ATV{k}' for k in range(n_ativos)] + ['IBOV', 'WIN$']
+    for k, simbolo in enumerate(simbolos):
+        ruido = np.zeros(n_barras)
+        for t in range(1, n_barras):
+            ruido[t] = 0.6 * ruido[t - 1] + rng.normal(0, 0.3)
+        serie = pd.Series(10 + k + (0.4 + 0.05 * k) * fator + ruido, index=index)
+        dados[simbolo] = {'close': {'serie': None, 'ndiffs': 1, 'raw': serie}}
+    return dados, simbolos[:n_ativos]
+
+
+def _tarefas(dados, ativos, periodos):
+    grade = triagem_ols_vetorizada(dados, ativos, ativos, periodos, ativos_referencia=['IBOV', 'WIN$'])
+    return list(grade[['Dependente', 'Independente', 'Período', 'alpha', 'beta', 'r2']]
+                .itertuples(index=False, name=None))
+
+
+def test_paralelo_igual_serial():
+    """Resultados do pool devem ser idênticos e na mesma ordem da execução serial"""
+    print("🧪 Comparando pool de processos com execução serial...")
+    dados, ativos = _dados_cointegrados()
+    tarefas = _tarefas(dados, ativos, [70, 120, 200])
+    filtros = {'enable_zscore_filter': False, 'enable_beta_filter': False, 'enable_r2_filter': False}
+
+    serial = list(avaliar_pares_paralelo(dados, tarefas, 'IBOV', 'WIN$', n_workers=1, **filtros))
+    paralelo = list(avaliar_pares_paralelo(dados, tarefas, 'IBOV', 'WIN$', n_workers=2, tamanho_lote=7, **filtros))
+    encerrar_executor()
+
+    assert len(serial) == len(paralelo) == len(tarefas)
+    aprovados = 0
+    for a, b in zip(serial, paralelo):
+        assert (a is None) == (b is None)
+        if a is not None:
+            aprovados += 1
+            assert np.allclose(np.array(a, dtype=float), np.array(b, dtype=float), equal_nan=True)
+    print(f"📊 {len(tarefas)} tarefas, {aprovados} pares aprovados")
+    assert aprovados > 0
+    print("✅ Pool determinístico e idêntico ao serial")
+
+
+def test_erro_em_um_par_serial_e_paralelo():
+    """Um par que gera exceção vira None nos dois caminhos (o serial também é o fallback do pool)"""
+    print("🧪 Testando erro em um par no caminho serial e no pool...")
+    dados, ativos = _dados_cointegrados()
+    tarefas = _tarefas(dados, ativos, [70])[:6]
+    dep, ind, periodo = tarefas[2][:3]
+    tarefas[2] = (dep, ind, periodo, 'inválido', 1.0, 0.9)     # parâmetros que quebram o cálculo do resíduo
+    filtros = {'enable_zscore_filter': False, 'enable_beta_filter': False, 'enable_r2_filter': False}
+
+    serial = list(avaliar_pares_paralelo(dados, tarefas, 'IBOV', 'WIN$', n_workers=1, **filtros))
+    paralelo = list(avaliar_pares_paralelo(dados, tarefas, 'IBOV', 'WIN$', n_workers=2, tamanho_lote=2, **filtros))
+    encerrar_executor()
+
+    assert len(serial) == len(paralelo) == len(tarefas)
+    assert serial[2] is None and paralelo[2] is None
+    for a, b in zip(serial, paralelo):
+        assert (a is None) == (b is None)
+    print("✅ Mesmo resultado nos dois caminhos")
+
+
+def _estatisticas_estado():
+    """(Processo trabalhador) Contadores do rastreador de pares deste processo."""
+    return dict(rastreador_pares.estatisticas)
+
+
+def test_pares_fixos_por_processo():
+    """Cada par vai sempre para o mesmo processo: no segundo ciclo todos os estados são incrementais"""
+    print("🧪 Testando afinidade par → processo...")
+    dados, ativos = _dados_cointegrados()
+    tarefas = _tarefas(dados, ativos, [70, 120])
+    assert all(trabalhador_da_tarefa(dep, ind, p, 3) == trabalhador_da_tarefa(dep, ind, p, 3)
+               for dep, ind, p, *_ in tarefas)
+    filtros = {'enable_zscore_filter': False, 'enable_beta_filter': False, 'enable_r2_filter': False,
+               'estado_incremental': True}
+
+    encerrar_executor()
+    # Processos criados por fork herdam os contadores do processo do teste: compara antes/depois
+    antes = [executor.submit(_estatisticas_estado).result() for executor in obter_executores(3)]
+    for _ in range(2):
+        list(avaliar_pares_paralelo(dados, tarefas, 'IBOV', 'WIN$', n_workers=3, tamanho_lote=4, **filtros))
+    depois = [executor.submit(_estatisticas_estado).result() for executor in obter_executores(3)]
+    encerrar_executor()
+
+    def total(contador):
+        return sum(d[contador] - a[contador] for a, d in zip(antes, depois))
+
+    print(f"📊 completos={total('completos')} incrementais={total('incrementais')} tarefas={len(tarefas)}")
+    assert total('completos') == len(tarefas)
+    assert total('incrementais') == len(tarefas)
+    print("✅ Estado de cada par reaproveitado no processo fixo")
+
+
+def test_memoria_compartilhada_liberada():
+    """Os blocos publicados devem refletir as séries e ser liberados ao sair do contexto"""
+    print("🧪 Testando publicação em memória compartilhada...")
+    dados, ativos = _dados_cointegrados(n_ativos=3)
+    with SeriesCompartilhadas(dados, ativos + ['IBOV']) as compartilhadas:
+        descritor = compartilhadas.descritor
+        shm = shared_memory.SharedMemory(name=descritor['valores'])
+        valores = np.ndarray(descritor['tamanho'], dtype=np.float64, buffer=shm.buf)
+        ini, fim = descritor['deslocamentos']['ATV1']
+        assert np.array_equal(valores[ini:fim], dados['ATV1']['close']['raw'].to_numpy())
+        del valores
+        shm.close()
+
+    try:
+        shared_memory.SharedMemory(name=descritor['valores'])
+        liberada = False
+    except FileNotFoundError:
+        liberada = True
+    assert liberada
+    print("✅ Séries publicadas uma vez e blocos liberados")
+
+
+def test_trabalhador_sem_efeitos_de_importacao():
+    """No spawn o trabalhador importa execucao_paralela: não pode arrastar calculo_entradas_v55 (MT5 e setup)"""
+    print("🧪 Testando importação do ponto de entrada dos trabalhadores...")
+    codigo = "import sys, execucao_paralela; print('calculo_entradas_v55' in sys.modules, 'MetaTrader5' in sys.modules)"
+    saida = subprocess.run([sys.executable, '-c', codigo], cwd=os.path.dirname(os.path.abspath(__file__)),
+                           capture_output=True, text=True, check=True).stdout.split()
+    assert saida == ['False', 'False']
+    print("✅ Trabalhador importa só a triagem")
+
+
+if __name__ == "__main__":
+    test_paralelo_igual_serial()
+    test_erro_em_um_par_serial_e_paralelo()
+    test_pares_fixos_por_processo()
+    test_memoria_compartilhada_liberada()
+    test_trabalhador_sem_efeitos_de_importacao()
+    print("\n✅ Todos os testes da execução paralela passaram!")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Teste do hedge ratio por filtro de Kalman (hedge_kalman.py)
+Verifica a equivalência com o OLS expansivo (δ=0), o rastreio de beta variável e o resumo para encontrar_linha_monitorada
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from hedge_kalman import filtrar_hedge_kalman, resumo_beta_kalman
+from triagem_pares import calcular_betas_rolling
+
+
+def _pares(barras=300, pares=4, seed=1, beta=0.8):
+    rng = np.random.default_rng(seed)
+    x = 30 + np.cumsum(rng.normal(0, 0.2, (barras, pares)), axis=0)
+    y = 5 + beta * x + rng.normal(0, 0.3, (barras, pares))
+    return y, x
+
+
+def test_delta_zero_igual_ols_expansivo():
+    """Sem ruído de estado, o filtro é mínimos quadrados recursivos: igual ao OLS de todas as barras até t"""
+    print("🧪 Comparando Kalman (δ=0) com OLS expansivo...")
+    y, x = _pares()
+    y[50:60, 1] = np.nan        # barras ausentes só no par 1
+    x[:5, 2] = np.nan
+    saida = filtrar_hedge_kalman(y, x, delta=0.0)
+    for p in range(y.shape[1]):
+        valido = np.isfinite(y[:, p]) & np.isfinite(x[:, p])
+        for t in (40, 150, 299):
+            ate_t = valido & (np.arange(len(y)) <= t)
+            beta, alpha = np.polyfit(x[ate_t, p], y[ate_t, p], 1)
+            assert np.isclose(saida['beta'][t, p], beta, rtol=1e-9)
+            assert np.isclose(saida['alpha'][t, p], alpha, rtol=1e-9)
+    assert np.isnan(saida['beta'][55, 1]) and np.isnan(saida['zscore'][:20, 0]).all()
+
+    # Pares independentes: rodar em lote ou um a um dá o mesmo resultado
+    sozinho = filtrar_hedge_kalman(y[:, 3], x[:, 3], delta=1e-3)
+    em_lote = filtrar_hedge_kalman(y, x, delta=1e-3)
+    assert np.allclose(sozinho['zscore'][:, 0], em_lote['zscore'][:, 3], equal_nan=True)
+    print("✅ Filtro igual ao OLS expansivo e independente entre pares")
+
+
+def test_rastreia_beta_variavel():
+    """Com δ > 0 o beta filtrado acompanha um hedge ratio que muda, melhor que o beta rotation em janela"""
+    print("🧪 Testando rastreio de beta variável...")
+    rng = np.random.default_rng(5)
+    barras, pares = 800, 50
+    x = 30 + np.cumsum(rng.normal(0, 0.3, (barras, pares)), axis=0)
+    beta_real = np.linspace(0.6, 0.9, barras)[:, None]
+    y = 5 + beta_real * x + rng.normal(0, 0.2, (barras, pares))
+
+    saida = filtrar_hedge_kalman(y, x)
+    erro_kalman = np.abs(saida['beta'][-200:] - beta_real[-200:]).mean()
+    erro_expansivo = np.abs(filtrar_hedge_kalman(y, x, delta=0.0)['beta'][-200:] - beta_real[-200:]).mean()
+    erro_janela = np.mean([np.abs(calcular_betas_rolling(y[:, p], x[:, p], 100)[0][-200:] - beta_real[-200:, 0]).mean()
+                           for p in range(pares)])
+    print(f"📊 erro médio do beta: Kalman={erro_kalman:.4f} | janela 100={erro_janela:.4f} | "
+          f"OLS expansivo={erro_expansivo:.4f}")
+    assert erro_kalman < erro_janela / 3 and erro_kalman < erro_expansivo / 3
+    z = saida['zscore'][100:]
+    assert abs(np.nanmean(z)) < 0.3 and 0.5 < np.nanstd(z) < 1.5
+    print("✅ Beta dinâmico acompanha a mudança")
+
+
+def test_resumo_para_linha_monitorada():
+    """resumo_beta_kalman: uma linha por par com beta rotation e métricas da última barra"""
+    print("🧪 Testando resumo para encontrar_linha_monitorada...")
+    y, x = _pares(barras=200, pares=2, seed=3)
+    index = pd.date_range('2024-02-01 10:00', periods=200, freq='15min')
+    dados = {
+        'PETR4': {'close': {'raw': pd.Series(y[:, 0], index=index)}},
+        'VALE3': {'close': {'raw': pd.Series(x[:, 0], index=index)}},
+        'ITUB4': {'close': {'raw': pd.Series(y[:, 1], index=index)}},
+        'IBOV': {'close': {'raw': pd.Series(np.linspace(120000, 121000, 200), index=index).drop(index[10])}},
+    }
+    resumo = resumo_beta_kalman(dados, [('PETR4', 'VALE3'), ('ITUB4', 'VALE3'), ('PETR4', 'XXXX3')], ['IBOV'])
+    assert list(resumo.index) == [('PETR4', 'VALE3'), ('ITUB4', 'VALE3')]
+
+    # Mesmo calendário do caminho OLS: barras sem IBOV ficam de fora
+    calendario = index.drop(index[10])
+    esperado = filtrar_hedge_kalman(dados['PETR4']['close']['raw'].loc[calendario].to_numpy(),
+                                    dados['VALE3']['close']['raw'].loc[calendario].to_numpy())
+    linha = resumo.loc[('PETR4', 'VALE3')]
+    assert np.isclose(linha['beta_rotation'], esperado['beta'][-1, 0])
+    assert np.isclose(linha['beta_rotation_mean'], np.nanmean(esperado['beta'][:, 0]))
+    assert np.isclose(linha['zscore_kalman'], esperado['zscore'][-1, 0])
+    assert linha['beta_kalman'] == linha['beta_rotation']
+    print("✅ Resumo consistente com o filtro")
+
+
+if __name__ == "__main__":
+    test_delta_zero_igual_ols_expansivo()
+    test_rastreia_beta_variavel()
+    test_resumo_para_linha_monitorada()
+    print("\n✅ Todos os testes do hedge ratio Kalman passaram!")
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Teste do cache incremental de deals (historico_deals.py)
+Usa um terminal de teste com history_deals_get para verificar que só os deals novos são buscados, que os
+agregados acumulados batem com o cálculo completo de calcular_estatisticas_performance_real, a persistência
+por ticket e a poda diária da janela
+"""
+
+import sys
+import os
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from historico_deals import CacheDeals
+
+TradeDeal = namedtuple('TradeDeal', 'ticket order time type entry magic symbol volume price commission swap profit comment')
+
+
+class TerminalTeste:
+    """history_deals_get sobre uma lista de deals; guarda quantos deals cada chamada devolveu."""
+
+    def __init__(self):
+        self.deals = []
+        self.devolvidos = []
+
+    def adicionar(self, instante, lucro, entry=1, symbol='PETR4'):
+        ticket = len(self.deals) + 1000
+        self.deals.append(TradeDeal(ticket, ticket, int(instante.timestamp()), ticket % 2, entry, 20001,
+                                    symbol, 100.0, 30.0, -0.5, 0.0, lucro, ''))
+
+    def history_deals_get(self, desde, ate):
+        inicio, fim = desde.timestamp(), ate.timestamp()
+        resultado = tuple(d for d in self.deals if inicio <= d.time <= fim)
+        self.devolvidos.append(len(resultado))
+        return resultado
+
+
+def _estatisticas_completas(lucros):
+    """Fórmulas de TradingSystemReal.calcular_estatisticas_performance_real."""
+    curva = np.concatenate([[0], np.cumsum(lucros)])
+    drawdown = abs(min(curva - np.maximum.accumulate(curva)))
+    ganhos = [l for l in lucros if l > 0]
+    perdas = [l for l in lucros if l < 0]
+    return {
+        'total_trades': len(lucros),
+        'win_rate': len(ganhos) / len(lucros) * 100,
+        'resultado_total': sum(lucros),
+        'resultado_medio': np.mean(lucros),
+        'melhor_trade': max(lucros),
+        'pior_trade': min(lucros),
+        'sharpe_ratio': np.mean(lucros) / np.std(lucros),
+        'max_drawdown_reais': drawdown,
+        'profit_factor': sum(ganhos) / abs(sum(perdas)),
+    }
+
+
+def _relogio(valor):
+    estado = {'agora': valor}
+    return estado, (lambda: estado['agora'])
+
+
+def test_incremental_igual_calculo_completo():
+    """Cada atualização traz só os deals novos e as estatísticas batem com o recálculo completo"""
+    print("🧪 Testando cache incremental contra cálculo completo...")
+    rng = np.random.default_rng(3)
+    terminal = TerminalTeste()
+    estado, relogio = _relogio(datetime(2025, 6, 20, 10, 0))
+    inicio = estado['agora'] - timedelta(days=20)
+    for i in range(400):
+        terminal.adicionar(inicio + timedelta(minutes=37 * i), float(np.round(rng.normal(5, 60), 2)))
+        if i % 7 == 0:
+            terminal.adicionar(inicio + timedelta(minutes=37 * i, seconds=1), 0.0, entry=0)   # entrada, sem resultado
+
+    cache = CacheDeals(terminal, dias=30, intervalo_minimo=0, log=lambda msg: None, relogio=relogio)
+    assert cache.atualizar() == len(terminal.deals)
+    for lote in range(5):
+        estado['agora'] += timedelta(minutes=30)
+        for j in range(3):
+            terminal.adicionar(estado['agora'] - timedelta(seconds=10 - j), float(rng.normal(0, 50)))
+        assert cache.atualizar() == 3
+        assert terminal.devolvidos[-1] <= 3 + 5        # só a margem de 60 s além dos novos
+
+    lucros = [d.profit for d in terminal.deals if d.profit != 0 or d.entry == 1]
+    esperado = _estatisticas_completas(lucros)
+    obtido = cache.estatisticas()
+    for chave, valor in esperado.items():
+        assert abs(obtido[chave] - valor) < 1e-6, chave
+    assert cache.recalculos == 0 and len(cache.trades()) == len(lucros)
+
+    inicio_dia = datetime.combine(estado['agora'].date(), datetime.min.time())
+    lucro_dia, n_dia = cache.lucro_realizado(desde=inicio_dia)
+    do_dia = [d.profit for d in terminal.deals if d.time >= inicio_dia.timestamp()]
+    assert n_dia == len(do_dia) and abs(lucro_dia - sum(do_dia)) < 1e-9
+    assert all(d.profit != 0 for d in cache.deals(desde=inicio_dia, com_lucro=True))
+    assert cache.trades(desde=inicio_dia)[0]['Data'] >= inicio_dia
+    print(f"📊 {len(cache)} deals, {cache.buscas} buscas, win rate {obtido['win_rate']:.1f}%, "
+          f"drawdown R$ {obtido['max_drawdown_reais']:.2f}")
+    print("✅ Estatísticas incrementais iguais ao cálculo completo")
+
+
+def test_persistencia_e_poda():
+    """Reinício lê os deals do arquivo e busca só a margem; virada da janela poda e recalcula"""
+    print("🧪 Testando persistência e poda diária...")
+    terminal = TerminalTeste()
+    estado, relogio = _relogio(datetime(2025, 6, 20, 12, 0))
+    for i in range(60):
+        terminal.adicionar(estado['agora'] - timedelta(days=9, hours=-i * 3), (-1) ** i * (10.0 + i))
+
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'cache_deals_1.jsonl')
+        cache = CacheDeals(terminal, dias=10, caminho=caminho, intervalo_minimo=0, log=lambda msg: None,
+                           relogio=relogio)
+        cache.atualizar()
+        terminal.adicionar(estado['agora'], 99.0)
+        cache.atualizar()
+        with open(caminho, 'a', encoding='utf-8') as f:
+            f.write('[1, 2, 3')                     # gravação interrompida no meio
+        esperado = cache.estatisticas()
+
+        reaberto = CacheDeals(terminal, dias=10, caminho=caminho, intervalo_minimo=0, log=lambda msg: None,
+                              relogio=relogio)
+        assert len(reaberto) == len(terminal.deals) and reaberto.estatisticas() == esperado
+        assert reaberto.atualizar() == 0 and terminal.devolvidos[-1] == 1
+
+        # Deal atrasado (horário anterior ao último visto) entra com recálculo
+        terminal.adicionar(estado['agora'] - timedelta(seconds=30), -5.0)
+        assert reaberto.atualizar() == 1 and reaberto.recalculos == 2
+
+        # Três dias depois: os deals fora da janela saem numa única poda
+        estado['agora'] += timedelta(days=3)
+        reaberto.atualizar()
+        limite = reaberto.inicio_janela.timestamp()
+        assert all(d.time >= limite for d in reaberto.deals()) and len(reaberto) < len(terminal.deals)
+        lucros = [d.profit for d in terminal.deals if d.time >= limite]
+        assert reaberto.estatisticas()['total_trades'] == len(lucros)
+        assert abs(reaberto.estatisticas()['resultado_total'] - sum(lucros)) < 1e-9
+
+        # Janela maior que a coberta pelo arquivo: recarrega tudo do terminal
+        maior = CacheDeals(terminal, dias=40, caminho=caminho, intervalo_minimo=0, log=lambda msg: None,
+                           relogio=relogio)
+        assert len(maior) == 0 and maior.atualizar() == len(terminal.deals)
+    print("✅ Persistência e poda OK")
+
+
+if __name__ == "__main__":
+    test_incremental_igual_calculo_completo()
+    test_persistencia_e_poda()
+    print("\n✅ Todos os testes do cache de deals passaram!")
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Teste do livro de posições e do registro de pares por magic (livro_posicoes.py)
+Verifica os índices por magic/símbolo/ticket contra a varredura linear, a detecção de pernas órfãs
+e a persistência do registro magic → (dependente, independente)
+"""
+
+import sys
+import os
+import json
+import tempfile
+from collections import namedtuple
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from livro_posicoes import LivroPosicoes, RegistroMagics, acao_perna_unica, livro_do_snapshot
+
+Posicao = namedtuple('Posicao', 'ticket symbol magic type volume price_open price_current')
+Snapshot = namedtuple('Snapshot', 'versao posicoes ordens')
+
+
+def _carteira(n_magics=200, seed=0):
+    rng = np.random.default_rng(seed)
+    simbolos = ['PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'ABEV3', 'WEGE3']
+    posicoes, ordens, ticket = [], [], 1
+    for k in range(n_magics):
+        magic = int(f"{rng.choice([2, 3])}{k:04d}")
+        dep, ind = rng.choice(simbolos, 2, replace=False)
+        for simbolo in ([dep, ind] if rng.random() < 0.8 else [dep]):
+            posicoes.append(Posicao(ticket, str(simbolo), magic, int(rng.integers(2)), 100.0, 10.0, 10.5))
+            ticket += 1
+        if rng.random() < 0.2:
+            ordens.append(Posicao(ticket, str(ind), magic, 2, 100.0, 10.0, 10.0))
+            ticket += 1
+    return posicoes, ordens
+
+
+def test_indices_iguais_varredura():
+    """Consultas do livro iguais às varreduras [p for p in posicoes if ...] que substituem"""
+    print("🧪 Comparando índices do livro com varredura linear...")
+    posicoes, ordens = _carteira()
+    livro = LivroPosicoes(posicoes, ordens)
+    magics = {p.magic for p in posicoes}
+    assert livro.magics() == magics
+    assert livro.magics(prefixo='2') == {m for m in magics if str(m).startswith('2')}
+    for magic in magics:
+        assert list(livro.posicoes_do_magic(magic)) == [p for p in posicoes if p.magic == magic]
+        assert list(livro.ordens_do_magic(magic)) == [o for o in ordens if o.magic == magic]
+    for simbolo in {p.symbol for p in posicoes}:
+        assert list(livro.posicoes_do_simbolo(simbolo)) == [p for p in posicoes if p.symbol == simbolo]
+    assert livro.posicao(posicoes[17].ticket) is posicoes[17] and livro.posicao(-1) is None
+    assert livro.posicoes_do_magic(99999) == ()
+
+    orfas = livro.pernas_orfas(prefixo='2')
+    esperado = {m for m in magics if str(m).startswith('2') and sum(p.magic == m for p in posicoes) == 1}
+    assert set(orfas) == esperado and all(orfas[m].magic == m for m in orfas)
+
+    # Um livro por versão de snapshot, compartilhado entre os consumidores
+    snap = Snapshot(7, tuple(posicoes), tuple(ordens))
+    assert livro_do_snapshot(snap) is livro_do_snapshot(snap)
+    assert livro_do_snapshot(Snapshot(8, (), ())) is not livro_do_snapshot(snap)
+    print(f"📊 {len(posicoes)} posições, {len(magics)} magics, {len(orfas)} pernas órfãs (prefixo 2)")
+    print("✅ Índices consistentes")
+
+
+def test_registro_persistente():
+    """Registro sobrevive a reinício, não precisa das posições vivas e poda só entradas velhas fechadas"""
+    print("🧪 Testando registro persistente de magics...")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'registro_magics.json')
+        registro = RegistroMagics(caminho, dias_retencao=10, log=lambda msg: None)
+        assert registro.par(20001) == (None, None)
+        registro.registrar(20001, 'PETR4', 'VALE3')
+        registro.registrar(20002, 'ITUB4', 'BBDC4', zscore=-2.1)
+
+        reaberto = RegistroMagics(caminho, log=lambda msg: None)
+        assert reaberto.par(20001) == ('PETR4', 'VALE3') and 20002 in reaberto
+        assert reaberto.pares() == {20001: ('PETR4', 'VALE3'), 20002: ('ITUB4', 'BBDC4')}
+        assert not os.path.exists(caminho + '.tmp')
+
+        # Entradas antigas: só sai a que não está mais aberta
+        with open(caminho, 'r', encoding='utf-8') as f:
+            dados = json.load(f)
+        velho = (datetime.now() - timedelta(days=30)).isoformat(timespec='seconds')
+        for chave in dados:
+            dados[chave]['registrado'] = velho
+        with open(caminho, 'w', encoding='utf-8') as f:
+            json.dump(dados, f)
+        antigo = RegistroMagics(caminho, dias_retencao=10, log=lambda msg: None)
+        assert antigo.podar(magics_abertos=[20002]) == 1
+        assert RegistroMagics(caminho, log=lambda msg: None).pares() == {20002: ('ITUB4', 'BBDC4')}
+
+        # Arquivo corrompido não derruba o sistema
+        with open(caminho, 'w', encoding='utf-8') as f:
+            f.write('{quebrado')
+        assert len(RegistroMagics(caminho, log=lambda msg: None)) == 0
+    print("✅ Registro persistente OK")
+
+
+def test_acao_perna_unica():
+    """Dependente aberto sem posição nem ordem do independente é fechado (não fica sem hedge)"""
+    print("🧪 Testando decisão para magic com uma única perna...")
+    posicoes = [Posicao(1, 'PETR4', 20001, 0, 100.0, 30.0, 30.1),     # dependente com ordem do independente
+                Posicao(2, 'VALE3', 20002, 0, 100.0, 60.0, 60.2),     # dependente, independente falhou no envio
+                Posicao(3, 'BBDC4', 20003, 1, 100.0, 15.0, 15.1)]     # independente remanescente
+    ordens = [Posicao(10, 'PETR3', 20001, 2, 100.0, 28.0, 28.0),
+              Posicao(11, 'PETR4', 20002, 2, 100.0, 60.0, 60.0)]      # ordem de outro símbolo no mesmo magic
+    livro = LivroPosicoes(posicoes, ordens)
+
+    acao, ordens_ind = acao_perna_unica(livro, 20001, 'PETR4', 'PETR4', 'PETR3')
+    assert acao == 'converter' and [o.ticket for o in ordens_ind] == [10]
+    assert acao_perna_unica(livro, 20002, 'VALE3', 'VALE3', 'BRAP4') == ('fechar', ())
+    assert acao_perna_unica(livro, 20003, 'BBDC4', 'ITUB4', 'BBDC4') == ('fechar', ())
+    assert acao_perna_unica(livro, 20003, 'BBDC4', 'BBDC4', None) == ('fechar', ())
+    print("✅ Decisão para perna única OK")
+
+
+if __name__ == "__main__":
+    test_indices_iguais_varredura()
+    test_registro_persistente()
+    test_acao_perna_unica()
+    print("\n✅ Todos os testes do livro de posições passaram!")
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Teste do log estruturado (log_estruturado.py)
+Verifica o buffer circular de tamanho fixo, a inferência de nível/evento, a compatibilidade com a lista
+antiga de strings, as consultas da aba de logs e o arquivo rotativo gravado em segundo plano
+"""
+
+import sys
+import os
+import json
+import tempfile
+import threading
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from log_estruturado import AVISO, DEBUG, ERRO, INFO, BufferLog, inferir_evento, inferir_nivel
+
+
+def test_buffer_circular_e_compatibilidade():
+    """Memória limitada à capacidade mesmo com muitos registros; interface de lista preservada"""
+    print("🧪 Testando buffer circular e interface de lista...")
+    logs = BufferLog(capacidade=100)
+
+    def escritor(k):
+        for i in range(2000):
+            logs.registrar(f"[THREAD_{k}] mensagem {i}")
+
+    threads = [threading.Thread(target=escritor, args=(k,)) for k in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(logs) == 100 and logs.estatisticas['total'] == 8000
+    seqs = [r.seq for r in logs.consultar()]
+    assert seqs == sorted(seqs) and seqs[-1] == 8000
+
+    logs.clear()
+    logs.registrar("primeira")
+    logs.append("[2025-06-02 10:15:00] vinda de outro buffer")
+    ultimas = logs[-2:]
+    assert isinstance(ultimas, list) and ultimas[0].endswith("] primeira")
+    assert ultimas[1] == "[2025-06-02 10:15:00] vinda de outro buffer"
+    assert logs[-1] in logs and list(logs) == ultimas and bool(logs)
+    logs.clear()
+    assert not logs and logs[-50:] == []
+    print(f"📊 {logs.estatisticas}")
+    print("✅ Buffer circular com memória constante")
+
+
+def test_niveis_eventos_e_consulta():
+    """Nível e evento inferidos das marcas já usadas nas mensagens; filtros da aba de logs"""
+    print("🧪 Testando inferência de nível/evento e consultas...")
+    assert inferir_nivel("[ERRO] Falha ao enviar ordem") == ERRO
+    assert inferir_nivel("❌ Ordem recusada") == ERRO
+    assert inferir_nivel("⚠️ Perna órfã detectada") == AVISO
+    assert inferir_nivel("[DEBUG] parar_sistema: sinalizado") == DEBUG
+    assert inferir_nivel("✅ Ordem executada") == INFO
+    assert inferir_evento("[BREAK_EVEN] Stop movido") == 'BREAK_EVEN'
+    assert inferir_evento("[2025-06-02 10:00:00] texto") is None
+
+    logs = BufferLog(capacidade=50)
+    inicio = datetime.now()
+    logs.registrar("[DEBUG] ciclo", ts=(inicio - timedelta(minutes=5)).timestamp())
+    logs.registrar("[BREAK_EVEN] PETR4 stop no preço de entrada", magic=20001)
+    marcador = logs.registrar("⚠️ [MONITOR] perna órfã VALE3").seq
+    logs.registrar("[ENVIO] ❌ ITUB4 recusada", nivel='ERRO', evento='ENVIO', retcode=10006)
+
+    assert [r.evento for r in logs.consultar(nivel_minimo='AVISO')] == [None, 'ENVIO']
+    assert logs.consultar(evento='BREAK_EVEN')[0].campos == {'magic': 20001}
+    assert len(logs.consultar(texto='petr4')) == 1
+    assert len(logs.consultar(desde=inicio)) == 3
+    assert [r.evento for r in logs.consultar(desde=marcador)] == ['ENVIO']
+    assert logs.ultimos(1, nivel_minimo=ERRO)[0].endswith("❌ ITUB4 recusada")
+    assert logs.eventos() == ['BREAK_EVEN', 'DEBUG', 'ENVIO']
+    assert logs.estatisticas['por_nivel'] == {'DEBUG': 1, 'INFO': 1, 'AVISO': 1, 'ERRO': 1}
+    print("✅ Níveis, eventos e consultas OK")
+
+
+def test_arquivo_rotativo():
+    """Sink em segundo plano grava JSON por linha, filtra por nível e rotaciona pelo tamanho"""
+    print("🧪 Testando arquivo de log rotativo...")
+    with tempfile.TemporaryDirectory() as pasta:
+        caminho = os.path.join(pasta, 'logs', 'sistema.log')
+        logs = BufferLog(capacidade=10, arquivo=caminho, nivel_arquivo='INFO', max_bytes_arquivo=2000,
+                         backups_arquivo=2, log=lambda msg: None)
+        for i in range(200):
+            logs.registrar(f"[DEBUG] ciclo {i}")
+            logs.registrar(f"[ENVIO] ordem {i}", magic=20000 + i)
+        assert logs.sink.esvaziar()
+        logs.fechar()
+
+        arquivos = sorted(os.listdir(os.path.dirname(caminho)))
+        assert arquivos == ['sistema.log', 'sistema.log.1', 'sistema.log.2']
+        assert all(os.path.getsize(os.path.join(pasta, 'logs', a)) <= 2000 for a in arquivos)
+        with open(caminho, 'r', encoding='utf-8') as f:
+            linhas = [json.loads(linha) for linha in f]
+        assert linhas[-1]['mensagem'] == "[ENVIO] ordem 199" and linhas[-1]['campos'] == {'magic': 20199}
+        assert all(linha['nivel'] == 'INFO' and linha['evento'] == 'ENVIO' for linha in linhas)
+        assert logs.estatisticas['gravados'] == 200 and logs.estatisticas['descartados_arquivo'] == 0
+    print("✅ Arquivo rotativo OK")
+
+
+if __name__ == "__main__":
+    test_buffer_circular_e_compatibilidade()
+    test_niveis_eventos_e_consulta()
+    test_arquivo_rotativo()
+    print("\n✅ Todos os testes do log estruturado passaram!")
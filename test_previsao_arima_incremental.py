@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Teste do ARIMA walk-forward por filtro de Kalman (previsao_arima_incremental.py)
+Verifica equivalência com statsmodels extend() e com o reajuste barra a barra original
+"""
+
+import sys
+import os
+import warnings
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from previsao_arima_incremental import (
+    CachePrevisoesARIMA, FiltroARIMA, ajustar_arima, prever_walk_forward_arima, prever_ultima_barra_arima
+)
+
+warnings.simplefilter("ignore")
+
+
+def _serie(n=160, seed=3):
+    rng = np.random.default_rng(seed)
+    return pd.Series(40 + np.cumsum(rng.normal(0, 0.4, n)))
+
+
+def test_filtro_igual_extend():
+    """Atualização de Kalman deve reproduzir resultado.extend().get_forecast(1)"""
+    print("🧪 Comparando FiltroARIMA com statsmodels extend()...")
+    serie = _serie()
+    janela = 70
+    resultado = ajustar_arima(serie.iloc[:janela])
+    filtro = FiltroARIMA(resultado)
+    estendido = resultado
+    for i in range(janela, janela + 25):
+        filtro.atualizar(serie.iloc[i])
+        estendido = estendido.extend(serie.iloc[i:i + 1])
+        previsao = estendido.get_forecast(steps=1)
+        media, erro = filtro.prever()
+        assert np.isclose(media, previsao.predicted_mean.iloc[0], atol=1e-9)
+        assert np.isclose(erro, previsao.se_mean.iloc[0], atol=1e-9)
+    print("✅ Previsões e se_mean idênticos ao extend()")
+
+
+def test_refit_cada_barra_igual_original():
+    """refit_cada=1 reproduz o loop original (novo ARIMA na janela deslizante a cada barra)"""
+    print("🧪 Comparando refit_cada=1 com o reajuste original...")
+    serie = _serie(n=90)
+    janela = 70
+    saida = prever_walk_forward_arima(serie, janela, refit_cada=1)
+    for k, i in enumerate(range(janela, len(serie))):
+        previsao = ajustar_arima(serie[i - janela:i]).get_forecast(steps=1)
+        assert np.isclose(saida['previsao'][k], previsao.predicted_mean.iloc[0], atol=1e-9)
+        assert np.isclose(saida['std'][k], previsao.se_mean.iloc[0], atol=1e-9)
+    assert saida['n_ajustes'] == len(serie) - janela
+    assert saida['indice_previsao'] == len(serie) - 1
+    print("✅ Modo original preservado")
+
+
+def test_walk_forward_um_ajuste():
+    """Walk-forward faz um único ajuste no lugar de um ajuste por barra (conta ajustes, não tempo)"""
+    print("🧪 Contando ajustes do walk-forward x reajuste por barra...")
+    serie = _serie(n=250)
+    incremental = prever_walk_forward_arima(serie, 70, refit_cada=0)
+    original = prever_walk_forward_arima(serie, 70, refit_cada=1)
+
+    print(f"📊 ajustes: incremental={incremental['n_ajustes']} original={original['n_ajustes']}")
+    assert incremental['n_ajustes'] == 1 and original['n_ajustes'] == 180
+    assert len(incremental['previsao']) == len(original['previsao']) == 180
+    assert not incremental['falhou'].any()
+
+    # Mesmo ajuste inicial: a primeira previsão é idêntica nos dois modos
+    assert np.isclose(incremental['previsao'][0], original['previsao'][0], atol=1e-9)
+    assert np.isclose(incremental['std'][0], original['std'][0], atol=1e-9)
+
+    periodico = prever_walk_forward_arima(serie, 70, refit_cada=30)
+    assert periodico['n_ajustes'] == 6
+    print("✅ Walk-forward com um ajuste (ou a cada N barras)")
+
+
+def test_forecast_only_igual_ultima_barra():
+    """forecast_only usa um ajuste e reproduz a última previsão do reajuste por barra"""
+    print("🧪 Comparando forecast_only com a última barra do walk-forward...")
+    serie = _serie(n=200)
+    completo = prever_walk_forward_arima(serie, 70, refit_cada=1)
+    ultima = prever_ultima_barra_arima(serie, 70)
+    assert ultima['n_ajustes'] == 1
+    assert len(ultima['previsao']) == 1
+    assert ultima['indice_previsao'] == completo['indice_previsao'] == serie.index[-1]
+    assert np.isclose(ultima['previsao'][-1], completo['previsao'][-1], atol=1e-9)
+    assert np.isclose(ultima['std'][-1], completo['std'][-1], atol=1e-9)
+
+    curta = prever_ultima_barra_arima(serie.iloc[:50], 70)
+    assert len(curta['previsao']) == 0 and curta['resultado'] is None
+    print("✅ Previsão da última barra idêntica com um único ajuste")
+
+
+def test_cache_previsoes_por_ativo():
+    """Mesmo ativo/barra em vários pares → um ajuste; barra nova ou valores diferentes → recalcula"""
+    print("🧪 Testando cache de previsões ARIMA por ativo...")
+    serie = _serie(n=200)
+    serie.index = pd.date_range('2024-01-01', periods=len(serie), freq='D')
+    cache = CachePrevisoesARIMA(capacidade=4)
+    chamadas = []
+
+    def prever(janela_usada):
+        chamadas.append(len(janela_usada))
+        return prever_walk_forward_arima(janela_usada, 70, refit_cada=1)
+
+    modo = ('ultima', 70)
+    chaves_posicao = set()
+    for periodo in (120, 150, 200):   # três pares com o mesmo independente e períodos diferentes
+        # Mesmo formato de calcular_residuo_zscore_timeframe01: df_ind1 com os horários, df_ind com RangeIndex
+        df_ind1 = pd.DataFrame({'close': serie.iloc[-periodo:]})
+        df_ind = pd.DataFrame({col: list(df_ind1[col]) for col in df_ind1.columns})
+        serie_col = df_ind['close']
+        janela_usada = df_ind1['close'].iloc[-71:]
+        chave = CachePrevisoesARIMA.chave('VALE3', 'close', 16408, janela_usada, (1, 1, 1), modo)
+        previsao = cache.obter_ou_calcular(chave, janela_usada, lambda: prever(serie_col.iloc[-71:]))
+        chaves_posicao.add(CachePrevisoesARIMA.chave('VALE3', 'close', 16408, serie_col.iloc[-71:], (1, 1, 1), modo))
+    assert len(chamadas) == 1 and cache.acertos == 2
+    assert len(chaves_posicao) == 3     # com o RangeIndex a chave mudaria com o período de cada par
+    referencia = prever_ultima_barra_arima(serie, 70)
+    assert np.allclose(previsao['previsao'], referencia['previsao'])
+
+    # Mesma chave com barras diferentes (outro alinhamento) não reaproveita
+    alterada = serie.iloc[-71:].copy()
+    alterada.iloc[-5] += 1.0
+    chave = CachePrevisoesARIMA.chave('VALE3', 'close', 16408, alterada, (1, 1, 1), modo)
+    cache.obter_ou_calcular(chave, alterada, lambda: prever(alterada))
+    assert len(chamadas) == 2
+
+    # Barra nova → nova chave
+    nova = pd.concat([serie, pd.Series([serie.iloc[-1]], index=[serie.index[-1] + pd.Timedelta(days=1)])]).iloc[-71:]
+    assert CachePrevisoesARIMA.chave('VALE3', 'close', 16408, nova, (1, 1, 1), modo) != chave
+    print("✅ Previsão calculada uma vez por ativo e barra")
+
+
+if __name__ == "__main__":
+    test_filtro_igual_extend()
+    test_refit_cada_barra_igual_original()
+    test_walk_forward_um_ajuste()
+    test_forecast_only_igual_ultima_barra()
+    test_cache_previsoes_por_ativo()
+    print("\n✅ Todos os testes do ARIMA incremental passaram!")
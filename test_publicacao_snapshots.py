@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Teste da publicação de snapshots (publicacao_snapshots.py)
+Verifica que só os campos alterados são copiados, que a versão só avança quando algo muda, que os valores
+publicados são somente leitura e que consumidores em outra thread recebem a versão nova
+"""
+
+import sys
+import os
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd
+
+from publicacao_snapshots import PublicadorSnapshots, congelar
+
+
+class SerieVersionada:
+    """Objeto que se versiona sozinho (como RegistroEquity)."""
+
+    def __init__(self):
+        self.versao = 0
+        self.pontos = []
+
+    def registrar(self, valor):
+        self.pontos.append(valor)
+        self.versao += 1
+
+
+def test_copia_so_o_que_mudou():
+    """Publicações sem mudança não copiam nem avançam a versão; cada campo tem sua versão"""
+    print("🧪 Testando copy-on-write e versões por campo...")
+    publicador = PublicadorSnapshots()
+    assert publicador.atual().versao == 0 and len(publicador.atual()) == 0
+
+    tabela = pd.DataFrame({'Dependente': ['PETR4', 'VALE3'], 'Z-Score': [2.1, -1.7]})
+    dados = {'execucoes': 1, 'ultimo_update': None}
+    serie = SerieVersionada()
+    v1 = publicador.publicar(tabela_linha_operacao=tabela, dados_sistema=dados, equity_historico=serie,
+                             posicoes_abertas=[{'symbol': 'PETR4', 'profit': 10.0}])
+    assert v1.versao == 1 and publicador.copias == 3
+    assert v1['tabela_linha_operacao'] is not tabela and v1['equity_historico'] is serie
+
+    # Nada mudou (mesmos objetos ou objetos novos com o mesmo conteúdo): nenhuma cópia, mesma versão
+    for _ in range(10):
+        mesmo = publicador.publicar(tabela_linha_operacao=tabela.copy(), dados_sistema=dict(dados),
+                                    equity_historico=serie, posicoes_abertas=[{'symbol': 'PETR4', 'profit': 10.0}])
+        assert mesmo is v1
+    assert publicador.copias == 3 and publicador.sem_mudanca == 10
+
+    # Só dados_sistema muda: a tabela da versão nova é o mesmo objeto congelado da anterior
+    dados['execucoes'] = 2
+    v2 = publicador.publicar(tabela_linha_operacao=tabela, dados_sistema=dados)
+    assert v2.versao == 2 and publicador.copias == 4
+    assert v2['tabela_linha_operacao'] is v1['tabela_linha_operacao']
+    assert v2.versao_de('tabela_linha_operacao') == 1 and v2.versao_de('dados_sistema') == 2
+    assert v1['dados_sistema']['execucoes'] == 1          # a versão antiga não foi alterada
+
+    # Objeto versionado: muda pela versão dele, sem cópia
+    serie.registrar(100.0)
+    v3 = publicador.publicar(equity_historico=serie)
+    assert v3.versao == 3 and v3.versoes_de('equity_historico', 'dados_sistema') == (3, 2) and publicador.copias == 4
+    print(f"📊 {publicador.estatisticas}")
+    print("✅ Copy-on-write e versões OK")
+
+
+def test_dict_com_dataframes():
+    """dict/lista com DataFrames dentro: mesmo conteúdo não gera versão nova; conteúdo novo gera"""
+    print("🧪 Testando dicts com DataFrames...")
+    publicador = PublicadorSnapshots()
+    tabelas = {'M15': pd.DataFrame({'Z-Score': [2.1, -1.7]}), 'D1': pd.DataFrame({'Z-Score': [0.4]})}
+    v1 = publicador.publicar(tabelas_por_timeframe=tabelas, historico=[{'df': tabelas['D1'], 'n': 1}])
+    for _ in range(5):
+        copia = {nome: df.copy() for nome, df in tabelas.items()}
+        assert publicador.publicar(tabelas_por_timeframe=copia, historico=[{'df': copia['D1'], 'n': 1}]) is v1
+    assert publicador.copias == 2 and publicador.sem_mudanca == 5
+
+    tabelas['D1'] = pd.DataFrame({'Z-Score': [0.5]})
+    v2 = publicador.publicar(tabelas_por_timeframe=tabelas)
+    assert v2.versao == 2 and v2['tabelas_por_timeframe']['D1']['Z-Score'].iloc[0] == 0.5
+    print("✅ Dicts com DataFrames OK")
+
+
+def test_valores_somente_leitura():
+    """DataFrame, dict e lista publicados não podem ser alterados pelo consumidor"""
+    print("🧪 Testando valores congelados...")
+    tabela = pd.DataFrame({'Par': ['A', 'B'], 'Beta': [1.0, 0.8]})
+    congelada = congelar(tabela)
+    try:
+        congelada.loc[0, 'Beta'] = 5.0
+        assert False, "DataFrame publicado aceitou escrita"
+    except ValueError:
+        pass
+    tabela.loc[0, 'Beta'] = 9.0                        # o backend continua livre para alterar o original
+    assert congelada['Beta'].iloc[0] == 1.0 and congelada.sort_values('Beta')['Par'].tolist() == ['B', 'A']
+
+    dados = congelar({'equity_atual': 1000.0, 'ativos': ['PETR4']})
+    for operacao in (lambda: dados.__setitem__('equity_atual', 0), lambda: dados.update(x=1), dados.clear):
+        try:
+            operacao()
+            assert False, "dict publicado aceitou escrita"
+        except TypeError:
+            pass
+    alteravel = dados.copy()
+    alteravel['equity_atual'] = 0.0
+    assert dados['equity_atual'] == 1000.0 and dados['ativos'] == ('PETR4',)
+    assert pd.DataFrame(congelar([{'a': 1}, {'a': 2}]))['a'].sum() == 3
+    print("✅ Valores congelados OK")
+
+
+def test_consumidor_recebe_versao_nova():
+    """aguardar() acorda com a versão nova; assinantes são chamados uma vez por versão"""
+    print("🧪 Testando consumidores...")
+    publicador = PublicadorSnapshots()
+    recebidas = []
+    publicador.assinar(lambda snapshot: recebidas.append(snapshot.versao))
+    assert publicador.aguardar(0, timeout=0.05) is None
+
+    resultado = {}
+    consumidor = threading.Thread(target=lambda: resultado.update(snapshot=publicador.aguardar(0, timeout=5)))
+    consumidor.start()
+    publicador.publicar(sinais_ativos=[{'par': 'PETR4/VALE3'}])
+    consumidor.join()
+    assert resultado['snapshot'].versao == 1 and resultado['snapshot']['sinais_ativos'][0]['par'] == 'PETR4/VALE3'
+
+    publicador.publicar(sinais_ativos=[{'par': 'PETR4/VALE3'}])    # sem mudança: ninguém é avisado
+    publicador.publicar(sinais_ativos=[])
+    assert recebidas == [1, 2]
+    assert publicador.aguardar(1, timeout=0).versao == 2
+    print("✅ Consumidores OK")
+
+
+if __name__ == "__main__":
+    test_copia_so_o_que_mudou()
+    test_dict_com_dataframes()
+    test_valores_somente_leitura()
+    test_consumidor_recebe_versao_nova()
+    print("\n✅ Todos os testes da publicação de snapshots passaram!")
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Teste da série de equity (serie_equity.py)
+Verifica pico/drawdown em O(1) contra o cálculo sobre a lista completa, a compactação em barras de 1 minuto
+com memória constante, a semente vinda dos deals e a gravação diária em disco
+"""
+
+import sys
+import os
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+from serie_equity import RegistroEquity, carregar_dia
+
+
+def test_pico_drawdown_e_compactacao():
+    """Pico e drawdown iguais aos da lista completa; pontos antigos viram barras de 1 minuto"""
+    print("🧪 Testando pico, drawdown e compactação...")
+    rng = np.random.default_rng(5)
+    serie = RegistroEquity(capacidade=500, horizonte_segundos=600, capacidade_minutos=240, log=lambda msg: None)
+    inicio = datetime(2025, 6, 2, 10, 0)
+    equity = 100000 + np.cumsum(rng.normal(0, 50, 6000))
+    lista = []
+    for i, valor in enumerate(equity):
+        instante = inicio + timedelta(seconds=2 * i)
+        serie.registrar(valor, 100000.0, valor - 100000.0, timestamp=instante)
+        lista.append({'timestamp': instante, 'equity': valor})
+
+    assert serie.pico == max(entry['equity'] for entry in lista)
+    picos = np.maximum.accumulate(equity)
+    assert abs(serie.max_drawdown - (picos - equity).max()) < 1e-9
+    assert abs(serie.drawdown_atual - (picos[-1] - equity[-1])) < 1e-9
+
+    # 6000 pontos de 2 s = 200 minutos: só os últimos ~10-11 minutos continuam em resolução total
+    estat = serie.estatisticas
+    assert estat['recentes'] <= 500 and estat['barras_minuto'] <= 240 and estat['compactacoes'] > 0
+    pontos = serie.pontos()
+    assert np.all(np.diff(pontos[:, 0]) > 0)
+    assert pontos[-1, 0] == lista[-1]['timestamp'].timestamp() and pontos[-1, 1] == equity[-1]
+    # Cada barra guarda o último valor do seu minuto
+    minuto = (inicio + timedelta(minutes=7)).timestamp()
+    barra = pontos[pontos[:, 0] == minuto][0]
+    assert barra[1] == equity[7 * 30 + 29]
+
+    # Leitura só do período visível
+    janela = serie.pontos(desde=inicio + timedelta(minutes=190))
+    assert janela[0, 0] >= (inicio + timedelta(minutes=190)).timestamp() and len(janela) < len(pontos)
+    df = serie.para_dataframe(desde=inicio + timedelta(minutes=195))
+    assert list(df.columns) == ['timestamp', 'equity', 'balance', 'profit']
+    assert isinstance(df['timestamp'].iloc[0], datetime) or hasattr(df['timestamp'].iloc[0], 'to_pydatetime')
+    print(f"📊 {estat}")
+    print("✅ Pico, drawdown e compactação OK")
+
+
+def test_memoria_constante_e_semente():
+    """Registro acima da capacidade não cresce; semente dos deals fica antes dos pontos ao vivo"""
+    print("🧪 Testando memória constante e semente...")
+    serie = RegistroEquity(capacidade=100, horizonte_segundos=3600, capacidade_minutos=50, log=lambda msg: None)
+    bytes_iniciais = serie.estatisticas['bytes']
+    inicio = datetime(2025, 6, 2, 10, 0)
+    for i in range(20000):
+        serie.registrar(1000.0 + i % 37, timestamp=inicio + timedelta(seconds=i * 0.5))
+    assert len(serie) <= 150 and serie.estatisticas['bytes'] == bytes_iniciais
+
+    serie.semear([{'timestamp': inicio - timedelta(days=2), 'equity': 900.0, 'balance': 900.0, 'profit': 0.0},
+                  {'timestamp': inicio - timedelta(days=1), 'equity': 2000.0, 'balance': 2000.0, 'profit': 0.0},
+                  {'timestamp': inicio + timedelta(days=1), 'equity': 1.0, 'balance': 1.0, 'profit': 0.0}])
+    pontos = serie.pontos()
+    assert pontos[0, 1] == 900.0 and pontos[1, 1] == 2000.0 and 1.0 not in pontos[:, 1]
+    assert serie.pico == 2000.0
+    assert serie.pontos(incluir_semente=False)[0, 1] != 900.0
+    print("✅ Memória constante e semente OK")
+
+
+def test_gravacao_diaria():
+    """Virada do dia grava os pontos do dia anterior; carregar_dia devolve as colunas"""
+    print("🧪 Testando gravação diária...")
+    with tempfile.TemporaryDirectory() as pasta:
+        serie = RegistroEquity(capacidade=1000, horizonte_segundos=1800, pasta=pasta, log=lambda msg: None)
+        dia = datetime(2025, 6, 2, 16, 0)
+        for i in range(300):
+            serie.registrar(5000.0 + i, 5000.0, float(i), timestamp=dia + timedelta(seconds=30 * i))
+        assert serie.arquivos_gravados == []
+        serie.registrar(6000.0, timestamp=datetime(2025, 6, 3, 9, 0))
+        assert serie.arquivos_gravados == [os.path.join(pasta, 'equity_20250602.npz')]
+
+        gravado = carregar_dia(pasta, dia.date())
+        assert gravado.shape[1] == 4 and gravado[-1, 1] == 5299.0
+        assert np.all(gravado[:, 0] < datetime(2025, 6, 3).timestamp())
+        assert len(carregar_dia(pasta, datetime(2025, 6, 1).date())) == 0
+        assert serie.gravar().endswith('equity_20250603.npz')
+    print("✅ Gravação diária OK")
+
+
+if __name__ == "__main__":
+    test_pico_drawdown_e_compactacao()
+    test_memoria_constante_e_semente()
+    test_gravacao_diaria()
+    print("\n✅ Todos os testes da série de equity passaram!")
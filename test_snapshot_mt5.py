@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Teste do snapshot compartilhado do MT5 (snapshot_mt5.py)
+Usa um terminal de teste com a mesma API (positions_get/orders_get/symbol_info_tick/order_send) para
+verificar imutabilidade, filtros, idade máxima por consumidor, leitura única sob concorrência e invalidação
+"""
+
+import sys
+import os
+import threading
+import time
+from collections import namedtuple
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from snapshot_mt5 import ServicoSnapshotMT5
+
+Posicao = namedtuple('Posicao', 'ticket symbol magic type volume')
+Tick = namedtuple('Tick', 'bid ask')
+
+
+class TerminalTeste:
+    """Terminal com a API do MetaTrader5 que conta chamadas e demora um pouco em cada uma."""
+
+    def __init__(self, atraso=0.0):
+        self.posicoes = [Posicao(1, 'PETR4', 2001, 0, 100), Posicao(2, 'VALE3', 2001, 1, 100),
+                         Posicao(3, 'ITUB4', 3005, 0, 200)]
+        self.ordens = [Posicao(10, 'BBDC4', 2002, 2, 100)]
+        self.chamadas = 0
+        self.atraso = atraso
+        self.simultaneas = 0
+        self.max_simultaneas = 0
+        self._trava = threading.Lock()
+
+    def _chamada(self):
+        with self._trava:
+            self.chamadas += 1
+            self.simultaneas += 1
+            self.max_simultaneas = max(self.max_simultaneas, self.simultaneas)
+        time.sleep(self.atraso)
+        with self._trava:
+            self.simultaneas -= 1
+
+    def positions_get(self):
+        self._chamada()
+        return tuple(self.posicoes)
+
+    def orders_get(self):
+        self._chamada()
+        return tuple(self.ordens)
+
+    def symbol_info_tick(self, symbol):
+        self._chamada()
+        return Tick(10.0, 10.1)
+
+    def order_send(self, request):
+        self._chamada()
+        self.posicoes.append(Posicao(99, request['symbol'], request['magic'], 0, request['volume']))
+        return 'ok'
+
+
+def test_snapshot_imutavel_e_filtros():
+    """Snapshot carrega posições, ordens e ticks dos símbolos abertos; filtros iguais aos do MT5"""
+    print("🧪 Testando conteúdo e filtros do snapshot...")
+    terminal = TerminalTeste()
+    servico = ServicoSnapshotMT5(terminal, intervalo=1.0, simbolos=['WINM25'], log=lambda msg: None)
+    snap = servico.obter()
+    assert snap.versao == 1 and len(snap.posicoes) == 3 and len(snap.ordens) == 1
+    assert set(snap.ticks) == {'PETR4', 'VALE3', 'ITUB4', 'BBDC4', 'WINM25'}
+    assert [p.ticket for p in snap.posicoes_de(prefixo='2')] == [1, 2]
+    assert [p.ticket for p in snap.posicoes_de(symbol='ITUB4')] == [3]
+    assert snap.ordens_de(magic=2002)[0].symbol == 'BBDC4'
+    assert snap.tick('PETR4').bid == 10.0 and snap.tick('XXXX3') is None
+    try:
+        snap.posicoes = ()
+        assert False, "snapshot deveria ser imutável"
+    except AttributeError:
+        pass
+    try:
+        snap.ticks['PETR4'] = None
+        assert False, "ticks deveriam ser somente leitura"
+    except TypeError:
+        pass
+    print("✅ Snapshot imutável e filtros corretos")
+
+
+def test_idade_maxima_e_invalidacao():
+    """Consultas dentro da idade aceita não chamam o terminal; order_send invalida o snapshot"""
+    print("🧪 Testando idade máxima por consumidor e invalidação...")
+    terminal = TerminalTeste()
+    servico = ServicoSnapshotMT5(terminal, intervalo=1.0, log=lambda msg: None)
+    primeiro = servico.obter()
+    chamadas = terminal.chamadas
+    for _ in range(100):
+        assert servico.obter(idade_maxima=5.0) is primeiro
+    assert terminal.chamadas == chamadas
+
+    time.sleep(0.05)
+    assert servico.obter(idade_maxima=0.01).versao == 2       # consumidor mais exigente força leitura
+    assert servico.obter(idade_maxima=5.0).versao == 2
+
+    servico.enviar_ordem({'symbol': 'ABEV3', 'magic': 2003, 'volume': 100})
+    depois = servico.obter(idade_maxima=60)
+    assert depois.versao == 3 and depois.posicoes_de(symbol='ABEV3')
+    print(f"📊 {servico.estatisticas}")
+    print("✅ Idade máxima e invalidação OK")
+
+
+def test_leitura_unica_concorrente():
+    """Várias threads pedindo snapshot velho ao mesmo tempo geram uma única leitura do terminal"""
+    print("🧪 Testando leitura única com threads concorrentes...")
+    terminal = TerminalTeste(atraso=0.02)
+    servico = ServicoSnapshotMT5(terminal, intervalo=1.0, ticks_posicoes=False, log=lambda msg: None)
+    versoes = []
+    barreira = threading.Barrier(16)
+
+    def consumidor():
+        barreira.wait()
+        versoes.append(servico.obter(idade_maxima=1.0).versao)
+
+    threads = [threading.Thread(target=consumidor) for _ in range(16)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert versoes == [1] * 16
+    assert terminal.chamadas == 2 and terminal.max_simultaneas == 1
+
+    # Leitura periódica em segundo plano mantém o snapshot fresco sem leituras sob demanda
+    servico.intervalo = 0.05
+    servico.iniciar()
+    time.sleep(0.3)
+    sob_demanda = servico.estatisticas['leituras_sob_demanda']
+    for _ in range(50):
+        servico.obter(idade_maxima=0.2)
+        time.sleep(0.002)
+    servico.parar()
+    assert servico.estatisticas['leituras_sob_demanda'] == sob_demanda
+    assert servico.estatisticas['leituras'] >= 3
+    print("✅ Uma leitura por vez, compartilhada entre as threads")
+
+
+if __name__ == "__main__":
+    test_snapshot_imutavel_e_filtros()
+    test_idade_maxima_e_invalidacao()
+    test_leitura_unica_concorrente()
+    print("\n✅ Todos os testes do snapshot MT5 passaram!")
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Teste dos núcleos NumPy de ADF e Engle-Granger (testes_estatisticos.py)
+Valida estatística, p-valor, lag escolhido e valores críticos contra adfuller/coint do statsmodels
+"""
+
+import sys
+import os
+import time
+import warnings
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from statsmodels.tsa.stattools import adfuller, coint
+
+import testes_estatisticos
+from testes_estatisticos import CacheLagsADF, adf_lote, adfuller_rapido, coint_lote, coint_rapido
+from triagem_pares import calcular_testes_residuo_vetorizado, calcular_zscore_par, triagem_ols_vetorizada
+
+
+def _ar1(rng, n, phi):
+    x = np.zeros(n)
+    for t in range(1, n):
+        x[t] = phi * x[t - 1] + rng.normal()
+    return x
+
+
+def test_adf_igual_statsmodels():
+    """adfuller_rapido deve escolher o mesmo lag e reproduzir estatística, p-valor e críticos"""
+    print("🧪 Comparando ADF NumPy com adfuller(autolag='AIC')...")
+    rng = np.random.default_rng(3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for _ in range(60):
+            x = _ar1(rng, int(rng.integers(30, 400)), rng.uniform(0.3, 1.0))
+            for regression in ('c', 'n'):
+                esperado = adfuller(x, autolag='AIC', regression=regression)
+                obtido = adfuller_rapido(x, regression=regression)
+                assert obtido[2] == esperado[2] and obtido[3] == esperado[3]
+                assert np.isclose(obtido[0], esperado[0], rtol=1e-8, atol=1e-10)
+                assert np.isclose(obtido[1], esperado[1], rtol=1e-8, atol=1e-10)
+                assert np.isclose(obtido[5], esperado[5], rtol=1e-8)
+                assert all(np.isclose(obtido[4][k], esperado[4][k]) for k in ('1%', '5%', '10%'))
+
+            # Lag fixo igual ao lag escolhido reproduz a busca completa
+            fixo = adfuller_rapido(x, lag=esperado[2], regression='n')
+            assert np.isclose(fixo[0], esperado[0], rtol=1e-8, atol=1e-10)
+    print("✅ ADF idêntico ao statsmodels")
+
+
+def test_coint_igual_statsmodels():
+    """coint_rapido e coint_lote devem reproduzir coint(y0, y1)"""
+    print("🧪 Comparando Engle-Granger NumPy com coint...")
+    rng = np.random.default_rng(5)
+    n = 250
+    pares = []
+    for _ in range(30):
+        x = np.cumsum(rng.normal(size=n))
+        y = 2 + 0.7 * x + _ar1(rng, n, rng.uniform(0.2, 0.99))
+        pares.append((y, x))
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        esperados = [coint(y, x) for y, x in pares]
+    lote = coint_lote(np.array([p[0] for p in pares]), np.array([p[1] for p in pares]))
+    for k, ((y, x), esperado) in enumerate(zip(pares, esperados)):
+        obtido = coint_rapido(y, x)
+        assert np.isclose(obtido[0], esperado[0], rtol=1e-8, atol=1e-10)
+        assert np.isclose(obtido[1], esperado[1], rtol=1e-8, atol=1e-10)
+        assert np.allclose(obtido[2], esperado[2])
+        assert np.isclose(lote['estatistica'][k], esperado[0], rtol=1e-8, atol=1e-10)
+        assert np.isclose(lote['p_valor'][k], esperado[1], rtol=1e-8, atol=1e-10)
+    print("✅ Engle-Granger idêntico ao statsmodels")
+
+
+def test_lote_e_velocidade():
+    """O ADF em lote deve igualar o ADF série a série e ser várias vezes mais rápido que o statsmodels"""
+    print("🧪 Medindo ADF em lote...")
+    rng = np.random.default_rng(8)
+    X = np.cumsum(rng.normal(size=(200, 250)), axis=1)
+    X[7] = 1.0  # série constante fica com NaN, sem derrubar o lote
+
+    inicio = time.perf_counter()
+    lote = adf_lote(X)
+    tempo_lote = time.perf_counter() - inicio
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        inicio = time.perf_counter()
+        esperados = [adfuller(x, autolag='AIC') if k != 7 else None for k, x in enumerate(X)]
+        tempo_statsmodels = time.perf_counter() - inicio
+
+    assert np.isnan(lote['estatistica'][7]) and np.isnan(lote['p_valor'][7])
+    for k, esperado in enumerate(esperados):
+        if esperado is None:
+            continue
+        assert lote['lag'][k] == esperado[2]
+        assert np.isclose(lote['p_valor'][k], esperado[1], rtol=1e-8, atol=1e-10)
+    print(f"📊 statsmodels: {tempo_statsmodels:.2f}s | lote: {tempo_lote:.3f}s "
+          f"({tempo_statsmodels / tempo_lote:.0f}x)")
+    assert tempo_lote * 5 < tempo_statsmodels
+    print("✅ ADF em lote consistente e mais rápido")
+
+
+def test_pvalor_sem_tabelas_internas():
+    """Sem as tabelas internas do statsmodels, o p-valor vem do mackinnonp público com o mesmo resultado"""
+    print("🧪 Testando fallback do p-valor de MacKinnon...")
+    estatisticas = np.linspace(-12, 4, 161)
+    tabelas = testes_estatisticos.HAS_TABELAS_MACKINNON
+    try:
+        for N in (1, 2):
+            testes_estatisticos.HAS_TABELAS_MACKINNON = tabelas
+            direto = testes_estatisticos.mackinnonp_vetorizado(estatisticas, 'c', N)
+            testes_estatisticos.HAS_TABELAS_MACKINNON = False
+            publico = testes_estatisticos.mackinnonp_vetorizado(estatisticas, 'c', N)
+            assert np.allclose(direto, publico, rtol=1e-12, atol=0)
+
+        rng = np.random.default_rng(21)
+        x = _ar1(rng, 200, 0.7)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            esperado = adfuller(x, autolag='AIC')
+        assert np.isclose(adfuller_rapido(x)[1], esperado[1], rtol=1e-8)
+    finally:
+        testes_estatisticos.HAS_TABELAS_MACKINNON = tabelas
+    print("✅ Mesmos p-valores pelo mackinnonp público")
+
+
+def test_cache_de_lags():
+    """O lag é reaproveitado entre chamadas e rebuscado a cada revalidação"""
+    print("🧪 Testando cache de lags...")
+    rng = np.random.default_rng(13)
+    x = _ar1(rng, 300, 0.8)
+    cache = CacheLagsADF(revalidar_cada=2)
+    primeiro = cache.adfuller(('A', 'B', 120, 'adf'), x)
+    assert cache.buscas == 1 and len(primeiro) == 6
+    segundo = cache.adfuller(('A', 'B', 120, 'adf'), x)
+    cache.adfuller(('A', 'B', 120, 'adf'), x)
+    assert cache.acertos == 2 and len(segundo) == 5
+    assert np.isclose(segundo[0], primeiro[0]) and segundo[2] == primeiro[2]
+    cache.adfuller(('A', 'B', 120, 'adf'), x)   # terceira reutilização: revalida
+    assert cache.buscas == 2
+    print("✅ Lag reaproveitado e revalidado")
+
+
+def test_triagem_com_testes_rapidos():
+    """calcular_zscore_par com testes_rapidos e a etapa em lote devem coincidir com o caminho statsmodels"""
+    print("🧪 Comparando calcular_zscore_par com e sem testes rápidos...")
+    rng = np.random.default_rng(17)
+    index = pd.date_range('2024-01-01', periods=260, freq='D')
+    fator = 30 + np.cumsum(rng.normal(0, 0.5, 260))
+    dados = {}
+    simbolos = [f'ATV{k}' for k in range(5)] + ['IBOV', 'WIN$']
+    for k, simbolo in enumerate(simbolos):
+        ruido = _ar1(rng, 260, 0.4 + 0.1 * k) * 0.3
+        dados[simbolo] = {'close': {'serie': None, 'ndiffs': 1,
+                                    'raw': pd.Series(10 + k + (0.4 + 0.05 * k) * fator + ruido, index=index)}}
+    ativos = simbolos[:5]
+    grade = triagem_ols_vetorizada(dados, ativos, ativos, [70, 200], ativos_referencia=['IBOV', 'WIN$'])
+    testes = calcular_testes_residuo_vetorizado(dados, grade, ['IBOV', 'WIN$'])
+    assert testes['exato'].all()
+
+    series = {a: dados[a]['close']['raw'] for a in simbolos}
+    filtros = dict(enable_zscore_filter=False, enable_r2_filter=False, enable_beta_filter=False,
+                   USE_SPREAD_FORECAST=False)
+    aprovados = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for k, linha in grade.iterrows():
+            args = (series, linha['Dependente'], linha['Independente'], 'IBOV', 'WIN$', linha['Período'])
+            params = (linha['alpha'], linha['beta'], linha['r2'])
+            original = calcular_zscore_par(*args, params_ols=params, **filtros)
+            rapido = calcular_zscore_par(*args, params_ols=params, testes_rapidos=True, revalidar_lag=5, **filtros)
+            assert (original is None) == (rapido is None)
+            reprovado = (testes.loc[k, 'adf_p_est'] >= 0.05 or testes.loc[k, 'coint_p_est'] >= 0.05 or
+                         testes.loc[k, 'coint_stat_est'] > testes.loc[k, 'coint_crit5_est'])
+            assert reprovado == (original is None)
+            if original is not None:
+                aprovados += 1
+                assert np.isclose(rapido[5], original[5], rtol=1e-8, atol=1e-10)
+                assert np.isclose(rapido[14], original[14], rtol=1e-8, atol=1e-10)
+                assert np.isclose(testes.loc[k, 'adf_p_est'], original[5], rtol=1e-6, atol=1e-10)
+    print(f"📊 {len(grade)} linhas, {aprovados} aprovadas")
+    assert aprovados > 0
+    print("✅ Mesmas decisões e p-valores do statsmodels")
+
+
+if __name__ == "__main__":
+    test_adf_igual_statsmodels()
+    test_coint_igual_statsmodels()
+    test_lote_e_velocidade()
+    test_pvalor_sem_tabelas_internas()
+    test_cache_de_lags()
+    test_triagem_com_testes_rapidos()
+    print("\n✅ Todos os testes dos testes estatísticos rápidos passaram!")
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Teste do motor vetorizado de triagem de pares (triagem_pares.py)
+Compara alpha/beta/r² em lote com o sm.OLS individual usado em calcular_residuo_zscore_timeframe
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+
+import warnings
+
+from triagem_pares import (
+    alinhar_series_fechamento, calcular_betas_rolling, calcular_momentos_ols, calcular_momentos_ols_sufixos,
+    calcular_zscore_atual_vetorizado, calcular_zscore_par, janelas_exatas, triagem_em_etapas, triagem_ols_vetorizada
+)
+from execucao_paralela import avaliar_pares_paralelo
+
+
+def _dados_sinteticos(n_ativos=8, n_barras=300, seed=7):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-01-01', periods=n_barras, freq='D')
+    fator = np.cumsum(rng.normal(0, 1, n_barras))
+    dados = {}
+    simbolos = [f'ATV{k}' for k in range(n_ativos)] + ['IBOV', 'WIN$']
+    for k, simbolo in enumerate(simbolos):
+        preco = 50 + k + (0.5 + 0.1 * k) * fator + np.cumsum(rng.normal(0, 0.5, n_barras))
+        serie = pd.Series(preco, index=index)
+        dados[simbolo] = {'close': {'serie': None, 'ndiffs': 0, 'raw': serie}}
+    return dados, simbolos[:n_ativos]
+
+
+def test_triagem_igual_ols():
+    """Alpha, beta e r² vetorizados devem coincidir com sm.OLS par a par"""
+    print("🧪 Comparando triagem vetorizada com sm.OLS...")
+    dados, ativos = _dados_sinteticos()
+    periodos = [70, 120, 250]
+    grade = triagem_ols_vetorizada(dados, ativos, ativos, periodos, ativos_referencia=['IBOV', 'WIN$'])
+
+    assert len(grade) == len(periodos) * len(ativos) * (len(ativos) - 1)
+    assert list(grade['Período'].unique()) == periodos
+
+    for linha in grade.sample(20, random_state=1).itertuples(index=False):
+        y = dados[linha.Dependente]['close']['raw'].iloc[-linha.Período:]
+        x = dados[linha.Independente]['close']['raw'].iloc[-linha.Período:]
+        modelo = sm.OLS(y, sm.add_constant(x)).fit()
+        assert np.isclose(linha.alpha, modelo.params.iloc[0], rtol=1e-8, atol=1e-8)
+        assert np.isclose(linha.beta, modelo.params.iloc[1], rtol=1e-8, atol=1e-10)
+        assert np.isclose(linha.r2, modelo.rsquared, rtol=1e-8, atol=1e-10)
+    print("✅ Parâmetros idênticos ao OLS individual")
+
+
+def test_triagem_com_lacunas():
+    """Barras ausentes de um ativo são ignoradas apenas nos pares em que ele participa"""
+    print("🧪 Testando alinhamento com lacunas...")
+    dados, ativos = _dados_sinteticos(n_ativos=4)
+    raw = dados['ATV1']['close']['raw']
+    raw = raw.drop(raw.index[-30:-20])
+    dados['ATV1']['close']['raw'] = raw
+
+    index, matriz, simbolos = alinhar_series_fechamento(dados, ativos, ['IBOV', 'WIN$'])
+    assert simbolos == ativos
+    assert np.isnan(matriz[:, 1]).sum() == 10
+
+    grade = triagem_ols_vetorizada(dados, ativos, ativos, [100], ativos_referencia=['IBOV', 'WIN$'])
+    linha = grade[(grade['Dependente'] == 'ATV0') & (grade['Independente'] == 'ATV1')].iloc[0]
+    assert linha['n_obs'] == 90
+
+    df = pd.concat([dados['ATV0']['close']['raw'].iloc[-100:], raw.iloc[-100:]], axis=1).dropna()
+    df = df.loc[df.index.isin(index[-100:])]
+    modelo = sm.OLS(df.iloc[:, 0], sm.add_constant(df.iloc[:, 1])).fit()
+    assert np.isclose(linha['beta'], modelo.params.iloc[1], rtol=1e-8)
+    print("✅ Lacunas tratadas par a par")
+
+
+def test_triagem_universo_completo():
+    """Universo de ~50 ativos x 10 períodos deve rodar em segundos"""
+    print("🧪 Medindo tempo da triagem completa...")
+    dados, ativos = _dados_sinteticos(n_ativos=53, n_barras=360)
+    periodos = [70, 100, 120, 140, 160, 180, 200, 220, 240, 250]
+    inicio = time.perf_counter()
+    grade = triagem_ols_vetorizada(dados, ativos, ativos, periodos, ativos_referencia=['IBOV', 'WIN$'])
+    tempo = time.perf_counter() - inicio
+    print(f"📊 {len(grade)} regressões em {tempo:.3f}s")
+    assert len(grade) == 10 * 53 * 52
+    assert tempo < 5.0
+    print("✅ Triagem completa dentro do orçamento de tempo")
+
+
+def test_momentos_sufixos_e_grade_fina():
+    """Momentos de todos os períodos em uma passada iguais aos da janela isolada; grade fina quase sem custo extra"""
+    print("🧪 Comparando momentos por sufixo com a janela isolada...")
+    rng = np.random.default_rng(11)
+    matriz = 30 + np.cumsum(rng.normal(0, 0.3, (300, 12)), axis=0)
+    matriz[rng.random(matriz.shape) < 0.03] = np.nan
+    periodos = [250, 70, 100, 400, 100, 3]       # fora de ordem, repetido, maior que a série e curto demais
+    por_periodo = calcular_momentos_ols_sufixos(matriz, periodos)
+    for periodo in periodos:
+        isolado = calcular_momentos_ols(matriz[-periodo:])
+        for chave in ('alpha', 'beta', 'r2', 'correlacao'):
+            assert np.allclose(por_periodo[periodo][chave], isolado[chave], rtol=1e-9, atol=1e-12, equal_nan=True)
+        assert np.array_equal(por_periodo[periodo]['n_obs'], isolado['n_obs'])
+
+    dados, ativos = _dados_sinteticos(n_ativos=53, n_barras=360)
+    tempos = {}
+    for nome, grade in (('10', [70, 100, 120, 140, 160, 180, 200, 220, 240, 250]), ('181', list(range(70, 251)))):
+        inicio = time.perf_counter()
+        resultado = triagem_ols_vetorizada(dados, ativos, ativos, grade, ativos_referencia=['IBOV', 'WIN$'])
+        tempos[nome] = time.perf_counter() - inicio
+        assert len(resultado) == len(grade) * 53 * 52
+    linha = resultado[(resultado['Período'] == 137) & (resultado['Dependente'] == 'ATV3') &
+                      (resultado['Independente'] == 'ATV9')].iloc[0]
+    _, matriz, simbolos = alinhar_series_fechamento(dados, ativos, ['IBOV', 'WIN$'])
+    isolado = calcular_momentos_ols(matriz[-137:])
+    assert np.isclose(linha['beta'], isolado['beta'][simbolos.index('ATV3'), simbolos.index('ATV9')], rtol=1e-9)
+    print(f"📊 10 períodos: {tempos['10']:.3f}s | 181 períodos: {tempos['181']:.3f}s")
+    assert tempos['181'] < tempos['10'] * 18
+    print("✅ Momentos por sufixo idênticos e grade fina barata")
+
+
+def _betas_ols_por_janela(y, x, janela):
+    """Loop original de encontrar_linha_monitorada (sm.OLS por janela, janelas com erro descartadas)"""
+    betas = []
+    for i in range(len(y) - janela + 1):
+        Xu = sm.add_constant(pd.DataFrame({'ind': x.iloc[i:i + janela]}))
+        try:
+            betas.append(sm.OLS(y.iloc[i:i + janela], Xu).fit().params.get('ind', np.nan))
+        except Exception:
+            pass
+    return pd.Series(betas)
+
+
+def test_betas_rolling_igual_ols():
+    """Beta rotation por somas acumuladas deve coincidir com o OLS janela a janela"""
+    print("🧪 Comparando betas móveis com sm.OLS por janela...")
+    rng = np.random.default_rng(5)
+    x = pd.Series(30 + np.cumsum(rng.normal(0, 0.5, 360)))
+    y = pd.Series(12 + 0.8 * x + rng.normal(0, 0.4, 360))
+    x.iloc[100:104] = x.iloc[99]          # trecho constante
+    y.iloc[200] = np.nan                  # NaN no dependente
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for janela in (1, 4, 250):
+            esperado = _betas_ols_por_janela(y, x, janela)
+            betas, validos = calcular_betas_rolling(y.to_numpy(), x.to_numpy(), janela)
+            obtido = pd.Series(betas[validos])
+            assert len(obtido) == len(esperado)
+            assert np.allclose(obtido, esperado, rtol=1e-8, atol=1e-10, equal_nan=True)
+            for estatistica in (lambda b: b.mean(), lambda b: b.std(ddof=0), lambda b: b.iloc[-1]):
+                assert np.isclose(estatistica(obtido), estatistica(esperado), rtol=1e-8, equal_nan=True)
+
+        # NaN no independente: o OLS falha e a janela é descartada
+        x.iloc[300] = np.nan
+        betas, validos = calcular_betas_rolling(y.to_numpy(), x.to_numpy(), 20)
+        assert len(betas[validos]) == len(_betas_ols_por_janela(y, x, 20))
+
+        # Modo de calcular_betas_rolling_precos: janela com x constante vira NaN (sem intercepto não há beta)
+        betas, _ = calcular_betas_rolling(y.to_numpy(), x.to_numpy(), 4, constante_sem_intercepto=False)
+        assert np.isnan(betas[100]) and np.isfinite(betas[90])
+    print("✅ beta_rotation, média, desvio e último beta idênticos")
+
+
+def test_zscore_vetorizado_igual_par():
+    """z-score estimado em lote deve coincidir com calcular_zscore_par nas linhas exatas"""
+    print("🧪 Comparando z-score vetorizado com calcular_zscore_par...")
+    rng = np.random.default_rng(21)
+    index = pd.date_range('2024-01-01', periods=300, freq='D')
+    fator = 30 + np.cumsum(rng.normal(0, 0.5, 300))
+    dados = {}
+    simbolos = [f'ATV{k}' for k in range(6)] + ['IBOV', 'WIN$']
+    for k, simbolo in enumerate(simbolos):
+        ruido = np.zeros(300)
+        for t in range(1, 300):
+            ruido[t] = 0.5 * ruido[t - 1] + rng.normal(0, 0.3)
+        serie = pd.Series(10 + k + (0.4 + 0.05 * k) * fator + ruido, index=index)
+        dados[simbolo] = {'close': {'serie': None, 'ndiffs': 1, 'raw': serie}}
+    raw = dados['ATV5']['close']['raw']
+    dados['ATV5']['close']['raw'] = raw.drop(raw.index[-15])   # lacuna: linhas com ATV5 não são exatas
+    ativos = simbolos[:6]
+
+    grade = triagem_ols_vetorizada(dados, ativos, ativos, [70, 200], ativos_referencia=['IBOV', 'WIN$'])
+    estimativa = calcular_zscore_atual_vetorizado(dados, grade, ['IBOV', 'WIN$'])
+    com_lacuna = (grade['Dependente'] == 'ATV5') | (grade['Independente'] == 'ATV5')
+    assert not estimativa.loc[com_lacuna, 'exato'].any()
+    assert estimativa.loc[~com_lacuna, 'exato'].all()
+
+    series = {a: dados[a]['close']['raw'] for a in simbolos}
+    comparados = 0
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        for k, linha in grade[~com_lacuna].iterrows():
+            resultado = calcular_zscore_par(
+                series, linha['Dependente'], linha['Independente'], 'IBOV', 'WIN$', linha['Período'],
+                enable_zscore_filter=False, enable_r2_filter=False, enable_beta_filter=False,
+                enable_cointegration_filter=False, params_ols=(linha['alpha'], linha['beta'], linha['r2'])
+            )
+            if resultado is None:
+                continue
+            comparados += 1
+            assert np.isclose(estimativa.loc[k, 'half_life_est'], resultado[2], rtol=1e-8, atol=1e-10)
+            assert np.isclose(estimativa.loc[k, 'zscore_est'], resultado[3], rtol=1e-8, atol=1e-10, equal_nan=True)
+    print(f"📊 {comparados} pares comparados")
+    assert comparados > 0
+    print("✅ z-score vetorizado idêntico ao cálculo por par")
+
+
+def _dados_cointegrados(indice_acoes, indice_win, seed=5):
+    """Ações e IBOV em `indice_acoes`, WIN$ em `indice_win`, todos cointegrados com o mesmo fator."""
+    rng = np.random.default_rng(seed)
+    calendario = indice_acoes.union(indice_win)
+    fator = pd.Series(30 + np.cumsum(rng.normal(0, 0.3, len(calendario))), index=calendario)
+    dados = {}
+    simbolos = [f'ATV{k}' for k in range(5)] + ['IBOV', 'WIN$']
+    for k, simbolo in enumerate(simbolos):
+        indice = indice_win if simbolo == 'WIN$' else indice_acoes
+        ruido = np.zeros(len(indice))
+        for t in range(1, len(indice)):
+            ruido[t] = 0.6 * ruido[t - 1] + rng.normal(0, 0.25)
+        serie = pd.Series(10 + k + (0.4 + 0.1 * k) * fator.loc[indice].to_numpy() + ruido, index=indice)
+        dados[simbolo] = {'close': {'serie': None, 'ndiffs': 1, 'raw': serie}}
+    return dados, simbolos[:5]
+
+
+def _loop_original(dados, ativos, periodos, filtros):
+    """Loop de main() sem a triagem vetorizada: calcular_zscore_par com OLS do próprio par para cada linha."""
+    series = {a: dados[a]['close']['raw'] for a in dados}
+    resultados = {}
+    for periodo in periodos:
+        for dep in ativos:
+            for ind in ativos:
+                if dep != ind:
+                    resultado = calcular_zscore_par(series, dep, ind, 'IBOV', 'WIN$', periodo, nd_dep=1, nd_ind=1,
+                                                    **filtros)
+                    if resultado is not None and resultado[3] is not None:
+                        resultados[(dep, ind, periodo)] = resultado
+    return resultados
+
+
+def test_etapas_iguais_ao_loop_original():
+    """Com sessões diferentes (WIN$ com mais horas) ou barra ausente em WIN$, as etapas aprovam as mesmas linhas"""
+    print("🧪 Comparando triagem em etapas com o loop original...")
+    filtros = dict(USE_SPREAD_FORECAST=False, enable_cointegration_filter=True, zscore_min_threshold=-1.0,
+                   zscore_max_threshold=1.0, r2_min_threshold=0.5, beta_max_threshold=1.0, testes_rapidos=True)
+    # M15: ações e IBOV das 10h às 17h, WIN$ das 9h às 18h (o recorte de WIN$ cobre menos dias)
+    dias = pd.bdate_range('2024-03-04', periods=12)
+    pregao = pd.DatetimeIndex([d + pd.Timedelta(minutes=15 * k) for d in dias for k in range(40, 68)])
+    estendido = pd.DatetimeIndex([d + pd.Timedelta(minutes=15 * k) for d in dias for k in range(36, 72)])
+    dados_m15, ativos_m15 = _dados_cointegrados(pregao, estendido)
+    # D1: uma barra a menos em WIN$
+    diario = pd.bdate_range('2023-01-02', periods=300)
+    dados_diarios, ativos_diarios = _dados_cointegrados(diario, diario.delete(-40), seed=9)
+
+    comparados = 0
+    for dados, ativos, periodos in ((dados_m15, ativos_m15, [70, 120, 200]),
+                                    (dados_diarios, ativos_diarios, [30, 70, 120])):
+        grade = triagem_ols_vetorizada(dados, ativos, ativos, periodos, ativos_referencia=['IBOV', 'WIN$'])
+        exato = janelas_exatas(dados, grade, ['IBOV', 'WIN$'])
+        assert not exato.all()
+
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            tarefas, resultados = triagem_em_etapas(
+                dados, ativos, ativos, periodos, ['IBOV', 'WIN$'],
+                lambda t: avaliar_pares_paralelo(dados, t, 'IBOV', 'WIN$', n_workers=1, **filtros),
+                r2_min=0.5, beta_max=1.0, zscore_min=-1.0, zscore_max=1.0
+            )
+            etapas = {(dep, ind, periodo): resultado for (dep, ind, periodo, *_), resultado in zip(tarefas, resultados)
+                      if resultado is not None and resultado[3] is not None}
+            original = _loop_original(dados, ativos, periodos, filtros)
+
+        assert set(etapas) == set(original)
+        for chave, resultado in original.items():
+            assert np.allclose(np.array(etapas[chave][:8], dtype=float), np.array(resultado[:8], dtype=float),
+                               rtol=1e-7, atol=1e-9, equal_nan=True)
+            assert np.isclose(etapas[chave][15], resultado[15], rtol=1e-7)
+        comparados += len(original)
+        print(f"📊 {len(grade)} linhas, {int(exato.sum())} exatas, {len(original)} aprovadas")
+    assert comparados > 0
+    print("✅ Mesmas linhas e valores do loop original")
+
+
+if __name__ == "__main__":
+    test_triagem_igual_ols()
+    test_triagem_com_lacunas()
+    test_triagem_universo_completo()
+    test_momentos_sufixos_e_grade_fina()
+    test_betas_rolling_igual_ols()
+    test_zscore_vetorizado_igual_par()
+    test_etapas_iguais_ao_loop_original()
+    print("\n✅ Todos os testes da triagem vetorizada passaram!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Teste do rastreador GARCH(1,1) recursivo (volatilidade_garch.py)
+Compara a recursão com o forecast do arch e verifica compartilhamento entre pares e reajustes
+"""
+
+import sys
+import os
+import math
+import warnings
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+from arch import arch_model
+
+from volatilidade_garch import RastreadorGARCH, ajustar_garch, volatilidade_rolling
+
+
+def _serie(n=400, seed=1, freq='15min'):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range('2024-03-04 10:00', periods=n, freq=freq)
+    retornos = rng.normal(0, 0.01, n) * (1 + 0.5 * np.sin(np.arange(n) / 30))
+    return pd.Series(30 * np.exp(np.cumsum(retornos)), index=index)
+
+
+def _forecast_fixo(series, params):
+    modelo = arch_model(series, vol='Garch', p=1, q=1, dist='normal', rescale=False)
+    return math.sqrt(modelo.fix(params).forecast(horizon=1).variance.values[-1, 0])
+
+
+def test_recursao_igual_arch():
+    """Ajuste igual ao arch_model().fit(); barras novas e barra em formação iguais ao forecast com os mesmos parâmetros"""
+    print("🧪 Comparando recursão GARCH com o arch...")
+    serie = _serie()
+    rastreador = RastreadorGARCH(refit_diario=False, min_barras_deriva=1000)   # só o ajuste inicial
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        esperado = math.sqrt(ajustar_garch(serie.iloc[:300]).forecast(horizon=1).variance.values[-1, 0])
+        assert np.isclose(rastreador.sigma(('PETR4', 'close'), serie.iloc[:300]), esperado, rtol=1e-10)
+        params = rastreador._estados[('PETR4', 'close')].params
+
+        for fim in (301, 320, 350):
+            obtido = rastreador.sigma(('PETR4', 'close'), serie.iloc[:fim])
+            assert np.isclose(obtido, _forecast_fixo(serie.iloc[:fim], params), rtol=1e-9)
+
+        # Última barra ainda em formação: mesmo horário, valor diferente
+        em_formacao = serie.iloc[:350].copy()
+        em_formacao.iloc[-1] *= 1.01
+        obtido = rastreador.sigma(('PETR4', 'close'), em_formacao)
+        assert np.isclose(obtido, _forecast_fixo(em_formacao, params), rtol=1e-9)
+    assert rastreador.estatisticas['ajustes'] == 1
+    print(f"📊 {rastreador.estatisticas}")
+    print("✅ σ² recursivo idêntico ao forecast do arch")
+
+
+def test_compartilhado_entre_pares():
+    """Pares com janelas diferentes do mesmo ativo usam um único ajuste; virada do dia reajusta"""
+    print("🧪 Testando compartilhamento entre pares e reajuste diário...")
+    serie = _serie(n=200, freq='h')
+    rastreador = RastreadorGARCH()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        fim = serie.index.get_indexer([serie.index[serie.index.normalize() == serie.index[150].normalize()][0]])[0]
+        for periodo in (120, 100, 70, 120):        # mesmo ativo em quatro pares
+            rastreador.sigma(('VALE3', 'high'), serie.iloc[fim + 1 - periodo:fim + 1])
+        assert rastreador.estatisticas['ajustes'] == 1
+
+        rastreador.sigma(('VALE3', 'high'), serie.iloc[:fim + 3])     # mesmo dia: só recursão
+        assert rastreador.estatisticas['ajustes'] == 1
+        rastreador.sigma(('VALE3', 'high'), serie.iloc[:fim + 30])    # outro dia: reajuste
+        assert rastreador.estatisticas['ajustes'] == 2
+
+        # Outra série sob a mesma chave (ex.: outro timeframe) não é confundida com continuação
+        outra = _serie(n=200, seed=9, freq='h')
+        esperado = math.sqrt(ajustar_garch(outra.iloc[:fim + 30]).forecast(horizon=1).variance.values[-1, 0])
+        # (reajuste parte dos parâmetros anteriores: o ótimo coincide dentro da tolerância do otimizador)
+        assert np.isclose(rastreador.sigma(('VALE3', 'high'), outra.iloc[:fim + 30]), esperado, rtol=1e-3)
+    print("✅ Um ajuste por ativo/coluna por dia")
+
+
+def test_deriva_e_fallback():
+    """Salto de nível fora do regime ajustado dispara reajuste; série curta cai no desvio móvel"""
+    print("🧪 Testando reajuste por deriva e fallback...")
+    serie = _serie(n=300)
+    choque = serie.copy()
+    choque.iloc[252:] *= 1.25
+    rastreador = RastreadorGARCH(refit_diario=False, min_barras_deriva=10)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        rastreador.sigma(('WEGE3', 'close'), choque.iloc[:250])
+        for fim in range(255, 301, 5):
+            rastreador.sigma(('WEGE3', 'close'), choque.iloc[:fim])
+    assert rastreador.estatisticas['ajustes'] >= 2
+
+    curta = serie.iloc[:2]
+    assert np.isnan(rastreador.sigma(('WEGE3', 'low'), curta)) == np.isnan(volatilidade_rolling(curta))
+    assert rastreador.estatisticas['fallbacks'] == 1
+    print("✅ Deriva reajusta e fallback preservado")
+
+
+if __name__ == "__main__":
+    test_recursao_igual_arch()
+    test_compartilhado_entre_pares()
+    test_deriva_e_fallback()
+    print("\n✅ Todos os testes do GARCH recursivo passaram!")
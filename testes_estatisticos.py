@@ -0,0 +1,299 @@
+"""
+Testes Estatísticos Rápidos - ADF e Engle-Granger em NumPy
+Reproduz adfuller(autolag='AIC') e coint() do statsmodels sem ajustar uma regressão
+OLS por candidato de lag: uma única decomposição QR da matriz com todos os lags
+fornece a soma dos quadrados dos resíduos de todos os modelos aninhados, e o
+t-valor do nível sai direto da mesma decomposição. Séries de mesmo tamanho são
+processadas em lote (matriz séries x barras), e o lag escolhido pode ser fixado
+ou reaproveitado de um ciclo anterior (CacheLagsADF). Os p-valores e valores
+críticos usam as mesmas tabelas de MacKinnon do statsmodels.
+"""
+
+import threading
+
+import numpy as np
+from scipy.stats import norm
+from statsmodels.tsa.adfvalues import mackinnoncrit, mackinnonp
+
+# As tabelas de MacKinnon (_tau_*) são internas do statsmodels: só são usadas diretamente se existirem e
+# reproduzirem o mackinnonp público desta versão; senão o p-valor vem do mackinnonp, elemento a elemento
+try:
+    from statsmodels.tsa.adfvalues import _tau_maxs, _tau_mins, _tau_stars, _tau_smallps, _tau_largeps
+    HAS_TABELAS_MACKINNON = True
+except ImportError:
+    HAS_TABELAS_MACKINNON = False
+
+SQRTEPS = np.sqrt(np.finfo(np.double).eps)
+LOG_2PI = np.log(2 * np.pi)
+
+
+def _mackinnonp_publico(estatisticas, regression='c', N=1):
+    """mackinnonp público aplicado a cada estatística (fallback sem as tabelas internas)."""
+    return np.vectorize(lambda t: mackinnonp(t, regression=regression, N=N), otypes=[float])(estatisticas)
+
+
+def mackinnonp_vetorizado(estatisticas, regression='c', N=1):
+    """Versão vetorizada de statsmodels.tsa.adfvalues.mackinnonp (mesmas tabelas e fronteiras)."""
+    estatisticas = np.asarray(estatisticas, dtype=float)
+    if not HAS_TABELAS_MACKINNON:
+        return _mackinnonp_publico(estatisticas, regression, N)
+    maximo = _tau_maxs[regression][N - 1]
+    minimo = _tau_mins[regression][N - 1]
+    estrela = _tau_stars[regression][N - 1]
+    pequenos = np.polyval(np.asarray(_tau_smallps[regression][N - 1])[::-1], estatisticas)
+    grandes = np.polyval(np.asarray(_tau_largeps[regression][N - 1])[::-1], estatisticas)
+    p = norm.cdf(np.where(estatisticas <= estrela, pequenos, grandes))
+    p = np.where(estatisticas > maximo, 1.0, p)
+    p = np.where(estatisticas < minimo, 0.0, p)
+    return p
+
+
+def _tabelas_conferem():
+    """As tabelas internas reproduzem o mackinnonp público (fronteiras e os dois polinômios)?"""
+    pontos = np.array([-30.0, -6.0, -3.5, -2.9, -1.6, 0.0, 0.5, 3.0])
+    try:
+        return all(np.allclose(mackinnonp_vetorizado(pontos, regression, N), _mackinnonp_publico(pontos, regression, N))
+                   for regression, N in (('c', 1), ('c', 2)))
+    except Exception:
+        return False
+
+
+if HAS_TABELAS_MACKINNON and not _tabelas_conferem():
+    HAS_TABELAS_MACKINNON = False
+
+
+def maxlag_padrao(nobs, regression='c'):
+    """Lag máximo de adfuller quando maxlag=None: ceil(12·(n/100)^¼), limitado a n//2 - ntrend - 1."""
+    ntrend = len(regression) if regression != 'n' else 0
+    maxlag = int(np.ceil(12.0 * np.power(nobs / 100.0, 1 / 4.0)))
+    maxlag = min(nobs // 2 - ntrend - 1, maxlag)
+    if maxlag < 0:
+        raise ValueError("sample size is too short to use selected regression component")
+    return maxlag
+
+
+def _regressores(X, lag, n_linhas, constante):
+    """
+    Monta o lote de matrizes de regressão (séries x n_linhas x colunas) do ADF, com as
+    últimas n_linhas observações: [constante], Δx defasado 1..lag e, por último, o nível x[t-1].
+    """
+    m, n = X.shape
+    dx = np.diff(X, axis=1)
+    colunas = []
+    if constante:
+        colunas.append(np.ones((m, n_linhas)))
+    for k in range(1, lag + 1):
+        colunas.append(dx[:, n - 1 - n_linhas - k:n - 1 - k])
+    colunas.append(X[:, n - 1 - n_linhas:n - 1])
+    return np.stack(colunas, axis=2), dx[:, n - 1 - n_linhas:]
+
+
+def _estatistica_nivel(X, lags, regression):
+    """t-valor do coeficiente do nível na regressão final do ADF, agrupando as séries por lag."""
+    m, n = X.shape
+    constante = regression != 'n'
+    tstat = np.full(m, np.nan)
+    nobs = np.zeros(m, dtype=int)
+    for lag in np.unique(lags):
+        selecao = lags == lag
+        n_linhas = n - 1 - int(lag)
+        A, y = _regressores(X[selecao], int(lag), n_linhas, constante)
+        Q, R = np.linalg.qr(A)
+        qy = np.einsum('mik,mi->mk', Q, y)
+        k = A.shape[2]
+        ssr = np.maximum(np.einsum('mi,mi->m', y, y) - np.einsum('mk,mk->m', qy, qy), 0.0)
+        s = np.sqrt(ssr / (n_linhas - k))
+        # Com o nível na última coluna: beta = qy[-1]/R[-1,-1] e (X'X)^-1[-1,-1] = 1/R[-1,-1]²
+        with np.errstate(invalid='ignore', divide='ignore'):
+            tstat[selecao] = np.sign(R[:, -1, -1]) * qy[:, -1] / s
+        nobs[selecao] = n_linhas
+    return tstat, nobs
+
+
+def _escolher_lag_aic(X, maxlag, regression):
+    """
+    Lag de menor AIC como em adfuller(autolag='AIC'): todos os candidatos sobre as mesmas
+    n-1-maxlag observações, desempate pelo menor lag. A QR da matriz completa [const, nível, Δx lags]
+    dá a SQR de cada prefixo de colunas, ou seja, de cada modelo aninhado.
+    """
+    m, n = X.shape
+    n_linhas = n - 1 - maxlag
+    constante = regression != 'n'
+    A, y = _regressores(X, maxlag, n_linhas, constante)
+    # Ordem das colunas do statsmodels na busca: [const], nível, Δx(1..maxlag)
+    A = np.concatenate([A[:, :, :int(constante)], A[:, :, -1:], A[:, :, int(constante):-1]], axis=2)
+    Q, _ = np.linalg.qr(A)
+    qy = np.einsum('mik,mi->mk', Q, y)
+    ssr = np.einsum('mi,mi->m', y, y)[:, None] - np.cumsum(qy * qy, axis=1)
+    k_inicial = int(constante) + 1
+    k = np.arange(k_inicial, A.shape[2] + 1)
+    ssr = np.maximum(ssr[:, k_inicial - 1:], np.finfo(float).tiny)
+    llf = -n_linhas / 2.0 * (LOG_2PI + np.log(ssr / n_linhas) + 1)
+    aic = -2 * llf + 2 * k
+    # Arredonda para não deixar ruído de ponto flutuante decidir empates que o statsmodels resolve pelo menor lag
+    melhor = np.argmin(np.round(aic, 10), axis=1)
+    return melhor, aic[np.arange(m), melhor]
+
+
+def adf_lote(X, maxlag=None, regression='c', autolag='AIC', lags=None):
+    """
+    ADF de várias séries de mesmo tamanho (linhas de X) de uma vez.
+
+    - autolag='AIC': escolhe o lag de cada série como adfuller(autolag='AIC')
+    - autolag=None: usa maxlag como lag fixo (como adfuller(maxlag=..., autolag=None))
+    - lags: vetor de lags por série (ex.: vindos de CacheLagsADF); dispensa a busca
+
+    Retorna dict com 'estatistica', 'p_valor', 'lag', 'nobs', 'aic' (NaN sem busca) e 'criticos'
+    (séries x 3, valores de 1%, 5% e 10%). Séries constantes ou com NaN ficam com NaN.
+    """
+    X = np.atleast_2d(np.asarray(X, dtype=float))
+    m, n = X.shape
+    if maxlag is None:
+        maxlag = maxlag_padrao(n, regression)
+    estatistica = np.full(m, np.nan)
+    lag_usado = np.full(m, -1)
+    aic = np.full(m, np.nan)
+    nobs = np.zeros(m, dtype=int)
+
+    valido = np.isfinite(X).all(axis=1) & (X.max(axis=1) != X.min(axis=1))
+    if valido.any():
+        Xv = X[valido]
+        if lags is not None:
+            lag_v = np.asarray(lags, dtype=int)[valido]
+        elif autolag is not None:
+            lag_v, aic[valido] = _escolher_lag_aic(Xv, maxlag, regression)
+        else:
+            lag_v = np.full(len(Xv), int(maxlag))
+        estatistica[valido], nobs[valido] = _estatistica_nivel(Xv, lag_v, regression)
+        lag_usado[valido] = lag_v
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        p_valor = np.where(np.isnan(estatistica), np.nan,
+                           mackinnonp_vetorizado(np.nan_to_num(estatistica), regression, 1))
+    criticos = np.full((m, 3), np.nan)
+    for nob in np.unique(nobs[valido]):
+        criticos[nobs == nob] = mackinnoncrit(N=1, regression=regression, nobs=nob)
+    return {'estatistica': estatistica, 'p_valor': p_valor, 'lag': lag_usado, 'nobs': nobs,
+            'aic': aic, 'criticos': criticos}
+
+
+def adfuller_rapido(x, maxlag=None, regression='c', autolag='AIC', lag=None):
+    """
+    Substituto de statsmodels adfuller para uma série. Retorna a mesma tupla:
+    (adfstat, pvalue, usedlag, nobs, critvalues[, icbest]) — icbest só quando há busca de lag.
+    lag: lag fixo (ex.: do cache) — o resultado é o mesmo da busca quando ela escolheria esse lag.
+    """
+    x = np.asarray(x, dtype=float)
+    if x.max() == x.min():
+        raise ValueError("Invalid input, x is constant")
+    resultado = adf_lote(x[None, :], maxlag=maxlag, regression=regression, autolag=autolag,
+                         lags=None if lag is None else [lag])
+    criticos = resultado['criticos'][0]
+    saida = (float(resultado['estatistica'][0]), float(resultado['p_valor'][0]), int(resultado['lag'][0]),
+             int(resultado['nobs'][0]), {'1%': criticos[0], '5%': criticos[1], '10%': criticos[2]})
+    if autolag is not None and lag is None:
+        saida += (float(resultado['aic'][0]),)
+    return saida
+
+
+def coint_lote(Y0, Y1, maxlag=None, autolag='AIC', lags=None):
+    """
+    Engle-Granger (coint com trend='c') de vários pares de mesmo tamanho: regressão de cada linha
+    de Y0 na linha de Y1 com constante, ADF sem constante no resíduo e MacKinnon com N=2.
+
+    Retorna dict com 'estatistica', 'p_valor', 'criticos' (valores de 1%, 5% e 10%, iguais para
+    todos os pares) e 'lag'.
+    """
+    Y0 = np.atleast_2d(np.asarray(Y0, dtype=float))
+    Y1 = np.atleast_2d(np.asarray(Y1, dtype=float))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        d0 = Y0 - Y0.mean(axis=1, keepdims=True)
+        d1 = Y1 - Y1.mean(axis=1, keepdims=True)
+        sxx = (d1 * d1).sum(axis=1)
+        beta = (d0 * d1).sum(axis=1) / sxx
+        residuo = d0 - beta[:, None] * d1
+        r2 = 1 - (residuo * residuo).sum(axis=1) / (d0 * d0).sum(axis=1)
+
+    return coint_residuos_lote(residuo, maxlag=maxlag, autolag=autolag, lags=lags, r2=r2)
+
+
+def coint_residuos_lote(residuos, maxlag=None, autolag='AIC', lags=None, r2=None):
+    """
+    Etapa final do Engle-Granger a partir dos resíduos (linhas) da regressão com constante já ajustada:
+    ADF sem constante e MacKinnon com N=2. r2 (opcional) marca pares colineares, que recebem -inf como em coint.
+    """
+    residuos = np.atleast_2d(np.asarray(residuos, dtype=float))
+    resultado = adf_lote(residuos, maxlag=maxlag, regression='n', autolag=autolag, lags=lags)
+    estatistica = resultado['estatistica']
+    if r2 is not None:
+        estatistica = np.where(np.asarray(r2) >= 1 - 100 * SQRTEPS, -np.inf, estatistica)
+    with np.errstate(invalid='ignore', over='ignore'):
+        p_valor = np.where(np.isnan(estatistica), np.nan,
+                           mackinnonp_vetorizado(np.nan_to_num(estatistica, neginf=-np.inf), 'c', 2))
+    criticos = mackinnoncrit(N=2, regression='c', nobs=residuos.shape[1] - 1)
+    return {'estatistica': estatistica, 'p_valor': p_valor, 'criticos': criticos, 'lag': resultado['lag']}
+
+
+def coint_rapido(y0, y1, maxlag=None, autolag='AIC', lag=None):
+    """Substituto de statsmodels coint(y0, y1) (trend='c'). Retorna (estatística, p-valor, críticos[1%, 5%, 10%])."""
+    resultado = coint_lote(np.asarray(y0, dtype=float)[None, :], np.asarray(y1, dtype=float)[None, :],
+                           maxlag=maxlag, autolag=autolag, lags=None if lag is None else [lag])
+    return float(resultado['estatistica'][0]), float(resultado['p_valor'][0]), resultado['criticos']
+
+
+class CacheLagsADF:
+    """
+    Lag escolhido pelo AIC por chave (ex.: (dep, ind, período, 'adf')), reaproveitado nos ciclos seguintes.
+    A cada `revalidar_cada` usos a busca completa roda de novo e atualiza o lag guardado.
+    """
+
+    def __init__(self, revalidar_cada=10):
+        self.revalidar_cada = revalidar_cada
+        self._lags = {}
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.buscas = 0
+
+    def __len__(self):
+        return len(self._lags)
+
+    def obter(self, chave, revalidar_cada=None):
+        """Lag guardado para a chave, ou None se for hora de (re)fazer a busca."""
+        revalidar_cada = self.revalidar_cada if revalidar_cada is None else revalidar_cada
+        with self._lock:
+            entrada = self._lags.get(chave)
+            if entrada is None or entrada[1] >= revalidar_cada:
+                return None
+            self._lags[chave] = (entrada[0], entrada[1] + 1)
+            self.acertos += 1
+            return entrada[0]
+
+    def guardar(self, chave, lag):
+        with self._lock:
+            self._lags[chave] = (int(lag), 0)
+            self.buscas += 1
+
+    def limpar(self):
+        with self._lock:
+            self._lags.clear()
+
+    def adfuller(self, chave, x, regression='c', revalidar_cada=None):
+        """adfuller_rapido com lag do cache (busca AIC só na primeira vez e a cada revalidação)."""
+        lag = self.obter(chave, revalidar_cada)
+        resultado = adfuller_rapido(x, regression=regression, lag=lag)
+        if lag is None:
+            self.guardar(chave, resultado[2])
+        return resultado
+
+    def coint(self, chave, y0, y1, revalidar_cada=None):
+        """coint_rapido com lag do cache."""
+        lag = self.obter(chave, revalidar_cada)
+        resultado = coint_lote(np.asarray(y0, dtype=float)[None, :], np.asarray(y1, dtype=float)[None, :],
+                               lags=None if lag is None else [lag])
+        if lag is None and resultado['lag'][0] >= 0:
+            self.guardar(chave, resultado['lag'][0])
+        return float(resultado['estatistica'][0]), float(resultado['p_valor'][0]), resultado['criticos']
+
+
+# Cache compartilhado do processo (cada trabalhador de execucao_paralela mantém o seu)
+cache_lags = CacheLagsADF()
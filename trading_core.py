@@ -24,13 +24,21 @@ try:
         extrair_dados, preprocessar_dados, calcular_residuo_zscore_timeframe,
         encontrar_linha_monitorada, verificar_operacao_aberta,
         calcular_quantidade, get_mt5_connection_status,
-        calcular_volatilidade_garch, prever_residuo_spread
+        calcular_volatilidade_garch
     )
     HAS_ORIGINAL_FUNCTIONS = True
 except ImportError:
     HAS_ORIGINAL_FUNCTIONS = False
     st.warning("⚠️ Funções originais não encontradas. Usando versões simplificadas.")
 
+try:
+    from testes_estatisticos import adfuller_rapido  # ADF em NumPy, validado contra o statsmodels
+    HAS_TESTES_RAPIDOS = True
+except ImportError:
+    HAS_TESTES_RAPIDOS = False
+
+from dados_graficos import PONTOS_PADRAO, reduzir_dataframe  # Séries reduzidas antes de montar as figuras
+
 class TradingAnalyzer:
     """Analisador principal do sistema de trading"""
     
@@ -147,8 +155,11 @@ class TradingAnalyzer:
             spread = df1_aligned['close'] - df2_aligned['close']
             
             # Teste de cointegração simples (ADF)
-            from statsmodels.tsa.stattools import adfuller
-            adf_result = adfuller(spread)
+            if HAS_TESTES_RAPIDOS and self.config.get('testes_rapidos', True):
+                adf_result = adfuller_rapido(spread.to_numpy(dtype=float))
+            else:
+                from statsmodels.tsa.stattools import adfuller
+                adf_result = adfuller(spread)
             is_cointegrated = adf_result[1] < 0.05  # p-value < 5%
             
             # Calcular Z-Score
@@ -376,8 +387,16 @@ class ChartGenerator:
     """Gerador de gráficos avançados"""
     
     @staticmethod
-    def create_pair_analysis_chart(df1, df2, symbol1, symbol2):
-        """Cria gráfico de análise de pares"""
+    def create_pair_analysis_chart(df1, df2, symbol1, symbol2, pontos_max=PONTOS_PADRAO):
+        """Cria gráfico de análise de pares (cada série reduzida a ~pontos_max pontos por min-max)"""
+        # Spread e Z-Score calculados sobre a série completa; só o desenho é reduzido
+        spread = df1['close'] - df2['close']
+        z_score = (spread - spread.mean()) / spread.std()
+        indicadores = reduzir_dataframe(pd.DataFrame({'spread': spread, 'z_score': z_score}),
+                                        ['spread', 'z_score'], pontos_max, 'minmax')
+        df1 = reduzir_dataframe(df1, ['close'], pontos_max, 'minmax')
+        df2 = reduzir_dataframe(df2, ['close'], pontos_max, 'minmax')
+
         fig = make_subplots(
             rows=3, cols=1,
             subplot_titles=[
@@ -410,10 +429,9 @@ class ChartGenerator:
         )
         
         # Spread
-        spread = df1['close'] - df2['close']
         fig.add_trace(
             go.Scatter(
-                x=df1.index, y=spread,
+                x=indicadores.index, y=indicadores['spread'],
                 name='Spread',
                 line=dict(color='green')
             ),
@@ -421,10 +439,9 @@ class ChartGenerator:
         )
         
         # Z-Score
-        z_score = (spread - spread.mean()) / spread.std()
         fig.add_trace(
             go.Scatter(
-                x=df1.index, y=z_score,
+                x=indicadores.index, y=indicadores['z_score'],
                 name='Z-Score',
                 line=dict(color='purple')
             ),
@@ -445,8 +462,9 @@ class ChartGenerator:
         return fig
     
     @staticmethod
-    def create_performance_chart(equity_data):
+    def create_performance_chart(equity_data, pontos_max=PONTOS_PADRAO):
         """Cria gráfico de performance"""
+        equity_data = reduzir_dataframe(equity_data, ['equity'], pontos_max, 'lttb')
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
@@ -468,16 +486,18 @@ class ChartGenerator:
         return fig
     
     @staticmethod
-    def create_drawdown_chart(equity_data):
+    def create_drawdown_chart(equity_data, pontos_max=PONTOS_PADRAO):
         """Cria gráfico de drawdown"""
         # Calcular drawdown
         peak = equity_data['equity'].expanding().max()
         drawdown = (equity_data['equity'] - peak) / peak * 100
+        # Min-max por balde preserva os vales do drawdown na série reduzida
+        drawdown = reduzir_dataframe(drawdown.to_frame('drawdown'), ['drawdown'], pontos_max, 'minmax')['drawdown']
         
         fig = go.Figure()
         
         fig.add_trace(go.Scatter(
-            x=equity_data.index,
+            x=drawdown.index,
             y=drawdown,
             mode='lines',
             name='Drawdown',
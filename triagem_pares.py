@@ -0,0 +1,793 @@
+"""
+Triagem de Pares - Motor vetorizado de regressão para a primeira seleção
+Alinha todas as séries de fechamento uma única vez em uma matriz NumPy e calcula
+alpha, beta e r² de todos os pares (dependente x independente) e de todos os
+períodos em lote, a partir de momentos fechados (somas, produtos cruzados e
+variâncias), substituindo os milhares de sm.OLS individuais de calculo_entradas_v55.main.
+"""
+
+import time
+import warnings
+from functools import reduce
+
+import numpy as np
+import pandas as pd
+import statsmodels.api as sm
+from statsmodels.tsa.arima.model import ARIMA
+from statsmodels.tsa.stattools import adfuller
+
+from testes_estatisticos import adf_lote, adfuller_rapido, coint_rapido, coint_residuos_lote, cache_lags
+from estado_pares import rastreador_pares
+
+
+class EtapasTriagem:
+    """Registro das etapas da triagem: quantos pares entraram/passaram em cada uma e quanto tempo levou."""
+
+    def __init__(self):
+        self.etapas = []
+        self._inicio = time.perf_counter()
+
+    def registrar(self, nome, entrada, aprovados):
+        agora = time.perf_counter()
+        self.etapas.append({'etapa': nome, 'entrada': int(entrada), 'aprovados': int(aprovados),
+                            'tempo': agora - self._inicio})
+        self._inicio = agora
+
+    def resumo(self):
+        return " | ".join(f"{e['etapa']}: {e['aprovados']}/{e['entrada']} ({e['tempo']:.2f}s)" for e in self.etapas)
+
+
+def alinhar_series_fechamento(dados_preprocessados, ativos, ativos_referencia=None, coluna='close'):
+    """
+    Monta a matriz de preços (barras x ativos) a partir das séries 'raw' do preprocessamento.
+
+    O calendário é o das barras em que todos os ativos de referência (ex.: IBOV e WIN$)
+    possuem cotação. Barras ausentes de um ativo ficam como NaN e são tratadas par a par no
+    cálculo dos momentos.
+
+    A janela de um período na grade (últimas `periodo` barras deste calendário) NÃO é, em geral, a de
+    calcular_residuo_zscore_timeframe, que recorta as últimas `periodo` barras de cada uma das quatro
+    séries e só depois intersecta: uma barra a mais ou a menos em WIN$/IBOV (ex.: WIN$ negociando mais
+    horas no intradiário) já muda a janela. janelas_exatas() indica as linhas em que as duas coincidem.
+
+    Retorna:
+      - index: DatetimeIndex do calendário alinhado
+      - matriz: np.ndarray float64 (barras x ativos)
+      - simbolos: lista de ativos na ordem das colunas
+    """
+    series = {}
+    for ativo in list(ativos) + list(ativos_referencia or []):
+        if ativo in series:
+            continue
+        try:
+            serie = dados_preprocessados[ativo][coluna]['raw']
+        except (KeyError, TypeError):
+            continue
+        if serie is None or len(serie) == 0:
+            continue
+        serie = pd.to_numeric(serie, errors='coerce')
+        series[ativo] = serie[~serie.index.duplicated(keep='last')]
+
+    if not series:
+        return pd.DatetimeIndex([]), np.empty((0, 0)), []
+
+    df = pd.concat(series, axis=1).sort_index()
+
+    referencias = [a for a in (ativos_referencia or []) if a in df.columns]
+    if referencias:
+        df = df[df[referencias].notna().all(axis=1)]
+
+    simbolos = [a for a in ativos if a in df.columns]
+    simbolos = list(dict.fromkeys(simbolos))
+    return df.index, df[simbolos].to_numpy(dtype=float), simbolos
+
+
+def _ols_dos_momentos(n, soma_y, soma_x, soma_yy, soma_xx, soma_xy, media):
+    """
+    Parâmetros da regressão y_i = alpha + beta * x_j a partir das somas (ativos x ativos) de colunas
+    deslocadas por `media`. Retorna o dicionário de calcular_momentos_ols.
+    """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        media_y = soma_y / n
+        media_x = soma_x / n
+        cov = soma_xy / n - media_y * media_x
+        var_x = soma_xx / n - media_x * media_x
+        var_y = soma_yy / n - media_y * media_y
+
+        beta = cov / var_x
+        alpha = (media_y + media[:, None]) - beta * (media_x + media[None, :])
+        correlacao = cov / np.sqrt(var_x * var_y)
+        r2 = correlacao * correlacao
+
+    insuficiente = (n < 3) | ~(var_x > 0) | ~(var_y > 0)
+    for matriz in (alpha, beta, r2, correlacao):
+        matriz[insuficiente] = np.nan
+
+    return {
+        'alpha': alpha,
+        'beta': beta,
+        'r2': r2,
+        'correlacao': correlacao,
+        'n_obs': n.astype(int),
+    }
+
+
+def _somas_momentos(z, m):
+    """Somas (ativos x ativos) de um bloco de barras: z = colunas deslocadas (0 onde inválido), m = máscara."""
+    z2 = z * z
+    return (
+        m.T @ m,       # n[i, j]   = barras válidas em comum
+        z.T @ m,       # Σ y_i     (onde x_j também é válido)
+        m.T @ z,       # Σ x_j     (onde y_i também é válido)
+        z2.T @ m,      # Σ y_i²
+        m.T @ z2,      # Σ x_j²
+        z.T @ z,       # Σ y_i x_j
+    )
+
+
+def calcular_momentos_ols(janela):
+    """
+    Calcula, para todos os pares de colunas de uma janela (barras x ativos), os parâmetros
+    da regressão y_i = alpha + beta * x_j a partir de momentos fechados.
+
+    Apenas as barras em que ambos os ativos do par possuem cotação entram no cálculo.
+    As colunas são centralizadas antes dos produtos para preservar a precisão numérica.
+
+    Retorna dicionário de matrizes (ativos x ativos), indexadas [dependente, independente]:
+    'alpha', 'beta', 'r2', 'correlacao', 'n_obs'.
+    """
+    validos = np.isfinite(janela)
+    m = validos.astype(float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        contagem = m.sum(axis=0)
+        media = np.where(contagem > 0, np.nansum(janela, axis=0) / np.maximum(contagem, 1), 0.0)
+        z = np.where(validos, janela - media, 0.0)
+
+    return _ols_dos_momentos(*_somas_momentos(z, m), media)
+
+
+def calcular_momentos_ols_sufixos(matriz, periodos):
+    """
+    calcular_momentos_ols de matriz[-periodo:] para todos os períodos em uma passada.
+
+    As janelas são sufixos da mesma matriz: as somas são acumuladas do fim para o início,
+    bloco a bloco entre períodos consecutivos, então cada barra entra em um único produto
+    matricial e cada período a mais custa só a conversão das somas (ativos x ativos) em
+    parâmetros. As colunas são centralizadas pela média da maior janela.
+
+    Retorna {periodo: dicionário de calcular_momentos_ols}.
+    """
+    total = matriz.shape[0]
+    tamanhos = sorted({min(int(p), total) for p in periodos})
+    if not tamanhos:
+        return {}
+
+    maior = matriz[total - tamanhos[-1]:]
+    validos = np.isfinite(maior)
+    m = validos.astype(float)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        contagem = m.sum(axis=0)
+        media = np.where(contagem > 0, np.nansum(maior, axis=0) / np.maximum(contagem, 1), 0.0)
+        z = np.where(validos, maior - media, 0.0)
+
+    por_tamanho = {}
+    somas = None
+    anterior = 0
+    for tamanho in tamanhos:
+        # Barras do sufixo `tamanho` que não estão no sufixo anterior (linhas contadas a partir do fim)
+        bloco = slice(len(z) - tamanho, len(z) - anterior)
+        parciais = _somas_momentos(z[bloco], m[bloco])
+        somas = parciais if somas is None else tuple(a + b for a, b in zip(somas, parciais))
+        por_tamanho[tamanho] = _ols_dos_momentos(*somas, media)
+        anterior = tamanho
+
+    return {periodo: por_tamanho[min(int(periodo), total)] for periodo in periodos}
+
+
+def triagem_ols_vetorizada(dados_preprocessados, dependentes, independentes, periodos,
+                           ativos_referencia=None):
+    """
+    Executa a regressão dep ~ ind de todos os pares e de todos os períodos em uma passada
+    (momentos acumulados dos sufixos da série alinhada, calcular_momentos_ols_sufixos).
+
+    Parâmetros:
+      - dados_preprocessados: saída de preprocessar_dados
+      - dependentes / independentes: listas de ativos
+      - periodos: lista de lookbacks (ex.: [70, 100, ..., 250])
+      - ativos_referencia: ativos que definem o calendário comum (ex.: [ibov, win])
+
+    Retorna DataFrame com uma linha por (Período, Dependente, Independente), na mesma
+    ordem do loop original de main(), com as colunas:
+    'Período', 'Dependente', 'Independente', 'alpha', 'beta', 'r2', 'correlacao', 'n_obs'.
+    """
+    colunas = ['Período', 'Dependente', 'Independente', 'alpha', 'beta', 'r2', 'correlacao', 'n_obs']
+    if len(periodos) == 0:
+        return pd.DataFrame(columns=colunas)
+    universo = list(dict.fromkeys(list(dependentes) + list(independentes)))
+    _, matriz, simbolos = alinhar_series_fechamento(dados_preprocessados, universo, ativos_referencia)
+    if not simbolos or matriz.shape[0] < 3:
+        return pd.DataFrame(columns=colunas)
+
+    posicao = {s: k for k, s in enumerate(simbolos)}
+    idx_dep = np.array([posicao[d] for d in dependentes if d in posicao], dtype=int)
+    idx_ind = np.array([posicao[i] for i in independentes if i in posicao], dtype=int)
+    if idx_dep.size == 0 or idx_ind.size == 0:
+        return pd.DataFrame(columns=colunas)
+
+    nomes_dep = np.array(simbolos, dtype=object)[idx_dep]
+    nomes_ind = np.array(simbolos, dtype=object)[idx_ind]
+    grade_dep = np.repeat(nomes_dep, idx_ind.size)
+    grade_ind = np.tile(nomes_ind, idx_dep.size)
+    mesmo_ativo = grade_dep == grade_ind
+
+    # Um único DataFrame para todos os períodos: o custo por período é só o recorte das matrizes de momentos
+    momentos_por_periodo = calcular_momentos_ols_sufixos(matriz, periodos)
+    manter = ~mesmo_ativo
+    grade = {
+        'Período': np.repeat(np.asarray(periodos), manter.sum()),
+        'Dependente': np.tile(grade_dep[manter], len(periodos)),
+        'Independente': np.tile(grade_ind[manter], len(periodos)),
+    }
+    for chave in ('alpha', 'beta', 'r2', 'correlacao', 'n_obs'):
+        grade[chave] = np.concatenate([momentos_por_periodo[periodo][chave][np.ix_(idx_dep, idx_ind)].ravel()[manter]
+                                       for periodo in periodos])
+    return pd.DataFrame(grade, columns=colunas)
+
+
+def _cauda_identica(serie, calendario):
+    """
+    Quantas das últimas barras da série coincidem com as do calendário alinhado (mesmo horário, valor finito).
+    A janela de um período p é idêntica à do par quando esse comprimento é >= p.
+    """
+    if serie is None:
+        return 0
+    n = min(len(serie), len(calendario))
+    if n == 0:
+        return 0
+    cauda = serie.iloc[-n:]
+    igual = ((cauda.index == calendario[-n:]) &
+             np.isfinite(pd.to_numeric(cauda, errors='coerce').to_numpy(dtype=float)))
+    divergentes = np.flatnonzero(~igual)
+    return int(n - 1 - divergentes[-1]) if divergentes.size else n
+
+
+def _janela_alinhada(dados_preprocessados, grade, ativos_referencia):
+    """
+    (calendário, matriz, posição de cada ativo na matriz, Series booleana 'exato' com o índice da grade).
+    Uma linha é exata quando as últimas `periodo` barras de dep, ind e das referências coincidem com as
+    do calendário alinhado, sem lacunas: aí o recorte + interseção de calcular_residuo_zscore_timeframe
+    dá exatamente a janela da grade.
+    """
+    universo = list(dict.fromkeys(list(grade['Dependente']) + list(grade['Independente'])))
+    calendario, matriz, simbolos = alinhar_series_fechamento(dados_preprocessados, universo, ativos_referencia)
+    posicao = {s: k for k, s in enumerate(simbolos)}
+
+    def serie_raw(ativo):
+        try:
+            return dados_preprocessados[ativo]['close']['raw']
+        except (KeyError, TypeError):
+            return None
+
+    # Uma comparação por ativo serve para todos os períodos
+    cauda = {a: _cauda_identica(serie_raw(a), calendario) for a in universo + list(ativos_referencia or [])}
+
+    exato = pd.Series(False, index=grade.index, dtype=bool)
+    for periodo, bloco in grade.groupby('Período', sort=False):
+        periodo = int(periodo)
+        if len(calendario) < periodo or not all(cauda[r] >= periodo for r in ativos_referencia or []):
+            continue
+        exato.loc[bloco.index] = [cauda[d] >= periodo and cauda[i] >= periodo and d in posicao and i in posicao
+                                  for d, i in zip(bloco['Dependente'], bloco['Independente'])]
+    return calendario, matriz, posicao, exato
+
+
+def janelas_exatas(dados_preprocessados, grade, ativos_referencia):
+    """
+    Series booleana (índice da grade): a janela da linha na grade é a mesma do cálculo par a par?
+    Só nessas linhas os parâmetros e estimativas da grade podem rejeitar um par ou substituir o OLS do par.
+    """
+    if grade.empty:
+        return pd.Series(False, index=grade.index, dtype=bool)
+    return _janela_alinhada(dados_preprocessados, grade, ativos_referencia)[3]
+
+
+def _residuos_exatos(dados_preprocessados, grade, ativos_referencia):
+    """
+    Para cada período da grade, gera (período, índices das linhas, matriz de resíduos barras x pares) com
+    alpha/beta da grade, apenas para as linhas exatas (_janela_alinhada).
+    """
+    if grade.empty:
+        return
+
+    calendario, matriz, posicao, exato = _janela_alinhada(dados_preprocessados, grade, ativos_referencia)
+    for periodo, bloco in grade[exato].groupby('Período', sort=False):
+        periodo = int(periodo)
+        linhas = bloco.index
+        sub = bloco.loc[linhas]
+        janela = matriz[-periodo:]
+        Y = janela[:, [posicao[d] for d in sub['Dependente']]]
+        X = janela[:, [posicao[i] for i in sub['Independente']]]
+        yield periodo, linhas, Y - (sub['alpha'].to_numpy() + sub['beta'].to_numpy() * X)
+
+
+def calcular_zscore_atual_vetorizado(dados_preprocessados, grade, ativos_referencia):
+    """
+    Estimativa vetorizada do z-score do resíduo atual para as linhas da grade (saída de triagem_ols_vetorizada).
+
+    Repete as contas de calcular_zscore_par — resíduo com alpha/beta da grade, half-life pela regressão
+    de Δresíduo em resíduo defasado, janela max(20, round(half_life)) e z-score do último resíduo —
+    para todos os pares de cada período de uma vez, sobre a matriz alinhada de fechamentos.
+
+    Só é 'exato' quando as últimas `periodo` barras de dep, ind e das referências coincidem com as do
+    calendário alinhado (caso normal, sem lacunas); nas demais linhas a estimativa não deve ser usada para rejeitar.
+
+    Retorna DataFrame com o índice da grade e as colunas 'half_life_est', 'zscore_est', 'exato'.
+    """
+    saida = pd.DataFrame({'half_life_est': np.nan, 'zscore_est': np.nan, 'exato': False}, index=grade.index)
+
+    for periodo, linhas, residuo in _residuos_exatos(dados_preprocessados, grade, ativos_referencia):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            defasado = residuo[:-1]
+            delta = residuo[1:] - residuo[:-1]
+            d_lag = defasado - defasado.mean(axis=0)
+            d_delta = delta - delta.mean(axis=0)
+            coef = (d_lag * d_delta).sum(axis=0) / (d_lag * d_lag).sum(axis=0)
+            half_life = np.where((coef <= -1) | np.isnan(coef), 0.0, np.log(2) / (-np.log1p(coef)))
+            if len(defasado) < 3:
+                half_life = np.zeros_like(half_life)
+
+            zscore = np.full(len(linhas), np.nan)
+            valido = np.isfinite(half_life)
+            janelas = np.where(valido, np.maximum(20, np.round(np.where(valido, half_life, 0.0))), 0).astype(int)
+            for w in np.unique(janelas[valido]):
+                colunas = valido & (janelas == w)
+                if w > periodo:
+                    continue
+                cauda = residuo[-w:, colunas]
+                zscore[colunas] = (residuo[-1, colunas] - cauda.mean(axis=0)) / cauda.std(axis=0, ddof=1)
+
+        saida.loc[linhas, 'half_life_est'] = half_life
+        saida.loc[linhas, 'zscore_est'] = zscore
+        # Half-life na fronteira de arredondamento ou não finito: a janela do caminho exato pode diferir
+        fronteira = ~valido | (np.abs(np.abs(half_life - np.trunc(half_life)) - 0.5) < 1e-6)
+        saida.loc[linhas, 'exato'] = ~fronteira
+    return saida
+
+
+def calcular_testes_residuo_vetorizado(dados_preprocessados, grade, ativos_referencia, cointegracao=True):
+    """
+    ADF (regressão com constante) e Engle-Granger do resíduo de todas as linhas exatas da grade, em lote
+    (testes_estatisticos.adf_lote / coint_residuos_lote), com a mesma busca de lag por AIC de adfuller/coint.
+    O resíduo de coint(dep, ind) é o mesmo da regressão da grade, então os dois testes usam a mesma matriz.
+
+    Retorna DataFrame com o índice da grade e as colunas 'adf_p_est', 'coint_stat_est', 'coint_p_est',
+    'coint_crit5_est' e 'exato' (linhas não exatas ficam com NaN e não devem ser rejeitadas por aqui).
+    """
+    saida = pd.DataFrame({'adf_p_est': np.nan, 'coint_stat_est': np.nan, 'coint_p_est': np.nan,
+                          'coint_crit5_est': np.nan, 'exato': False}, index=grade.index)
+
+    for periodo, linhas, residuo in _residuos_exatos(dados_preprocessados, grade, ativos_referencia):
+        if periodo < 10:
+            continue
+        saida.loc[linhas, 'adf_p_est'] = adf_lote(residuo.T, regression='c')['p_valor']
+        if cointegracao:
+            eg = coint_residuos_lote(residuo.T, r2=grade.loc[linhas, 'r2'].to_numpy())
+            saida.loc[linhas, 'coint_stat_est'] = eg['estatistica']
+            saida.loc[linhas, 'coint_p_est'] = eg['p_valor']
+            saida.loc[linhas, 'coint_crit5_est'] = eg['criticos'][1]
+        saida.loc[linhas, 'exato'] = True
+    return saida
+
+
+def triagem_em_etapas(dados_preprocessados, dependentes, independentes, periodos, ativos_referencia, avaliar,
+                      r2_min=0.5, beta_max=1.0, zscore_min=-2.0, zscore_max=6.5, prefiltro_zscore=True,
+                      testes_rapidos=True, cointegracao=True, etapas=None):
+    """
+    Etapas 1-4 da primeira seleção em lote (calculo_entradas_v55.calcular_zscores_triagem_vetorizada) e o
+    envio dos sobreviventes para avaliar(tarefas) — normalmente execucao_paralela.avaliar_pares_paralelo.
+
+    Os valores da grade só rejeitam pares nas linhas de janela exata (janelas_exatas); nas demais o par segue
+    para o cálculo completo. As tarefas levam (dep, ind, período, alpha, beta, r2) com os parâmetros da grade
+    apenas nas linhas exatas; nas outras alpha/beta/r2 são NaN e calcular_zscore_par refaz o OLS na janela
+    do próprio par, como o loop original.
+
+    Retorna (tarefas, resultados de avaliar(tarefas)); cada etapa é registrada em `etapas` (EtapasTriagem).
+    """
+    etapas = etapas if etapas is not None else EtapasTriagem()
+    grade = triagem_ols_vetorizada(dados_preprocessados, dependentes, independentes, periodos,
+                                   ativos_referencia=ativos_referencia)
+    etapas.registrar('OLS', len(grade), grade['beta'].notna().sum())
+
+    exato = janelas_exatas(dados_preprocessados, grade, ativos_referencia)
+    fora_da_faixa = ~((grade['beta'].abs() < beta_max) & (grade['r2'] >= r2_min))
+    aprovados = grade[~(exato & fora_da_faixa)]
+    etapas.registrar('beta/R²', len(grade), len(aprovados))
+
+    tolerancia = 1e-9
+    if prefiltro_zscore:
+        estimativa = calcular_zscore_atual_vetorizado(dados_preprocessados, aprovados, ativos_referencia)
+        extremo = ((estimativa['zscore_est'] <= zscore_min + tolerancia) |
+                   (estimativa['zscore_est'] >= zscore_max - tolerancia))
+        entrada = len(aprovados)
+        aprovados = aprovados[~estimativa['exato'] | extremo]
+        etapas.registrar('z-score', entrada, len(aprovados))
+
+    if testes_rapidos:
+        testes = calcular_testes_residuo_vetorizado(dados_preprocessados, aprovados, ativos_referencia,
+                                                    cointegracao=cointegracao)
+        rejeitado = testes['adf_p_est'] >= 0.05 + tolerancia
+        if cointegracao:
+            rejeitado |= ((testes['coint_p_est'] >= 0.05 + tolerancia) |
+                          (testes['coint_stat_est'] > testes['coint_crit5_est'] + tolerancia))
+        entrada = len(aprovados)
+        aprovados = aprovados[~(testes['exato'] & rejeitado)]
+        etapas.registrar('ADF/EG lote', entrada, len(aprovados))
+
+    aprovados = aprovados.copy()
+    aprovados.loc[~exato.loc[aprovados.index], ['alpha', 'beta', 'r2']] = np.nan
+    tarefas = list(aprovados[['Dependente', 'Independente', 'Período', 'alpha', 'beta', 'r2']]
+                   .itertuples(index=False, name=None))
+    return tarefas, avaliar(tarefas)
+
+
+def calcular_betas_rolling(y, x, janela, constante_sem_intercepto=True):
+    """
+    Beta de y ~ const + x em todas as janelas deslizantes de `janela` barras, em O(n).
+
+    Usa somas acumuladas de x, y, x² e xy (séries centralizadas para preservar a precisão)
+    e reproduz o sm.OLS(y, sm.add_constant(x)) feito janela a janela:
+      - x com NaN na janela: o OLS lança erro → valido=False
+      - y com NaN na janela: o OLS devolve NaN → beta NaN
+      - x constante na janela: add_constant não inclui o intercepto; com
+        constante_sem_intercepto=True o beta é o da regressão pela origem (Σxy/Σx², 0 se x=0),
+        senão NaN
+
+    Retorna (betas, valido), arrays com len(y) - janela + 1 posições; a posição k é a janela [k, k+janela).
+    """
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    n = len(y)
+    janela = int(janela)
+    if janela < 1 or n < janela:
+        return np.empty(0), np.empty(0, dtype=bool)
+
+    def soma_janelas(v):
+        acumulada = np.concatenate(([0.0], np.cumsum(v)))
+        return acumulada[janela:] - acumulada[:-janela]
+
+    nan_x = ~np.isfinite(x)
+    nan_y = ~np.isfinite(y)
+    x0 = np.where(nan_x, 0.0, x)
+    y0 = np.where(nan_y, 0.0, y)
+    xc = np.where(nan_x, 0.0, x0 - (x0[~nan_x].mean() if (~nan_x).any() else 0.0))
+    yc = np.where(nan_y, 0.0, y0 - (y0[~nan_y].mean() if (~nan_y).any() else 0.0))
+
+    s_x, s_y = soma_janelas(xc), soma_janelas(yc)
+    s_xx, s_xy = soma_janelas(xc * xc), soma_janelas(xc * yc)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        var_x = s_xx - s_x * s_x / janela
+        cov = s_xy - s_x * s_y / janela
+        betas = cov / var_x
+
+        # Janela com x constante (mudanças de valor entre barras consecutivas = 0)
+        mudancas = np.concatenate(([0.0], (np.diff(x0) != 0).astype(float)))
+        constante = (soma_janelas(mudancas) - mudancas[:n - janela + 1]) == 0
+        if constante.any():
+            if constante_sem_intercepto:
+                origem_xy = soma_janelas(x0 * y0)
+                origem_xx = soma_janelas(x0 * x0)
+                origem = np.where(origem_xx != 0, origem_xy / np.where(origem_xx != 0, origem_xx, 1.0), 0.0)
+                betas = np.where(constante, origem, betas)
+            else:
+                betas = np.where(constante, np.nan, betas)
+
+    valido = soma_janelas(nan_x.astype(float)) == 0
+    betas = np.where(soma_janelas(nan_y.astype(float)) > 0, np.nan, betas)
+    betas = np.where(valido, betas, np.nan)
+    return betas, valido
+
+
+def prever_residuo_spread(resid_series):
+    """
+    Retorna forecast de um passo do spread (resíduo) usando ARIMA(1,0,0).
+    CORRIGIDO: Define frequência apropriada para evitar FutureWarning.
+    """
+    try: 
+        # CORREÇÃO: Garante que a série tem índice temporal apropriado
+        if not isinstance(resid_series.index, pd.DatetimeIndex):
+            # Se não for DatetimeIndex, cria um índice temporal
+            resid_series = resid_series.copy()
+            resid_series.index = pd.date_range(start='2020-01-01', periods=len(resid_series), freq='D')
+        
+        # CORREÇÃO: Define frequência explicitamente se não estiver definida
+        if resid_series.index.freq is None:
+            resid_series = resid_series.asfreq('D', method='ffill')
+        
+        # Suprime warnings durante o fitting do ARIMA
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=FutureWarning)
+            warnings.filterwarnings("ignore", category=UserWarning)
+            
+            model = ARIMA(resid_series, order=(1,0,0))
+            fit = model.fit(method_kwargs={'maxiter': 500})
+            
+            # CORREÇÃO: Usa get_forecast em vez de forecast para controlar melhor o índice
+            forecast_result = fit.get_forecast(steps=1)
+            forecast_value = float(forecast_result.predicted_mean.iloc[0])
+            
+            return forecast_value
+            
+    except Exception as e:
+        print(f"[AVISO] ARIMA spread falhou ({e}), usando valor atual como previsão.")
+        return float(resid_series.iloc[-1])
+
+
+def _zscore_completo(residuo, verbose=False):
+    """
+    Half-life (OLS de Δresíduo sobre o resíduo defasado) e z-score do último resíduo na janela
+    max(20, round(half_life)), recalculados sobre a série inteira. Retorna (half_life, zscore, média móvel atual).
+    """
+    residuo_lag = residuo.shift(1).dropna().rename('residuo_lag')
+    delta = residuo.diff().dropna()
+
+    if len(residuo_lag) >= 3 and len(delta) >= 3:
+        try:
+            ou = sm.OLS(delta, sm.add_constant(residuo_lag)).fit()
+            coef_ou = ou.params['residuo_lag']
+            half_life = (0 if coef_ou <= -1 or np.isnan(coef_ou)
+                         else np.log(2) / (-np.log(1 + coef_ou)))
+        except Exception as e:
+            half_life = 0
+            if verbose:
+                print(f"[ERRO] Erro ao calcular half-life: {e}")
+    else:
+        half_life = 0
+        if verbose:
+            print("[AVISO] Série insuficiente para calcular half-life.")
+
+    # Z-score móvel pair-trading
+    window = max(20, int(round(half_life)))
+    media_movel = residuo.rolling(window, min_periods=window).mean()
+    std_movel = residuo.rolling(window, min_periods=window).std()
+    zscore = (residuo.iloc[-1] - media_movel) / std_movel
+    
+    # CORRIGIDO: Valores atuais do resíduo
+    try:
+        zscore_final = float(zscore.iloc[-1])
+    except Exception:
+        zscore_final = 0.0
+
+    return half_life, zscore_final, media_movel.iloc[-1]
+
+
+def _rejeitado_zscore(zscore_final, dep, ind, enable_zscore_filter, zscore_min_threshold, zscore_max_threshold,
+                      verbose=False):
+    """Filtro de z-score extremo de calcular_zscore_par: True se o par deve ser rejeitado."""
+    if enable_zscore_filter and not (zscore_final <= zscore_min_threshold or zscore_final >= zscore_max_threshold):
+        if verbose:
+            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Z-Score={zscore_final:.4f} não está em faixa extrema (|z| < {abs(zscore_min_threshold)})")
+        return True
+    return False
+
+
+def calcular_zscore_par(series_close, dep, ind, ibov, win, periodo, nd_dep=0, nd_ind=0,
+                        USE_SPREAD_FORECAST=True, zscore_threshold=2.0, verbose=False,
+                        enable_zscore_filter=True, enable_r2_filter=True, enable_beta_filter=True,
+                        enable_cointegration_filter=True,
+                        zscore_min_threshold=-2.0, zscore_max_threshold=6.5,
+                        r2_min_threshold=0.5, beta_max_threshold=1.0, params_ols=None,
+                        testes_rapidos=False, revalidar_lag=0, estado_incremental=False):
+    """
+    Núcleo estatístico de calcular_residuo_zscore_timeframe (regressão, filtros de beta/R²,
+    ADF, cointegração, half-life, z-score e previsão do resíduo) para um par.
+
+    Não depende do MetaTrader5 nem de estado global, para poder rodar nos processos de
+    execucao_paralela. series_close: {ativo: série 'raw' de fechamento} contendo dep, ind, ibov e win.
+
+    testes_rapidos: ADF e Engle-Granger pelos núcleos NumPy de testes_estatisticos em vez do statsmodels;
+    com revalidar_lag > 0 o lag escolhido pelo AIC é reaproveitado (cache_lags) e só rebuscado a cada
+    revalidar_lag avaliações do mesmo par/período.
+
+    estado_incremental: regressão (quando params_ols não vem da triagem), half-life e z-score pelas
+    somas do estado do par em estado_pares (rastreador_pares), atualizadas só com as barras novas.
+    Com o z-score em O(1), o filtro de z-score vem antes do ADF e da cointegração: o resíduo só é
+    montado para os pares que passam por ele (todos os filtros são obrigatórios, o resultado é o mesmo).
+
+    Retorna a mesma tupla de calcular_residuo_zscore_timeframe, ou None se o par for rejeitado.
+    """
+    ativos = [dep, ind, win, ibov]
+    series = {a: series_close[a].iloc[-periodo:] for a in ativos}
+
+    # Alinha os índices
+    idxs = [series[a].index for a in ativos]
+    common = reduce(lambda x, y: x.intersection(y), idxs)
+    for a in ativos:
+        series[a] = series[a].loc[common]
+
+    if len(common) < 3:
+        if verbose:
+            print("[ERRO] Insuficientes dados após alinhamento.")
+        return None
+
+    # Regressão dep ~ ind
+    dep_close = pd.to_numeric(series[dep], errors='coerce')
+    ind_close = pd.to_numeric(series[ind], errors='coerce')
+    df_reg = pd.concat([dep_close, ind_close], axis=1, keys=[dep, ind]).dropna()
+    dep_close, ind_close = df_reg[dep], df_reg[ind]
+
+    estado = None
+    if estado_incremental:
+        estado = rastreador_pares.atualizar((dep, ind, periodo), df_reg.index.to_numpy(),
+                                            ind_close.to_numpy(), dep_close.to_numpy())
+
+    if params_ols is not None:
+        alpha, beta, r2 = params_ols
+    elif estado is not None:
+        alpha, beta, r2 = estado.regressao()
+    else:
+        X = sm.add_constant(df_reg[ind].to_frame(name=ind))
+        modelo = sm.OLS(df_reg[dep], X).fit()
+        alpha = modelo.params['const']
+        beta = modelo.params[ind]
+        r2 = modelo.rsquared
+
+    # ===================================================================
+    # FILTRO 1: BETA MÁXIMO (aplicado primeiro por ser mais rápido)
+    # ===================================================================
+    if enable_beta_filter and abs(beta) >= beta_max_threshold:
+        if verbose:
+            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Beta={beta:.4f} >= {beta_max_threshold} (beta muito alto)")
+        return None
+    
+    # ===================================================================
+    # FILTRO 2: R² MÍNIMO (segundo filtro por usar resultado já calculado)
+    # ===================================================================
+    if enable_r2_filter and r2 < r2_min_threshold:
+        if verbose:
+            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: R²={r2:.4f} < {r2_min_threshold} (R² muito baixo)")
+        return None
+
+    # Estado incremental: half-life e z-score pelas somas, filtro de z-score antes dos testes caros
+    if estado is not None:
+        half_life, zscore_final, media_atual, _ = rastreador_pares.zscore(estado, alpha, beta)
+        if _rejeitado_zscore(zscore_final, dep, ind, enable_zscore_filter, zscore_min_threshold,
+                             zscore_max_threshold, verbose):
+            return None
+
+    residuo = df_reg[dep] - (alpha + beta * df_reg[ind])
+    
+    # ===================================================================
+    # FILTRO 3: TESTE DE ESTACIONARIEDADE (ADF)
+    # ===================================================================
+    if not testes_rapidos:
+        adf_result = adfuller(residuo, autolag='AIC')
+    elif revalidar_lag > 0:
+        adf_result = cache_lags.adfuller((dep, ind, periodo, 'adf'), residuo.to_numpy(), revalidar_cada=revalidar_lag)
+    else:
+        adf_result = adfuller_rapido(residuo.to_numpy())
+    adf_p_value = adf_result[1]
+    
+    # FILTRO: Se resíduo não for estacionário, rejeita o par
+    if adf_p_value >= 0.05:
+        if verbose:
+            print(f"[FILTRO REJEITADO] Par {dep}x{ind}: ADF p-value={adf_p_value:.4f} >= 0.05 (não estacionário)")
+        return None
+    
+    # ===================================================================
+    # FILTRO 4: TESTE DE COINTEGRAÇÃO (aplicado por último por ser mais complexo)
+    # ===================================================================
+    if enable_cointegration_filter:
+        try:
+            if not testes_rapidos:
+                from statsmodels.tsa.stattools import coint
+                coint_result = coint(df_reg[dep], df_reg[ind])
+            elif revalidar_lag > 0:
+                coint_result = cache_lags.coint((dep, ind, periodo, 'eg'), df_reg[dep].to_numpy(),
+                                                df_reg[ind].to_numpy(), revalidar_cada=revalidar_lag)
+            else:
+                coint_result = coint_rapido(df_reg[dep].to_numpy(), df_reg[ind].to_numpy())
+            coint_statistic = coint_result[0]
+            coint_p_value = coint_result[1]
+            coint_critical_values = coint_result[2]
+            
+            # FILTRO: Se não for cointegrado (p-value >= 0.05), rejeita o par
+            if coint_p_value >= 0.05:
+                if verbose:
+                    print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Cointegração p-value={coint_p_value:.4f} >= 0.05 (não cointegrado)")
+                return None
+                
+            # Verificação adicional: estatística deve ser menor que valor crítico 5%
+            critical_5pct = coint_critical_values[1]  # 5% critical value
+            if coint_statistic > critical_5pct:
+                if verbose:
+                    print(f"[FILTRO REJEITADO] Par {dep}x{ind}: Cointegração estatística={coint_statistic:.4f} > crítico 5%={critical_5pct:.4f}")
+                return None
+                
+        except Exception as e:
+            if verbose:
+                print(f"[ERRO] Falha no teste de cointegração para {dep}x{ind}: {e}")
+            return None
+    else:
+        # Se filtro de cointegração está desabilitado, define valores padrão
+        coint_statistic = 0.0
+        coint_p_value = 0.01  # Valor que passaria no filtro
+        coint_critical_values = [0.0, 0.0, 0.0]
+        if verbose:
+            print(f"[INFO] Filtro de cointegração desabilitado para par {dep}x{ind}")
+
+    # ===================================================================
+    # CÁLCULO DO Z-SCORE (necessário para o filtro final)
+    # ===================================================================
+    
+    # Estima half-life (com estado incremental já calculado e filtrado acima)
+    if estado is None:
+        half_life, zscore_final, media_atual = _zscore_completo(residuo, verbose)
+    
+        # ===================================================================
+        # FILTRO 5: Z-SCORE EXTREMO (aplicado por último por ser mais complexo)
+        # ===================================================================
+        if _rejeitado_zscore(zscore_final, dep, ind, enable_zscore_filter, zscore_min_threshold,
+                             zscore_max_threshold, verbose):
+            return None
+
+    # ===================================================================
+    # SE PASSOU EM TODOS OS FILTROS, CONTINUA COM O PROCESSAMENTO NORMAL
+    # ===================================================================
+    if verbose:
+        print(f"[FILTRO APROVADO] Par {dep}x{ind}: "
+              f"Beta={beta:.4f}, R²={r2:.4f}, Z-Score={zscore_final:.4f}, "
+              f"ADF p-value={adf_p_value:.4f}, Coint p-value={coint_p_value:.4f}")
+   
+    resid_atual = float(residuo.iloc[-1])
+    # CORRIGIDO: Sempre calcular previsão do resíduo independente do flag USE_SPREAD_FORECAST
+    try:
+        pred_resid_calc = prever_residuo_spread(residuo)
+        if pred_resid_calc is not None:
+            pred_resid = float(pred_resid_calc)
+        else:
+            # Se a previsão falhar, usar uma estimativa baseada na média móvel
+            pred_resid = float(media_atual) if not pd.isna(media_atual) else resid_atual
+    except Exception as e:
+        if verbose:
+            print(f"[AVISO] Erro ao calcular previsão do resíduo: {e}")
+        pred_resid = float(media_atual) if not pd.isna(media_atual) else resid_atual
+
+    #print(f"[DEBUG] resid_atual={resid_atual:.6f}, pred_resid={pred_resid:.6f}, "
+        #f"diff={pred_resid - resid_atual:.6f}")
+
+    # GARANTIR que pred_resid nunca seja None
+    if pred_resid is None:
+        pred_resid = 0.0
+
+    # GARANTIR que resid_atual nunca seja None  
+    resid_atual = float(residuo.iloc[-1]) if residuo.iloc[-1] is not None else 0.0
+    
+    # Inicializa outras variáveis
+    zscore_forecast_compra = 0.0
+    zscore_forecast_venda = 0.0
+    zf_compra = 0.0
+    zf_venda = 0.0
+    
+    # Se habilitado, usar forecast do spread para decisão
+    if USE_SPREAD_FORECAST:
+        try:
+            # Atualiza os sinais de forecast baseado nas condições
+            if zscore_final < -zscore_threshold: 
+                zscore_forecast_compra = pred_resid > resid_atual
+            elif zscore_final > zscore_threshold:
+                zscore_forecast_venda = pred_resid < resid_atual
+            else:
+                zscore_forecast_compra = 0.0
+                zscore_forecast_venda = 0.0
+        except Exception as e:
+            if verbose:
+                print(f"[ERRO] Erro no forecast do spread: {e}")
+
+    if verbose:
+        print(f"[RESULTADO] alpha={alpha:.4f}, beta={beta:.4f}, r2={r2:.4f}, half_life={half_life:.2f}, zscore={zscore_final:.4f}")
+        print(f"[FORECAST] pred_resid={pred_resid:.4f}, resid_atual={resid_atual:.4f}")
+        print(f"[DIFERENÇA] pred_resid - resid_atual = {pred_resid - resid_atual:.4f}")
+        print(f"[SINAIS] zscore_forecast_compra={zscore_forecast_compra}, zscore_forecast_venda={zscore_forecast_venda}")
+
+    return alpha, beta, half_life, zscore_final, residuo.iloc[-1], adf_p_value, pred_resid, resid_atual, zscore_forecast_compra, zscore_forecast_venda, zf_compra, zf_venda, nd_dep, nd_ind, coint_p_value, r2
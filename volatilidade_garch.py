@@ -0,0 +1,191 @@
+"""
+Volatilidade GARCH Recursiva - Estado GARCH(1,1) por ativo compartilhado entre pares
+calcular_volatilidade_garch ajustava um arch_model novo para cada série de cada par
+(close/high/low de dep e ind: seis ajustes por par). Aqui cada (ativo, coluna) guarda
+μ, ω, α, β e a variância condicional da última barra; barras novas avançam σ² pela
+recursão σ²ₜ₊₁ = ω + α·(yₜ - μ)² + β·σ²ₜ e o modelo só é reajustado (partindo dos
+parâmetros anteriores) na virada do dia, a cada N barras ou quando há deriva dos
+parâmetros: resíduos padronizados fora da escala ajustada ou nível médio da série
+afastado de μ. Sem o pacote arch, ou se o ajuste falhar,
+vale o fallback de desvio padrão móvel da versão original.
+"""
+
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from arch import arch_model
+    HAS_ARCH = True
+except ImportError:
+    HAS_ARCH = False
+
+JANELA_FALLBACK = 20
+
+
+def volatilidade_rolling(series, janela=JANELA_FALLBACK):
+    """Fallback da versão original: desvio padrão móvel dos retornos, em unidades de preço."""
+    return series.pct_change().rolling(window=janela).std().iloc[-1] * series.iloc[-1]
+
+
+def ajustar_garch(series, starting_values=None):
+    """Ajusta GARCH(1,1) de média constante como calcular_volatilidade_garch. Retorna o resultado do arch."""
+    am = arch_model(series, vol='Garch', p=1, q=1, dist='normal', rescale=False)
+    return am.fit(disp='off', starting_values=starting_values, show_warning=False)
+
+
+class EstadoGARCH:
+    """Parâmetros ajustados e variância condicional das últimas barras de uma série."""
+
+    def __init__(self, params, historico, dia_ajuste):
+        self.params = params              # array [mu, omega, alpha, beta]
+        self.historico = historico        # OrderedDict ts -> [valor, sigma2 condicional da barra]
+        self.dia_ajuste = dia_ajuste
+        self.barras_desde_ajuste = 0
+        self.deriva = 1.0                 # média exponencial de (resíduo² / σ²) das barras avançadas
+        self.nivel = float(params[0])     # média exponencial dos valores das barras avançadas
+
+    @property
+    def ultimo_ts(self):
+        return next(reversed(self.historico))
+
+    def prever(self, valor, sigma2):
+        """Variância da próxima barra dado o valor e a variância condicional da barra atual."""
+        mu, omega, alpha, beta = self.params
+        return omega + alpha * (valor - mu) ** 2 + beta * sigma2
+
+
+class RastreadorGARCH:
+    """
+    Estados GARCH(1,1) por chave (ex.: (ativo, coluna)), compartilhados por todos os pares.
+
+    Parâmetros:
+      - refit_diario: reajusta na primeira chamada de cada dia (data da última barra)
+      - refit_barras: reajusta após N barras avançadas pela recursão (0 = desligado)
+      - limiar_deriva: reajusta quando a média exponencial de resíduo²/σ² sai de [1/limiar, limiar]
+      - limiar_media: reajusta quando a média exponencial dos valores se afasta de μ mais que essa fração
+      - min_barras_deriva: barras mínimas desde o último ajuste antes de considerar a deriva
+      - n_historico: barras recentes guardadas (permite consultas de pares cujo alinhamento termina antes)
+    """
+
+    def __init__(self, refit_diario=True, refit_barras=0, limiar_deriva=3.0, limiar_media=0.05,
+                 min_barras_deriva=10, peso_deriva=0.1, n_historico=64):
+        self.refit_diario = refit_diario
+        self.refit_barras = refit_barras
+        self.limiar_deriva = limiar_deriva
+        self.limiar_media = limiar_media
+        self.min_barras_deriva = min_barras_deriva
+        self.peso_deriva = peso_deriva
+        self.n_historico = n_historico
+        self._estados = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {'ajustes': 0, 'atualizacoes': 0, 'acertos': 0, 'fallbacks': 0}
+
+    def __len__(self):
+        return len(self._estados)
+
+    def limpar(self):
+        with self._lock:
+            self._estados.clear()
+
+    @staticmethod
+    def _dia(ts):
+        return ts.date() if hasattr(ts, 'date') else None
+
+    def _ajustar(self, chave, series):
+        anterior = self._estados.get(chave)
+        inicio = anterior.params if anterior is not None else None
+        res = ajustar_garch(series, starting_values=inicio)
+        params = np.asarray(res.params, dtype=float)
+        sigma2 = np.asarray(res.conditional_volatility, dtype=float) ** 2
+        if not np.all(np.isfinite(params)) or not np.isfinite(sigma2[-1]):
+            raise ValueError("ajuste GARCH sem solução finita")
+        n = min(self.n_historico, len(series))
+        historico = OrderedDict((ts, [float(v), float(s2)])
+                                for ts, v, s2 in zip(series.index[-n:], series.to_numpy(dtype=float)[-n:], sigma2[-n:]))
+        estado = EstadoGARCH(params, historico, self._dia(series.index[-1]))
+        self._estados[chave] = estado
+        self.estatisticas['ajustes'] += 1
+        return estado
+
+    def _precisa_ajuste(self, estado, series):
+        if self.refit_diario and self._dia(series.index[-1]) != estado.dia_ajuste:
+            return True
+        if self.refit_barras and estado.barras_desde_ajuste >= self.refit_barras:
+            return True
+        if estado.barras_desde_ajuste >= self.min_barras_deriva:
+            if not (1.0 / self.limiar_deriva <= estado.deriva <= self.limiar_deriva):
+                return True
+            mu = estado.params[0]
+            if abs(estado.nivel - mu) > self.limiar_media * abs(mu):
+                return True
+        return False
+
+    def _avancar(self, estado, series):
+        """
+        Leva o estado até a última barra da série. Retorna False se a série não é continuação do
+        histórico guardado (outro timeframe, barras revisadas ou lacuna) e é preciso reajustar.
+        """
+        historico = estado.historico
+        ultimo = estado.ultimo_ts
+        indice = series.index
+        valores = series.to_numpy(dtype=float)
+
+        # As barras já conhecidas, exceto a última (que pode ter sido gravada em formação), devem coincidir
+        for ts in list(historico)[-3:-1]:
+            pos = indice.get_indexer([ts])[0]
+            if pos >= 0 and not np.isclose(valores[pos], historico[ts][0], rtol=1e-12, atol=0.0):
+                return False
+
+        if indice[-1] in historico:
+            historico[indice[-1]][0] = valores[-1]
+            return True
+
+        pos = indice.get_indexer([ultimo])[0]
+        if pos < 0:
+            return False
+        historico[ultimo][0] = valores[pos]
+        sigma2 = historico[ultimo][1]
+        mu = estado.params[0]
+        for k in range(pos, len(valores) - 1):
+            residuo2 = (valores[k] - mu) ** 2
+            estado.deriva += self.peso_deriva * (residuo2 / sigma2 - estado.deriva)
+            estado.nivel += self.peso_deriva * (valores[k] - estado.nivel)
+            sigma2 = estado.prever(valores[k], sigma2)
+            historico[indice[k + 1]] = [valores[k + 1], sigma2]
+            estado.barras_desde_ajuste += 1
+        while len(historico) > self.n_historico:
+            historico.popitem(last=False)
+        self.estatisticas['atualizacoes'] += 1
+        return True
+
+    def sigma(self, chave, series):
+        """
+        Volatilidade condicional (desvio padrão) prevista para a próxima barra de `series`,
+        equivalente a sqrt(arch_model(series, ...).fit().forecast(horizon=1).variance) no ajuste
+        e atualizada recursivamente entre ajustes. Usa o fallback de desvio móvel se não houver GARCH.
+        """
+        series = series.dropna()
+        if not HAS_ARCH or len(series) < 3:
+            self.estatisticas['fallbacks'] += 1
+            return volatilidade_rolling(series)
+        try:
+            with self._lock:
+                estado = self._estados.get(chave)
+                if (estado is not None and series.index[-1] < estado.ultimo_ts
+                        and series.index[-1] not in estado.historico):
+                    # Série que termina antes do histórico guardado: ajuste avulso, sem mexer no estado compartilhado
+                    self.estatisticas['fallbacks'] += 1
+                    f = ajustar_garch(series).forecast(horizon=1)
+                    return math.sqrt(f.variance.values[-1, 0])
+                if estado is None or self._precisa_ajuste(estado, series) or not self._avancar(estado, series):
+                    estado = self._ajustar(chave, series)
+                else:
+                    self.estatisticas['acertos'] += 1
+                valor, sigma2 = estado.historico[series.index[-1]]
+                return math.sqrt(estado.prever(valor, sigma2))
+        except Exception:
+            self.estatisticas['fallbacks'] += 1
+            return volatilidade_rolling(series)